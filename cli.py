@@ -0,0 +1,321 @@
+"""
+物业收费管理系统命令行入口（不加载 PyQt，用于计划任务 / 夜间批处理）
+
+用法：
+    python cli.py billing run [--period 2026-10] [--plan 1 --plan 2]   按出账计划生成本周期账单（可重复执行）
+    python cli.py billing plans                                        列出出账计划
+    python cli.py export unpaid --period 2026-10 [--output 文件]        导出欠费清单
+    python cli.py export payments [--period P] [--include-archive]     导出缴费记录
+    python cli.py export estates --period P                            导出多小区汇总
+    python cli.py report monthly|daily --period P [--output 文件]       生成月度/日度报表
+    python cli.py report year --year 2026 [--output 文件]               生成年度报表
+    python cli.py report closeout [--date D] [--end-date D] [--operator 收银员]   收银日结（按实收流水，含对账）
+    python cli.py backup create [--full] | list | prune                备份
+    python cli.py archive run [--years 3]                              归档多年前已结清的周期
+
+全局参数：--estate 小区标识（只对本次命令生效）、--json（结果以 JSON 输出到标准输出）、--quiet（不显示进度）。
+进度逐行输出到标准错误，结果摘要输出到标准输出。
+
+退出码：0 成功；1 部分失败；2 参数错误；3 业务错误（如周期格式不对、没有启用的计划）；4 其他错误（详见日志）。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_ERROR = 3
+EXIT_FAILURE = 4
+
+
+class Console:
+    """进度写到标准错误，结果写到标准输出"""
+
+    def __init__(self, as_json=False, quiet=False, stdout=None, stderr=None):
+        self.as_json = as_json
+        self.quiet = quiet
+        self.stdout = stdout or sys.stdout
+        self.stderr = stderr or sys.stderr
+        self._last_percent = {}
+
+    def progress(self, message, done=None, total=None):
+        if self.quiet:
+            return
+        if total:
+            # 同一任务按 10% 一档输出，避免大批量时刷屏
+            percent = int(done * 100 / total)
+            if done < total and percent // 10 == self._last_percent.get(message, -1) // 10:
+                return
+            self._last_percent[message] = percent
+            line = f"[{time.strftime('%H:%M:%S')}] {message} {done}/{total} ({percent}%)"
+        else:
+            line = f"[{time.strftime('%H:%M:%S')}] {message}"
+        print(line, file=self.stderr, flush=True)
+
+    def result(self, summary, text):
+        if self.as_json:
+            print(json.dumps(summary, ensure_ascii=False, default=str), file=self.stdout, flush=True)
+        else:
+            print(text, file=self.stdout, flush=True)
+
+
+def _period(value):
+    """校验周期格式 YYYY-MM"""
+    try:
+        year, month = value.split('-')
+        if len(year) != 4 or not 1 <= int(month) <= 12:
+            raise ValueError
+        return f"{int(year):04d}-{int(month):02d}"
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"周期格式应为 YYYY-MM：{value}")
+
+
+# ---------------------------------------------------------------------- 出账
+def cmd_billing_run(args, console):
+    from services.billing_plan_service import BillingPlanService, current_period
+
+    period = args.period or current_period()
+    plans = BillingPlanService.get_all_plans(active_only=True)
+    if args.plan:
+        plans = [p for p in plans if p.id in set(args.plan)]
+    if not plans:
+        raise ValueError("没有可执行的出账计划（请先在“周期出账计划”中添加并启用）")
+
+    # 每个计划单独一个事务，一个计划失败不影响其他计划
+    summary = {'period': period, 'created': 0, 'skipped': 0, 'plans': [], 'not_due': [], 'errors': []}
+    for index, plan in enumerate(plans, start=1):
+        name = plan.charge_item.name if plan.charge_item else str(plan.id)
+        try:
+            result = BillingPlanService.run_period(period, plan_ids=[plan.id])
+        except Exception as e:
+            summary['errors'].append({'plan_id': plan.id, 'charge_item': name, 'error': str(e)})
+            console.progress(f"出账 {period}：{name} 失败：{e}", index, len(plans))
+            continue
+        summary['created'] += result['created']
+        summary['skipped'] += result['skipped']
+        summary['plans'].extend(result['plans'])
+        summary['not_due'].extend(result['not_due'])
+        if result['not_due']:
+            console.progress(f"出账 {period}：{name} 上一账期未结束，下次出账 {result['not_due'][0]['next_period']}",
+                             index, len(plans))
+            continue
+        console.progress(f"出账 {period}：{name} 新建 {result['created']}，已存在 {result['skipped']}",
+                         index, len(plans))
+    text = (f"{period} 出账完成：新建 {summary['created']} 张，已存在跳过 {summary['skipped']} 张"
+            f"（{len(summary['plans'])} 个计划）")
+    if summary['not_due']:
+        text += f"；{len(summary['not_due'])} 个计划未到出账周期"
+    if summary['errors']:
+        text += f"；{len(summary['errors'])} 个计划失败：" + '；'.join(
+            f"{e['charge_item']}：{e['error']}" for e in summary['errors'])
+    console.result(summary, text)
+    if not summary['errors']:
+        return EXIT_OK
+    return EXIT_PARTIAL if summary['plans'] else EXIT_FAILURE
+
+
+def cmd_billing_plans(args, console):
+    from services.billing_plan_service import BillingPlanService
+
+    plans = BillingPlanService.get_all_plans()
+    rows = [{
+        'id': p.id,
+        'charge_item': p.charge_item.name if p.charge_item else '',
+        'property_type': p.property_type or '',
+        'building': p.building or '',
+        'billing_months': p.billing_months,
+        'active': bool(p.active),
+        'last_period': p.last_period or '',
+    } for p in plans]
+    lines = [f"{r['id']:>4}  {r['charge_item']:<12} 楼栋={r['building'] or '全部'} 类型={r['property_type'] or '全部'}"
+             f" 每 {r['billing_months']} 月  {'启用' if r['active'] else '停用'}  最近 {r['last_period'] or '-'}"
+             for r in rows]
+    console.result({'plans': rows}, '\n'.join(lines) or '没有出账计划')
+    return EXIT_OK
+
+
+# ---------------------------------------------------------------------- 导出与报表
+def _output(args, default_name):
+    return os.path.abspath(args.output or default_name)
+
+
+def cmd_export(args, console):
+    from utils.excel_exporter import ExcelExporter
+
+    if args.kind == 'unpaid':
+        if not args.period:
+            raise ValueError("导出欠费清单需要 --period")
+        path = _output(args, f'欠费清单_{args.period}.xlsx')
+        console.progress(f"导出欠费清单 {args.period}")
+        ExcelExporter.export_unpaid_list(args.period, path)
+    elif args.kind == 'payments':
+        path = _output(args, f"缴费记录_{args.period or '全部'}.xlsx")
+        console.progress(f"导出缴费记录 {args.period or '全部周期'}")
+        ExcelExporter.export_payments(args.period, path, include_archive=args.include_archive)
+    else:
+        if not args.period:
+            raise ValueError("导出小区汇总需要 --period")
+        path = _output(args, f'小区汇总_{args.period}.xlsx')
+        console.progress(f"导出小区汇总 {args.period}")
+        ExcelExporter.export_estate_summary(args.period, path)
+    summary = {'kind': args.kind, 'period': args.period, 'file': path, 'size': os.path.getsize(path)}
+    console.result(summary, f"已导出到 {path}")
+    return EXIT_OK
+
+
+def cmd_report(args, console):
+    from utils.report_generator import ReportGenerator
+
+    if args.kind == 'year':
+        year = args.year or int(time.strftime('%Y'))
+        path = _output(args, f'年度报表_{year}.xlsx')
+        console.progress(f"生成 {year} 年度报表")
+        ReportGenerator.generate_year_report(year, path)
+        summary = {'kind': 'year', 'year': year, 'file': path}
+    elif args.kind == 'closeout':
+        start = args.date or time.strftime('%Y-%m-%d')
+        path = _output(args, f"收银日结_{start}{'_' + args.end_date if args.end_date else ''}.xlsx")
+        console.progress(f"生成 {start}{' 至 ' + args.end_date if args.end_date else ''} 收银日结")
+        result = ReportGenerator.generate_closeout_report(start, path, args.end_date, args.operator)
+        summary = {'kind': 'closeout', 'date': start, 'end_date': args.end_date, 'file': path,
+                   'count': result['count'], 'amount': float(result['amount']), 'mismatches': result['mismatches']}
+        console.result(summary, f"实收 {result['count']} 笔，合计 ¥{float(result['amount']):.2f}，"
+                                f"对账不一致 {result['mismatches']} 张；报表已保存到 {path}")
+        # 有对账差异时按部分失败退出，便于计划任务报警
+        return EXIT_PARTIAL if result['mismatches'] else EXIT_OK
+    else:
+        label, generate = (('月度', ReportGenerator.generate_monthly_report) if args.kind == 'monthly'
+                           else ('日度', ReportGenerator.generate_daily_report))
+        if not args.period:
+            raise ValueError(f"{label}报表需要 --period")
+        path = _output(args, f"{label}报表_{args.period}.xlsx")
+        console.progress(f"生成 {args.period} {label}报表")
+        generate(args.period, path)
+        summary = {'kind': args.kind, 'period': args.period, 'file': path}
+    console.result(summary, f"报表已保存到 {path}")
+    return EXIT_OK
+
+
+# ---------------------------------------------------------------------- 备份与归档
+def cmd_backup(args, console):
+    from utils.backup_engine import BackupEngine
+
+    engine = BackupEngine()
+    if args.action == 'create':
+        entry = engine.snapshot(reason='cli', force_full=args.full,
+                                progress=lambda done, total: console.progress('备份', done, total))
+        summary = dict(entry.to_dict(), path=entry.path)
+        console.result(summary, f"已备份（{'全量' if entry.kind == 'full' else '增量'}）：{entry.path}")
+    elif args.action == 'list':
+        entries = engine.list_backups()
+        summary = {'backups': [e.to_dict() for e in entries]}
+        console.result(summary, '\n'.join(f"{e.created}  {e.kind:<5} {e.size:>12}  {e.file}  {e.reason}"
+                                          for e in entries) or '没有备份')
+    else:
+        entries = engine.prune()
+        console.result({'kept': len(entries)}, f"已按保留策略清理，剩余 {len(entries)} 个备份")
+    return EXIT_OK
+
+
+def cmd_archive(args, console):
+    from services.archive_service import ArchiveService
+
+    console.progress(f"归档 {args.years} 年前已结清的周期")
+    result = ArchiveService.archive_closed_periods(args.years)
+    console.result(result, f"归档周期 {len(result['periods'])} 个，账单 {result['payments']} 张，"
+                           f"流水 {result['transactions']} 条（截止 {result['cutoff']}）")
+    return EXIT_OK
+
+
+# ---------------------------------------------------------------------- 入口
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='物业收费管理系统命令行（计划任务用）')
+    parser.add_argument('--estate', help='小区标识，只对本次命令生效（默认当前小区）')
+    parser.add_argument('--json', action='store_true', help='结果以 JSON 输出')
+    parser.add_argument('--quiet', action='store_true', help='不显示进度')
+    commands = parser.add_subparsers(dest='command', metavar='命令')
+    commands.required = True
+
+    billing = commands.add_parser('billing', help='出账').add_subparsers(dest='action', metavar='操作')
+    billing.required = True
+    run = billing.add_parser('run', help='按出账计划生成一个周期的账单')
+    run.add_argument('--period', type=_period, help='周期 YYYY-MM，默认当前月')
+    run.add_argument('--plan', type=int, action='append', help='只执行指定计划（可重复）')
+    run.set_defaults(handler=cmd_billing_run)
+    billing.add_parser('plans', help='列出出账计划').set_defaults(handler=cmd_billing_plans)
+
+    export = commands.add_parser('export', help='导出 Excel')
+    export.add_argument('kind', choices=['unpaid', 'payments', 'estates'])
+    export.add_argument('--period', type=_period)
+    export.add_argument('--output', help='保存路径，默认当前目录')
+    export.add_argument('--include-archive', action='store_true', help='缴费记录包含归档库中的账单')
+    export.set_defaults(handler=cmd_export)
+
+    report = commands.add_parser('report', help='生成报表')
+    report.add_argument('kind', choices=['monthly', 'daily', 'year', 'closeout'])
+    report.add_argument('--period', type=_period)
+    report.add_argument('--year', type=int)
+    report.add_argument('--date', help='日结开始日期 YYYY-MM-DD，默认今天')
+    report.add_argument('--end-date', help='日结结束日期 YYYY-MM-DD，默认与开始日期相同')
+    report.add_argument('--operator', help='只统计该收银员')
+    report.add_argument('--output', help='保存路径，默认当前目录')
+    report.set_defaults(handler=cmd_report)
+
+    backup = commands.add_parser('backup', help='备份')
+    backup.add_argument('action', choices=['create', 'list', 'prune'])
+    backup.add_argument('--full', action='store_true', help='强制全量备份')
+    backup.set_defaults(handler=cmd_backup)
+
+    archive = commands.add_parser('archive', help='归档历史账单')
+    archive.add_argument('action', choices=['run'])
+    archive.add_argument('--years', type=int, default=3)
+    archive.set_defaults(handler=cmd_archive)
+    return parser
+
+
+def main(argv=None, stdout=None, stderr=None):
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else EXIT_USAGE
+    console = Console(as_json=args.json, quiet=args.quiet, stdout=stdout, stderr=stderr)
+
+    from models.database import init_db, switch_estate
+    from services.write_executor import write_executor
+    from utils.logger import logger
+
+    command = ' '.join(a for a in (argv if argv is not None else sys.argv[1:]))
+    logger.log_operation("CLI_START", command)
+    try:
+        # 数据库迁移会 print 进度，转到标准错误，标准输出只留给结果（--json 时保持可解析）
+        with contextlib.redirect_stdout(console.stderr):
+            if args.estate:
+                switch_estate(args.estate, remember=False)
+            else:
+                init_db()
+        code = args.handler(args, console)
+    except ValueError as e:
+        console.result({'error': str(e)}, f"错误：{e}")
+        code = EXIT_ERROR
+    except Exception as e:
+        logger.log_error(e, f"CLI_FAILED: {command}")
+        console.result({'error': str(e)}, f"失败：{e}")
+        code = EXIT_FAILURE
+    finally:
+        write_executor.shutdown()
+    logger.log_operation("CLI_DONE", f"{command} exit={code}")
+    logger.flush()
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
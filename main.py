@@ -8,8 +8,13 @@ import errno
 import tempfile
 import shutil
 import os
+import threading
+
+# 进程启动时间，用于统计各启动阶段耗时
+_PROCESS_START = time.perf_counter()
+
 from PyQt5.QtWidgets import QApplication, QMessageBox
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 
 # 设置Qt插件路径（解决虚拟环境中的插件问题）
 if hasattr(sys, 'frozen'):
@@ -43,7 +48,6 @@ if getattr(sys, 'frozen', False):
 
 # Local imports (after ensuring sys.path contains application files)
 from models.database import init_db
-from migrate_db import migrate_database
 try:
     from ui.main_window import MainWindow
 except ModuleNotFoundError:
@@ -56,15 +60,64 @@ except ModuleNotFoundError:
     except Exception:
         raise
 from utils.logger import logger, setup_global_exception_handler
+from utils.startup import startup_timer
+
+_IMPORTS_DONE = time.perf_counter()
+
+
+def parse_options(argv):
+    """运行方式：
+        main.py                              本机直接使用数据库（默认）
+        main.py --server --token T [--host H] [--port P]
+                                             服务模式：本机独占数据库，为局域网内其他收银电脑提供服务
+                                             （不设口令时只能用 --host 127.0.0.1 在本机使用）
+        main.py --connect 服务端IP[:端口] [--token T]
+                                             联网模式：数据在服务端，本机只运行界面
+    联网模式也可以在 ~/.property_manager_settings.json 中设置 server_url / server_token。
+    """
+    import argparse
+    import json
+    from pathlib import Path
+    from services.api_protocol import DEFAULT_PORT
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--server', action='store_true')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--connect', default=None)
+    parser.add_argument('--token', default=None)
+    # 其余参数（如 Qt 的 -style）原样留给 QApplication
+    options, _ = parser.parse_known_args(argv)
+    if not options.server and not options.connect:
+        try:
+            cfg = Path.home() / '.property_manager_settings.json'
+            data = json.loads(cfg.read_text(encoding='utf-8')) if cfg.exists() else {}
+            options.connect = data.get('server_url') or None
+            options.token = options.token or data.get('server_token') or None
+        except Exception:
+            pass
+    return options
 
 
 def main():
     """主函数"""
     try:
+        startup_timer.reset(_PROCESS_START)
+        startup_timer.record('imports', _PROCESS_START, _IMPORTS_DONE)
+
         # 设置全局异常处理器和启动日志
         setup_global_exception_handler()
         logger.log_startup_info()
 
+        options = parse_options(sys.argv[1:])
+        if options.server:
+            # 服务模式不显示界面
+            from services.api_server import serve
+            return serve(options.host, options.port, options.token)
+        client = None
+        if options.connect:
+            from services.api_client import install_remote_services
+            client = install_remote_services(options.connect, options.token)
+
         # ----------------- PyInstaller temp cleanup + single-instance -----------------
         # Clean up old PyInstaller _MEI* temp dirs to reduce "file already exists" popup risk.
         def cleanup_old_pyinstaller_dirs(days_old=1):
@@ -120,33 +173,41 @@ def main():
                 raise
             return s
 
-        # Run cleanup (remove >1 day old) then ensure single instance
-        try:
-            cleanup_old_pyinstaller_dirs(days_old=1)
-        except Exception:
-            pass
+        # Ensure single instance first, then clean up (remove >1 day old) on a
+        # background thread so listing/rmtree of the temp folder does not delay the window.
         _single_socket = None
         try:
-            _single_socket = ensure_single_instance_or_exit(_SINGLE_INSTANCE_PORT)
+            with startup_timer.phase('single_instance'):
+                _single_socket = ensure_single_instance_or_exit(_SINGLE_INSTANCE_PORT)
         except SystemExit:
             raise
         except Exception:
             _single_socket = None
+
+        def _background_cleanup():
+            with startup_timer.phase('temp_cleanup'):
+                try:
+                    cleanup_old_pyinstaller_dirs(days_old=1)
+                except Exception:
+                    pass
+
+        threading.Thread(target=_background_cleanup, name='TempCleanup', daemon=True).start()
         # --------------------------------------------------------------------------
-        # 迁移数据库（如果存在旧数据库）
-        migrate_database()
-        
-        # 初始化数据库（创建表，如果不存在）
-        init_db()
         
         # 创建应用程序
-        app = QApplication(sys.argv)
-        app.setStyle('Fusion')  # 使用Fusion样式，更现代
+        with startup_timer.phase('qapplication'):
+            app = QApplication(sys.argv)
+            app.setStyle('Fusion')  # 使用Fusion样式，更现代
         
-        # 创建主窗口
+        # 先显示主窗口框架，数据库准备和首次加载数据在窗口显示后进行
         try:
-            window = MainWindow()
-            window.show()
+            with startup_timer.phase('window_shell'):
+                window = MainWindow(defer_load=True)
+                window.show()
+            # 初始化数据库：新库建表，老库按 PRAGMA user_version 执行缺少的迁移步骤；
+            # 联网模式下只检查服务端是否可用
+            prepare = client.ping if client is not None else init_db
+            QTimer.singleShot(0, lambda: window.start_deferred_load(prepare))
         except Exception as e:
             # 如果窗口创建失败，显示错误信息
             import traceback
@@ -158,8 +219,47 @@ def main():
             msg_box.exec_()
             return 1
         
+        if client is not None:
+            # 联网模式：定时备份和定时出账都由服务端执行
+            return app.exec_()
+
+        # 定时备份：后台线程按间隔创建快照，退出时若数据有修改再备份一次
+        try:
+            from utils.backup_engine import BackupScheduler
+            backup_scheduler = BackupScheduler()
+            backup_scheduler.start()
+            app.aboutToQuit.connect(backup_scheduler.on_exit)
+        except Exception as e:
+            logger.log_error(e, 'BACKUP_SCHEDULER_START_FAILED')
+
+        # 定时出账：数据库就绪后按出账计划补齐本周期账单（可重复执行，不会重复出账）。
+        # 出账服务会加载 NumPy，放到首次加载数据之后再导入
+        def _start_billing_scheduler():
+            try:
+                from services.billing_plan_service import BillingScheduler
+                scheduler = BillingScheduler(on_created=lambda summary: window.payments_generated.emit())
+                scheduler.start()
+                app.aboutToQuit.connect(scheduler.stop)
+            except Exception as e:
+                logger.log_error(e, 'BILLING_SCHEDULER_START_FAILED')
+
+        window.data_loaded.connect(_start_billing_scheduler)
+        
         # 运行应用程序
-        return app.exec_()
+        exit_code = app.exec_()
+        # 等写线程处理完已提交的写操作
+        try:
+            from services.write_executor import write_executor
+            write_executor.shutdown()
+        except Exception:
+            pass
+        # 退出前把本次运行的性能统计写入日志
+        try:
+            from utils.profiler import profiler
+            profiler.log_summary()
+        except Exception:
+            pass
+        return exit_code
     except Exception as e:
         # 如果Qt初始化失败，尝试显示控制台错误
         import traceback
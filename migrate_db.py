@@ -1,231 +1,475 @@
 """
 数据库迁移脚本
-自动检测并添加缺失的字段
+
+数据库结构版本保存在 SQLite 的 PRAGMA user_version 中。每个迁移步骤有一个递增的编号，
+启动时只读取一次 user_version：已是最新版本则直接返回；否则在一个事务中依次执行缺少的步骤，
+最后把 user_version 更新为最新版本，任一步失败则整体回滚。
+
+新增字段/表/索引时：
+    1. 修改 models 中的模型（新建数据库由 create_all 直接建成最新结构）；
+    2. 在本文件末尾用 @migration(N, '说明') 增加一个新步骤（老数据库靠它升级）。
+ALTER TABLE ADD COLUMN 表达不了的修改（改类型、删列、改约束）用 _rebuild_table 重建表。
+
+归档库（property_archive.db）只有账单表和流水表，用 migrate_archive 按同样的步骤迁移，
+所以迁移步骤要先判断表是否存在，不能假定主库的其他表都在。
 """
 import sqlite3
 import os
+import re
 from datetime import datetime, timedelta
-from models.database import DB_PATH
+from models.database import DB_PATH, archive_db_path
+
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """注册一个迁移步骤"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def get_schema_version(conn):
+    """读取数据库结构版本（PRAGMA user_version）"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def _table_exists(cursor, table):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+
+def _columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info('{table}')")
+    return [row[1] for row in cursor.fetchall()]
 
 
-def migrate_database():
-    """迁移数据库，添加缺失的字段"""
-    if not os.path.exists(DB_PATH):
-        print(f"数据库文件不存在: {DB_PATH}")
+def _add_column(cursor, table, column, ddl, fill_sql=None):
+    """表存在且缺少该字段时添加字段；表不存在时跳过（稍后由 create_all 建表）"""
+    if not _table_exists(cursor, table) or column in _columns(cursor, table):
+        return False
+    print(f"添加 {table}.{column} 字段...")
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    if fill_sql:
+        cursor.execute(fill_sql)
+    print(f"✓ {table}.{column} 字段已添加")
+    return True
+
+
+def _rebuild_table(cursor, table, create_sql, columns=None, indexes=()):
+    """按新的建表语句重建表并保留数据（SQLite 官方推荐的 12 步重建法的简化版）
+
+    Args:
+        table: 表名
+        create_sql: 新表的 CREATE TABLE 语句，表名处写 {table}
+        columns: 需要复制的字段 {新字段: 旧字段或SQL表达式}，默认复制新旧表共有的字段
+        indexes: 重建后需要重新创建的索引语句
+    """
+    new_table = f"{table}__new"
+    cursor.execute(f"DROP TABLE IF EXISTS {new_table}")
+    cursor.execute(create_sql.format(table=new_table))
+    if columns is None:
+        old_cols = set(_columns(cursor, table))
+        shared = [c for c in _columns(cursor, new_table) if c in old_cols]
+        columns = {c: c for c in shared}
+    targets = ', '.join(columns.keys())
+    sources = ', '.join(columns.values())
+    cursor.execute(f"INSERT INTO {new_table} ({targets}) SELECT {sources} FROM {table}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+    for sql in indexes:
+        cursor.execute(sql)
+
+
+def migrate_database(db_path=None):
+    """迁移数据库到最新结构版本
+
+    Returns:
+        bool: 是否成功（数据库不存在或已是最新版本也返回 True）
+    """
+    db_path = db_path or DB_PATH
+    if not os.path.exists(db_path):
+        print(f"数据库文件不存在: {db_path}")
         print("程序首次运行时会自动创建数据库")
         return True
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+
+    # isolation_level=None：由我们显式控制事务（BEGIN IMMEDIATE ... COMMIT）
+    conn = sqlite3.connect(db_path, isolation_level=None)
     try:
-        # 检查并添加 charge_items.unit 字段
-        try:
-            cursor.execute("SELECT unit FROM charge_items LIMIT 1")
-        except sqlite3.OperationalError:
-            print("添加 charge_items.unit 字段...")
-            cursor.execute("ALTER TABLE charge_items ADD COLUMN unit VARCHAR(20) DEFAULT '元/月'")
-            # 更新现有记录
-            cursor.execute("UPDATE charge_items SET unit = '元/月' WHERE unit IS NULL")
-            print("✓ charge_items.unit 字段已添加")
-        
-        # 检查并添加 residents.move_in_date 字段
-        try:
-            cursor.execute("SELECT move_in_date FROM residents LIMIT 1")
-        except sqlite3.OperationalError:
-            print("添加 residents.move_in_date 字段...")
-            cursor.execute("ALTER TABLE residents ADD COLUMN move_in_date DATETIME")
-            print("✓ residents.move_in_date 字段已添加")
-        
-        # 检查并添加 residents.identity 字段（房主/租户）
-        try:
-            cursor.execute("SELECT identity FROM residents LIMIT 1")
-        except sqlite3.OperationalError:
-            print("添加 residents.identity 字段...")
-            cursor.execute("ALTER TABLE residents ADD COLUMN identity VARCHAR(20) DEFAULT 'owner'")
-            cursor.execute("UPDATE residents SET identity = 'owner' WHERE identity IS NULL")
-            print("✓ residents.identity 字段已添加")
-        
-        # 检查并添加 residents.property_type 字段（住宅/商铺）
-        try:
-            cursor.execute("SELECT property_type FROM residents LIMIT 1")
-        except sqlite3.OperationalError:
-            print("添加 residents.property_type 字段...")
-            cursor.execute("ALTER TABLE residents ADD COLUMN property_type VARCHAR(20) DEFAULT 'residential'")
-            cursor.execute("UPDATE residents SET property_type = 'residential' WHERE property_type IS NULL")
-            print("✓ residents.property_type 字段已添加")
-        
-        # 检查并添加 residents.building 字段（楼栋）
-        try:
-            cursor.execute("SELECT building FROM residents LIMIT 1")
-        except sqlite3.OperationalError:
-            print("添加 residents.building 字段...")
-            cursor.execute("ALTER TABLE residents ADD COLUMN building VARCHAR(20)")
-            cursor.execute("UPDATE residents SET building = '' WHERE building IS NULL")
-            print("✓ residents.building 字段已添加")
-
-        # 检查并添加 residents.unit 字段（单元）
-        try:
-            cursor.execute("SELECT unit FROM residents LIMIT 1")
-        except sqlite3.OperationalError:
-            print("添加 residents.unit 字段...")
-            cursor.execute("ALTER TABLE residents ADD COLUMN unit VARCHAR(20)")
-            cursor.execute("UPDATE residents SET unit = '' WHERE unit IS NULL")
-            print("✓ residents.unit 字段已添加")
-        
-        # 检查并添加 payments 表的新字段
-        try:
-            cursor.execute("SELECT billing_start_date FROM payments LIMIT 1")
-        except sqlite3.OperationalError:
-            print("添加 payments.billing_start_date 字段...")
-            cursor.execute("ALTER TABLE payments ADD COLUMN billing_start_date DATETIME")
-            print("✓ payments.billing_start_date 字段已添加")
-        
-        try:
-            cursor.execute("SELECT billing_end_date FROM payments LIMIT 1")
-        except sqlite3.OperationalError:
-            print("添加 payments.billing_end_date 字段...")
-            cursor.execute("ALTER TABLE payments ADD COLUMN billing_end_date DATETIME")
-            print("✓ payments.billing_end_date 字段已添加")
-        
-        try:
-            cursor.execute("SELECT billing_months FROM payments LIMIT 1")
-        except sqlite3.OperationalError:
-            print("添加 payments.billing_months 字段...")
-            cursor.execute("ALTER TABLE payments ADD COLUMN billing_months INTEGER DEFAULT 1")
-            # 更新现有记录
-            cursor.execute("UPDATE payments SET billing_months = 1 WHERE billing_months IS NULL")
-            print("✓ payments.billing_months 字段已添加")
-        
-        try:
-            cursor.execute("SELECT paid_months FROM payments LIMIT 1")
-        except sqlite3.OperationalError:
-            print("添加 payments.paid_months 字段...")
-            cursor.execute("ALTER TABLE payments ADD COLUMN paid_months INTEGER DEFAULT 0")
-            # 更新现有记录
-            cursor.execute("UPDATE payments SET paid_months = 0 WHERE paid_months IS NULL")
-            print("✓ payments.paid_months 字段已添加")
-        
-        try:
-            cursor.execute("SELECT paid_amount FROM payments LIMIT 1")
-        except sqlite3.OperationalError:
-            print("添加 payments.paid_amount 字段...")
-            cursor.execute("ALTER TABLE payments ADD COLUMN paid_amount NUMERIC(10, 2) DEFAULT 0")
-            # 更新现有记录：如果已缴费，设置paid_amount等于amount
-            cursor.execute("UPDATE payments SET paid_amount = amount WHERE paid = 1 AND paid_amount IS NULL")
-            cursor.execute("UPDATE payments SET paid_amount = 0 WHERE paid_amount IS NULL")
-            print("✓ payments.paid_amount 字段已添加")
-        
-        # 为现有payments记录设置默认的计费日期（基于period字段）
-        cursor.execute("""
-            SELECT id, period FROM payments 
-            WHERE billing_start_date IS NULL OR billing_end_date IS NULL
-        """)
-        records = cursor.fetchall()
-        if records:
-            print(f"更新 {len(records)} 条现有记录的计费日期...")
-            for record_id, period in records:
-                try:
-                    # 解析period (格式: YYYY-MM)
-                    year, month = map(int, period.split('-'))
-                    start_date = datetime(year, month, 1)
-                    # 结束日期为当月最后一天
-                    if month == 12:
-                        end_date = datetime(year + 1, 1, 1) - timedelta(days=1)
-                    else:
-                        end_date = datetime(year, month + 1, 1) - timedelta(days=1)
-                    
-                    cursor.execute("""
-                        UPDATE payments 
-                        SET billing_start_date = ?, 
-                            billing_end_date = ?,
-                            billing_months = 1
-                        WHERE id = ?
-                    """, (start_date, end_date, record_id))
-                except:
-                    # 如果解析失败，使用当前日期
-                    now = datetime.now()
-                    cursor.execute("""
-                        UPDATE payments 
-                        SET billing_start_date = ?, 
-                            billing_end_date = ?,
-                            billing_months = 1
-                        WHERE id = ?
-                    """, (now, now, record_id))
-            print("✓ 现有记录的计费日期已更新")
-        
-        # 重新计算并修正所有 payments 的 billing_months（以 billing_start_date/billing_end_date 为准）
+        current = get_schema_version(conn)
+        target = latest_version()
+        if current >= target:
+            return True
+
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
         try:
-            cursor.execute("SELECT id, billing_start_date, billing_end_date, billing_months FROM payments")
-            all_payments = cursor.fetchall()
-            for pid, bstart, bend, bm in all_payments:
-                if not bstart or not bend:
-                    continue
-                try:
-                    # SQLite stores DATETIME as text; let sqlite parse via substrings
-                    # We'll use Python to parse via sqlite3 returning string; use sqlite to get raw and let Python parse
-                    import datetime as _dt
-                    start = _dt.datetime.fromisoformat(bstart) if isinstance(bstart, str) else _dt.datetime(*bstart)
-                    end = _dt.datetime.fromisoformat(bend) if isinstance(bend, str) else _dt.datetime(*bend)
-                    months = (end.year - start.year) * 12 + (end.month - start.month)
-                    if end.day >= start.day:
-                        months += 1
-                    if months <= 0:
-                        months = 1
-                    if bm != months:
-                        cursor.execute("UPDATE payments SET billing_months = ? WHERE id = ?", (months, pid))
-                except Exception:
+            for version, description, step in MIGRATIONS:
+                if version <= current:
                     continue
-            print("✓ 所有 payments 的 billing_months 已按计费日期重新计算并修正")
-            conn.commit()
+                print(f"执行数据库迁移 {version}: {description}")
+                step(cursor)
+            cursor.execute(f"PRAGMA user_version = {int(target)}")
+            cursor.execute("COMMIT")
         except Exception:
-            conn.rollback()
-        # 确保 payment_transactions 表存在
-        try:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS payment_transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    payment_id INTEGER NOT NULL,
-                    amount NUMERIC(10,2) NOT NULL,
-                    paid_time DATETIME,
-                    operator VARCHAR(50),
-                    created_at DATETIME DEFAULT (datetime('now'))
-                )
-            """)
-            print("✓ payment_transactions 表已存在或创建完成")
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            print(f"创建 payment_transactions 表失败：{e}")
-        
-        # 确保 print_logs 表存在（记录打印流水）
-        try:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS print_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    payment_id INTEGER,
-                    seq INTEGER NOT NULL,
-                    printed_at DATETIME DEFAULT (datetime('now'))
-                )
-            """)
-            print("✓ print_logs 表已存在或创建完成")
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            print(f"创建 print_logs 表失败：{e}")
-        
-        conn.commit()
-        print("\n数据库迁移完成！")
+            cursor.execute("ROLLBACK")
+            raise
+        print(f"\n数据库迁移完成！版本 {current} -> {target}")
         return True
-        
+
     except Exception as e:
-        conn.rollback()
         print(f"\n数据库迁移失败: {str(e)}")
         return False
     finally:
         conn.close()
 
 
+# 早期的归档库没有记录结构版本（user_version 为 0）；归档功能随第 8 步加入，按第 8 步的结构处理
+ARCHIVE_BASE_VERSION = 8
+
+
+def migrate_archive(archive_path):
+    """迁移归档库到最新结构版本（归档库不存在时直接返回 True）"""
+    if not os.path.exists(archive_path):
+        return True
+    conn = sqlite3.connect(archive_path)
+    try:
+        if get_schema_version(conn) == 0:
+            conn.execute(f"PRAGMA user_version = {ARCHIVE_BASE_VERSION}")
+            conn.commit()
+    finally:
+        conn.close()
+    return migrate_database(archive_path)
+
+
+# ---------------------------------------------------------------------------
+# 迁移步骤
+# ---------------------------------------------------------------------------
+
+@migration(1, '补齐早期版本缺少的字段、计费日期和流水/打印日志表')
+def _migrate_legacy_columns(cursor):
+    _add_column(cursor, 'charge_items', 'unit', "VARCHAR(20) DEFAULT '元/月'",
+                "UPDATE charge_items SET unit = '元/月' WHERE unit IS NULL")
+    _add_column(cursor, 'residents', 'move_in_date', "DATETIME")
+    # 身份（房主/租户）、房屋类型（住宅/商铺）
+    _add_column(cursor, 'residents', 'identity', "VARCHAR(20) DEFAULT 'owner'",
+                "UPDATE residents SET identity = 'owner' WHERE identity IS NULL")
+    _add_column(cursor, 'residents', 'property_type', "VARCHAR(20) DEFAULT 'residential'",
+                "UPDATE residents SET property_type = 'residential' WHERE property_type IS NULL")
+    # 楼栋、单元
+    _add_column(cursor, 'residents', 'building', "VARCHAR(20)",
+                "UPDATE residents SET building = '' WHERE building IS NULL")
+    _add_column(cursor, 'residents', 'unit', "VARCHAR(20)",
+                "UPDATE residents SET unit = '' WHERE unit IS NULL")
+
+    _add_column(cursor, 'payments', 'billing_start_date', "DATETIME")
+    _add_column(cursor, 'payments', 'billing_end_date', "DATETIME")
+    _add_column(cursor, 'payments', 'billing_months', "INTEGER DEFAULT 1",
+                "UPDATE payments SET billing_months = 1 WHERE billing_months IS NULL")
+    _add_column(cursor, 'payments', 'paid_months', "INTEGER DEFAULT 0",
+                "UPDATE payments SET paid_months = 0 WHERE paid_months IS NULL")
+    if _add_column(cursor, 'payments', 'paid_amount', "NUMERIC(10, 2) DEFAULT 0"):
+        # 如果已缴费，设置paid_amount等于amount（新加的字段已按默认值填 0，不能用 IS NULL 判断）
+        cursor.execute("UPDATE payments SET paid_amount = amount WHERE paid = 1")
+        cursor.execute("UPDATE payments SET paid_amount = 0 WHERE paid_amount IS NULL")
+
+    if _table_exists(cursor, 'payments'):
+        _backfill_billing_dates(cursor)
+
+    # 缴费流水表、打印日志表
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS payment_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payment_id INTEGER NOT NULL,
+            amount NUMERIC(10,2) NOT NULL,
+            paid_time DATETIME,
+            operator VARCHAR(50),
+            created_at DATETIME DEFAULT (datetime('now'))
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS print_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payment_id INTEGER,
+            seq INTEGER NOT NULL,
+            printed_at DATETIME DEFAULT (datetime('now'))
+        )
+    """)
+
+
+def _backfill_billing_dates(cursor):
+    """为缺少计费日期的账单按 period 补齐，并按计费日期重新计算 billing_months"""
+    cursor.execute("""
+        SELECT id, period FROM payments
+        WHERE billing_start_date IS NULL OR billing_end_date IS NULL
+    """)
+    records = cursor.fetchall()
+    if records:
+        print(f"更新 {len(records)} 条现有记录的计费日期...")
+        for record_id, period in records:
+            try:
+                # 解析period (格式: YYYY-MM)
+                year, month = map(int, period.split('-'))
+                start_date = datetime(year, month, 1)
+                # 结束日期为当月最后一天
+                if month == 12:
+                    end_date = datetime(year + 1, 1, 1) - timedelta(days=1)
+                else:
+                    end_date = datetime(year, month + 1, 1) - timedelta(days=1)
+            except Exception:
+                # 如果解析失败，使用当前日期
+                start_date = end_date = datetime.now()
+            cursor.execute("""
+                UPDATE payments
+                SET billing_start_date = ?,
+                    billing_end_date = ?,
+                    billing_months = 1
+                WHERE id = ?
+            """, (start_date, end_date, record_id))
+
+    cursor.execute("SELECT id, billing_start_date, billing_end_date, billing_months FROM payments")
+    for pid, bstart, bend, bm in cursor.fetchall():
+        if not bstart or not bend:
+            continue
+        try:
+            start = datetime.fromisoformat(bstart) if isinstance(bstart, str) else bstart
+            end = datetime.fromisoformat(bend) if isinstance(bend, str) else bend
+            months = (end.year - start.year) * 12 + (end.month - start.month)
+            if end.day >= start.day:
+                months += 1
+            if months <= 0:
+                months = 1
+            if bm != months:
+                cursor.execute("UPDATE payments SET billing_months = ? WHERE id = ?", (months, pid))
+        except Exception:
+            continue
+
+
+@migration(2, '账单增加用量字段 payments.usage')
+def _migrate_payment_usage(cursor):
+    _add_column(cursor, 'payments', 'usage', "NUMERIC(10,2)")
+
+
+@migration(3, '新增抄表记录表 meter_readings')
+def _migrate_meter_readings(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS meter_readings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            resident_id INTEGER NOT NULL REFERENCES residents (id),
+            charge_item_id INTEGER NOT NULL REFERENCES charge_items (id),
+            meter_no VARCHAR(50) NOT NULL DEFAULT '',
+            period VARCHAR(20) NOT NULL,
+            previous_value NUMERIC(12, 2),
+            current_value NUMERIC(12, 2) NOT NULL,
+            read_at DATETIME,
+            payment_id INTEGER REFERENCES payments (id),
+            operator VARCHAR(50),
+            created_at DATETIME DEFAULT (datetime('now')),
+            CONSTRAINT uq_meter_reading UNIQUE (resident_id, charge_item_id, meter_no, period)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_meter_readings_item_period ON meter_readings (charge_item_id, period)")
+
+
+@migration(4, '账单按 (住户, 收费项目, 周期) 唯一；新增周期出账计划表 billing_plans')
+def _migrate_payment_uniqueness(cursor):
+    if _table_exists(cursor, 'payments'):
+        _add_column(cursor, 'payments', 'dedup_seq', "INTEGER NOT NULL DEFAULT 0")
+        # 升级前已存在的重复账单保留，按创建顺序编号 1、2……，最早的一张仍为 0
+        cursor.execute("CREATE TEMP TABLE payment_dups (id INTEGER PRIMARY KEY, seq INTEGER NOT NULL)")
+        cursor.execute("""
+            INSERT INTO payment_dups (id, seq)
+            SELECT id, seq FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY resident_id, charge_item_id, period ORDER BY id) - 1 AS seq
+                FROM payments
+            ) WHERE seq > 0
+        """)
+        cursor.execute("""
+            UPDATE payments SET dedup_seq = (SELECT seq FROM payment_dups d WHERE d.id = payments.id)
+            WHERE id IN (SELECT id FROM payment_dups)
+        """)
+        if cursor.rowcount > 0:
+            print(f"发现 {cursor.rowcount} 张同周期重复账单，已保留并编号")
+        cursor.execute("DROP TABLE payment_dups")
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_payment_period
+            ON payments (resident_id, charge_item_id, period, dedup_seq)
+        """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS billing_plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            charge_item_id INTEGER NOT NULL REFERENCES charge_items (id),
+            property_type VARCHAR(20) DEFAULT '',
+            building VARCHAR(20) DEFAULT '',
+            billing_months INTEGER NOT NULL DEFAULT 1,
+            active INTEGER DEFAULT 1,
+            last_period VARCHAR(20),
+            last_run_at DATETIME,
+            created_at DATETIME DEFAULT (datetime('now'))
+        )
+    """)
+
+
+@migration(5, '流水表按账单ID建索引')
+def _migrate_transaction_index(cursor):
+    if _table_exists(cursor, 'payment_transactions'):
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS ix_payment_transactions_payment_id
+            ON payment_transactions (payment_id)
+        """)
+
+
+# 金额字段（元）改为按整数分保存，对应 models.types.MoneyType
+MONEY_COLUMNS = (
+    ('payments', 'amount'),
+    ('payments', 'paid_amount'),
+    ('payment_transactions', 'amount'),
+    ('charge_items', 'price'),
+)
+
+
+@migration(6, '金额字段改为整数分')
+def _migrate_money_to_fen(cursor):
+    # 原字段为 NUMERIC 亲和性，直接存整数即可，不必重建表
+    for table, column in MONEY_COLUMNS:
+        if not _table_exists(cursor, table) or column not in _columns(cursor, table):
+            continue
+        cursor.execute(f"""
+            UPDATE {table} SET {column} = CAST(ROUND({column} * 100) AS INTEGER)
+            WHERE {column} IS NOT NULL
+        """)
+
+
+@migration(7, '住户表按房号、姓名建索引（住户选择框前缀查找）')
+def _migrate_resident_name_index(cursor):
+    if _table_exists(cursor, 'residents'):
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_residents_room_no ON residents (room_no)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_residents_name ON residents (name)")
+
+
+@migration(8, '新增已归档周期汇总表 archived_periods')
+def _migrate_archived_periods(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archived_periods (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            period VARCHAR(20) NOT NULL,
+            charge_item_id INTEGER NOT NULL REFERENCES charge_items (id),
+            payment_count INTEGER NOT NULL DEFAULT 0,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            total_amount INTEGER NOT NULL DEFAULT 0,
+            paid_amount INTEGER NOT NULL DEFAULT 0,
+            archived_at DATETIME DEFAULT (datetime('now'))
+        )
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_archived_period_item
+        ON archived_periods (period, charge_item_id)
+    """)
+
+
+
+@migration(9, '流水表按收款时间、收银员建索引（收银日结）')
+def _migrate_transaction_paid_time_index(cursor):
+    if _table_exists(cursor, 'payment_transactions'):
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS ix_payment_transactions_paid_time
+            ON payment_transactions (paid_time, operator)
+        """)
+
+
+
+@migration(10, '账单表按周期、创建时间建索引（列表分页）')
+def _migrate_payment_period_index(cursor):
+    if _table_exists(cursor, 'payments'):
+        # 很早的版本没有创建时间列（ALTER TABLE 不能带 datetime('now') 默认值，旧账单留空）
+        if 'created_at' not in _columns(cursor, 'payments'):
+            cursor.execute("ALTER TABLE payments ADD COLUMN created_at DATETIME")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS ix_payments_period_created
+            ON payments (period, created_at)
+        """)
+
+
+# 归档后会从主库删除行的表
+ARCHIVED_TABLES = ('payment_transactions', 'payments')
+
+
+def _autoincrement_sql(create_sql, table):
+    """把建表语句的主键改为 INTEGER PRIMARY KEY AUTOINCREMENT，表名处换成 {table}"""
+    sql = create_sql.replace('{', '{{').replace('}', '}}')
+    sql = re.sub(rf'^\s*CREATE TABLE\s+(["`\[]?){table}["`\]]?', 'CREATE TABLE {table}', sql, count=1, flags=re.I)
+    sql = re.sub(r',\s*PRIMARY KEY\s*\(\s*"?id"?\s*\)', '', sql, flags=re.I)
+    sql, count = re.subn(r'(\(\s*"?id"?\s+INTEGER)(\s+NOT NULL)?(\s+PRIMARY KEY)?', r'\1 PRIMARY KEY AUTOINCREMENT',
+                         sql, count=1, flags=re.I)
+    if count != 1:
+        raise Exception(f"无法识别 {table} 表的主键定义")
+    return sql
+
+
+def raise_sequence(cursor, table, value, schema='main'):
+    """让 AUTOINCREMENT 表以后分配的 ID 大于 value"""
+    cursor.execute(f"SELECT seq FROM {schema}.sqlite_sequence WHERE name = ?", (table,))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute(f"INSERT INTO {schema}.sqlite_sequence (name, seq) VALUES (?, ?)", (table, value))
+    elif row[0] < value:
+        cursor.execute(f"UPDATE {schema}.sqlite_sequence SET seq = ? WHERE name = ?", (value, table))
+
+
+@migration(11, '账单表、流水表的 ID 改为 AUTOINCREMENT（删除或归档的 ID 不再复用）')
+def _migrate_autoincrement_ids(cursor):
+    for table in ARCHIVED_TABLES:
+        if not _table_exists(cursor, table):
+            continue
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        create_sql = cursor.fetchone()[0]
+        if 'AUTOINCREMENT' in create_sql.upper():
+            continue
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                       (table,))
+        indexes = [row[0] for row in cursor.fetchall()]
+        # 复制行时 sqlite_sequence 记下当前最大 ID
+        _rebuild_table(cursor, table, _autoincrement_sql(create_sql, table), indexes=indexes)
+
+    # 已经归档过的库：主库最新的行若被删过，当前最大 ID 可能小于归档库里的 ID，按归档库补上
+    cursor.execute("PRAGMA database_list")
+    main_path = next((row[2] for row in cursor.fetchall() if row[1] == 'main'), '')
+    archive_path = archive_db_path(main_path) if main_path else None
+    if not archive_path or not os.path.exists(archive_path):
+        return
+    archive = sqlite3.connect(archive_path)
+    try:
+        highest = {}
+        for table in ARCHIVED_TABLES:
+            if _table_exists(archive.cursor(), table):
+                highest[table] = archive.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+    finally:
+        archive.close()
+    for table, high in highest.items():
+        if high is not None and _table_exists(cursor, table):
+            raise_sequence(cursor, table, high)
+
+
+
+@migration(12, '收款流水中按 UTC 记录的收款时间改为本地时间')
+def _migrate_transaction_local_time(cursor):
+    # 登记缴费写入的流水以前没有设置收款时间，取的是列默认值 CURRENT_TIMESTAMP（UTC，精确到秒）；
+    # 程序写入的本地时间总是带微秒，按长度即可区分
+    if _table_exists(cursor, 'payment_transactions'):
+        cursor.execute("""
+            UPDATE payment_transactions SET paid_time = datetime(paid_time, 'localtime')
+            WHERE length(paid_time) = 19
+        """)
+
+
 if __name__ == '__main__':
     print("=" * 50)
     print("数据库迁移工具")
@@ -234,4 +478,3 @@ if __name__ == '__main__':
     migrate_database()
     print()
     input("按回车键退出...")
-
@@ -2,3 +2,5 @@ from models.resident import Resident
 from models.charge_item import ChargeItem
 from models.payment import Payment
 from models.payment_transaction import PaymentTransaction
+from models.meter_reading import MeterReading
+from models.billing_plan import BillingPlan
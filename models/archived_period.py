@@ -0,0 +1,30 @@
+"""
+已归档周期汇总模型
+账单和流水移入归档库后，在主库按 (周期, 收费项目) 留一行汇总，不打开归档库也能看到历史总数
+"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, func
+from sqlalchemy.orm import relationship
+from models.database import Base
+from models.types import MoneyType
+
+
+class ArchivedPeriod(Base):
+    """已归档周期汇总表"""
+    __tablename__ = 'archived_periods'
+    __table_args__ = (
+        Index('uq_archived_period_item', 'period', 'charge_item_id', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    period = Column(String(20), nullable=False, comment='缴费周期')
+    charge_item_id = Column(Integer, ForeignKey('charge_items.id'), nullable=False, comment='收费项目ID')
+    payment_count = Column(Integer, nullable=False, default=0, comment='账单数')
+    transaction_count = Column(Integer, nullable=False, default=0, comment='流水数')
+    total_amount = Column(MoneyType, nullable=False, default=0, comment='应收合计')
+    paid_amount = Column(MoneyType, nullable=False, default=0, comment='实收合计')
+    archived_at = Column(DateTime, default=func.now(), comment='最近一次归档时间')
+
+    charge_item = relationship('ChargeItem')
+
+    def __repr__(self):
+        return f"<ArchivedPeriod(period='{self.period}', charge_item_id={self.charge_item_id}, count={self.payment_count})>"
@@ -0,0 +1,36 @@
+"""
+周期出账计划模型
+每条计划表示“每个周期按某收费项目给某范围的住户出账”，由定时出账按周期自动执行
+"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
+from sqlalchemy.orm import relationship
+from models.database import Base
+
+
+class BillingPlan(Base):
+    """周期出账计划表"""
+    __tablename__ = 'billing_plans'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    charge_item_id = Column(Integer, ForeignKey('charge_items.id'), nullable=False, comment='收费项目ID')
+    property_type = Column(String(20), default='', comment='房屋类型范围：空-全部，residential-住宅，commercial-商铺')
+    building = Column(String(20), default='', comment='楼栋范围：空-全部')
+    billing_months = Column(Integer, nullable=False, default=1, comment='每次出账的计费月数')
+    active = Column(Integer, default=1, comment='状态：1-启用，0-停用')
+    last_period = Column(String(20), comment='最近一次执行的周期')
+    last_run_at = Column(DateTime, comment='最近一次执行时间')
+    created_at = Column(DateTime, default=func.now(), comment='创建时间')
+
+    charge_item = relationship('ChargeItem')
+
+    def __repr__(self):
+        return f"<BillingPlan(id={self.id}, charge_item_id={self.charge_item_id}, active={self.active})>"
+
+    def scope_text(self):
+        """出账范围说明"""
+        parts = []
+        if self.building:
+            parts.append(f"{self.building}栋")
+        if self.property_type:
+            parts.append({'residential': '住宅', 'commercial': '商铺'}.get(self.property_type, self.property_type))
+        return '、'.join(parts) if parts else '全部住户'
@@ -1,8 +1,9 @@
 """
 收费项目模型
 """
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, func
+from sqlalchemy import Column, Integer, String, DateTime, func
 from models.database import Base
+from models.types import MoneyType
 
 
 class ChargeItem(Base):
@@ -11,7 +12,7 @@ class ChargeItem(Base):
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(100), nullable=False, comment='项目名称')
-    price = Column(Numeric(10, 2), nullable=False, comment='单价/固定金额')
+    price = Column(MoneyType, nullable=False, comment='单价/固定金额')
     charge_type = Column(String(20), nullable=False, comment='收费类型：fixed-固定，area-按面积，manual-手动')
     unit = Column(String(20), default='元/月', comment='单位：如 元/月、元/年、元/平方米等')
     status = Column(Integer, default=1, comment='状态：1-启用，0-停用')
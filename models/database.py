@@ -1,48 +1,257 @@
 """
 数据库连接和初始化模块
+
+每个小区一个数据库文件：estates.json 记录小区列表和当前小区（没有该文件时只有 property.db 一个小区）。
+各小区的引擎（连接池）在第一次用到时创建；切换小区时把 SessionLocal 改绑到对应引擎，无需重启程序。
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
+import json
+import threading
 from utils.path_utils import get_data_path
+from utils.profiler import profiler
 
-# 数据库文件路径
+# 数据库文件路径（默认小区）
 DB_PATH = get_data_path('property.db')
 DATABASE_URL = f'sqlite:///{DB_PATH}'
 
-# 创建数据库引擎
-engine = create_engine(DATABASE_URL, echo=False, connect_args={'check_same_thread': False})
+# 小区列表
+ESTATES_FILE = os.path.join(os.path.dirname(DB_PATH), 'estates.json')
+DEFAULT_ESTATE = 'default'
+
+# 连接等待其他连接释放锁的时间（秒），即 SQLite 的 busy_timeout
+BUSY_TIMEOUT = 10
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _create_engine(db_path):
+    new_engine = create_engine(f'sqlite:///{db_path}', echo=False,
+                               connect_args={'check_same_thread': False, 'timeout': BUSY_TIMEOUT})
+    # 统计每个服务方法执行的 SQL 数，并记录慢查询
+    profiler.install(new_engine)
+    return new_engine
+
+
+def get_engine(db_path=None):
+    """数据库文件对应的引擎（连接池），第一次使用时创建；默认为当前小区"""
+    db_path = os.path.abspath(db_path or current_db_path())
+    key = os.path.normcase(db_path)
+    with _engines_lock:
+        found = _engines.get(key)
+        if found is None:
+            found = _engines[key] = _create_engine(db_path)
+        return found
+
+
+class Estate:
+    """小区：名称和数据库文件"""
+
+    def __init__(self, key, name, path):
+        self.key = key
+        self.name = name
+        self.path = path
+
+    @property
+    def db_path(self):
+        """数据库文件绝对路径（相对路径按默认数据库所在目录解析）"""
+        if os.path.isabs(self.path):
+            return self.path
+        return os.path.join(os.path.dirname(DB_PATH), self.path)
+
+    def to_dict(self):
+        return {'key': self.key, 'name': self.name, 'path': self.path}
+
+    def __repr__(self):
+        return f"<Estate(key='{self.key}', name='{self.name}', path='{self.path}')>"
+
+
+def _read_estates_file():
+    try:
+        with open(ESTATES_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_estates():
+    """小区列表，默认小区（property.db）总在第一个"""
+    data = _read_estates_file()
+    estates = [Estate(e['key'], e.get('name') or e['key'], e['path']) for e in data.get('estates', [])
+               if e.get('key') and e.get('path')]
+    if not any(e.key == DEFAULT_ESTATE for e in estates):
+        estates.insert(0, Estate(DEFAULT_ESTATE, '本小区', os.path.basename(DB_PATH)))
+    return estates
+
+
+def save_estates(estates, current_key=None):
+    data = {
+        'current': current_key or current_estate().key,
+        'estates': [e.to_dict() for e in estates],
+    }
+    tmp_path = ESTATES_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, ESTATES_FILE)
+
+
+def find_estate(key):
+    for estate in load_estates():
+        if estate.key == key:
+            return estate
+    raise ValueError(f"小区不存在：{key}")
+
+
+def add_estate(name, path):
+    """登记一个小区（数据库文件不存在时在首次切换到该小区时新建）"""
+    name = (name or '').strip()
+    if not name:
+        raise ValueError("小区名称不能为空")
+    if not path:
+        raise ValueError("请选择小区数据库文件")
+    estates = load_estates()
+    if any(e.name == name for e in estates):
+        raise ValueError(f"小区 {name} 已存在")
+    new = Estate(f'estate{max([0] + [int(e.key[6:]) for e in estates if e.key[6:].isdigit()]) + 1}', name, path)
+    target = os.path.normcase(os.path.abspath(new.db_path))
+    if any(os.path.normcase(os.path.abspath(e.db_path)) == target for e in estates):
+        raise ValueError("该数据库文件已登记为其他小区")
+    estates.append(new)
+    save_estates(estates)
+    return new
+
+
+def rename_estate(key, name):
+    name = (name or '').strip()
+    if not name:
+        raise ValueError("小区名称不能为空")
+    estates = load_estates()
+    if any(e.name == name and e.key != key for e in estates):
+        raise ValueError(f"小区 {name} 已存在")
+    for estate in estates:
+        if estate.key == key:
+            estate.name = name
+            save_estates(estates)
+            return estate
+    raise ValueError(f"小区不存在：{key}")
+
 
-# 创建会话工厂
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def remove_estate(key):
+    """取消登记一个小区（不删除数据库文件）"""
+    if key == DEFAULT_ESTATE:
+        raise ValueError("默认小区不能移除")
+    if key == current_estate().key:
+        raise ValueError("不能移除当前正在使用的小区，请先切换到其他小区")
+    estates = load_estates()
+    remaining = [e for e in estates if e.key != key]
+    if len(remaining) == len(estates):
+        raise ValueError(f"小区不存在：{key}")
+    save_estates(remaining)
+
+
+def _initial_estate():
+    current = _read_estates_file().get('current')
+    estates = load_estates()
+    for estate in estates:
+        if estate.key == current:
+            return estate
+    return estates[0]
+
+
+_current_estate = _initial_estate()
+
+
+def current_estate():
+    """当前使用的小区"""
+    return _current_estate
+
+
+def current_db_path():
+    """当前小区的数据库文件"""
+    return _current_estate.db_path
+
+
+def archive_db_path(db_path=None):
+    """归档库文件：与数据库同目录，文件名后加 _archive（property.db -> property_archive.db）"""
+    root, ext = os.path.splitext(db_path or current_db_path())
+    return f"{root}_archive{ext or '.db'}"
+
+
+# 创建数据库引擎（默认小区）
+engine = get_engine(DB_PATH)
+
+# 创建会话工厂（绑定当前小区）
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
 
 # 声明基类
 Base = declarative_base()
 
 
-def init_db():
-    """初始化数据库，创建所有表"""
+def max_sql_variables():
+    """单条 SQL 可绑定的参数个数上限（SQLite 3.32 之前为 999，之后为 32766）"""
+    import sqlite3
+    return 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+
+def chunked(values, size=None):
+    """把 ID 列表按参数上限切块，供 IN (...) 查询使用（留出少量参数给其他条件）"""
+    values = list(values)
+    size = size or max_sql_variables() - 10
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def init_db(db_path=None):
+    """初始化数据库（默认为当前小区）：新库直接建表并标记为最新结构版本，老库执行缺少的迁移步骤
+
+    数据库已是最新版本时只读取一次 PRAGMA user_version。
+    """
     from models.resident import Resident
     from models.charge_item import ChargeItem
     from models.payment import Payment
     from models.payment_transaction import PaymentTransaction
-    
-    Base.metadata.create_all(bind=engine)
-    # Ensure new columns exist for migrations (SQLite simple ADD COLUMN)
-    try:
-        conn = engine.connect()
-        try:
-            # Check if 'usage' column exists in payments table
-            res = conn.execute("PRAGMA table_info('payments')").fetchall()
-            col_names = [r[1] for r in res] if res else []
-            if 'usage' not in col_names:
-                # Add usage column (nullable)
-                conn.execute("ALTER TABLE payments ADD COLUMN usage NUMERIC(10,2)")
-        finally:
-            conn.close()
-    except Exception:
-        # Migration best-effort: if it fails, continue; errors will surface at runtime when accessing the column
-        pass
+    from models.print_log import PrintLog
+    from models.meter_reading import MeterReading
+    from models.billing_plan import BillingPlan
+    from models.archived_period import ArchivedPeriod
+    from migrate_db import migrate_database, migrate_archive, latest_version
+
+    db_path = db_path or current_db_path()
+    db_engine = get_engine(db_path)
+    target = latest_version()
+    with db_engine.connect() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+    if version >= target:
+        return
+
+    fresh = not inspect(db_engine).has_table('payments')
+    if not fresh and not migrate_database(db_path):
+        raise Exception("数据库迁移失败，请查看日志")
+    # 归档库中的历史账单与主库一起升级，否则新增字段后归档查询和再次归档都会失败
+    if not fresh and not migrate_archive(archive_db_path(db_path)):
+        raise Exception("归档库迁移失败，请查看日志")
+
+    Base.metadata.create_all(bind=db_engine)
+    if fresh:
+        with db_engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {int(target)}")
+
+
+def switch_estate(key, remember=True):
+    """切换当前小区：准备好该小区的数据库（新建或迁移），再把 SessionLocal 改绑过去
+
+    remember 为 False 时不写入 estates.json（命令行临时指定小区，不改变界面下次打开的小区）
+    """
+    global _current_estate
+    estate = find_estate(key)
+    init_db(estate.db_path)
+    SessionLocal.configure(bind=get_engine(estate.db_path))
+    _current_estate = estate
+    if remember:
+        save_estates(load_estates(), current_key=estate.key)
+    return estate
 
 
 def get_db():
@@ -52,4 +261,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
@@ -0,0 +1,40 @@
+"""
+抄表记录模型
+每户每块表每个周期一条记录，保存上期/本期读数，按量出账后关联生成的账单
+"""
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, UniqueConstraint, Index, func
+from sqlalchemy.orm import relationship
+from models.database import Base
+
+
+class MeterReading(Base):
+    """抄表记录表"""
+    __tablename__ = 'meter_readings'
+    __table_args__ = (
+        UniqueConstraint('resident_id', 'charge_item_id', 'meter_no', 'period', name='uq_meter_reading'),
+        Index('ix_meter_readings_item_period', 'charge_item_id', 'period'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    resident_id = Column(Integer, ForeignKey('residents.id'), nullable=False, comment='住户ID')
+    charge_item_id = Column(Integer, ForeignKey('charge_items.id'), nullable=False, comment='收费项目ID（按用量计费）')
+    meter_no = Column(String(50), nullable=False, default='', comment='表号，同一住户多块表时区分')
+    period = Column(String(20), nullable=False, comment='抄表周期，格式：YYYY-MM')
+    previous_value = Column(Numeric(12, 2), comment='上期读数，导入时未提供则取上一周期本期读数')
+    current_value = Column(Numeric(12, 2), nullable=False, comment='本期读数')
+    read_at = Column(DateTime, comment='抄表时间')
+    payment_id = Column(Integer, ForeignKey('payments.id'), comment='出账后关联的账单ID')
+    operator = Column(String(50), comment='操作员')
+    created_at = Column(DateTime, default=func.now(), comment='创建时间')
+
+    resident = relationship('Resident')
+
+    def __repr__(self):
+        return f"<MeterReading(id={self.id}, resident_id={self.resident_id}, meter_no='{self.meter_no}', period='{self.period}')>"
+
+    @property
+    def usage(self):
+        """本期用量（缺少上期读数时为 None）"""
+        if self.previous_value is None or self.current_value is None:
+            return None
+        return self.current_value - self.previous_value
@@ -1,14 +1,23 @@
 """
 缴费记录模型
 """
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from models.database import Base
+from models.types import MoneyType
 
 
 class Payment(Base):
     """缴费记录表"""
     __tablename__ = 'payments'
+    # 同一住户、同一收费项目、同一周期只能有一张账单（批量/定时出账依赖它做到可重复执行）
+    __table_args__ = (
+        Index('uq_payment_period', 'resident_id', 'charge_item_id', 'period', 'dedup_seq', unique=True),
+        # 按周期列出、按 (周期, 创建时间, ID) 分页
+        Index('ix_payments_period_created', 'period', 'created_at'),
+        # 删除的 ID 不再复用：归档库中的账单 ID 不会被主库的新账单重复使用
+        {'sqlite_autoincrement': True},
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     resident_id = Column(Integer, ForeignKey('residents.id'), nullable=False, comment='住户ID')
@@ -18,12 +27,14 @@ class Payment(Base):
     billing_end_date = Column(DateTime, nullable=False, comment='计费结束日期')
     billing_months = Column(Integer, nullable=False, default=1, comment='计费周期数（月数）')
     paid_months = Column(Integer, default=0, comment='已缴费周期数（月数）')
-    amount = Column(Numeric(10, 2), nullable=False, comment='总金额（全部计费周期的金额）')
-    paid_amount = Column(Numeric(10, 2), default=0, comment='已缴费金额')
+    amount = Column(MoneyType, nullable=False, comment='总金额（全部计费周期的金额）')
+    paid_amount = Column(MoneyType, default=0, comment='已缴费金额')
     paid = Column(Integer, default=0, comment='缴费状态：1-已缴费，0-未缴费')
     paid_time = Column(DateTime, comment='缴费时间')
     # 用量（例如度数、电量、停车小时数等），可选
     usage = Column(Numeric(10, 2), nullable=True, comment='用量，按收费项目单位含义解释')
+    # 正常账单为 0；只有升级前已存在的重复账单按创建顺序编号为 1、2……
+    dedup_seq = Column(Integer, nullable=False, default=0, server_default='0', comment='同周期重复账单序号')
     operator = Column(String(50), comment='操作员')
     created_at = Column(DateTime, default=func.now(), comment='创建时间')
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), comment='更新时间')
@@ -2,18 +2,28 @@
 付款流水模型
 每次实际收款都会写入此表，便于审计与明细导出
 """
-from sqlalchemy import Column, Integer, Numeric, DateTime, ForeignKey, String, func
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, String, Index, func
 from sqlalchemy.orm import relationship
 from models.database import Base
+from models.types import MoneyType
 
 
 class PaymentTransaction(Base):
     __tablename__ = 'payment_transactions'
+    # 收银日结按收款时间区间汇总
+    __table_args__ = (
+        Index('ix_payment_transactions_paid_time', 'paid_time', 'operator'),
+        # 删除的 ID 不再复用（同账单表，见归档）
+        {'sqlite_autoincrement': True},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    payment_id = Column(Integer, ForeignKey('payments.id'), nullable=False, comment='缴费记录ID')
-    amount = Column(Numeric(10, 2), nullable=False, comment='本次实收金额')
-    paid_time = Column(DateTime, default=func.now(), comment='收款时间')
+    payment_id = Column(Integer, ForeignKey('payments.id'), nullable=False, index=True, comment='缴费记录ID')
+    amount = Column(MoneyType, nullable=False, comment='本次实收金额')
+    # 收款时间按本地时间记录（收银日结按本地日期划分）；func.now() 在 SQLite 中是 UTC
+    paid_time = Column(DateTime, default=datetime.now, comment='收款时间')
     operator = Column(String(50), comment='操作员')
     created_at = Column(DateTime, default=func.now(), comment='创建时间')
 
@@ -1,7 +1,7 @@
 """
 住户模型
 """
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, func, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, func, UniqueConstraint, Index
 from models.database import Base
 from sqlalchemy import UniqueConstraint
 
@@ -12,6 +12,9 @@ class Resident(Base):
     __table_args__ = (UniqueConstraint('building', 'unit', 'room_no', name='uq_building_unit_room'),)
     __table_args__ = (
         UniqueConstraint('building', 'unit', 'room_no', name='uq_building_unit_room'),
+        # 住户选择框按房号/姓名前缀查找
+        Index('ix_residents_room_no', 'room_no'),
+        Index('ix_residents_name', 'name'),
     )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -58,14 +61,17 @@ class Resident(Base):
           - building='', unit=2, room_no=1002  -> '2-1002'
           - building=None, unit=None, room_no=1306 -> '1306'
         """
+        return Resident.format_room_no(getattr(self, 'building', None), getattr(self, 'unit', None), self.room_no)
+
+    @staticmethod
+    def format_room_no(building, unit, room_no):
+        """按 full_room_no 的规则拼接房号（只查询了列值、没有住户对象时使用）"""
         parts = []
-        b = getattr(self, 'building', None)
-        u = getattr(self, 'unit', None)
-        if b is not None and str(b).strip() != '':
-            parts.append(str(b).strip().replace(' ', ''))
-        if u is not None and str(u).strip() != '':
-            parts.append(str(u).strip().replace(' ', ''))
+        if building is not None and str(building).strip() != '':
+            parts.append(str(building).strip().replace(' ', ''))
+        if unit is not None and str(unit).strip() != '':
+            parts.append(str(unit).strip().replace(' ', ''))
         # 房号总是加入，保证非空输出
-        parts.append(str(self.room_no).strip().replace(' ', ''))
+        parts.append(str(room_no).strip().replace(' ', ''))
         return "-".join(parts)
 
@@ -0,0 +1,27 @@
+"""
+自定义字段类型
+"""
+from sqlalchemy.types import TypeDecorator, Integer
+
+from utils.money import Money, to_fen
+
+
+class MoneyType(TypeDecorator):
+    """金额字段：数据库中保存整数分，Python 中为 Money（元）
+
+    写入时接受 int/float/Decimal/str/Money；func.sum 等聚合沿用该类型，结果同样是 Money。
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_fen(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, float):
+            value = round(value)
+        return Money.from_fen(value)
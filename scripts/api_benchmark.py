@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+联网服务模式基准：在临时数据库上启动服务端（本进程内），用若干线程模拟收银电脑并发调用接口，
+按读写混合的操作统计吞吐量（次/秒）和延迟（p50/p95）。
+
+每个模拟客户端有自己的 HTTP 长连接，循环执行：
+  - 读：周期统计、住户缴费记录、住户联想搜索
+  - 写：生成账单、收费（按 --write-ratio 的比例）
+
+用法：
+    python scripts/api_benchmark.py                            # 1/4/8 个客户端各跑 5 秒
+    python scripts/api_benchmark.py --clients 1,3,6 --seconds 10 --write-ratio 0.3
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import itertools
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from models.database import Base, SessionLocal  # noqa: E402
+from models.resident import Resident  # noqa: E402
+from models.charge_item import ChargeItem  # noqa: E402
+from models.payment import Payment  # noqa: E402
+from services.api_server import ApiServer  # noqa: E402
+from services.api_client import ApiClient  # noqa: E402
+
+
+def populate(engine, residents):
+    conn = engine.connect()
+    trans = conn.begin()
+    conn.execute(Resident.__table__.insert(), [
+        {'building': str(i // 200 + 1), 'unit': str(i // 50 % 4 + 1), 'room_no': str(100 + i % 50),
+         'name': f'住户{i}', 'area': 90, 'status': 1}
+        for i in range(residents)
+    ])
+    conn.execute(ChargeItem.__table__.insert(), [
+        {'name': '物业费', 'price': 2, 'charge_type': 'area', 'unit': '元/㎡/月', 'status': 1},
+    ])
+    conn.execute(Payment.__table__.insert(), [
+        {'resident_id': rid, 'charge_item_id': 1, 'period': '2024-05',
+         'billing_start_date': datetime(2024, 5, 1), 'billing_end_date': datetime(2024, 5, 31),
+         'billing_months': 1, 'paid_months': 0, 'amount': 180, 'paid_amount': 0, 'paid': 0}
+        for rid in range(1, residents + 1)
+    ])
+    trans.commit()
+    conn.close()
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def run_round(url, clients, seconds, write_ratio, residents, counter):
+    """clients 个线程并发调用 seconds 秒，返回 (读延迟, 写延迟, 错误数)"""
+    reads, writes, errors = [], [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = ApiClient(url)
+        my_reads, my_writes, my_errors = [], [], 0
+        while time.perf_counter() < deadline:
+            is_write = rng.random() < write_ratio
+            start = time.perf_counter()
+            try:
+                if is_write:
+                    n = next(counter)
+                    if n % 2:
+                        # 收费：每户的 2024-05 账单只收一次，收过的账单按业务错误计
+                        rid = n // 2 % residents + 1
+                        client.call('PaymentService', 'collect_payments', rid, operator=f'收银{seed}')
+                    else:
+                        rid = n // 2 % residents + 1
+                        month = n // 2 // residents
+                        client.call('PaymentService', 'create_payment', resident_id=rid, charge_item_id=1,
+                                    period=f'{2030 + month // 12:04d}-{month % 12 + 1:02d}',
+                                    billing_start_date=datetime(2030, 1, 1), billing_end_date=datetime(2030, 1, 31),
+                                    billing_months=1, amount=180)
+                else:
+                    kind = rng.randrange(3)
+                    if kind == 0:
+                        client.call('PaymentService', 'get_statistics_by_period', '2024-05')
+                    elif kind == 1:
+                        client.call('PaymentService', 'get_payments_by_resident', rng.randrange(residents) + 1)
+                    else:
+                        client.call('ResidentService', 'suggest_residents', f'住户{rng.randrange(100)}')
+            except ValueError:
+                pass
+            except Exception:
+                my_errors += 1
+                continue
+            (my_writes if is_write else my_reads).append((time.perf_counter() - start) * 1000.0)
+        with lock:
+            reads.extend(my_reads)
+            writes.extend(my_writes)
+            errors.append(my_errors)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return reads, writes, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='联网服务模式吞吐量与延迟基准')
+    parser.add_argument('--clients', default='1,4,8', help='模拟客户端数，逗号分隔')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--residents', type=int, default=2000)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix='api_bench_')
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+                           connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    # 所有服务共用 SessionLocal，改绑到临时数据库
+    SessionLocal.configure(bind=engine)
+    populate(engine, args.residents)
+
+    server = ApiServer('127.0.0.1', 0).start()
+    host, port = server.address
+    url = f'http://{host}:{port}'
+    counter = itertools.count()
+
+    print(f"服务端 {url}，{args.residents} 户，写操作比例 {args.write_ratio:.0%}，每轮 {args.seconds:g} s")
+    print(f"  {'客户端':<6}{'总吞吐 次/s':>12}{'读 p50':>9}{'读 p95':>9}{'写 p50':>9}{'写 p95':>9}{'错误':>6}")
+    for clients in [int(c) for c in args.clients.split(',') if c.strip()]:
+        reads, writes, errors = run_round(url, clients, args.seconds, args.write_ratio, args.residents, counter)
+        throughput = (len(reads) + len(writes)) / args.seconds
+        print(f"  {clients:<9}{throughput:>12.1f}"
+              f"{percentile(reads, 0.5):>9.1f}{percentile(reads, 0.95):>9.1f}"
+              f"{percentile(writes, 0.5):>9.1f}{percentile(writes, 0.95):>9.1f}{errors:>6}")
+    print("（延迟单位 ms）")
+
+    server.stop()
+    engine.dispose()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
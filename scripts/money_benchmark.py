@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+金额统计与报表基准：在临时数据库中生成账单，比较
+  - 旧做法：取出全部账单对象，逐条 float() 累加
+  - 新做法：SQL 在整数分上 SUM/GROUP BY，结果为 Money
+并测量周期统计、年度统计和月度/日度/年度报表的耗时，同时检查两种做法的合计是否一致。
+
+用法：
+    python scripts/money_benchmark.py                  # 2000 户 x 4 个项目 x 12 个月
+    python scripts/money_benchmark.py --residents 5000 --months 24 --repeat 5
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import shutil
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from models.database import Base, SessionLocal  # noqa: E402
+from models.resident import Resident  # noqa: E402
+from models.charge_item import ChargeItem  # noqa: E402
+from models.payment import Payment  # noqa: E402
+from services.payment_service import PaymentService  # noqa: E402
+from utils.report_generator import ReportGenerator  # noqa: E402
+
+
+def populate(engine, residents, items, months, seed=20240101):
+    rng = random.Random(seed)
+    conn = engine.connect()
+    trans = conn.begin()
+    conn.execute(Resident.__table__.insert(), [
+        {'building': str(i // 200 + 1), 'unit': str(i // 50 % 4 + 1), 'room_no': str(100 + i % 50),
+         'name': f'住户{i}', 'area': round(rng.uniform(40, 200), 2), 'status': 1}
+        for i in range(residents)
+    ])
+    conn.execute(ChargeItem.__table__.insert(), [
+        {'name': f'项目{k}', 'price': round(rng.uniform(0.5, 80), 2), 'charge_type': 'fixed',
+         'unit': '元/月', 'status': 1}
+        for k in range(items)
+    ])
+    rows = []
+    for m in range(months):
+        year, month = 2024 + m // 12, m % 12 + 1
+        start = datetime(year, month, 1)
+        end = (datetime(year + month // 12, month % 12 + 1, 1) - timedelta(days=1))
+        for rid in range(1, residents + 1):
+            for item in range(1, items + 1):
+                amount = round(rng.uniform(1, 500), 2)
+                paid = rng.random() < 0.7
+                rows.append({
+                    'resident_id': rid, 'charge_item_id': item, 'period': f'{year:04d}-{month:02d}',
+                    'billing_start_date': start, 'billing_end_date': end, 'billing_months': 1,
+                    'paid_months': 1 if paid else 0, 'amount': amount,
+                    'paid_amount': amount if paid else 0, 'paid': 1 if paid else 0,
+                })
+        if len(rows) >= 20000:
+            conn.execute(Payment.__table__.insert(), rows)
+            rows = []
+    if rows:
+        conn.execute(Payment.__table__.insert(), rows)
+    trans.commit()
+    conn.close()
+
+
+def legacy_statistics(period):
+    """旧做法：加载全部账单对象并逐条 float 累加"""
+    payments = PaymentService.get_payments_by_period(period)
+    total = sum(float(p.amount) for p in payments)
+    paid = sum(float(p.amount) for p in payments if p.paid == 1)
+    return total, paid
+
+
+def timed(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='金额统计与报表基准')
+    parser.add_argument('--residents', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=4)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix='money_bench_')
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+    Base.metadata.create_all(engine)
+    # 所有服务共用 SessionLocal，改绑到临时数据库
+    SessionLocal.configure(bind=engine)
+
+    start = time.perf_counter()
+    populate(engine, args.residents, args.items, args.months)
+    count = args.residents * args.items * args.months
+    print(f"生成 {count} 条账单用时 {time.perf_counter() - start:.1f} s")
+
+    period = '2024-06' if args.months >= 6 else '2024-01'
+    results = []
+
+    legacy_ms, (legacy_total, legacy_paid) = timed(lambda: legacy_statistics(period), args.repeat)
+    results.append(('周期统计（旧：对象 + float 累加）', legacy_ms))
+    new_ms, stats = timed(lambda: PaymentService.get_statistics_by_period(period), args.repeat)
+    results.append(('周期统计（SQL 整数分 SUM）', new_ms))
+    ms, _ = timed(lambda: PaymentService.get_period_breakdown(period, by='item'), args.repeat)
+    results.append(('按收费项目汇总', ms))
+    ms, _ = timed(lambda: PaymentService.get_statistics_by_year(2024), args.repeat)
+    results.append(('年度统计', ms))
+
+    out = os.path.join(tmp_dir, 'report.xlsx')
+    ms, _ = timed(lambda: ReportGenerator.generate_monthly_report(period, out), args.repeat)
+    results.append(('月度报表', ms))
+    ms, _ = timed(lambda: ReportGenerator.generate_daily_report(period, out), args.repeat)
+    results.append(('日度报表', ms))
+    ms, _ = timed(lambda: ReportGenerator.generate_year_report(2024, out), args.repeat)
+    results.append(('年度报表', ms))
+
+    print(f"（{args.repeat} 次中位数，ms）")
+    for name, ms in results:
+        print(f"  {name:<28}{ms:10.1f}")
+
+    print('')
+    print(f"合计（SQL）：{stats['total_amount']}  已缴：{stats['paid_amount']}")
+    print(f"合计（float）：{legacy_total!r}  已缴：{legacy_paid!r}")
+    exact = f"{legacy_total:.2f}" == str(stats['total_amount'])
+    print('两种做法四舍五入到分后一致' if exact else '注意：float 累加在分位上出现误差')
+
+    engine.dispose()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
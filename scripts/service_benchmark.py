@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+服务层规模基准：用 synthetic_data 按 1k / 10k / 100k 户生成数据库，测量常用接口在各规模下的耗时：
+
+  - 查询：周期账单、账单搜索（全部周期 / 指定周期）、周期统计、项目汇总、年度统计
+  - 写入：批量出账（每 200 户一个事务，与批量出账窗口一致）、Excel 导入住户
+  - 导出与报表：缴费记录、欠费清单、月度 / 日度 / 年度报表
+  - 收据渲染为图片（需要 PyQt5，无显示器时使用 offscreen 平台）
+
+计时之后每个用例再用 tracemalloc 跑一次，记录峰值内存并折算为每 1 万行（返回或处理的行数）的 MB 数，
+超过 --memory-budget 时在结果中标出，全部跑完后以退出码 1 结束。
+
+结果写入 JSON（含当前提交号），用 --compare 与之前的结果对比，便于逐个提交跟踪性能变化。
+
+用法：
+    python scripts/service_benchmark.py                                   # 1k/10k/100k 户，3 年账单
+    python scripts/service_benchmark.py --scales 1000,10000 --years 1 --repeat 5
+    python scripts/service_benchmark.py --output after.json --compare before.json
+    python scripts/service_benchmark.py --memory-budget 40                # 每万行峰值超过 40 MB 即失败
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, SCRIPT_DIR)
+
+import sqlalchemy  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+
+from models.database import Base, SessionLocal  # noqa: E402
+from models.payment import Payment  # noqa: E402
+from services.payment_service import PaymentService  # noqa: E402
+from services.reference_cache import reference_cache  # noqa: E402
+from services.write_executor import write_executor  # noqa: E402
+from utils.memory import peak_mb_per_10k, BUDGET_MIN_ROWS  # noqa: E402
+from synthetic_data import generate, DEFAULT_SEED, GARBAGE_FEE  # noqa: E402
+
+BATCH_SIZE = 200
+IMPORT_ROWS = 500
+# 默认内存预算：每 1 万行的峰值内存（MB）
+MEMORY_BUDGET_MB = 60.0
+# 个别用例的预算（openpyxl 读入整个工作簿，导入的固定开销较大）
+OPERATION_BUDGETS_MB = {
+    'import_residents': 100.0,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return ''
+
+
+def timed(func, repeat):
+    """执行 repeat 次（第 i 次调用 func(i)），返回 {'median_ms', 'min_ms', 'samples'}"""
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(i)
+        samples.append(round((time.perf_counter() - start) * 1000.0, 2))
+    return {'median_ms': round(statistics.median(samples), 2), 'min_ms': min(samples), 'samples': samples}
+
+
+def measure_memory(func, i):
+    """在 tracemalloc 下执行一次 func(i)，返回 (峰值字节数, 结果)"""
+    tracemalloc.start()
+    try:
+        result = func(i)
+        return tracemalloc.get_traced_memory()[1], result
+    finally:
+        tracemalloc.stop()
+
+
+def ensure_qt():
+    """收据渲染需要 QApplication；没有 PyQt5 时返回 None"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt5.QtWidgets import QApplication
+    except ImportError:
+        return None
+    return QApplication.instance() or QApplication(sys.argv[:1])
+
+
+def write_import_file(path, rows, tag):
+    import openpyxl
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['楼栋', '单元', '房号', '姓名', '电话', '面积', '入住日期'])
+    for i in range(rows):
+        sheet.append([f'导入{tag}', str(i // 50 + 1), str(101 + i % 50), f'新住户{i}', '', 88.5, '2024-01-01'])
+    workbook.save(path)
+
+
+def run_scale(households, years, repeat, work_dir, memory_budget=None):
+    """在 households 户的合成库上跑全部用例，返回该规模的结果"""
+    path = os.path.join(work_dir, f'bench_{households}.db')
+    engine = create_engine(f'sqlite:///{path}', connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    start = time.perf_counter()
+    summary = generate(engine, households, years, DEFAULT_SEED)
+    summary['generate_s'] = round(time.perf_counter() - start, 2)
+    summary['db_size_mb'] = round(os.path.getsize(path) / 1024 / 1024, 1)
+    print(f"\n{households} 户：{summary['payments']} 张账单，{summary['transactions']} 条流水，"
+          f"生成 {summary['generate_s']} s，{summary['db_size_mb']} MB")
+
+    # 所有服务共用 SessionLocal，改绑到合成库
+    old_bind = SessionLocal.kw['bind']
+    SessionLocal.configure(bind=engine)
+    reference_cache.reset()
+
+    period = summary['last_period']
+    settled = summary['first_period']
+    year = int(period[:4])
+    out_xlsx = os.path.join(work_dir, 'out.xlsx')
+    out_png = os.path.join(work_dir, 'receipt.png')
+    db = SessionLocal()
+    period_rows = db.query(Payment).filter(Payment.period == period).count()
+    settled_rows = db.query(Payment).filter(Payment.period == settled).count()
+    year_rows = db.query(Payment).filter(Payment.period.like(f'{year}-%')).count()
+    db.close()
+
+    from utils.excel_exporter import ExcelExporter
+    from utils.excel_importer import ExcelImporter
+    from utils.report_generator import ReportGenerator
+
+    def billing(i):
+        # 每次为一个新周期出账，避免与已有账单冲突
+        bill_period = f'2099-{i % 12 + 1:02d}'
+        rows = [(rid, 10) for rid in range(1, households + 1)]
+        for offset in range(0, len(rows), BATCH_SIZE):
+            PaymentService.create_payments_batch(GARBAGE_FEE, bill_period, datetime(2099, 1, 1),
+                                                 datetime(2099, 1, 31), 1, rows[offset:offset + BATCH_SIZE])
+
+    import_files = []
+    for i in range(repeat + 1):
+        import_path = os.path.join(work_dir, f'import_{i}.xlsx')
+        write_import_file(import_path, IMPORT_ROWS, i)
+        import_files.append(import_path)
+
+    # (名称, 函数, 处理的行数；None 表示取返回列表的长度)
+    cases = [
+        ('get_payments_by_period', lambda i: PaymentService.get_payments_by_period(period), None),
+        ('search_payments', lambda i: PaymentService.search_payments('王'), None),
+        ('search_payments_period', lambda i: PaymentService.search_payments('王', period=period), None),
+        ('get_statistics_by_period', lambda i: PaymentService.get_statistics_by_period(period), period_rows),
+        ('get_period_breakdown', lambda i: PaymentService.get_period_breakdown(period, by='item'), period_rows),
+        ('get_statistics_by_year', lambda i: PaymentService.get_statistics_by_year(year), year_rows),
+        ('bulk_billing', billing, households),
+        ('import_residents', lambda i: ExcelImporter.import_residents(import_files[i]), IMPORT_ROWS),
+        ('export_payments', lambda i: ExcelExporter.export_payments(period, out_xlsx), period_rows),
+        ('export_unpaid_list', lambda i: ExcelExporter.export_unpaid_list(period, out_xlsx), period_rows),
+        ('monthly_report', lambda i: ReportGenerator.generate_monthly_report(period, out_xlsx), period_rows),
+        ('daily_report', lambda i: ReportGenerator.generate_daily_report(settled, out_xlsx), settled_rows),
+        ('year_report', lambda i: ReportGenerator.generate_year_report(year, out_xlsx), year_rows),
+    ]
+    if ensure_qt() is not None:
+        from utils.printer import ReceiptPrinter
+        printer = ReceiptPrinter()
+        cases.append(('render_receipt', lambda i: printer.render_receipt_to_image(i + 1, out_png, dpi=150), 1))
+
+    operations = {}
+    try:
+        for name, func, rows in cases:
+            try:
+                result = operations[name] = timed(func, repeat)
+                if memory_budget is not None:
+                    peak, returned = measure_memory(func, repeat)
+                    if rows is None:
+                        rows = len(returned) if isinstance(returned, (list, tuple)) else 0
+                    per_10k = peak_mb_per_10k(peak, rows)
+                    budget = OPERATION_BUDGETS_MB.get(name, memory_budget)
+                    result.update(rows=rows, peak_mb=round(peak / 1024.0 / 1024.0, 2),
+                                  peak_mb_per_10k=round(per_10k, 2), budget_mb_per_10k=budget,
+                                  over_budget=rows >= BUDGET_MIN_ROWS and per_10k > budget)
+            except Exception as e:
+                result = operations[name] = {'error': str(e)}
+            if 'median_ms' not in result:
+                print(f"  {name:<28}  失败：{result['error']}")
+                continue
+            memory = ''
+            if 'peak_mb' in result:
+                memory = f"  峰值 {result['peak_mb']:8.1f} MB（{result['rows']} 行，每万行 {result['peak_mb_per_10k']:.1f} MB）"
+                if result['over_budget']:
+                    memory += '  超出预算'
+            print(f"  {name:<28}{result['median_ms']:10.1f} ms{memory}")
+    finally:
+        write_executor.shutdown()
+        SessionLocal.configure(bind=old_bind)
+        reference_cache.reset()
+        engine.dispose()
+        os.remove(path)
+    return {'data': summary, 'operations': operations}
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\n与 {baseline_path}（{baseline['meta'].get('commit') or '未知提交'}）对比，中位数变化：")
+    for scale, result in current['results'].items():
+        old = baseline['results'].get(scale)
+        if not old:
+            continue
+        print(f"  {scale} 户")
+        for name, op in result['operations'].items():
+            before = old['operations'].get(name, {}).get('median_ms')
+            after = op.get('median_ms')
+            if before and after:
+                print(f"    {name:<28}{before:10.1f} → {after:10.1f} ms  {(after - before) / before:+.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='服务层规模基准')
+    parser.add_argument('--scales', default='1000,10000,100000', help='户数，逗号分隔')
+    parser.add_argument('--years', type=int, default=3, help='生成多少年的月度账单')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='service_benchmark.json', help='结果 JSON 文件')
+    parser.add_argument('--compare', help='与之前保存的结果 JSON 对比')
+    parser.add_argument('--memory-budget', type=float, default=MEMORY_BUDGET_MB,
+                        help='每 1 万行的峰值内存预算（MB）')
+    parser.add_argument('--no-memory', action='store_true', help='不测量内存')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='service_bench_')
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'sqlite': __import__('sqlite3').sqlite_version,
+            'platform': platform.platform(),
+            'years': args.years,
+            'repeat': args.repeat,
+            'seed': DEFAULT_SEED,
+            'memory_budget_mb_per_10k': None if args.no_memory else args.memory_budget,
+        },
+        'results': {},
+    }
+    try:
+        for households in [int(s) for s in args.scales.split(',') if s.strip()]:
+            report['results'][str(households)] = run_scale(households, args.years, args.repeat, work_dir,
+                                                           None if args.no_memory else args.memory_budget)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {args.output}（{args.repeat} 次中位数）")
+    if args.compare:
+        compare(report, args.compare)
+
+    over = [(scale, name, op) for scale, result in report['results'].items()
+            for name, op in result['operations'].items() if op.get('over_budget')]
+    if over:
+        print("\n内存超出预算：")
+        for scale, name, op in over:
+            print(f"  {scale} 户 {name}：每万行 {op['peak_mb_per_10k']:.1f} MB，预算 {op['budget_mb_per_10k']:g} MB")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
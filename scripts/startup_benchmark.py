@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准：测量从启动解释器到主窗口首次绘制（time-to-first-paint）及首次数据加载完成的时间，
+报告各启动阶段（导入、QApplication、窗口框架、数据库准备、首次加载）的耗时，
+并用 python -X importtime 找出最慢的模块导入。
+
+用法：
+    python scripts/startup_benchmark.py               # 运行 3 次，取中位数
+    python scripts/startup_benchmark.py --runs 5 --top 20
+    python scripts/startup_benchmark.py --json        # 输出 JSON，便于对比
+    python scripts/startup_benchmark.py --check-lazy  # 检查 openpyxl/PIL/打印模块未在启动时加载
+
+没有显示器时自动使用 Qt 的 offscreen 平台。注意：会对项目下的 property.db 执行迁移/建表，
+与真实启动一致。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import statistics
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 这些模块只应在首次使用时加载
+LAZY_MODULES = ('openpyxl', 'PIL', 'utils.printer', 'utils.report_generator',
+                'utils.excel_exporter', 'utils.excel_importer', 'PyQt5.QtPrintSupport')
+
+
+def child_main():
+    """子进程：按 main.py 的分阶段顺序启动（先显示窗口，再后台准备数据库并加载数据），
+    记录各阶段耗时后退出"""
+    t0 = time.perf_counter()
+    sys.path.insert(0, PROJECT_ROOT)
+    os.chdir(PROJECT_ROOT)
+
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QObject, QEvent, QTimer
+    from models.database import init_db
+    from ui.main_window import MainWindow
+    from utils.startup import startup_timer
+    t_import = time.perf_counter()
+    startup_timer.reset(t0)
+    startup_timer.record('imports', t0, t_import)
+
+    with startup_timer.phase('qapplication'):
+        app = QApplication(sys.argv[:1])
+    result = {}
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and 'first_paint' not in result:
+                result['first_paint'] = time.perf_counter()
+                result['first_paint_wall'] = time.time()
+            return False
+
+    watcher = PaintWatcher()
+    with startup_timer.phase('window_shell'):
+        window = MainWindow(defer_load=True)
+        window.installEventFilter(watcher)
+        window.show()
+    window.data_loaded.connect(app.quit)
+    QTimer.singleShot(0, lambda: window.start_deferred_load(init_db))
+    # 平台不产生绘制事件或加载卡住时的兜底
+    QTimer.singleShot(30000, app.quit)
+    app.exec_()
+    t_loaded = time.perf_counter()
+
+    first_paint = result.get('first_paint', t_loaded)
+    report = {
+        'import_ms': round((t_import - t0) * 1000, 1),
+        'first_paint_ms': round((first_paint - t0) * 1000, 1),
+        'data_loaded_ms': round((t_loaded - t0) * 1000, 1),
+        'first_paint_wall': result.get('first_paint_wall', time.time()),
+        'phases': {p['phase']: p['duration_ms'] for p in startup_timer.report()['phases']},
+        'lazy_loaded': [m for m in LAZY_MODULES if m in sys.modules],
+    }
+    print('STARTUP_RESULT ' + json.dumps(report), flush=True)
+
+
+def _child_env():
+    env = dict(os.environ)
+    if sys.platform.startswith('linux') and not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+def run_once(importtime=False):
+    """启动一次子进程，返回 (结果字典, importtime 输出)"""
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += [os.path.abspath(__file__), '--child']
+    start_wall = time.time()
+    proc = subprocess.run(cmd, cwd=PROJECT_ROOT, env=_child_env(),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, encoding='utf-8', errors='replace')
+    report = None
+    for line in proc.stdout.splitlines():
+        if line.startswith('STARTUP_RESULT '):
+            report = json.loads(line[len('STARTUP_RESULT '):])
+    if report is None:
+        raise RuntimeError(f"启动子进程失败（退出码 {proc.returncode}）：\n{proc.stderr[-2000:]}")
+    # 含解释器启动在内的首次绘制时间
+    report['ttfp_ms'] = round((report.pop('first_paint_wall') - start_wall) * 1000, 1)
+    return report, proc.stderr
+
+
+def parse_importtime(stderr, top=15):
+    """解析 -X importtime 输出，返回累计耗时最长的模块 [(模块, 累计ms, 自身ms), ...]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+            rows.append((name.strip(), int(cumulative_us) / 1000.0, int(self_us) / 1000.0))
+        except ValueError:
+            continue
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return [(name, round(cum, 1), round(own, 1)) for name, cum, own in rows[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='物业收费管理系统启动耗时基准')
+    parser.add_argument('--runs', type=int, default=3, help='测量次数（取中位数）')
+    parser.add_argument('--top', type=int, default=15, help='列出最慢的导入数量')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+    parser.add_argument('--check-lazy', action='store_true', help='若重模块在启动时被加载则返回非零')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main()
+        return 0
+
+    # 第一次运行预热（生成 .pyc、初始化数据库），不计入结果
+    run_once()
+    reports = [run_once()[0] for _ in range(max(1, args.runs))]
+    _, stderr = run_once(importtime=True)
+
+    keys = ('ttfp_ms', 'first_paint_ms', 'data_loaded_ms', 'import_ms')
+    summary = {k: statistics.median(r[k] for r in reports) for k in keys}
+    phase_names = []
+    for r in reports:
+        for name in r['phases']:
+            if name not in phase_names:
+                phase_names.append(name)
+    summary['phases'] = {name: statistics.median(r['phases'].get(name, 0.0) for r in reports)
+                         for name in phase_names}
+    summary['runs'] = len(reports)
+    summary['lazy_loaded'] = reports[-1]['lazy_loaded']
+    summary['slowest_imports'] = parse_importtime(stderr, args.top)
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print(f"首次绘制（含解释器启动）：{summary['ttfp_ms']:.0f} ms")
+        print(f"  进程内到首次绘制：{summary['first_paint_ms']:.0f} ms")
+        print(f"  进程内到数据加载完成：{summary['data_loaded_ms']:.0f} ms")
+        print("各启动阶段（ms）：")
+        for name, ms in summary['phases'].items():
+            print(f"  {name:<16}{ms:8.1f}")
+        print(f"（{summary['runs']} 次中位数）")
+        print('')
+        print(f"累计耗时最长的 {args.top} 个导入（ms，累计 / 自身）：")
+        for name, cum, own in summary['slowest_imports']:
+            print(f"  {cum:8.1f} {own:8.1f}  {name}")
+        if summary['lazy_loaded']:
+            print('')
+            print('警告：以下模块在启动时被加载：' + ', '.join(summary['lazy_loaded']))
+
+    if args.check_lazy and summary['lazy_loaded']:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+合成测试数据：按规模（户数）生成一个小区的住户、收费项目和 N 年的月度账单，
+含部分缴费（季度车位费只缴了一两个月）和收款流水。相同参数和种子每次生成完全相同的数据，
+用于基准测试和在真实规模下复现问题。
+
+  - 住户：楼栋/单元/房号唯一，约 10% 租户、5% 商铺，面积 45～180 ㎡
+  - 收费项目：物业费（按面积）、垃圾清运费、电梯费（单数楼栋）按月出账，车位管理费（约 30% 住户）按季出账
+  - 缴费：越早的周期缴清比例越高，最近三个月欠费较多；每次收款一条流水，收款时间落在周期之后
+
+用法：
+    python scripts/synthetic_data.py --households 10000 --years 3 --output synthetic.db
+"""
+import os
+import sys
+import random
+import argparse
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from models.database import Base  # noqa: E402
+from models.resident import Resident  # noqa: E402
+from models.charge_item import ChargeItem  # noqa: E402
+from models.payment import Payment  # noqa: E402
+from models.payment_transaction import PaymentTransaction  # noqa: E402
+
+DEFAULT_SEED = 20240101
+CHUNK_ROWS = 20000
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何林高罗'
+GIVEN_NAMES = ['伟', '芳', '娜', '敏', '静', '丽', '强', '磊', '军', '洋', '勇', '艳', '杰', '娟', '涛',
+               '明', '超', '秀英', '桂英', '建华', '志强', '海燕', '国庆', '晓东']
+OPERATORS = ('收银员A', '收银员B', '收银员C')
+
+# (名称, 单价, 收费类型, 单位, 出账间隔月数)
+CHARGE_ITEMS = (
+    ('物业费', 1.8, 'area', '元/㎡/月', 1),
+    ('垃圾清运费', 10, 'fixed', '元/月', 1),
+    ('电梯费', 25, 'fixed', '元/月', 1),
+    ('车位管理费', 150, 'fixed', '元/月', 3),
+)
+PROPERTY_FEE, GARBAGE_FEE, ELEVATOR_FEE, PARKING_FEE = range(1, 5)
+
+
+def month_periods(years, end_year=2025, end_month=12):
+    """截至 end_year-end_month 的 years*12 个月，返回 [(年, 月)]（由早到晚）"""
+    total = end_year * 12 + end_month - 1
+    return [(m // 12, m % 12 + 1) for m in range(total - years * 12 + 1, total + 1)]
+
+
+def _month_end(year, month, months=1):
+    y, m = divmod(year * 12 + month - 1 + months, 12)
+    return datetime(y, m + 1, 1) - timedelta(days=1)
+
+
+def resident_rows(households, rng):
+    """住户：每栋 4 个单元，每单元 50 户（13 层，每层 4 户）"""
+    rows = []
+    for i in range(households):
+        in_unit = i % 50
+        rows.append({
+            'id': i + 1,
+            'building': str(i // 200 + 1),
+            'unit': str(i // 50 % 4 + 1),
+            'room_no': f'{in_unit // 4 + 1}{in_unit % 4 + 1:02d}',
+            'name': rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES),
+            'phone': f'13{rng.randrange(10 ** 9):09d}',
+            'area': round(rng.uniform(45, 180), 2),
+            'move_in_date': datetime(2010 + rng.randrange(10), rng.randrange(12) + 1, 1),
+            'identity': 'renter' if rng.random() < 0.1 else 'owner',
+            'property_type': 'commercial' if rng.random() < 0.05 else 'residential',
+            'status': 1,
+        })
+    return rows
+
+
+def _dt(value):
+    """SQLAlchemy 在 SQLite 中保存 DateTime 的文本格式"""
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f') if value is not None else None
+
+
+def _insert(conn, table, columns, rows):
+    """账单和流水行数多，绕过 ORM 类型转换直接按元组批量插入（金额已是整数分）"""
+    if rows:
+        conn.exec_driver_sql(
+            f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+        rows.clear()
+
+
+def generate(engine, households, years=3, seed=DEFAULT_SEED, end_year=2025, end_month=12):
+    """在 engine 指向的空库中生成数据（表需已建好），返回各表行数和周期范围"""
+    rng = random.Random(seed)
+    residents = resident_rows(households, rng)
+    months = month_periods(years, end_year, end_month)
+    last_index = len(months) - 1
+
+    # 每户的缴费习惯和是否有电梯、车位
+    profiles = []
+    for r in residents:
+        profiles.append({
+            'id': r['id'],
+            'area': r['area'],
+            'diligence': rng.choice((0.99, 0.97, 0.9, 0.7)),
+            'elevator': int(r['building']) % 2 == 1,
+            'parking': rng.random() < 0.3,
+        })
+
+    conn = engine.connect()
+    trans = conn.begin()
+    try:
+        conn.execute(Resident.__table__.insert(), residents)
+        conn.execute(ChargeItem.__table__.insert(), [
+            {'id': k, 'name': name, 'price': price, 'charge_type': charge_type, 'unit': unit, 'status': 1}
+            for k, (name, price, charge_type, unit, _) in enumerate(CHARGE_ITEMS, start=1)
+        ])
+
+        payment_columns = ('id', 'resident_id', 'charge_item_id', 'period', 'billing_start_date', 'billing_end_date',
+                           'billing_months', 'paid_months', 'amount', 'paid_amount', 'paid', 'paid_time',
+                           'operator', 'dedup_seq', 'created_at')
+        transaction_columns = ('id', 'payment_id', 'amount', 'paid_time', 'operator', 'created_at')
+        payments, transactions = [], []
+        payment_id = transaction_id = 0
+        for index, (year, month) in enumerate(months):
+            period = f'{year:04d}-{month:02d}'
+            start = datetime(year, month, 1)
+            start_text = _dt(start)
+            end_texts = {n: _dt(_month_end(year, month, n)) for n in (1, 3)}
+            months_ago = last_index - index
+            for profile in profiles:
+                # 金额以分计
+                bills = [(PROPERTY_FEE, round(profile['area'] * 180), 1), (GARBAGE_FEE, 1000, 1)]
+                if profile['elevator']:
+                    bills.append((ELEVATOR_FEE, 2500, 1))
+                if profile['parking'] and month % 3 == 1:
+                    bills.append((PARKING_FEE, 45000, 3))
+                pay_chance = profile['diligence'] if months_ago >= 3 else profile['diligence'] * (0.4 + 0.2 * months_ago)
+                will_pay = rng.random() < pay_chance
+                for item_id, amount, billing_months in bills:
+                    payment_id += 1
+                    paid_months = billing_months if will_pay else 0
+                    if billing_months > 1 and will_pay and rng.random() < 0.25:
+                        paid_months = rng.randrange(1, billing_months)
+                    paid_amount = amount * paid_months // billing_months
+                    paid_time = None
+                    operator = None
+                    if paid_months:
+                        paid_time = _dt(start + timedelta(days=rng.randrange(45), hours=8 + rng.randrange(10),
+                                                          minutes=rng.randrange(60)))
+                        operator = rng.choice(OPERATORS)
+                        transaction_id += 1
+                        transactions.append((transaction_id, payment_id, paid_amount, paid_time, operator, paid_time))
+                    payments.append((payment_id, profile['id'], item_id, period, start_text, end_texts[billing_months],
+                                     billing_months, paid_months, amount, paid_amount,
+                                     1 if paid_months == billing_months else 0, paid_time, operator, 0, start_text))
+                if len(payments) >= CHUNK_ROWS:
+                    _insert(conn, Payment.__table__, payment_columns, payments)
+                    _insert(conn, PaymentTransaction.__table__, transaction_columns, transactions)
+        _insert(conn, Payment.__table__, payment_columns, payments)
+        _insert(conn, PaymentTransaction.__table__, transaction_columns, transactions)
+        trans.commit()
+    except BaseException:
+        trans.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return {
+        'households': households,
+        'years': years,
+        'seed': seed,
+        'residents': len(residents),
+        'charge_items': len(CHARGE_ITEMS),
+        'payments': payment_id,
+        'transactions': transaction_id,
+        'first_period': f'{months[0][0]:04d}-{months[0][1]:02d}',
+        'last_period': f'{months[-1][0]:04d}-{months[-1][1]:02d}',
+    }
+
+
+def create_database(path, households, years=3, seed=DEFAULT_SEED):
+    """新建数据库文件并生成数据（文件已存在时报错，避免覆盖真实数据）"""
+    if os.path.exists(path):
+        raise ValueError(f"文件已存在：{path}")
+    from migrate_db import latest_version
+
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        Base.metadata.create_all(engine)
+        # 与 init_db 新建的库一样标记为最新结构版本，否则程序打开时会把金额再按“元改分”迁移一次
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {int(latest_version())}")
+        return generate(engine, households, years, seed)
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成合成测试数据库')
+    parser.add_argument('--households', type=int, default=1000)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', default='synthetic.db')
+    args = parser.parse_args()
+
+    summary = create_database(args.output, args.households, args.years, args.seed)
+    print(f"已生成 {args.output}：{summary['residents']} 户，{summary['payments']} 张账单，"
+          f"{summary['transactions']} 条流水（{summary['first_period']} ～ {summary['last_period']}）")
+
+
+if __name__ == '__main__':
+    main()
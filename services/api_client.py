@@ -0,0 +1,141 @@
+"""
+联网服务模式：客户端
+
+install_remote_services(url) 把各 *Service 类的静态方法替换为远程调用，界面和报表代码不用改动：
+ResidentService.get_resident_by_id(1) 会请求服务端并返回还原后的 Resident 对象，
+服务端抛出的 ValueError 在客户端同样以 ValueError 抛出。
+每个线程保持一条 HTTP 长连接，连续调用不必反复建立连接。
+空闲长连接被服务端关闭时只在确定请求没有送达时重发；已发出的写请求失败一律报错，不重发，避免重复收费/出账。
+"""
+import json
+import select
+import inspect
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+from services.api_protocol import (SERVICES, LOCAL_METHODS, FILE_ARGUMENTS, DEFAULT_PORT, service_class,
+                                   public_methods, is_read, encode, encode_file, decode)
+
+_client = None
+
+
+class RemoteError(Exception):
+    """服务端返回的非业务错误"""
+
+
+class ApiClient:
+    """调用服务端接口"""
+
+    def __init__(self, url, token=None, timeout=60):
+        parts = urlsplit(url if '://' in url else f'http://{url}')
+        self.url = f'{parts.scheme}://{parts.hostname}:{parts.port or DEFAULT_PORT}'
+        self.host = parts.hostname
+        self.port = parts.port or DEFAULT_PORT
+        self.token = token
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        """本线程的长连接；返回 (连接, 是否为复用的已有连接)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and conn.sock is not None and _dropped(conn.sock):
+            # 服务端已关闭空闲连接：发送前就换新连接
+            self._drop(conn)
+            conn = None
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn, conn.sock is not None
+
+    def _drop(self, conn):
+        conn.close()
+        self._local.conn = None
+
+    def _request(self, method, path, payload=None, retry=False):
+        """发送请求；retry 为 True（只读请求）时复用的连接在等待响应时断开也重发一次"""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json; charset=utf-8'}
+        if self.token:
+            headers['X-Api-Token'] = self.token
+        for attempt in range(2):
+            conn, reused = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                # 复用的空闲连接在发送时已断开，请求没有送达：重连后再发一次
+                self._drop(conn)
+                if reused and not attempt:
+                    continue
+                raise ConnectionError(f"无法连接服务端 {self.url}：{e}")
+            except (OSError, http.client.HTTPException) as e:
+                self._drop(conn)
+                raise ConnectionError(f"无法连接服务端 {self.url}：{e}")
+            try:
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                # 请求已发出，服务端可能已经执行：只有只读请求才重发
+                self._drop(conn)
+                if retry and reused and not attempt:
+                    continue
+                raise ConnectionError(f"与服务端 {self.url} 通信失败，请确认操作是否已完成：{e}")
+        result = json.loads(data.decode('utf-8') or '{}')
+        if response.status == 200:
+            return result
+        message = result.get('error') or f'HTTP {response.status}'
+        if result.get('type') == 'ValueError':
+            raise ValueError(message)
+        raise RemoteError(message)
+
+    def ping(self):
+        """检查服务端是否可用，返回服务端状态"""
+        return self._request('GET', '/api/ping', retry=True)
+
+    def call(self, service, method, *args, **kwargs):
+        file_arg = FILE_ARGUMENTS.get((service, method))
+        if file_arg is not None and isinstance(kwargs.get(file_arg), str):
+            kwargs[file_arg] = encode_file(kwargs[file_arg])
+        payload = {'args': encode(list(args)), 'kwargs': encode(kwargs)}
+        return decode(self._request('POST', f'/api/call/{service}/{method}', payload,
+                                    retry=is_read(method))['result'])
+
+
+def _dropped(sock):
+    """空闲连接是否已被对方关闭（可读即为收到 EOF 或意外数据，都不能再复用）"""
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable)
+    except (OSError, ValueError):
+        return True
+
+
+def _remote_method(client, service, method, signature):
+    def call(*args, **kwargs):
+        # 统一按参数名传输，服务端无需关心调用方用的是位置参数还是关键字参数
+        arguments = signature.bind(*args, **kwargs).arguments
+        arguments.pop('db', None)
+        return client.call(service, method, **arguments)
+    call.__name__ = method
+    call.__qualname__ = f'{service}.{method}'
+    return call
+
+
+def install_remote_services(url, token=None):
+    """把服务方法替换为远程调用（客户端启动时、导入界面模块之前调用）"""
+    global _client
+    client = ApiClient(url, token)
+    for name in SERVICES:
+        cls = service_class(name)
+        for method in public_methods(cls):
+            if (name, method) in LOCAL_METHODS:
+                continue
+            signature = inspect.signature(getattr(cls, method))
+            setattr(cls, method, staticmethod(_remote_method(client, name, method, signature)))
+    _client = client
+    return client
+
+
+def active_client():
+    """联网模式下的客户端，本地模式为 None"""
+    return _client
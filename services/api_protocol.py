@@ -0,0 +1,170 @@
+"""
+联网服务模式的公共部分：可远程调用的服务、读写划分，以及参数/返回值的 JSON 编解码
+
+服务端和客户端调用的是同一批 *Service 静态方法：
+    POST /api/call/<服务类>/<方法>   请求体 {"args": [...], "kwargs": {...}}
+    成功 200 {"result": ...}；ValueError 400 {"error": "...", "type": "ValueError"}；其他错误 500
+
+模型对象按 {"__model__": 类名, "fields": 列值, "relations": 已加载的关联} 传输，客户端还原为
+不属于任何会话的模型对象，界面代码可以照常访问 payment.resident.full_room_no 等属性。
+金额（Money/Decimal）和日期时间也带类型标记，往返后类型不变。
+"""
+import base64
+import importlib
+from datetime import datetime, date
+from decimal import Decimal
+
+from sqlalchemy import inspect as sa_inspect
+
+from utils.money import Money
+
+DEFAULT_PORT = 8765
+
+# 服务类名 -> 模块
+SERVICES = {
+    'ResidentService': 'services.resident_service',
+    'ChargeService': 'services.charge_service',
+    'PaymentService': 'services.payment_service',
+    'PaymentTransactionService': 'services.payment_transaction_service',
+    'PrintService': 'services.print_service',
+    'MeterReadingService': 'services.meter_reading_service',
+    'BillingPlanService': 'services.billing_plan_service',
+    'EstateReportService': 'services.estate_report_service',
+    'ArchiveService': 'services.archive_service',
+    'CloseoutService': 'services.closeout_service',
+}
+
+# 以这些前缀开头的方法只读，服务端并发执行；其余方法都交给唯一的写线程排队执行
+READ_PREFIXES = ('get_', 'search_', 'suggest_', 'count_')
+
+# 不访问数据库、在客户端本地执行的方法
+LOCAL_METHODS = {
+    ('ChargeService', 'calculate_amount'),
+    ('PaymentService', 'installment_amount'),
+    ('MeterReadingService', 'create_reading_template'),
+}
+
+# 参数是客户端本地文件的方法：客户端上传文件内容，服务端存为临时文件后把路径传给服务方法
+FILE_ARGUMENTS = {
+    ('MeterReadingService', 'import_readings'): 'file_path',
+}
+
+_MODELS = None
+
+
+def service_class(name):
+    """按类名取服务类（只允许 SERVICES 中登记的类）"""
+    module = SERVICES.get(name)
+    if module is None:
+        raise KeyError(name)
+    return getattr(importlib.import_module(module), name)
+
+
+def public_methods(cls):
+    """服务类中可以远程调用的静态方法名"""
+    return [name for name, value in vars(cls).items()
+            if isinstance(value, staticmethod) and not name.startswith('_')]
+
+
+def is_read(method):
+    return method.startswith(READ_PREFIXES)
+
+
+def _models():
+    global _MODELS
+    if _MODELS is None:
+        from models.database import Base
+        _MODELS = {mapper.class_.__name__: mapper.class_ for mapper in Base.registry.mappers}
+    return _MODELS
+
+
+# ---------------------------------------------------------------------- 编码
+def encode(value, _seen=None):
+    """把服务方法的参数/返回值转换为可 JSON 序列化的结构"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Money):
+        return {'__money__': str(value)}
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, dict):
+        return {'__dict__': [[encode(k, _seen), encode(v, _seen)] for k, v in value.items()]}
+    if isinstance(value, (list, tuple, set)):
+        return [encode(v, _seen) for v in value]
+    if hasattr(value, '__table__'):
+        return _encode_model(value, _seen if _seen is not None else set())
+    raise TypeError(f"无法传输的类型：{type(value).__name__}")
+
+
+def _encode_model(obj, seen):
+    state = sa_inspect(obj)
+    marker = (type(obj).__name__, state.identity or id(obj))
+    if marker in seen:
+        return None
+    seen = seen | {marker}
+    unloaded = state.unloaded
+    fields = {c.key: encode(getattr(obj, c.key)) for c in obj.__table__.columns if c.key not in unloaded}
+    relations = {}
+    for rel in state.mapper.relationships:
+        if rel.key in unloaded:
+            continue
+        value = getattr(obj, rel.key)
+        if value is None:
+            continue
+        if rel.uselist:
+            relations[rel.key] = [v for v in (_encode_model(item, seen) for item in value) if v is not None]
+        else:
+            encoded = _encode_model(value, seen)
+            if encoded is not None:
+                relations[rel.key] = encoded
+    return {'__model__': type(obj).__name__, 'fields': fields, 'relations': relations}
+
+
+def encode_file(path):
+    """把本地文件编码为上传参数"""
+    import os
+    with open(path, 'rb') as f:
+        data = base64.b64encode(f.read()).decode('ascii')
+    return {'__file__': {'name': os.path.basename(path), 'data': data}}
+
+
+# ---------------------------------------------------------------------- 解码
+def decode(value):
+    """encode 的逆过程（模型还原为不属于任何会话的对象）"""
+    if isinstance(value, list):
+        return [decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if '__money__' in value:
+        return Money(value['__money__'])
+    if '__decimal__' in value:
+        return Decimal(value['__decimal__'])
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    if '__date__' in value:
+        return date.fromisoformat(value['__date__'])
+    if '__dict__' in value:
+        return {_hashable(decode(k)): decode(v) for k, v in value['__dict__']}
+    if '__model__' in value:
+        return _decode_model(value)
+    if '__file__' in value:
+        return value
+    raise ValueError(f"无法识别的数据：{list(value)[:3]}")
+
+
+def _hashable(key):
+    return tuple(key) if isinstance(key, list) else key
+
+
+def _decode_model(value):
+    cls = _models().get(value['__model__'])
+    if cls is None:
+        raise ValueError(f"未知的数据模型：{value['__model__']}")
+    obj = cls(**{k: decode(v) for k, v in value['fields'].items()})
+    for key, related in value.get('relations', {}).items():
+        setattr(obj, key, decode(related))
+    return obj
@@ -0,0 +1,215 @@
+"""
+联网服务模式：服务端
+
+一台电脑运行 `python main.py --server`，独占数据库文件，通过局域网 HTTP/JSON 提供各 *Service 的方法；
+其余收银电脑用 `--connect http://服务端IP:8765` 启动，界面不变，服务方法改为远程调用。
+
+- 读操作（get_/search_/suggest_/count_ 开头）在请求线程中并发执行；
+- 写操作由服务类的 @serialize_writes 交给全局写线程（services.write_executor）按到达顺序执行，
+  与服务端本机的定时出账等写入共用同一队列，同一时刻只有一个连接在写库；
+- 口令：服务端以 --token 启动后，请求头须带 X-Api-Token；监听局域网地址时必须设置口令，
+  不设口令只允许监听本机回环地址（127.0.0.1），否则局域网内任何人都能调用删除、归档等方法。
+"""
+import os
+import hmac
+import json
+import ipaddress
+import shutil
+import tempfile
+import threading
+import time
+import base64
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.api_protocol import (service_class, public_methods, encode, decode,
+                                   FILE_ARGUMENTS, LOCAL_METHODS, DEFAULT_PORT)
+from utils.logger import logger
+
+# 请求体上限（上传抄表文件时最大）
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+def is_loopback(host):
+    """host 是否只在本机可访问"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class ApiServer:
+    """把服务方法发布为 HTTP 接口"""
+
+    def __init__(self, host='0.0.0.0', port=DEFAULT_PORT, token=None):
+        self.token = token or None
+        if self.token is None and not is_loopback(host):
+            raise ValueError(f"在 {host} 上提供服务必须设置口令（--token），不设口令时只能监听 127.0.0.1")
+        self.started_at = time.time()
+        self._methods = {}
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self._httpd.server_address[:2]
+        return host, port
+
+    def start(self):
+        """在后台线程中提供服务（测试和基准脚本使用）"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='ApiServer', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def resolve(self, service, method):
+        """取可远程调用的方法，不允许时抛 KeyError"""
+        key = (service, method)
+        func = self._methods.get(key)
+        if func is None:
+            cls = service_class(service)
+            if method not in public_methods(cls) or key in LOCAL_METHODS:
+                raise KeyError(method)
+            func = self._methods[key] = getattr(cls, method)
+        return func
+
+    def call(self, service, method, args, kwargs):
+        """执行一次调用（写方法由 @serialize_writes 排队到写线程）"""
+        func = self.resolve(service, method)
+        if 'db' in kwargs:
+            raise ValueError("不能通过接口传入数据库会话")
+        temp_dir = None
+        file_arg = FILE_ARGUMENTS.get((service, method))
+        if file_arg is not None and isinstance(kwargs.get(file_arg), dict):
+            temp_dir = tempfile.mkdtemp(prefix='api_upload_')
+            kwargs[file_arg] = _save_upload(kwargs[file_arg], temp_dir)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if temp_dir is not None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def status(self):
+        from models.database import current_estate
+        return {'ok': True, 'estate': current_estate().name, 'uptime': round(time.time() - self.started_at, 1)}
+
+
+def _save_upload(upload, temp_dir):
+    info = upload['__file__']
+    path = os.path.join(temp_dir, os.path.basename(info['name']) or 'upload')
+    with open(path, 'wb') as f:
+        f.write(base64.b64decode(info['data']))
+    return path
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # 响应头和响应体分两次写出，关闭 Nagle 避免与延迟确认叠加出 40ms 的等待
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            # 不逐条打印访问日志，错误单独记录
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self):
+            if server.token and not hmac.compare_digest(
+                    (self.headers.get('X-Api-Token') or '').encode('utf-8'), server.token.encode('utf-8')):
+                self._send(401, {'error': '口令错误', 'type': 'PermissionError'})
+                return False
+            return True
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            if self.path == '/api/ping':
+                self._send(200, server.status())
+            else:
+                self._send(404, {'error': '接口不存在', 'type': 'KeyError'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY_BYTES:
+                self.close_connection = True
+                self._send(413, {'error': '请求过大', 'type': 'ValueError'})
+                return
+            body = self.rfile.read(length) if length else b''
+            if not self._authorized():
+                return
+            parts = self.path.strip('/').split('/')
+            if len(parts) != 4 or parts[:2] != ['api', 'call']:
+                self._send(404, {'error': '接口不存在', 'type': 'KeyError'})
+                return
+            service, method = parts[2], parts[3]
+            try:
+                server.resolve(service, method)
+            except KeyError:
+                self._send(404, {'error': f'不支持的方法：{service}.{method}', 'type': 'KeyError'})
+                return
+            try:
+                request = json.loads(body.decode('utf-8') or '{}')
+                args = decode(request.get('args', []))
+                kwargs = decode(request.get('kwargs', {}))
+                if isinstance(kwargs, list):
+                    kwargs = {}
+                result = server.call(service, method, args, kwargs)
+                self._send(200, {'result': encode(result)})
+            except ValueError as e:
+                self._send(400, {'error': str(e), 'type': 'ValueError'})
+            except Exception as e:
+                logger.log_error(e, f"API_CALL_FAILED: {service}.{method}")
+                self._send(500, {'error': str(e), 'type': type(e).__name__})
+
+    return Handler
+
+
+def serve(host='0.0.0.0', port=DEFAULT_PORT, token=None):
+    """服务模式入口：准备数据库、启动定时备份和定时出账，然后一直提供服务"""
+    from models.database import init_db
+    from utils.backup_engine import BackupScheduler
+    from services.billing_plan_service import BillingScheduler
+    from services.write_executor import write_executor
+
+    if not token and not is_loopback(host):
+        print(f"在 {host} 上提供服务必须设置口令：main.py --server --token 口令"
+              f"（各收银电脑用 --connect 时带同样的 --token）；只在本机使用可加 --host 127.0.0.1")
+        logger.log('WARNING', 'API_SERVER_REFUSED', f'{host}:{port}', reason='no token')
+        return 2
+
+    init_db()
+    backup_scheduler = BackupScheduler()
+    backup_scheduler.start()
+    billing_scheduler = BillingScheduler()
+    billing_scheduler.start()
+
+    server = ApiServer(host, port, token)
+    bound_host, bound_port = server.address
+    logger.log('INFO', 'API_SERVER_START', f'{bound_host}:{bound_port}', token=bool(token))
+    print(f"物业收费服务已启动：http://{bound_host}:{bound_port}  （Ctrl+C 停止）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        billing_scheduler.stop()
+        write_executor.shutdown()
+        backup_scheduler.on_exit()
+        logger.log('INFO', 'API_SERVER_STOP', f'{bound_host}:{bound_port}')
+    return 0
@@ -0,0 +1,326 @@
+"""
+历史账单归档
+
+账单和流水只增不减，“全部账单”、搜索和导出每次都要扫描全部历史，而多年前的周期早已结清、不会再改。
+archive_closed_periods() 把 N 年前、账单已全部缴清的周期整体移到同目录的归档库（property_archive.db），
+在主库 archived_periods 表按 (周期, 收费项目) 留一行汇总，然后压缩两个库文件，主库保持小而快。
+
+读取接口默认只查主库；传入 include_archive=True 时用 attached_archive() 在同一连接上 ATTACH 归档库，
+archive_union() 把两边的同名表 UNION ALL 成一个实体，查询写法和返回的模型对象都与原来相同。
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import Table, Column, MetaData, select, func, create_engine
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy.pool import NullPool
+
+from models.database import SessionLocal, archive_db_path
+from models.payment import Payment
+from models.payment_transaction import PaymentTransaction
+from models.archived_period import ArchivedPeriod
+from migrate_db import raise_sequence, migrate_archive, latest_version
+from utils.logger import logger
+from utils.profiler import profile_service
+from services.write_executor import serialize_writes
+
+ARCHIVE_SCHEMA = 'archive'
+
+# 移入归档库的表（按依赖顺序，流水在前）
+ARCHIVED_MODELS = (PaymentTransaction, Payment)
+
+_archive_tables = {}
+
+
+def archive_table(model):
+    """归档库中与模型同名的表（只含列定义，用于 UNION 查询）"""
+    table = _archive_tables.get(model)
+    if table is None:
+        columns = [Column(c.name, c.type, primary_key=c.primary_key) for c in model.__table__.columns]
+        table = _archive_tables[model] = Table(model.__tablename__, MetaData(), *columns, schema=ARCHIVE_SCHEMA)
+    return table
+
+
+def archive_union(model):
+    """主库与归档库同名表 UNION ALL 后的别名实体，可像模型本身一样过滤、排序和预加载关联"""
+    union = select(model.__table__).union_all(select(archive_table(model))).subquery(f'{model.__tablename__}_all')
+    return aliased(model, union)
+
+
+def _database_path(bind):
+    path = bind.url.database
+    return None if not path or path == ':memory:' else path
+
+
+@contextmanager
+def attached_archive(db: Session, enabled: bool = True):
+    """在会话的连接上附加归档库，返回是否已附加（没有归档库或 enabled 为 False 时为 False）"""
+    path = _database_path(db.get_bind()) if enabled else None
+    archive_path = archive_db_path(path) if path else None
+    if not archive_path or not os.path.exists(archive_path):
+        yield False
+        return
+    conn = db.connection()
+    attached = ARCHIVE_SCHEMA in [row[1] for row in conn.exec_driver_sql("PRAGMA database_list")]
+    if not attached:
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (archive_path,))
+    try:
+        yield True
+    finally:
+        if not attached:
+            try:
+                conn.exec_driver_sql(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+            except Exception:
+                # 连接仍在事务中时无法分离；留着也无妨，下次会直接复用
+                pass
+
+
+def _column_list(model):
+    return ', '.join(c.name for c in model.__table__.columns)
+
+
+def _ensure_archive_schema(archive_path):
+    """归档库不存在时按模型建表（含索引）并标记为最新结构版本；已存在时迁移到最新结构"""
+    if os.path.exists(archive_path) and not migrate_archive(archive_path):
+        raise Exception("归档库迁移失败，请查看日志")
+    fresh = not os.path.exists(archive_path)
+    engine = create_engine(f'sqlite:///{archive_path}', poolclass=NullPool)
+    try:
+        for model in ARCHIVED_MODELS:
+            model.__table__.create(engine, checkfirst=True)
+        if fresh:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f"PRAGMA user_version = {int(latest_version())}")
+    finally:
+        engine.dispose()
+
+
+def _raise_sequences(cursor):
+    """主库记下归档库的最大 ID（sqlite_sequence），以后分配的 ID 都在它之后（归档库须已附加）"""
+    for model in ARCHIVED_MODELS:
+        table = model.__tablename__
+        cursor.execute(f"SELECT MAX(id) FROM {ARCHIVE_SCHEMA}.{table}")
+        highest = cursor.fetchone()[0]
+        if highest is not None:
+            raise_sequence(cursor, table, highest)
+
+
+def reconcile_archive(db_path):
+    """恢复了不含归档库的备份后调用：恢复出的数据库里仍有的账单，从归档库中去掉（连同其流水），
+    回到该备份时“尚未归档”的状态，避免包含归档的查询出现重复行、再次归档时主键冲突。
+    ID 相同但内容不同的账单（ID 不复用之前遗留的情况）两边都保留。
+    备份之后才创建并归档的账单仍在归档库中，主库的 ID 序列同样提到归档库的最大 ID 之后。
+
+    Returns:
+        dict: {'payments', 'transactions'} 从归档库中去掉的行数
+    """
+    archive_path = archive_db_path(db_path)
+    result = {'payments': 0, 'transactions': 0}
+    if not os.path.exists(archive_path):
+        return result
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (archive_path,))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS restored_payments (id INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM temp.restored_payments")
+            conn.execute(f"""
+                INSERT INTO temp.restored_payments (id)
+                SELECT a.id FROM {ARCHIVE_SCHEMA}.payments a JOIN main.payments p
+                    ON p.id = a.id AND p.resident_id = a.resident_id
+                   AND p.charge_item_id = a.charge_item_id AND p.period = a.period
+            """)
+            result['transactions'] = conn.execute(f"""
+                DELETE FROM {ARCHIVE_SCHEMA}.payment_transactions
+                WHERE payment_id IN (SELECT id FROM temp.restored_payments)
+            """).rowcount
+            result['payments'] = conn.execute(f"""
+                DELETE FROM {ARCHIVE_SCHEMA}.payments WHERE id IN (SELECT id FROM temp.restored_payments)
+            """).rowcount
+            _raise_sequences(conn.cursor())
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+    finally:
+        conn.close()
+    if result['payments']:
+        logger.log_operation("ARCHIVE_RECONCILED",
+                             f"payments={result['payments']}, transactions={result['transactions']}")
+    return result
+
+
+@serialize_writes
+@profile_service
+class ArchiveService:
+    """历史账单归档服务"""
+
+    @staticmethod
+    def get_archived_periods(db: Session = None):
+        """已归档周期汇总（按周期倒序），每行 {'period', 'charge_item_name', 'payment_count', ...}"""
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            rows = db.query(ArchivedPeriod).options(joinedload(ArchivedPeriod.charge_item)).order_by(
+                ArchivedPeriod.period.desc(), ArchivedPeriod.charge_item_id).all()
+            return [{
+                'period': r.period,
+                'charge_item_id': r.charge_item_id,
+                'charge_item_name': r.charge_item.name if r.charge_item else '',
+                'payment_count': r.payment_count,
+                'transaction_count': r.transaction_count,
+                'total_amount': r.total_amount,
+                'paid_amount': r.paid_amount,
+                'archived_at': r.archived_at,
+            } for r in rows]
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def get_archive_status(db: Session = None):
+        """归档库文件和已归档数量"""
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            path = _database_path(db.get_bind())
+            archive_path = archive_db_path(path) if path else ''
+            periods, payments = db.query(
+                func.count(func.distinct(ArchivedPeriod.period)),
+                func.coalesce(func.sum(ArchivedPeriod.payment_count), 0),
+            ).one()
+            return {
+                'path': archive_path,
+                'exists': bool(archive_path) and os.path.exists(archive_path),
+                'size': os.path.getsize(archive_path) if archive_path and os.path.exists(archive_path) else 0,
+                'periods': periods,
+                'payments': payments,
+            }
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def archive_closed_periods(years: int = 3, now: datetime = None, vacuum: bool = True):
+        """把 years 年前、账单已全部缴清的周期移入归档库
+
+        仍有欠费的周期留在主库（之后结清了会在下次归档时移走）。账单表、流水表的 ID 为 AUTOINCREMENT，
+        归档后把主库的 sqlite_sequence 提到归档库的最大 ID，主库最新的行即使被删除，新行的 ID 也不会与归档库重复。
+
+        Returns:
+            dict: {'cutoff', 'periods', 'payments', 'transactions', 'open_periods', 'archive_path'}
+        """
+        years = int(years)
+        if years < 1:
+            raise ValueError("归档年限至少为 1 年")
+        now = now or datetime.now()
+        cutoff = f"{now.year - years:04d}-{now.month:02d}"
+
+        engine = SessionLocal.kw['bind']
+        db_path = _database_path(engine)
+        if db_path is None:
+            raise ValueError("内存数据库不支持归档")
+        archive_path = archive_db_path(db_path)
+        _ensure_archive_schema(archive_path)
+
+        logger.log_operation("ARCHIVE_START", f"cutoff={cutoff}, archive={archive_path}")
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (archive_path,))
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    result = ArchiveService._move_closed_periods(cursor, cutoff, now)
+                    cursor.execute("COMMIT")
+                except BaseException:
+                    cursor.execute("ROLLBACK")
+                    raise
+                if vacuum and result['payments']:
+                    # 归档库重新整理成紧凑文件，主库释放删掉的页
+                    cursor.execute(f"VACUUM {ARCHIVE_SCHEMA}")
+                    cursor.execute("VACUUM main")
+            finally:
+                cursor.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+                cursor.close()
+        except Exception as e:
+            logger.log_error(e, f"ARCHIVE_FAILED: cutoff={cutoff}")
+            raise
+        finally:
+            raw.close()
+
+        result.update(cutoff=cutoff, archive_path=archive_path)
+        logger.log_operation("ARCHIVE_SUCCESS",
+                             f"periods={result['periods']}, payments={result['payments']}, "
+                             f"transactions={result['transactions']}")
+        return result
+
+    @staticmethod
+    def _move_closed_periods(cursor, cutoff, now):
+        """在已开始的事务中移动数据，返回统计"""
+        cursor.execute("""
+            SELECT period FROM main.payments WHERE period < ?
+            GROUP BY period HAVING SUM(CASE WHEN paid = 1 THEN 0 ELSE 1 END) > 0
+            ORDER BY period
+        """, (cutoff,))
+        open_periods = [row[0] for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT period FROM main.payments WHERE period < ?
+            GROUP BY period HAVING SUM(CASE WHEN paid = 1 THEN 0 ELSE 1 END) = 0
+            ORDER BY period
+        """, (cutoff,))
+        periods = [row[0] for row in cursor.fetchall()]
+
+        result = {'periods': periods, 'payments': 0, 'transactions': 0, 'open_periods': open_periods}
+        if not periods:
+            return result
+
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS archive_periods (period TEXT PRIMARY KEY)")
+        cursor.execute("DELETE FROM temp.archive_periods")
+        cursor.executemany("INSERT INTO temp.archive_periods (period) VALUES (?)", [(p,) for p in periods])
+
+        moving_ids = "SELECT p.id FROM main.payments p JOIN temp.archive_periods a ON a.period = p.period"
+        cursor.execute(f"""
+            INSERT INTO main.archived_periods
+                (period, charge_item_id, payment_count, transaction_count, total_amount, paid_amount, archived_at)
+            SELECT p.period, p.charge_item_id, COUNT(*), COALESCE(SUM(tc.n), 0),
+                   COALESCE(SUM(p.amount), 0), COALESCE(SUM(p.paid_amount), 0), ?
+            FROM main.payments p
+            JOIN temp.archive_periods a ON a.period = p.period
+            LEFT JOIN (SELECT payment_id, COUNT(*) AS n FROM main.payment_transactions
+                       WHERE payment_id IN ({moving_ids}) GROUP BY payment_id) tc ON tc.payment_id = p.id
+            WHERE 1
+            GROUP BY p.period, p.charge_item_id
+            ON CONFLICT (period, charge_item_id) DO UPDATE SET
+                payment_count = payment_count + excluded.payment_count,
+                transaction_count = transaction_count + excluded.transaction_count,
+                total_amount = total_amount + excluded.total_amount,
+                paid_amount = paid_amount + excluded.paid_amount,
+                archived_at = excluded.archived_at
+        """, (now.strftime('%Y-%m-%d %H:%M:%S.%f'),))
+
+        tx_columns = _column_list(PaymentTransaction)
+        cursor.execute(f"""
+            INSERT INTO {ARCHIVE_SCHEMA}.payment_transactions ({tx_columns})
+            SELECT {tx_columns} FROM main.payment_transactions WHERE payment_id IN ({moving_ids})
+        """)
+        result['transactions'] = cursor.rowcount
+        payment_columns = _column_list(Payment)
+        cursor.execute(f"""
+            INSERT INTO {ARCHIVE_SCHEMA}.payments ({payment_columns})
+            SELECT {payment_columns} FROM main.payments
+            WHERE period IN (SELECT period FROM temp.archive_periods)
+        """)
+        result['payments'] = cursor.rowcount
+        cursor.execute(f"DELETE FROM main.payment_transactions WHERE payment_id IN ({moving_ids})")
+        cursor.execute("DELETE FROM main.payments WHERE period IN (SELECT period FROM temp.archive_periods)")
+        _raise_sequences(cursor)
+        return result
@@ -0,0 +1,316 @@
+"""
+周期出账服务
+
+按出账计划为一个周期生成全部账单：每个计划一条查询取出范围内住户，编译收费规则一次算出金额，
+再用 INSERT ... ON CONFLICT DO NOTHING 批量插入。账单表上有 (住户, 收费项目, 周期) 唯一索引，
+已存在的账单被跳过，因此同一周期重复执行（手动重复点击、定时任务重跑）不会产生重复账单。
+"""
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from models.billing_plan import BillingPlan
+from services.tariff import compile_tariff, billing_quantities, KIND_USAGE
+from utils.logger import logger
+from utils.profiler import profile_service
+from services.write_executor import serialize_writes
+
+
+def period_range(period, months=1):
+    """周期 YYYY-MM 开始的 months 个月的计费起止日期"""
+    year, month = map(int, period.split('-'))
+    start = datetime(year, month, 1)
+    month_index = year * 12 + (month - 1) + months
+    end = datetime(month_index // 12, month_index % 12 + 1, 1) - timedelta(days=1)
+    return start, end
+
+
+def current_period(now=None):
+    now = now or datetime.now()
+    return f"{now.year:04d}-{now.month:02d}"
+
+
+def _month_index(period):
+    year, month = map(int, period.split('-'))
+    return year * 12 + (month - 1)
+
+
+def next_period(period, months=1):
+    """周期 YYYY-MM 之后第 months 个月的周期"""
+    index = _month_index(period) + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def plan_is_due(plan, period):
+    """计划在该周期是否应出账：从未执行过、重跑上次的周期（可重复执行），
+    或距上次出账已满 billing_months 个月（按季/按年的计划中间几个月不再出账，账期不会重叠）"""
+    if not plan.last_period or plan.last_period == period:
+        return True
+    return _month_index(period) >= _month_index(plan.last_period) + (plan.billing_months or 1)
+
+
+@serialize_writes
+@profile_service
+class BillingPlanService:
+    """周期出账计划服务类"""
+
+    @staticmethod
+    def get_all_plans(db: Session = None, active_only: bool = False):
+        """获取所有出账计划（已加载收费项目）"""
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            query = db.query(BillingPlan)
+            if active_only:
+                query = query.filter(BillingPlan.active == 1)
+            plans = query.order_by(BillingPlan.id).all()
+            for plan in plans:
+                _ = plan.charge_item
+            return plans
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def create_plan(charge_item_id: int, property_type: str = '', building: str = '',
+                    billing_months: int = 1, db: Session = None):
+        """创建出账计划"""
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            charge_item = db.query(ChargeItem).filter(ChargeItem.id == charge_item_id).first()
+            if not charge_item:
+                raise ValueError("收费项目不存在")
+            if charge_item.charge_type == 'manual':
+                raise ValueError("手动金额的收费项目不能自动出账")
+            if compile_tariff(charge_item).kind == KIND_USAGE:
+                raise ValueError("按用量计费的收费项目请通过抄表出账")
+            if billing_months is None or billing_months < 1:
+                raise ValueError("计费月数必须大于 0")
+            plan = BillingPlan(
+                charge_item_id=charge_item_id,
+                property_type=property_type or '',
+                building=(building or '').strip(),
+                billing_months=billing_months,
+                active=1,
+            )
+            db.add(plan)
+            db.commit()
+            db.refresh(plan)
+            _ = plan.charge_item
+            logger.log_operation("CREATE_BILLING_PLAN", f"plan_id={plan.id}, charge_item_id={charge_item_id}")
+            return plan
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def set_plan_active(plan_id: int, active: bool, db: Session = None):
+        """启用/停用出账计划"""
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            plan = db.query(BillingPlan).filter(BillingPlan.id == plan_id).first()
+            if not plan:
+                raise ValueError("出账计划不存在")
+            plan.active = 1 if active else 0
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def delete_plan(plan_id: int, db: Session = None):
+        """删除出账计划（已生成的账单不受影响）"""
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            plan = db.query(BillingPlan).filter(BillingPlan.id == plan_id).first()
+            if not plan:
+                raise ValueError("出账计划不存在")
+            db.delete(plan)
+            db.commit()
+            logger.log_operation("DELETE_BILLING_PLAN", f"plan_id={plan_id}")
+            return True
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def run_period(period: str = None, plan_ids=None, db: Session = None):
+        """按出账计划生成某周期的全部账单（可重复执行）
+
+        Args:
+            period: 周期 YYYY-MM，默认当前月
+            plan_ids: 只执行这些计划，默认执行全部启用的计划
+
+        Returns:
+            dict: {'period', 'created', 'skipped', 'plans': [{'plan_id', 'charge_item', 'created', 'skipped'}, ...],
+                   'not_due': [{'plan_id', 'charge_item', 'next_period'}, ...]}，
+                  not_due 为上一账期还未结束、本周期不出账的计划
+        """
+        period = period or current_period()
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            query = db.query(BillingPlan).filter(BillingPlan.active == 1)
+            if plan_ids is not None:
+                query = query.filter(BillingPlan.id.in_(list(plan_ids)))
+            summary = {'period': period, 'created': 0, 'skipped': 0, 'plans': [], 'not_due': []}
+            now = datetime.now()
+            for plan in query.order_by(BillingPlan.id).all():
+                if not plan_is_due(plan, period):
+                    summary['not_due'].append({
+                        'plan_id': plan.id,
+                        'charge_item': plan.charge_item.name if plan.charge_item else '',
+                        'next_period': next_period(plan.last_period, plan.billing_months or 1),
+                    })
+                    continue
+                created, skipped = BillingPlanService._run_plan(db, plan, period)
+                plan.last_period = period
+                plan.last_run_at = now
+                summary['created'] += created
+                summary['skipped'] += skipped
+                summary['plans'].append({
+                    'plan_id': plan.id,
+                    'charge_item': plan.charge_item.name if plan.charge_item else '',
+                    'created': created,
+                    'skipped': skipped,
+                })
+            db.commit()
+            logger.log('INFO', 'BILLING_PLAN_RUN', period, created=summary['created'],
+                       skipped=summary['skipped'], plans=len(summary['plans']))
+            return summary
+        except Exception as e:
+            db.rollback()
+            logger.log_error(e, f"BILLING_PLAN_RUN_FAILED: period={period}")
+            raise
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def _run_plan(db, plan, period):
+        """执行单个计划，返回 (新建数量, 已存在跳过数量)"""
+        charge_item = plan.charge_item
+        if charge_item is None or charge_item.status == 0:
+            return 0, 0
+        tariff = compile_tariff(charge_item)
+        if tariff.charge_type == 'manual' or tariff.kind == KIND_USAGE:
+            return 0, 0
+
+        query = db.query(Resident.id, Resident.area).filter(Resident.status == 1)
+        if plan.property_type:
+            query = query.filter(Resident.property_type == plan.property_type)
+        if plan.building:
+            query = query.filter(Resident.building == plan.building)
+        residents = query.all()
+        if not residents:
+            return 0, 0
+
+        months = plan.billing_months or 1
+        start, end = period_range(period, months)
+        q = billing_quantities(start, end, months)
+        amounts = tariff.price_batch(
+            areas=[float(area) if area else 0.0 for _, area in residents],
+            months=months, days=q['days'], years=q['years'], hours=q['hours'],
+            count=len(residents),
+        )
+
+        def existing():
+            return db.query(func.count(Payment.id)).filter(
+                Payment.charge_item_id == charge_item.id, Payment.period == period).scalar()
+
+        before = existing()
+        stmt = sqlite_insert(Payment.__table__).on_conflict_do_nothing(
+            index_elements=['resident_id', 'charge_item_id', 'period', 'dedup_seq'])
+        db.execute(stmt, [
+            {
+                'resident_id': resident_id,
+                'charge_item_id': charge_item.id,
+                'period': period,
+                'billing_start_date': start,
+                'billing_end_date': end,
+                'billing_months': months,
+                'paid_months': 0,
+                'amount': amount,
+                'paid_amount': 0,
+                'paid': 0,
+                'dedup_seq': 0,
+            }
+            for (resident_id, _), amount in zip(residents, amounts)
+        ])
+        created = existing() - before
+        return created, len(residents) - created
+
+
+class BillingScheduler:
+    """定时出账：后台线程每隔 check_minutes 检查一次，有启用的计划尚未执行本周期就执行。
+    出账本身可重复执行，多开程序或重启后重跑也不会产生重复账单"""
+
+    def __init__(self, check_minutes=60, on_created=None):
+        self.check_seconds = check_minutes * 60
+        self.on_created = on_created
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='BillingScheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_if_due()
+            if self._stop.wait(self.check_seconds):
+                return
+
+    def run_if_due(self, now=None):
+        """本周期还有计划未执行则执行，返回出账结果（无需执行返回 None）"""
+        period = current_period(now)
+        try:
+            due = [p.id for p in BillingPlanService.get_all_plans(active_only=True)
+                   if p.last_period != period and plan_is_due(p, period)]
+            if not due:
+                return None
+            summary = BillingPlanService.run_period(period, plan_ids=due)
+            if summary['created'] and self.on_created is not None:
+                self.on_created(summary)
+            return summary
+        except Exception as e:
+            logger.log_error(e, 'SCHEDULED_BILLING_FAILED')
+            return None
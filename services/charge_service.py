@@ -4,10 +4,15 @@
 from sqlalchemy.orm import Session
 from models.charge_item import ChargeItem
 from models.database import SessionLocal
+from services.reference_cache import reference_cache, CHARGE_ITEMS
 from decimal import Decimal, ROUND_HALF_UP
 import math
+from utils.profiler import profile_service
+from services.write_executor import serialize_writes
 
 
+@serialize_writes
+@profile_service
 class ChargeService:
     """收费项目管理服务类"""
     
@@ -27,9 +32,9 @@ class ChargeService:
     
     @staticmethod
     def get_charge_item_by_id(item_id: int, db: Session = None):
-        """根据ID获取收费项目"""
+        """根据ID获取收费项目（未传入会话时走引用数据缓存）"""
         if db is None:
-            db = SessionLocal()
+            return reference_cache.get_charge_item(item_id)
         try:
             return db.query(ChargeItem).filter(ChargeItem.id == item_id).first()
         finally:
@@ -55,6 +60,7 @@ class ChargeService:
             db.add(charge_item)
             db.commit()
             db.refresh(charge_item)
+            reference_cache.store(db, charge_item)
             return charge_item
         except Exception as e:
             db.rollback()
@@ -89,6 +95,7 @@ class ChargeService:
             
             db.commit()
             db.refresh(charge_item)
+            reference_cache.store(db, charge_item)
             return charge_item
         except Exception as e:
             db.rollback()
@@ -115,6 +122,7 @@ class ChargeService:
             
             db.delete(charge_item)
             db.commit()
+            reference_cache.discard(db, CHARGE_ITEMS, [item_id])
             return True
         except Exception as e:
             db.rollback()
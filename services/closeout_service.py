@@ -0,0 +1,211 @@
+"""
+收银日结
+
+日度报表按账单的计费开始日汇总，反映不了当天实际收了多少钱。日结直接统计收款流水（payment_transactions），
+按 天 × 收银员 × 收费项目 汇总实收金额，用于每天下班前核对现金。
+
+汇总只扫描 (paid_time, operator) 索引上的日期区间，一条 GROUP BY 完成，耗时与历史数据量无关；
+明细按 (收款时间, 流水ID) 分页读取，导出时逐页写入，不把整段流水一次装进内存。
+对账：区间内有收款的账单，payments.paid_amount 应等于该账单全部流水之和，不相等的列出来。
+"""
+from datetime import datetime, date, timedelta
+
+from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal
+from models.payment import Payment
+from models.payment_transaction import PaymentTransaction
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from utils.money import ZERO
+from utils.profiler import profile_service
+
+# 流水没有记录收银员时的显示名
+UNKNOWN_OPERATOR = '未记录'
+# 明细每页条数
+DETAIL_PAGE_SIZE = 2000
+
+
+def day_range(start_date, end_date=None):
+    """把起止日期（'YYYY-MM-DD' 字符串或 date）换算为 [开始, 结束) 的时间区间，结束日期缺省与开始相同"""
+    def parse(value):
+        if isinstance(value, datetime):
+            return datetime(value.year, value.month, value.day)
+        if isinstance(value, date):
+            return datetime(value.year, value.month, value.day)
+        try:
+            return datetime.strptime(str(value).strip(), '%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f"日期格式应为 YYYY-MM-DD：{value}")
+
+    start = parse(start_date)
+    end = parse(end_date) if end_date else start
+    if end < start:
+        raise ValueError('结束日期不能早于开始日期')
+    return start, end + timedelta(days=1)
+
+
+def _transactions_in(query, start, end, operator=None):
+    T = PaymentTransaction
+    query = query.filter(T.paid_time >= start, T.paid_time < end)
+    if operator is not None:
+        query = query.filter(func.coalesce(T.operator, '') == ('' if operator == UNKNOWN_OPERATOR else operator))
+    return query
+
+
+@profile_service
+class CloseoutService:
+    """收银日结服务类"""
+
+    @staticmethod
+    def get_closeout(start_date, end_date=None, operator: str = None, db: Session = None):
+        """按 天 × 收银员 × 收费项目 汇总区间内的实收流水
+
+        Returns:
+            dict: {'start', 'end', 'rows', 'by_day', 'by_operator', 'total'}，
+                  rows 每行 {'day', 'operator', 'item', 'count', 'payment_count', 'amount'}；
+                  by_day / by_operator 为按天、按收银员的小计，total 为合计
+        """
+        start, end = day_range(start_date, end_date)
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            T = PaymentTransaction
+            day = func.date(T.paid_time)
+            op = func.coalesce(T.operator, '')
+            item = func.coalesce(ChargeItem.name, '未知')
+            query = db.query(
+                day, op, item,
+                func.count(T.id),
+                func.count(func.distinct(T.payment_id)),
+                func.sum(T.amount),
+            ).join(Payment, Payment.id == T.payment_id).outerjoin(
+                ChargeItem, ChargeItem.id == Payment.charge_item_id)
+            query = _transactions_in(query, start, end, operator).group_by(day, op, item).order_by(day, op, item)
+            rows = [
+                {
+                    'day': row[0],
+                    'operator': row[1] or UNKNOWN_OPERATOR,
+                    'item': row[2],
+                    'count': row[3],
+                    'payment_count': row[4],
+                    'amount': row[5] or ZERO,
+                }
+                for row in query
+            ]
+        finally:
+            if close_db:
+                db.close()
+
+        def subtotal(key):
+            groups = {}
+            for row in rows:
+                group = groups.setdefault(row[key], {key: row[key], 'count': 0, 'amount': ZERO})
+                group['count'] += row['count']
+                group['amount'] += row['amount']
+            return [groups[k] for k in sorted(groups)]
+
+        return {
+            'start': start.strftime('%Y-%m-%d'),
+            'end': (end - timedelta(days=1)).strftime('%Y-%m-%d'),
+            'rows': rows,
+            'by_day': subtotal('day'),
+            'by_operator': subtotal('operator'),
+            'total': {'count': sum(r['count'] for r in rows), 'amount': sum((r['amount'] for r in rows), ZERO)},
+        }
+
+    @staticmethod
+    def get_closeout_details(start_date, end_date=None, operator: str = None, after=None,
+                             limit: int = DETAIL_PAGE_SIZE, db: Session = None):
+        """区间内的收款明细，按 (收款时间, 流水ID) 排序分页
+
+        Args:
+            after: 上一页最后一行的 (paid_time, id)，第一页为 None
+
+        Returns:
+            list[dict]: 每行 {'id', 'paid_time', 'operator', 'room_no', 'name', 'item', 'period', 'amount'}
+        """
+        start, end = day_range(start_date, end_date)
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            T = PaymentTransaction
+            query = db.query(
+                T.id, T.paid_time, T.operator, Resident.room_no, Resident.name, ChargeItem.name, Payment.period,
+                T.amount,
+            ).join(Payment, Payment.id == T.payment_id).outerjoin(
+                Resident, Resident.id == Payment.resident_id).outerjoin(
+                ChargeItem, ChargeItem.id == Payment.charge_item_id)
+            query = _transactions_in(query, start, end, operator)
+            if after:
+                after_time, after_id = after
+                query = query.filter(or_(T.paid_time > after_time, and_(T.paid_time == after_time, T.id > after_id)))
+            query = query.order_by(T.paid_time, T.id).limit(int(limit))
+            return [
+                {
+                    'id': row[0],
+                    'paid_time': row[1],
+                    'operator': row[2] or UNKNOWN_OPERATOR,
+                    'room_no': row[3] or '',
+                    'name': row[4] or '',
+                    'item': row[5] or '未知',
+                    'period': row[6],
+                    'amount': row[7] or ZERO,
+                }
+                for row in query
+            ]
+        finally:
+            if close_db:
+                db.close()
+
+    @staticmethod
+    def get_reconciliation(start_date, end_date=None, db: Session = None):
+        """核对区间内有收款的账单：payments.paid_amount 与该账单全部流水之和是否一致
+
+        Returns:
+            dict: {'checked': 核对的账单数, 'mismatches': [{'payment_id', 'room_no', 'name', 'item',
+                   'period', 'paid_amount', 'transaction_total', 'difference'}, ...]}
+        """
+        start, end = day_range(start_date, end_date)
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            T = PaymentTransaction
+            touched = _transactions_in(db.query(T.payment_id), start, end).distinct().subquery()
+            totals = db.query(
+                T.payment_id.label('payment_id'),
+                func.sum(T.amount).label('total'),
+            ).filter(T.payment_id.in_(db.query(touched.c.payment_id))).group_by(T.payment_id).subquery()
+            paid = func.coalesce(Payment.paid_amount, 0)
+            query = db.query(
+                Payment.id, Resident.room_no, Resident.name, ChargeItem.name, Payment.period,
+                Payment.paid_amount, totals.c.total,
+            ).join(totals, totals.c.payment_id == Payment.id).outerjoin(
+                Resident, Resident.id == Payment.resident_id).outerjoin(
+                ChargeItem, ChargeItem.id == Payment.charge_item_id)
+            checked = db.query(func.count()).select_from(totals).scalar() or 0
+            mismatches = []
+            for row in query.filter(paid != totals.c.total).order_by(Payment.id):
+                paid_amount = row[5] or ZERO
+                total = row[6] or ZERO
+                mismatches.append({
+                    'payment_id': row[0],
+                    'room_no': row[1] or '',
+                    'name': row[2] or '',
+                    'item': row[3] or '未知',
+                    'period': row[4],
+                    'paid_amount': paid_amount,
+                    'transaction_total': total,
+                    'difference': paid_amount - total,
+                })
+            return {'checked': checked, 'mismatches': mismatches}
+        finally:
+            if close_db:
+                db.close()
@@ -0,0 +1,146 @@
+"""
+多小区汇总统计
+
+把各小区的数据库文件 ATTACH 到同一个连接上，用一条 UNION ALL 查询一次算出每个小区的数字，
+不需要逐个打开数据库、也不需要手工合并各小区导出的 Excel。
+SQLite 默认最多同时附加 10 个数据库，小区更多时按 10 个一组分批查询再合并。
+"""
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from models.database import load_estates, init_db
+from utils.money import Money
+from utils.profiler import profiler, profile_service
+
+# SQLITE_MAX_ATTACHED 的默认值
+MAX_ATTACHED = 10
+
+_report_engine = None
+
+
+def _get_report_engine():
+    """汇总用的内存库引擎：每次连接都是新的空库，只用来附加各小区数据库"""
+    global _report_engine
+    if _report_engine is None:
+        _report_engine = create_engine('sqlite://', poolclass=NullPool)
+        profiler.install(_report_engine)
+    return _report_engine
+
+
+def _select_estates(estate_keys=None):
+    estates = load_estates()
+    if estate_keys is not None:
+        wanted = list(estate_keys)
+        estates = [e for e in estates if e.key in wanted]
+        missing = set(wanted) - {e.key for e in estates}
+        if missing:
+            raise ValueError(f"小区不存在：{', '.join(sorted(missing))}")
+    for estate in estates:
+        if not os.path.exists(estate.db_path):
+            raise ValueError(f"小区 {estate.name} 的数据库文件不存在：{estate.db_path}")
+    return estates
+
+
+@contextmanager
+def _attached(estates):
+    """附加一组小区数据库，返回 (连接, [(别名, 小区), ...])；附加前先把各库迁移到最新结构"""
+    for estate in estates:
+        init_db(estate.db_path)
+    with _get_report_engine().connect() as conn:
+        aliases = []
+        for i, estate in enumerate(estates):
+            alias = f'estate_{i}'
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {alias}", (estate.db_path,))
+            aliases.append((alias, estate))
+        try:
+            yield conn, aliases
+        finally:
+            for alias, _ in aliases:
+                conn.exec_driver_sql(f"DETACH DATABASE {alias}")
+
+
+def _union_query(estates, build_select, params_per_estate, order_by):
+    """对每组附加的小区执行一条 UNION ALL 查询，返回 (小区, 行) 列表"""
+    results = []
+    for start in range(0, len(estates), MAX_ATTACHED):
+        with _attached(estates[start:start + MAX_ATTACHED]) as (conn, aliases):
+            sql = ' UNION ALL '.join(build_select(alias, i) for i, (alias, _) in enumerate(aliases))
+            params = tuple(p for _ in aliases for p in params_per_estate)
+            by_index = {i: estate for i, (_, estate) in enumerate(aliases)}
+            for row in conn.exec_driver_sql(f"SELECT * FROM ({sql}) ORDER BY {order_by}", params):
+                results.append((by_index[row[0]], row[1:]))
+    return results
+
+
+@profile_service
+class EstateReportService:
+    """多小区汇总统计服务类"""
+
+    @staticmethod
+    def get_statistics_by_period(period: str, estate_keys=None):
+        """各小区某周期的账单统计及合计
+
+        Returns:
+            dict: {'period', 'estates': [{'estate', 'name', 'total_count', 'paid_count', 'unpaid_count',
+                   'total_amount', 'paid_amount', 'unpaid_amount'}, ...], 'total': {...}}
+        """
+        estates = _select_estates(estate_keys)
+
+        def build_select(alias, i):
+            return (f"SELECT {i} AS idx, COUNT(id), COALESCE(SUM(paid = 1), 0), "
+                    f"COALESCE(SUM(amount), 0), COALESCE(SUM(CASE WHEN paid = 1 THEN amount ELSE 0 END), 0) "
+                    f"FROM {alias}.payments WHERE period = ?")
+
+        rows = []
+        for estate, (count, paid_count, total, paid) in _union_query(estates, build_select, (period,), 'idx'):
+            rows.append(_stat_row(estate.key, estate.name, count, paid_count, total, paid))
+        total = _stat_row('', '合计', sum(r['total_count'] for r in rows), sum(r['paid_count'] for r in rows),
+                          sum(r['total_amount'].fen for r in rows), sum(r['paid_amount'].fen for r in rows))
+        return {'period': period, 'estates': rows, 'total': total}
+
+    @staticmethod
+    def get_item_breakdown(period: str, estate_keys=None):
+        """各小区某周期按收费项目汇总（金额按整数分求和）
+
+        Returns:
+            list[dict]: [{'estate', 'name', 'item', 'count', 'paid_count', 'total', 'paid_amount'}, ...]
+        """
+        estates = _select_estates(estate_keys)
+
+        def build_select(alias, i):
+            return (f"SELECT {i} AS idx, COALESCE(c.name, '未知') AS item, COUNT(p.id), "
+                    f"COALESCE(SUM(p.paid = 1), 0), COALESCE(SUM(p.amount), 0), COALESCE(SUM(p.paid_amount), 0) "
+                    f"FROM {alias}.payments p LEFT JOIN {alias}.charge_items c ON c.id = p.charge_item_id "
+                    f"WHERE p.period = ? GROUP BY c.name")
+
+        return [
+            {
+                'estate': estate.key,
+                'name': estate.name,
+                'item': item,
+                'count': count,
+                'paid_count': paid_count,
+                'total': Money.from_fen(total),
+                'paid_amount': Money.from_fen(paid_amount),
+            }
+            for estate, (item, count, paid_count, total, paid_amount)
+            in _union_query(estates, build_select, (period,), 'idx, item')
+        ]
+
+
+def _stat_row(key, name, count, paid_count, total_fen, paid_fen):
+    total_amount = Money.from_fen(total_fen)
+    paid_amount = Money.from_fen(paid_fen)
+    return {
+        'estate': key,
+        'name': name,
+        'total_count': count,
+        'paid_count': paid_count,
+        'unpaid_count': count - paid_count,
+        'total_amount': total_amount,
+        'paid_amount': paid_amount,
+        'unpaid_amount': total_amount - paid_amount,
+    }
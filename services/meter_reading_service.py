@@ -0,0 +1,416 @@
+"""
+抄表与按量出账服务
+
+导入：逐行流式读取 Excel(.xlsx) 或 CSV，按 (住户, 收费项目, 表号, 周期) 批量 upsert 抄表记录，
+      未提供上期读数的记录用一条 UPDATE 从上一周期的本期读数补齐。
+出账：用一条 GROUP BY 查询在数据库中算出每户用量，编译收费规则后一次算出全部金额，
+      在同一个事务中批量插入账单并回写抄表记录的 payment_id。
+"""
+import os
+import re
+import csv
+from datetime import datetime, timedelta
+
+from sqlalchemy import text, func, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal, chunked
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from models.meter_reading import MeterReading
+from services.tariff import compile_tariff, KIND_USAGE
+from utils.logger import logger
+from utils.profiler import profile_service
+from services.write_executor import serialize_writes
+
+
+# 每批 upsert 的行数
+IMPORT_CHUNK_SIZE = 500
+
+TEMPLATE_HEADERS = ['楼栋', '单元', '房号', '表号', '本期读数', '上期读数(可选)', '抄表日期(可选)']
+
+
+def _check_period(period):
+    if not period or not re.match(r'^\d{4}-\d{2}$', str(period)):
+        raise ValueError("周期格式应为 YYYY-MM")
+
+
+def _period_range(period):
+    """周期对应的计费起止日期（当月第一天到最后一天）"""
+    year, month = map(int, period.split('-'))
+    start = datetime(year, month, 1)
+    if month == 12:
+        end = datetime(year + 1, 1, 1) - timedelta(days=1)
+    else:
+        end = datetime(year, month + 1, 1) - timedelta(days=1)
+    return start, end
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _parse_number(value):
+    if value is None or value == '':
+        return None
+    return round(float(str(value).strip().replace(',', '')), 2)
+
+
+def _parse_date(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    text_value = str(value).strip()
+    for fmt in ('%Y-%m-%d', '%Y/%m/%d', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M'):
+        try:
+            return datetime.strptime(text_value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"无法识别的抄表日期：{text_value}")
+
+
+def _detect_csv_encoding(file_path):
+    with open(file_path, 'rb') as f:
+        head = f.read(64 * 1024)
+    try:
+        head.decode('utf-8')
+        return 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # 截断在多字节字符中间时仍视为 UTF-8
+        if e.start >= len(head) - 3:
+            return 'utf-8-sig'
+        return 'gbk'
+
+
+def iter_reading_rows(file_path):
+    """流式读取抄表文件（跳过标题行），逐行返回 (行号, 行数据元组)"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.csv':
+        with open(file_path, 'r', encoding=_detect_csv_encoding(file_path), newline='') as f:
+            for row_idx, row in enumerate(csv.reader(f), start=1):
+                if row_idx == 1:
+                    continue
+                yield row_idx, tuple(row)
+        return
+
+    import openpyxl
+    # read_only 模式按行流式解析，不把整个工作表载入内存
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        for row_idx, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
+            yield row_idx, row
+    finally:
+        workbook.close()
+
+
+@serialize_writes
+@profile_service
+class MeterReadingService:
+    """抄表与按量出账服务类"""
+
+    @staticmethod
+    def import_readings(file_path: str, charge_item_id: int, period: str, operator: str = '', db: Session = None):
+        """从 Excel/CSV 导入抄表数据
+
+        列顺序：楼栋、单元、房号、表号、本期读数[、上期读数、抄表日期]
+
+        Returns:
+            tuple: (成功数量, 失败数量, 错误列表)
+        """
+        _check_period(period)
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            if not db.query(ChargeItem.id).filter(ChargeItem.id == charge_item_id).first():
+                raise ValueError("收费项目不存在")
+
+            # 一次取出住户索引和本期已出账的表，避免逐行查询
+            residents = {
+                ((b or ''), (u or ''), r): rid
+                for rid, b, u, r in db.query(Resident.id, Resident.building, Resident.unit, Resident.room_no)
+            }
+            billed = set(
+                db.query(MeterReading.resident_id, MeterReading.meter_no)
+                .filter(MeterReading.charge_item_id == charge_item_id,
+                        MeterReading.period == period,
+                        MeterReading.payment_id.isnot(None))
+            )
+
+            success_count = 0
+            fail_count = 0
+            errors = []
+            chunk = []
+            now = datetime.now()
+
+            for row_idx, row in iter_reading_rows(file_path):
+                if not row or not any(_cell_text(v) for v in row):
+                    continue
+                try:
+                    cells = list(row) + [None] * (len(TEMPLATE_HEADERS) - len(row))
+                    building, unit, room_no, meter_no = (_cell_text(v) for v in cells[:4])
+                    if not room_no:
+                        raise ValueError("房号为空")
+                    resident_id = residents.get((building, unit, room_no))
+                    if resident_id is None:
+                        raise ValueError(f"住户 {building}-{unit}-{room_no} 不存在")
+                    current_value = _parse_number(cells[4])
+                    if current_value is None:
+                        raise ValueError("本期读数为空")
+                    previous_value = _parse_number(cells[5])
+                    if previous_value is not None and current_value < previous_value:
+                        raise ValueError(f"本期读数 {current_value} 小于上期读数 {previous_value}")
+                    if (resident_id, meter_no) in billed:
+                        raise ValueError("该表本期已出账，不能修改读数")
+
+                    chunk.append({
+                        'resident_id': resident_id,
+                        'charge_item_id': charge_item_id,
+                        'meter_no': meter_no,
+                        'period': period,
+                        'previous_value': previous_value,
+                        'current_value': current_value,
+                        'read_at': _parse_date(cells[6]) or now,
+                        'operator': operator or None,
+                    })
+                    success_count += 1
+                except ValueError as e:
+                    fail_count += 1
+                    errors.append(f"第{row_idx}行：{str(e)}")
+                except Exception as e:
+                    fail_count += 1
+                    errors.append(f"第{row_idx}行：导入失败 - {str(e)}")
+
+                if len(chunk) >= IMPORT_CHUNK_SIZE:
+                    MeterReadingService._upsert(db, chunk)
+                    chunk = []
+            if chunk:
+                MeterReadingService._upsert(db, chunk)
+
+            MeterReadingService._fill_previous_values(db, charge_item_id, period)
+            db.commit()
+            logger.log('INFO', 'METER_READINGS_IMPORTED', os.path.basename(file_path),
+                       charge_item_id=charge_item_id, period=period,
+                       success=success_count, failed=fail_count)
+            return success_count, fail_count, errors
+        except Exception as e:
+            db.rollback()
+            if isinstance(e, ValueError):
+                raise
+            raise Exception(f"导入抄表数据失败：{str(e)}")
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def _upsert(db, rows):
+        """按唯一键 (住户, 收费项目, 表号, 周期) 批量插入或更新抄表记录"""
+        table = MeterReading.__table__
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['resident_id', 'charge_item_id', 'meter_no', 'period'],
+            set_={
+                'current_value': stmt.excluded.current_value,
+                'previous_value': func.coalesce(stmt.excluded.previous_value, table.c.previous_value),
+                'read_at': stmt.excluded.read_at,
+                'operator': stmt.excluded.operator,
+            },
+            where=table.c.payment_id.is_(None),
+        )
+        db.execute(stmt, rows)
+
+    @staticmethod
+    def _fill_previous_values(db, charge_item_id, period):
+        """未填上期读数的记录，取同一块表上一个周期的本期读数"""
+        db.execute(text("""
+            UPDATE meter_readings
+            SET previous_value = (
+                SELECT p.current_value FROM meter_readings p
+                WHERE p.resident_id = meter_readings.resident_id
+                  AND p.charge_item_id = meter_readings.charge_item_id
+                  AND p.meter_no = meter_readings.meter_no
+                  AND p.period < meter_readings.period
+                ORDER BY p.period DESC
+                LIMIT 1
+            )
+            WHERE charge_item_id = :item_id AND period = :period AND previous_value IS NULL
+        """), {'item_id': charge_item_id, 'period': period})
+
+    @staticmethod
+    def get_readings_by_period(charge_item_id: int, period: str, db: Session = None):
+        """获取某收费项目某周期的抄表记录（按房号排序）
+
+        Returns:
+            list[dict]: 每条包含 id、room、resident_name、meter_no、previous_value、current_value、usage、payment_id
+        """
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            rows = (
+                db.query(MeterReading, Resident)
+                .join(Resident, Resident.id == MeterReading.resident_id)
+                .filter(MeterReading.charge_item_id == charge_item_id, MeterReading.period == period)
+                .order_by(Resident.building, Resident.unit, Resident.room_no, MeterReading.meter_no)
+                .all()
+            )
+            result = []
+            for reading, resident in rows:
+                usage = reading.usage
+                result.append({
+                    'id': reading.id,
+                    'room': resident.full_room_no,
+                    'resident_name': resident.name,
+                    'meter_no': reading.meter_no or '',
+                    'previous_value': float(reading.previous_value) if reading.previous_value is not None else None,
+                    'current_value': float(reading.current_value),
+                    'usage': float(usage) if usage is not None else None,
+                    'payment_id': reading.payment_id,
+                })
+            return result
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def run_billing(charge_item_id: int, period: str, billing_start_date=None, billing_end_date=None,
+                    db: Session = None):
+        """按抄表用量为某周期批量生成账单（单个事务）
+
+        同一住户多块表的用量合并为一张账单；缺少上期读数、用量为负或该住户本期已有此项账单的跳过。
+        住户只要有一块表缺少上期读数就整户跳过（列入 skipped_incomplete），不按部分表出账。
+
+        Returns:
+            dict: {'created', 'total_amount', 'skipped_no_previous', 'skipped_existing', 'skipped_negative',
+                   'skipped_incomplete'}
+        """
+        _check_period(period)
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            charge_item = db.query(ChargeItem).filter(ChargeItem.id == charge_item_id).first()
+            if not charge_item:
+                raise ValueError("收费项目不存在")
+            tariff = compile_tariff(charge_item)
+            if tariff.charge_type != 'fixed' or tariff.kind != KIND_USAGE:
+                raise ValueError("该收费项目不是按用量（度）计费，不能按抄表出账")
+
+            if billing_start_date is None or billing_end_date is None:
+                billing_start_date, billing_end_date = _period_range(period)
+
+            params = {'item_id': charge_item_id, 'period': period}
+            rows = db.execute(text("""
+                SELECT r.resident_id,
+                       ROUND(SUM(r.current_value - r.previous_value), 2) AS usage,
+                       MIN(r.current_value - r.previous_value) AS min_delta,
+                       COUNT(*) - COUNT(r.previous_value) AS missing
+                FROM meter_readings r
+                WHERE r.charge_item_id = :item_id AND r.period = :period
+                  AND r.payment_id IS NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM payments p
+                      WHERE p.resident_id = r.resident_id
+                        AND p.charge_item_id = r.charge_item_id
+                        AND p.period = r.period
+                  )
+                GROUP BY r.resident_id
+            """), params).fetchall()
+            skipped_no_previous = db.execute(text("""
+                SELECT COUNT(*) FROM meter_readings
+                WHERE charge_item_id = :item_id AND period = :period
+                  AND payment_id IS NULL AND previous_value IS NULL
+            """), params).scalar()
+            skipped_existing = db.execute(text("""
+                SELECT COUNT(DISTINCT r.resident_id) FROM meter_readings r
+                JOIN payments p ON p.resident_id = r.resident_id
+                     AND p.charge_item_id = r.charge_item_id AND p.period = r.period
+                WHERE r.charge_item_id = :item_id AND r.period = :period AND r.payment_id IS NULL
+            """), params).scalar()
+
+            incomplete = [row.resident_id for row in rows if row.missing]
+            rows = [row for row in rows if not row.missing]
+            negative = [row.resident_id for row in rows if row.min_delta < 0]
+            rows = [row for row in rows if row.min_delta >= 0]
+            amounts = tariff.price_batch(usages=[row.usage for row in rows], count=len(rows))
+
+            if rows:
+                db.execute(Payment.__table__.insert(), [
+                    {
+                        'resident_id': row.resident_id,
+                        'charge_item_id': charge_item_id,
+                        'period': period,
+                        'billing_start_date': billing_start_date,
+                        'billing_end_date': billing_end_date,
+                        'billing_months': 1,
+                        'paid_months': 0,
+                        'amount': amount,
+                        'paid_amount': 0,
+                        'paid': 0,
+                        'usage': row.usage,
+                    }
+                    for row, amount in zip(rows, amounts)
+                ])
+                # 回写抄表记录与账单的关联，只关联本次出账的住户
+                link = text("""
+                    UPDATE meter_readings
+                    SET payment_id = (
+                        SELECT p.id FROM payments p
+                        WHERE p.resident_id = meter_readings.resident_id
+                          AND p.charge_item_id = meter_readings.charge_item_id
+                          AND p.period = meter_readings.period
+                        ORDER BY p.id DESC
+                        LIMIT 1
+                    )
+                    WHERE charge_item_id = :item_id AND period = :period
+                      AND payment_id IS NULL AND resident_id IN :resident_ids
+                """).bindparams(bindparam('resident_ids', expanding=True))
+                for chunk in chunked(row.resident_id for row in rows):
+                    db.execute(link, dict(params, resident_ids=chunk))
+            db.commit()
+
+            summary = {
+                'created': len(rows),
+                'total_amount': sum(amounts),
+                'skipped_no_previous': skipped_no_previous or 0,
+                'skipped_existing': skipped_existing or 0,
+                'skipped_negative': negative,
+                'skipped_incomplete': incomplete,
+            }
+            logger.log('INFO', 'METER_BILLING_RUN', '', charge_item_id=charge_item_id, period=period,
+                       created=summary['created'], total_amount=summary['total_amount'],
+                       skipped_no_previous=summary['skipped_no_previous'],
+                       skipped_existing=summary['skipped_existing'],
+                       skipped_negative=len(negative), skipped_incomplete=len(incomplete))
+            return summary
+        except Exception as e:
+            db.rollback()
+            logger.log_error(e, f"METER_BILLING_RUN_FAILED: charge_item_id={charge_item_id}, period={period}")
+            raise
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def create_reading_template(file_path):
+        """创建抄表数据导入模板"""
+        import openpyxl
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = '抄表数据'
+        sheet.append(TEMPLATE_HEADERS)
+        sheet.append(['1', '1', '101', '', 1234.5, '', datetime.now().strftime('%Y-%m-%d')])
+        for col, width in zip('ABCDEFG', (8, 8, 10, 12, 12, 16, 16)):
+            sheet.column_dimensions[col].width = width
+        workbook.save(file_path)
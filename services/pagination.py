@@ -0,0 +1,83 @@
+"""
+键集分页（keyset pagination）
+
+列表接口原来一次 .all() 取回全部结果，历史越多，第一行出现得越慢、占的内存越多。
+分页接口按固定的排序键（最后一列为 ID，保证唯一）每次取一页，下一页用上一页最后一行的键值作游标，
+直接从索引上的该位置继续读，不用 OFFSET 跳过前面的行，翻到第几页耗时都一样。
+
+    page = keyset_page(query, Payment, PAYMENT_PAGE_KEYS, after=None, limit=200)
+    page['items']    # 本页对象
+    page['cursor']   # 下一页游标（元组），没有下一页时为 None
+"""
+from sqlalchemy import DateTime, String, and_, or_, false, type_coerce
+
+# 每页默认条数
+DEFAULT_PAGE_SIZE = 200
+# 单页最多条数
+MAX_PAGE_SIZE = 5000
+
+
+def _raw(column):
+    """排序键按库中保存的原值比较：SQLite 的时间是文本，datetime('now') 写入的没有微秒，
+    转成 Python datetime 再作为参数绑定回去会补上 .000000，比较结果就不对了"""
+    if isinstance(column.type, DateTime):
+        return type_coerce(column, String)
+    return column
+
+
+def _after(column, value, descending):
+    """排在 value 之后的行（SQLite 中 NULL 最小：升序排最前，降序排最后）"""
+    if value is None:
+        return false() if descending else column.isnot(None)
+    if descending:
+        return or_(column < value, column.is_(None))
+    return column > value
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def keyset_filter(columns, after):
+    """游标 after 之后的行的过滤条件；columns 为 [(列, 是否降序), ...]，与 ORDER BY 一致"""
+    clauses = []
+    for i, (column, descending) in enumerate(columns):
+        prefix = [_equal(c, v) for (c, _), v in zip(columns[:i], after[:i])]
+        clauses.append(and_(*(prefix + [_after(column, after[i], descending)])))
+    condition = or_(*clauses)
+    # 第一列（非空列）额外给出范围，SQLite 可以直接在索引上定位到游标位置
+    first, descending = columns[0]
+    if after[0] is not None:
+        condition = and_(first <= after[0] if descending else first >= after[0], condition)
+    return condition
+
+
+def keyset_page(query, entity, keys, after=None, limit=DEFAULT_PAGE_SIZE):
+    """按 keys 排序取一页
+
+    Args:
+        query: 已加好过滤条件、未排序的查询（查询的是 entity）
+        entity: 模型或别名实体
+        keys: [(属性名, 是否降序), ...]，第一列须为非空列，最后一列须唯一（通常为 id）
+        after: 上一页返回的 cursor，第一页为 None
+        limit: 每页条数
+
+    Returns:
+        dict: {'items': [...], 'cursor': 下一页游标或 None}
+    """
+    limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    columns = [(_raw(getattr(entity, name)), descending) for name, descending in keys]
+    if after is not None:
+        if len(after) != len(keys):
+            raise ValueError('分页游标无效')
+        query = query.filter(keyset_filter(columns, list(after)))
+    # 同时查出各排序键的原值作为游标
+    query = query.add_columns(*[column for column, _ in columns]).order_by(
+        *[column.desc() if descending else column.asc() for column, descending in columns])
+    # 多取一行判断是否还有下一页
+    rows = query.limit(limit + 1).all()
+    cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        cursor = tuple(rows[-1][1:])
+    return {'items': [row[0] for row in rows], 'cursor': cursor}
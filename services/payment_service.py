@@ -3,64 +3,206 @@
 """
 from datetime import datetime
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, case, cast, Integer
+from sqlalchemy.exc import IntegrityError
 from models.payment import Payment
 from models.resident import Resident
 from models.charge_item import ChargeItem
-from models.database import SessionLocal
+from models.archived_period import ArchivedPeriod
+from models.database import SessionLocal, chunked
 from decimal import Decimal, ROUND_HALF_UP
 from utils.logger import logger
+from utils.money import Money, ZERO
+from utils.profiler import profile_service
+from services.write_executor import serialize_writes
+from services.archive_service import attached_archive, archive_union
+from services.pagination import keyset_page, DEFAULT_PAGE_SIZE
 
+# 分期缴费金额取整到元
+_YUAN = Decimal(1)
 
+# 缴费记录分页的排序键：(周期, 创建时间, ID) 倒序，与 get_all_payments 的顺序一致
+PAYMENT_PAGE_KEYS = (('period', True), ('created_at', True), ('id', True))
+# 单个周期内未缴的排在前面，与 get_payments_by_period 的顺序一致
+PERIOD_PAGE_KEYS = (('period', True), ('paid', False), ('created_at', True), ('id', True))
+
+
+def _billing_months(start_date, end_date, billing_months):
+    """按开始/结束日期计算计费月数（日期缺失时使用传入的月数）"""
+    if not start_date or not end_date:
+        return billing_months if billing_months and billing_months > 0 else 1
+    years = end_date.year - start_date.year
+    months = years * 12 + (end_date.month - start_date.month)
+    if end_date.day >= start_date.day:
+        months += 1
+    return months if months > 0 else 1
+
+
+def _search_filter(query, P, keyword):
+    """按关键词过滤缴费记录查询（房号、姓名、电话、收费项目）
+
+    支持输入格式： "building-unit-room" 或 "unit-room" 或普通关键字
+    """
+    import re
+    parts = re.findall(r'\d+', keyword)
+    query = query.join(P.resident).join(P.charge_item)
+    if len(parts) == 3:
+        b, u, rno = parts
+        return query.filter(
+            (Resident.building == str(b)) &
+            (Resident.unit == str(u)) &
+            (Resident.room_no.like(f"%{rno}%"))
+        )
+    if len(parts) == 2:
+        a, b = parts
+        # treat as unit-room or building-room depending on data; try both
+        return query.filter(
+            ((Resident.unit == str(a)) & (Resident.room_no.like(f"%{b}%"))) |
+            ((Resident.building == str(a)) & (Resident.room_no.like(f"%{b}%")))
+        )
+    keyword_like = f"%{keyword}%"
+    return query.filter(
+        (Resident.room_no.like(keyword_like)) |
+        (Resident.name.like(keyword_like)) |
+        (Resident.phone.like(keyword_like)) |
+        (ChargeItem.name.like(keyword_like))
+    )
+
+
+@serialize_writes
+@profile_service
 class PaymentService:
     """缴费管理服务类"""
     
     @staticmethod
-    def get_all_payments(db: Session = None):
-        """获取所有缴费记录"""
+    def get_all_payments(db: Session = None, include_archive: bool = False):
+        """获取所有缴费记录（include_archive 为 True 时包含归档库中的历史账单）"""
         if db is None:
             db = SessionLocal()
         try:
-            # 使用joinedload预加载关联对象，避免DetachedInstanceError
-            return db.query(Payment).options(
-                joinedload(Payment.resident),
-                joinedload(Payment.charge_item)
-            ).order_by(Payment.period.desc(), Payment.created_at.desc()).all()
+            with attached_archive(db, include_archive) as archived:
+                P = archive_union(Payment) if archived else Payment
+                # 使用joinedload预加载关联对象，避免DetachedInstanceError
+                return db.query(P).options(
+                    joinedload(P.resident),
+                    joinedload(P.charge_item)
+                ).order_by(P.period.desc(), P.created_at.desc()).all()
         finally:
             if db is not None:
                 db.close()
     
     @staticmethod
-    def get_payment_by_id(payment_id: int, db: Session = None):
+    def get_payment_by_id(payment_id: int, db: Session = None, include_archive: bool = False):
         """根据ID获取缴费记录"""
         if db is None:
             db = SessionLocal()
         try:
-            # 使用joinedload预加载关联对象，避免DetachedInstanceError
-            return db.query(Payment).options(
-                joinedload(Payment.resident),
-                joinedload(Payment.charge_item)
-            ).filter(Payment.id == payment_id).first()
+            with attached_archive(db, include_archive) as archived:
+                P = archive_union(Payment) if archived else Payment
+                # 使用joinedload预加载关联对象，避免DetachedInstanceError
+                return db.query(P).options(
+                    joinedload(P.resident),
+                    joinedload(P.charge_item)
+                ).filter(P.id == payment_id).first()
         finally:
             if db is not None:
                 db.close()
     
     @staticmethod
-    def get_payments_by_period(period: str, db: Session = None):
+    def get_payments_by_ids(payment_ids, db: Session = None, include_archive: bool = False):
+        """按ID批量获取缴费记录（一条查询，已预加载住户和收费项目），按传入顺序返回，不存在的ID跳过"""
+        ids = list(dict.fromkeys(payment_ids or []))
+        if not ids:
+            return []
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            with attached_archive(db, include_archive) as archived:
+                P = archive_union(Payment) if archived else Payment
+                found = {}
+                # ID 超过 SQLite 参数上限时才会分多次查询
+                for chunk in chunked(ids):
+                    for payment in db.query(P).options(
+                        joinedload(P.resident),
+                        joinedload(P.charge_item)
+                    ).filter(P.id.in_(chunk)).all():
+                        found[payment.id] = payment
+                return [found[pid] for pid in ids if pid in found]
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def get_payments_page(period: str = None, resident_id: int = None, after=None, limit: int = DEFAULT_PAGE_SIZE,
+                          db: Session = None, include_archive: bool = False):
+        """分页获取缴费记录（可按周期、住户过滤），每次只取一页
+
+        不指定周期时按 (周期, 创建时间, ID) 倒序；指定周期时与 get_payments_by_period 一样未缴的在前。
+
+        Args:
+            after: 上一页返回的 cursor，第一页为 None
+            limit: 每页条数
+
+        Returns:
+            dict: {'items': [缴费记录], 'cursor': 下一页游标，没有下一页时为 None}
+        """
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            with attached_archive(db, include_archive) as archived:
+                P = archive_union(Payment) if archived else Payment
+                query = db.query(P).options(
+                    joinedload(P.resident),
+                    joinedload(P.charge_item)
+                )
+                if period:
+                    query = query.filter(P.period == period)
+                if resident_id is not None:
+                    query = query.filter(P.resident_id == resident_id)
+                keys = PERIOD_PAGE_KEYS if period else PAYMENT_PAGE_KEYS
+                return keyset_page(query, P, keys, after, limit)
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def get_payments_by_period(period: str, db: Session = None, include_archive: bool = False):
         """根据周期获取缴费记录"""
         if db is None:
             db = SessionLocal()
         try:
-            # 使用joinedload预加载关联对象，避免DetachedInstanceError
-            return db.query(Payment).options(
-                joinedload(Payment.resident),
-                joinedload(Payment.charge_item)
-            ).filter(Payment.period == period).order_by(
-                Payment.paid, Payment.created_at.desc()
-            ).all()
+            with attached_archive(db, include_archive) as archived:
+                P = archive_union(Payment) if archived else Payment
+                # 使用joinedload预加载关联对象，避免DetachedInstanceError
+                return db.query(P).options(
+                    joinedload(P.resident),
+                    joinedload(P.charge_item)
+                ).filter(P.period == period).order_by(
+                    P.paid, P.created_at.desc()
+                ).all()
         finally:
             if db is not None:
                 db.close()
+
+    @staticmethod
+    def get_periods(db: Session = None, include_archive: bool = False):
+        """有账单的周期列表（倒序）；包含归档时从归档汇总表取已归档的周期，不必打开归档库"""
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            periods = {p for (p,) in db.query(Payment.period).distinct()}
+            if include_archive:
+                periods.update(p for (p,) in db.query(ArchivedPeriod.period).distinct())
+            return sorted(periods, reverse=True)
+        finally:
+            if close_db and db is not None:
+                db.close()
     
     @staticmethod
     def get_unpaid_payments_by_period(period: str, db: Session = None):
@@ -80,18 +222,20 @@ class PaymentService:
                 db.close()
     
     @staticmethod
-    def get_payments_by_resident(resident_id: int, db: Session = None):
+    def get_payments_by_resident(resident_id: int, db: Session = None, include_archive: bool = False):
         """根据住户获取缴费记录"""
         if db is None:
             db = SessionLocal()
         try:
-            # 使用joinedload预加载关联对象，避免DetachedInstanceError
-            return db.query(Payment).options(
-                joinedload(Payment.resident),
-                joinedload(Payment.charge_item)
-            ).filter(Payment.resident_id == resident_id).order_by(
-                Payment.period.desc(), Payment.created_at.desc()
-            ).all()
+            with attached_archive(db, include_archive) as archived:
+                P = archive_union(Payment) if archived else Payment
+                # 使用joinedload预加载关联对象，避免DetachedInstanceError
+                return db.query(P).options(
+                    joinedload(P.resident),
+                    joinedload(P.charge_item)
+                ).filter(P.resident_id == resident_id).order_by(
+                    P.period.desc(), P.created_at.desc()
+                ).all()
         finally:
             if db is not None:
                 db.close()
@@ -118,16 +262,7 @@ class PaymentService:
             db = SessionLocal()
         try:
             # 计算并规范化 billing_months，确保与开始/结束日期一致
-            def calc_months(start_date, end_date):
-                if not start_date or not end_date:
-                    return billing_months if billing_months and billing_months > 0 else 1
-                years = end_date.year - start_date.year
-                months = years * 12 + (end_date.month - start_date.month)
-                if end_date.day >= start_date.day:
-                    months += 1
-                return months if months > 0 else 1
-
-            billing_months = calc_months(billing_start_date, billing_end_date)
+            billing_months = _billing_months(billing_start_date, billing_end_date, billing_months)
 
             payment = Payment(
                 resident_id=resident_id,
@@ -150,6 +285,9 @@ class PaymentService:
             _ = payment.charge_item
             logger.log_operation("CREATE_PAYMENT_SUCCESS", f"Created payment id={payment.id}")
             return payment
+        except IntegrityError:
+            db.rollback()
+            raise ValueError(f"该住户在 {period} 周期已有此收费项目的账单")
         except Exception as e:
             logger.log_error(e, f"CREATE_PAYMENT_FAILED: resident_id={resident_id}, charge_item_id={charge_item_id}")
             db.rollback()
@@ -158,6 +296,57 @@ class PaymentService:
             if db is not None:
                 db.close()
     
+    @staticmethod
+    def create_payments_batch(charge_item_id: int, period: str, billing_start_date, billing_end_date,
+                              billing_months: int, amounts: list, db: Session = None):
+        """为多个住户生成同一收费项目、同一周期的账单（一个事务，每户在各自的保存点中插入）
+
+        Args:
+            amounts: [(住户ID, 金额)]
+
+        Returns:
+            list: [(住户ID, 账单ID, 错误信息)]，成功时错误信息为 None，失败时账单ID为 None
+        """
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        months = _billing_months(billing_start_date, billing_end_date, billing_months)
+        results = []
+        try:
+            for resident_id, amount in amounts:
+                payment = Payment(
+                    resident_id=resident_id,
+                    charge_item_id=charge_item_id,
+                    period=period,
+                    billing_start_date=billing_start_date,
+                    billing_end_date=billing_end_date,
+                    billing_months=months,
+                    paid_months=0,
+                    amount=amount,
+                    paid_amount=0,
+                    paid=0
+                )
+                try:
+                    with db.begin_nested():
+                        db.add(payment)
+                    results.append((resident_id, payment.id, None))
+                except IntegrityError:
+                    results.append((resident_id, None, f"该住户在 {period} 周期已有此收费项目的账单"))
+            db.commit()
+            created = sum(1 for _, payment_id, _ in results if payment_id is not None)
+            logger.log_operation("CREATE_PAYMENTS_BATCH",
+                                 f"charge_item_id={charge_item_id}, period={period}, "
+                                 f"created={created}, failed={len(results) - created}")
+            return results
+        except Exception as e:
+            db.rollback()
+            logger.log_error(e, f"CREATE_PAYMENTS_BATCH_FAILED: charge_item_id={charge_item_id}, period={period}")
+            raise
+        finally:
+            if close_db and db is not None:
+                db.close()
+
     @staticmethod
     def update_payment(payment_id: int, resident_id: int = None, charge_item_id: int = None,
                        period: str = None, billing_start_date = None, billing_end_date = None,
@@ -207,6 +396,9 @@ class PaymentService:
             _ = payment.charge_item
             logger.log_operation("UPDATE_PAYMENT_SUCCESS", f"payment_id={payment_id}")
             return payment
+        except IntegrityError:
+            db.rollback()
+            raise ValueError("该住户在此周期已有此收费项目的账单")
         except Exception as e:
             logger.log_error(e, f"UPDATE_PAYMENT_FAILED: payment_id={payment_id}")
             db.rollback()
@@ -248,22 +440,12 @@ class PaymentService:
                 raise ValueError("缴费月数必须大于0")
             
             # 计算本次缴费金额（按比例计算）
-            # 按月分摊并四舍五入到整数元（元）
-            try:
-                monthly_amount_raw = Decimal(str(payment.amount)) / Decimal(str(payment.billing_months))
-            except Exception:
-                monthly_amount_raw = Decimal(str(float(payment.amount) / payment.billing_months))
-            monthly_amount = int(monthly_amount_raw.quantize(0, rounding=ROUND_HALF_UP))
-            paid_amount_this_time = int((monthly_amount_raw * Decimal(str(paid_months))).quantize(0, rounding=ROUND_HALF_UP))
+            paid_amount_this_time = PaymentService.installment_amount(payment, paid_months)
             
             # 更新缴费信息
             payment.paid_months += paid_months
-            # 累加已交金额（保持为数值）
-            try:
-                prev_paid = Decimal(str(payment.paid_amount or 0))
-            except Exception:
-                prev_paid = Decimal(str(float(payment.paid_amount or 0.0)))
-            payment.paid_amount = float((prev_paid + Decimal(str(paid_amount_this_time))))
+            # 累加已交金额（Money 之间相加，按分精确）
+            payment.paid_amount = (payment.paid_amount or ZERO) + paid_amount_this_time
 
             # 记录最近一次缴费时间（即便是部分缴费也记录时间）
             payment.paid_time = datetime.now()
@@ -277,7 +459,8 @@ class PaymentService:
             # 创建流水记录（使用同一 db session）
             try:
                 from services.payment_transaction_service import PaymentTransactionService
-                PaymentTransactionService.create_transaction(payment_id=payment.id, amount=paid_amount_this_time, operator=operator, db=db)
+                PaymentTransactionService.create_transaction(payment_id=payment.id, amount=paid_amount_this_time, operator=operator,
+                                                             paid_time=payment.paid_time, db=db)
             except Exception:
                 # 流水失败不应该阻止主流程，记录但继续
                 import traceback
@@ -296,6 +479,139 @@ class PaymentService:
             if db is not None:
                 db.close()
     
+    @staticmethod
+    def installment_amount(payment, months: int):
+        """按月分摊计算缴纳 months 个月的金额，四舍五入到整数元（返回 Money）"""
+        share = Money(payment.amount or ZERO) * int(months) / int(payment.billing_months)
+        return Money(share.quantize(_YUAN, rounding=ROUND_HALF_UP))
+
+    @staticmethod
+    def collect_payments(resident_id: int, allocations: dict = None, amount: float = None,
+                         operator: str = '', db: Session = None):
+        """一次收取同一住户的多笔账单（单个事务）
+
+        Args:
+            resident_id: 住户ID
+            allocations: {账单ID: 缴费月数}，月数为 None 表示缴清；省略时为该住户全部未缴清账单
+            amount: 实收总额；提供时按计费开始日期从早到晚（先欠先缴）逐笔分配整月，
+                    分配到某笔账单不足缴清时停止，剩余金额作为找零返回
+            operator: 操作员
+
+        Returns:
+            dict: 合并收据所需数据 {'resident_id', 'resident_name', 'room', 'operator', 'paid_time',
+                  'items': [...], 'total', 'received', 'change'}
+        """
+        from models.payment_transaction import PaymentTransaction
+
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            resident = db.query(Resident).filter(Resident.id == resident_id).first()
+            if not resident:
+                raise ValueError("住户不存在")
+
+            query = db.query(Payment).options(joinedload(Payment.charge_item)).filter(
+                Payment.resident_id == resident_id,
+                Payment.paid_months < Payment.billing_months,
+            )
+            if allocations is not None:
+                allocations = {int(pid): months for pid, months in allocations.items()}
+                query = query.filter(Payment.id.in_(list(allocations)))
+            payments = query.order_by(Payment.billing_start_date, Payment.period, Payment.id).all()
+            if allocations is not None:
+                missing = sorted(set(allocations) - {p.id for p in payments})
+                if missing:
+                    raise ValueError(f"账单 {missing} 不存在、已缴清或不属于该住户")
+            if not payments:
+                raise ValueError("该住户没有未缴清的账单")
+
+            budget = Money(amount) if amount is not None else None
+            if budget is not None and budget <= 0:
+                raise ValueError("实收金额必须大于0")
+
+            plan = []
+            for payment in payments:
+                remaining = payment.billing_months - payment.paid_months
+                months = allocations.get(payment.id) if allocations is not None else None
+                if months is None:
+                    months = remaining
+                if months <= 0:
+                    raise ValueError("缴费月数必须大于0")
+                if months > remaining:
+                    raise ValueError(f"缴费月数不能超过剩余未缴费月数（剩余{remaining}月）")
+                if budget is None:
+                    plan.append((payment, months, PaymentService.installment_amount(payment, months)))
+                    continue
+                # 先欠先缴：在余额内尽量多缴，某笔缴不满时后面的账单不再分配
+                wanted = months
+                while months > 0 and PaymentService.installment_amount(payment, months) > budget:
+                    months -= 1
+                if months > 0:
+                    cost = PaymentService.installment_amount(payment, months)
+                    plan.append((payment, months, cost))
+                    budget -= cost
+                if months < wanted:
+                    break
+            if not plan:
+                raise ValueError("实收金额不足以缴纳最早一笔欠费的一个月")
+
+            now = datetime.now()
+            transactions = []
+            for payment, months, cost in plan:
+                payment.paid_months += months
+                payment.paid_amount = (payment.paid_amount or ZERO) + cost
+                payment.paid_time = now
+                if payment.paid_months >= payment.billing_months:
+                    payment.paid = 1
+                payment.operator = operator
+                transactions.append(PaymentTransaction(payment_id=payment.id, amount=cost,
+                                                       paid_time=now, operator=operator))
+            db.add_all(transactions)
+            db.flush()
+
+            total = sum((cost for _, _, cost in plan), ZERO)
+            received = Money(amount) if amount is not None else total
+            receipt = {
+                'resident_id': resident.id,
+                'resident_name': resident.name,
+                'room': resident.full_room_no,
+                'operator': operator,
+                'paid_time': now,
+                'items': [
+                    {
+                        'payment_id': payment.id,
+                        'transaction_id': tx.id,
+                        'charge_item_name': payment.charge_item.name if payment.charge_item else '',
+                        'period': payment.period,
+                        'billing_start_date': payment.billing_start_date,
+                        'billing_end_date': payment.billing_end_date,
+                        'paid_months': months,
+                        'amount': cost,
+                        'remaining_months': payment.billing_months - payment.paid_months,
+                        'settled': payment.paid == 1,
+                    }
+                    for (payment, months, cost), tx in zip(plan, transactions)
+                ],
+                'total': total,
+                'received': received,
+                'change': received - total,
+            }
+            db.commit()
+            logger.log_operation("COLLECT_PAYMENTS",
+                                 f"resident_id={resident_id}, payments={[i['payment_id'] for i in receipt['items']]}, "
+                                 f"total={total}, received={received}")
+            return receipt
+        except Exception as e:
+            db.rollback()
+            if not isinstance(e, ValueError):
+                logger.log_error(e, f"COLLECT_PAYMENTS_FAILED: resident_id={resident_id}")
+            raise
+        finally:
+            if close_db and db is not None:
+                db.close()
+
     @staticmethod
     def mark_unpaid(payment_id: int, db: Session = None):
         """标记为未缴费"""
@@ -330,19 +646,15 @@ class PaymentService:
     @staticmethod
     def delete_payment(payment_id: int, db: Session = None):
         """删除缴费记录"""
-        logger.log_operation("DELETE_PAYMENT_START", f"payment_id={payment_id}")
-
         close_db = False
         if db is None:
             db = SessionLocal()
             close_db = True
 
         try:
-            payment = db.query(Payment).filter(Payment.id == payment_id).first()
-            if not payment:
+            found, _ = PaymentService._delete_payment_rows(db, [payment_id])
+            if not found:
                 raise ValueError("缴费记录不存在")
-
-            db.delete(payment)
             db.commit()
             logger.log_operation("DELETE_PAYMENT_SUCCESS", f"Deleted payment id={payment_id}")
             return True
@@ -356,127 +668,192 @@ class PaymentService:
 
     @staticmethod
     def delete_payments_batch(payment_ids: list, db: Session = None):
-        """批量删除缴费记录（使用单个数据库会话以提高性能和避免死锁）"""
-        logger.log_operation("DELETE_PAYMENTS_BATCH_START", f"payment_ids={payment_ids}")
+        """批量删除缴费记录（按 ID 集合删除流水和账单，单个事务）
 
+        Returns:
+            tuple: (删除数量, [(不存在的ID, 原因), ...])
+        """
         close_db = False
         if db is None:
             db = SessionLocal()
             close_db = True
 
         try:
-            deleted_count = 0
-            failed_deletes = []
-
-            for payment_id in payment_ids:
-                try:
-                    payment = db.query(Payment).filter(Payment.id == payment_id).first()
-                    if payment:
-                        db.delete(payment)
-                        deleted_count += 1
-                        logger.log_operation("DELETE_PAYMENT_BATCH_ITEM_SUCCESS", f"payment_id={payment_id}")
-                    else:
-                        failed_deletes.append((payment_id, "缴费记录不存在"))
-                        logger.log_error(ValueError("缴费记录不存在"), f"DELETE_PAYMENT_BATCH_ITEM_NOT_FOUND: payment_id={payment_id}")
-                except Exception as e:
-                    failed_deletes.append((payment_id, str(e)))
-                    logger.log_error(e, f"DELETE_PAYMENT_BATCH_ITEM_FAILED: payment_id={payment_id}")
-
+            found, not_found = PaymentService._delete_payment_rows(db, payment_ids)
             db.commit()
-            logger.log_operation("DELETE_PAYMENTS_BATCH_SUCCESS", f"deleted={deleted_count}, failed={len(failed_deletes)}")
-            return deleted_count, failed_deletes
+            failed_deletes = [(pid, "缴费记录不存在") for pid in not_found]
+            logger.log_operation("DELETE_PAYMENTS_BATCH",
+                                 f"requested={len(found) + len(not_found)}, deleted={len(found)}, not_found={not_found}")
+            return len(found), failed_deletes
 
         except Exception as e:
-            logger.log_error(e, "DELETE_PAYMENTS_BATCH_FAILED")
+            logger.log_error(e, f"DELETE_PAYMENTS_BATCH_FAILED: count={len(payment_ids)}")
             db.rollback()
             raise e
         finally:
             if close_db and db is not None:
                 db.close()
-    
+
     @staticmethod
-    def search_payments(keyword: str, period: str = None, db: Session = None):
+    def _delete_payment_rows(db: Session, payment_ids):
+        """删除一组账单及其流水（不提交），抄表记录解除关联以便重新出账
+
+        Returns:
+            tuple: (存在并已删除的ID列表, 不存在的ID列表)
+        """
+        from models.payment_transaction import PaymentTransaction
+        from models.meter_reading import MeterReading
+
+        ids = list(dict.fromkeys(int(pid) for pid in payment_ids))
+        found = set()
+        for chunk in chunked(ids):
+            found.update(pid for (pid,) in db.query(Payment.id).filter(Payment.id.in_(chunk)))
+        found_ids = [pid for pid in ids if pid in found]
+        not_found = [pid for pid in ids if pid not in found]
+
+        for chunk in chunked(found_ids):
+            db.query(PaymentTransaction).filter(
+                PaymentTransaction.payment_id.in_(chunk)).delete(synchronize_session=False)
+            db.query(MeterReading).filter(
+                MeterReading.payment_id.in_(chunk)).update({MeterReading.payment_id: None}, synchronize_session=False)
+            db.query(Payment).filter(Payment.id.in_(chunk)).delete(synchronize_session=False)
+        return found_ids, not_found
+
+    @staticmethod
+    def search_payments(keyword: str, period: str = None, db: Session = None, include_archive: bool = False):
         """搜索缴费记录（按房号、姓名、收费项目）"""
         if db is None:
             db = SessionLocal()
         try:
-            query = db.query(Payment).options(
-                joinedload(Payment.resident),
-                joinedload(Payment.charge_item)
-            )
-            
-            # 如果指定了周期，先过滤周期
-            if period:
-                query = query.filter(Payment.period == period)
-            
-            # 搜索关键词
-            # 支持输入格式： "building-unit-room" 或 "unit-room" 或普通关键字
-            import re
-            parts = re.findall(r'\d+', keyword)
-            if len(parts) == 3:
-                b, u, rno = parts
-                query = query.join(Resident).join(ChargeItem).filter(
-                    (Resident.building == str(b)) &
-                    (Resident.unit == str(u)) &
-                    (Resident.room_no.like(f"%{rno}%"))
-                )
-            elif len(parts) == 2:
-                a, b = parts
-                # treat as unit-room or building-room depending on data; try both
-                query = query.join(Resident).join(ChargeItem).filter(
-                    ((Resident.unit == str(a)) & (Resident.room_no.like(f"%{b}%"))) |
-                    ((Resident.building == str(a)) & (Resident.room_no.like(f"%{b}%")))
+            with attached_archive(db, include_archive) as archived:
+                P = archive_union(Payment) if archived else Payment
+                query = db.query(P).options(
+                    joinedload(P.resident),
+                    joinedload(P.charge_item)
                 )
-            else:
-                keyword_like = f"%{keyword}%"
-                query = query.join(Resident).join(ChargeItem).filter(
-                    (Resident.room_no.like(keyword_like)) |
-                    (Resident.name.like(keyword_like)) |
-                    (Resident.phone.like(keyword_like)) |
-                    (ChargeItem.name.like(keyword_like))
-                )
-            
-            return query.order_by(Payment.period.desc(), Payment.created_at.desc()).all()
+                
+                # 如果指定了周期，先过滤周期
+                if period:
+                    query = query.filter(P.period == period)
+                
+                query = _search_filter(query, P, keyword)
+                return query.order_by(P.period.desc(), P.created_at.desc()).all()
         finally:
             if db is not None:
                 db.close()
+
+    @staticmethod
+    def search_payments_page(keyword: str, period: str = None, after=None, limit: int = DEFAULT_PAGE_SIZE,
+                             db: Session = None, include_archive: bool = False):
+        """分页搜索缴费记录，按 (周期, 创建时间, ID) 倒序
+
+        Returns:
+            dict: {'items': [缴费记录], 'cursor': 下一页游标，没有下一页时为 None}
+        """
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            with attached_archive(db, include_archive) as archived:
+                P = archive_union(Payment) if archived else Payment
+                query = db.query(P).options(
+                    joinedload(P.resident),
+                    joinedload(P.charge_item)
+                )
+                if period:
+                    query = query.filter(P.period == period)
+                query = _search_filter(query, P, keyword)
+                return keyset_page(query, P, PAYMENT_PAGE_KEYS, after, limit)
+        finally:
+            if close_db and db is not None:
+                db.close()
     
     @staticmethod
-    def get_statistics_by_period(period: str, db: Session = None):
-        """获取周期统计信息"""
+    def get_statistics_by_period(period: str, db: Session = None, include_archive: bool = False):
+        """获取周期统计信息（一条聚合查询，金额为 Money）
+
+        include_archive 为 True 时加上归档汇总表中该周期的数字（已归档的账单都已缴清）。
+        """
         if db is None:
             db = SessionLocal()
         try:
-            total_count = db.query(Payment).filter(Payment.period == period).count()
-            paid_count = db.query(Payment).filter(
-                and_(Payment.period == period, Payment.paid == 1)
-            ).count()
-            unpaid_count = total_count - paid_count
-            
-            total_amount = db.query(func.sum(Payment.amount)).filter(
-                Payment.period == period
-            ).scalar()
-            total_amount = float(total_amount) if total_amount else 0.0
-            
-            paid_amount = db.query(func.sum(Payment.amount)).filter(
-                and_(Payment.period == period, Payment.paid == 1)
-            ).scalar()
-            paid_amount = float(paid_amount) if paid_amount else 0.0
-            
-            unpaid_amount = total_amount - paid_amount
+            row = db.query(
+                func.count(Payment.id),
+                func.sum(case((Payment.paid == 1, 1), else_=0)),
+                func.sum(Payment.amount),
+                func.sum(case((Payment.paid == 1, Payment.amount), else_=0)),
+            ).filter(Payment.period == period).one()
+            total_count = row[0] or 0
+            paid_count = row[1] or 0
+            total_amount = row[2] or ZERO
+            paid_amount = row[3] or ZERO
+            if include_archive:
+                archived_count, archived_amount = db.query(
+                    func.sum(ArchivedPeriod.payment_count), func.sum(ArchivedPeriod.total_amount)
+                ).filter(ArchivedPeriod.period == period).one()
+                total_count += archived_count or 0
+                paid_count += archived_count or 0
+                total_amount += archived_amount or ZERO
+                paid_amount += archived_amount or ZERO
             
             return {
                 'total_count': total_count,
                 'paid_count': paid_count,
-                'unpaid_count': unpaid_count,
+                'unpaid_count': total_count - paid_count,
                 'total_amount': total_amount,
                 'paid_amount': paid_amount,
-                'unpaid_amount': unpaid_amount
+                'unpaid_amount': total_amount - paid_amount
             }
         finally:
             if db is not None:
                 db.close()
 
+    @staticmethod
+    def get_period_breakdown(period: str, by: str = 'item', db: Session = None):
+        """按收费项目（by='item'）或计费开始日（by='day'）汇总某周期的账单，在 SQL 中按整数分求和
+
+        Returns:
+            list[dict]: 每组 {'key', 'count', 'paid_count', 'total', 'paid', 'paid_amount'}，
+                        paid 为已缴清按总额、未缴清按已缴金额计；paid_amount 为已缴金额合计
+        """
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            if by == 'item':
+                key = func.coalesce(ChargeItem.name, '未知')
+            elif by == 'day':
+                key = func.coalesce(cast(func.strftime('%d', Payment.billing_start_date), Integer), 1)
+            else:
+                raise ValueError(f"不支持的分组方式：{by}")
+            paid_amount = func.coalesce(Payment.paid_amount, 0)
+            query = db.query(
+                key.label('key'),
+                func.count(Payment.id),
+                func.sum(case((Payment.paid == 1, 1), else_=0)),
+                func.sum(Payment.amount),
+                func.sum(case((Payment.paid == 1, Payment.amount), else_=paid_amount)),
+                func.sum(paid_amount),
+            ).outerjoin(ChargeItem, ChargeItem.id == Payment.charge_item_id).filter(
+                Payment.period == period
+            ).group_by(key).order_by(key)
+            return [
+                {
+                    'key': row[0],
+                    'count': row[1],
+                    'paid_count': row[2] or 0,
+                    'total': row[3] or ZERO,
+                    'paid': row[4] or ZERO,
+                    'paid_amount': row[5] or ZERO,
+                }
+                for row in query
+            ]
+        finally:
+            if close_db and db is not None:
+                db.close()
+
     @staticmethod
     def get_daily_sequence_for_payment(payment, db: Session = None):
         """返回指定 payment 在其创建日期的当天序号（从1开始），用于票据序号生成。
@@ -556,33 +933,23 @@ class PaymentService:
         if db is None:
             db = SessionLocal()
         try:
-            # 统计年度内的账单金额（使用 billing_start_date 年份或 period 字符串匹配）
-            payments = db.query(Payment).join(ChargeItem).filter(
+            # 统计年度内的账单金额（按 billing_start_date 年份），按收费项目分组在 SQL 中求和
+            rows = db.query(
+                ChargeItem.name,
+                func.sum(Payment.amount),
+                func.sum(func.coalesce(Payment.paid_amount, 0)),
+            ).join(ChargeItem).filter(
                 func.strftime('%Y', Payment.billing_start_date) == f"{year:04d}"
-            ).all()
+            ).group_by(ChargeItem.name).all()
             # 按年汇总：总账单金额、已缴金额、欠费金额；并按收费项目分别统计 total/paid/unpaid
-            total_amount = 0.0
-            total_paid = 0.0
-            by_item = {}
-            for p in payments:
-                amt = float(p.amount) if p.amount else 0.0
-                paid = float(p.paid_amount) if p.paid_amount else 0.0
-                total_amount += amt
-                total_paid += paid
-                name = p.charge_item.name if p.charge_item else '未知'
-                entry = by_item.get(name)
-                if not entry:
-                    entry = {'total': 0.0, 'paid': 0.0}
-                    by_item[name] = entry
-                entry['total'] += amt
-                entry['paid'] += paid
-
-            # 构造按项目列表，包含 total/paid/unpaid
             by_item_list = []
-            for name, v in by_item.items():
-                unpaid = v['total'] - v['paid']
-                by_item_list.append((name, v['total'], v['paid'], unpaid))
+            for name, total, paid in rows:
+                total = total or ZERO
+                paid = paid or ZERO
+                by_item_list.append((name or '未知', total, paid, total - paid))
             by_item_list.sort(key=lambda x: x[1], reverse=True)
+            total_amount = sum((item[1] for item in by_item_list), ZERO)
+            total_paid = sum((item[2] for item in by_item_list), ZERO)
 
             return {
                 'year': year,
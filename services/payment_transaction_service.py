@@ -1,21 +1,32 @@
 """
 付款流水服务
 """
-from sqlalchemy.orm import Session
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased
 from models.payment_transaction import PaymentTransaction
-from models.database import SessionLocal
+from models.database import SessionLocal, chunked
+from utils.profiler import profile_service
+from services.write_executor import serialize_writes
+from services.archive_service import attached_archive, archive_union
 
 
+@serialize_writes
+@profile_service
 class PaymentTransactionService:
     @staticmethod
-    def create_transaction(payment_id: int, amount: float, operator: str = '', db: Session = None):
+    def create_transaction(payment_id: int, amount: float, operator: str = '', db: Session = None,
+                           paid_time: datetime = None):
+        """记录一笔收款流水（paid_time 缺省为当前本地时间）"""
         if db is None:
             db = SessionLocal()
             close_db = True
         else:
             close_db = False
         try:
-            tx = PaymentTransaction(payment_id=payment_id, amount=amount, operator=operator)
+            tx = PaymentTransaction(payment_id=payment_id, amount=amount, operator=operator,
+                                    paid_time=paid_time or datetime.now())
             db.add(tx)
             # do not commit here if caller will commit; caller may pass same session
             if close_db:
@@ -31,19 +42,64 @@ class PaymentTransactionService:
                 db.close()
 
     @staticmethod
-    def get_transactions_by_payment(payment_id: int, db: Session = None):
-        """返回指定 payment 的所有流水，按时间升序"""
+    def get_transactions_by_payment(payment_id: int, db: Session = None, include_archive: bool = False):
+        """返回指定 payment 的所有流水，按时间升序（include_archive 为 True 时包含归档库）"""
         if db is None:
             db = SessionLocal()
             close_db = True
         else:
             close_db = False
         try:
-            return db.query(PaymentTransaction).filter(PaymentTransaction.payment_id == payment_id).order_by(PaymentTransaction.paid_time.asc()).all()
+            with attached_archive(db, include_archive) as archived:
+                T = archive_union(PaymentTransaction) if archived else PaymentTransaction
+                return db.query(T).filter(T.payment_id == payment_id).order_by(T.paid_time.asc()).all()
         finally:
             if close_db:
                 db.close()
 
+    @staticmethod
+    def get_transactions_by_payments(payment_ids, last: int = None, db: Session = None,
+                                     include_archive: bool = False):
+        """批量返回多笔 payment 的流水：{payment_id: [流水, ...]}（按时间升序，没有流水的为空列表）
+
+        last 为 N 时每笔只取最近 N 条（ROW_NUMBER() 窗口函数），与选中多少笔无关都是一条查询。
+        """
+        ids = list(dict.fromkeys(payment_ids or []))
+        result = {pid: [] for pid in ids}
+        if not ids:
+            return result
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        else:
+            close_db = False
+        try:
+            with attached_archive(db, include_archive) as archived:
+                T = archive_union(PaymentTransaction) if archived else PaymentTransaction
+                for chunk in chunked(ids):
+                    if last is None:
+                        query = db.query(T).filter(T.payment_id.in_(chunk))
+                        X = T
+                    else:
+                        rank = func.row_number().over(
+                            partition_by=T.payment_id, order_by=(T.paid_time.desc(), T.id.desc())).label('rank')
+                        ranked = db.query(T, rank).filter(T.payment_id.in_(chunk)).subquery()
+                        X = aliased(PaymentTransaction, ranked)
+                        query = db.query(X).filter(ranked.c.rank <= int(last))
+                    for tx in query.order_by(X.payment_id, X.paid_time.asc(), X.id.asc()).all():
+                        result[tx.payment_id].append(tx)
+            return result
+        finally:
+            if close_db:
+                db.close()
+
+    @staticmethod
+    def get_last_transactions(payment_ids, db: Session = None, include_archive: bool = False):
+        """批量返回多笔 payment 各自最新的一条流水：{payment_id: 流水}（没有流水的不在结果中）"""
+        grouped = PaymentTransactionService.get_transactions_by_payments(
+            payment_ids, last=1, db=db, include_archive=include_archive)
+        return {pid: txs[-1] for pid, txs in grouped.items() if txs}
+
     @staticmethod
     def get_last_transaction(payment_id: int, db: Session = None):
         """返回指定 payment 的最新一条流水"""
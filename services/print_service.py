@@ -6,8 +6,12 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from models.print_log import PrintLog
 from models.database import SessionLocal
+from utils.profiler import profile_service
+from services.write_executor import serialize_writes, routes_own_writes, write_executor
 
 
+@serialize_writes
+@profile_service
 class PrintService:
     @staticmethod
     def get_today_sequence(db: Session = None) -> int:
@@ -30,25 +34,32 @@ class PrintService:
                 db.close()
 
     @staticmethod
+    @routes_own_writes
     def create_print_log(payment_id: int = None, seq: int = None, db: Session = None) -> PrintLog:
-        """创建打印记录；如果未提供 seq 则自动使用当天序号"""
-        close_db = False
+        """创建打印记录；如果未提供 seq 则自动使用当天序号
+
+        未传入 db 时交给写线程，与同时到达的其他打印记录合并为一个事务提交；
+        序号在写事务中依次分配，几台电脑同时打印也不会取到相同的序号。
+        """
         if db is None:
-            db = SessionLocal()
-            close_db = True
+            return write_executor.run_unit(
+                lambda session: PrintService._add_print_log(session, payment_id, seq))
         try:
-            if seq is None:
-                seq = PrintService.get_today_sequence(db=db)
-            pl = PrintLog(payment_id=payment_id, seq=seq)
-            db.add(pl)
+            pl = PrintService._add_print_log(db, payment_id, seq)
             db.commit()
             db.refresh(pl)
             return pl
         except Exception:
             db.rollback()
             raise
-        finally:
-            if close_db and db is not None:
-                db.close()
+
+    @staticmethod
+    def _add_print_log(db: Session, payment_id: int = None, seq: int = None) -> PrintLog:
+        if seq is None:
+            seq = PrintService.get_today_sequence(db=db)
+        pl = PrintLog(payment_id=payment_id, seq=seq)
+        db.add(pl)
+        db.flush()
+        return pl
 
 
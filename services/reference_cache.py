@@ -0,0 +1,253 @@
+"""
+引用数据缓存
+
+收费项目和住户在收费、打印、导入时被反复按 ID 或 (楼栋, 单元, 房号) 查找，
+每次开会话查询的开销远大于数据本身。这里在进程内缓存两张表的全部行：
+
+- 第一次查找时一条 SELECT 载入整张表，之后按 ID / 三元组直接取，不存在的键也不再查库；
+- 本进程的写入由服务层在提交后写回（store）或剔除（discard）对应的行；
+- 其他进程（另开的程序、备份恢复）写库时，用一个专用连接读取 PRAGMA data_version，
+  值发生变化就整体失效，下次查找重新载入。本进程任何会话的提交（包括收费等与两张表无关的写入）
+  同样会改变 data_version，所以提交前先检查一次，提交后立即把当前值作为新基线，只有其他进程的提交才算外部变化。
+
+返回的是与会话分离的对象副本，调用方修改它不会影响缓存。
+"""
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from models.database import SessionLocal
+from models.resident import Resident
+from models.charge_item import ChargeItem
+
+CHARGE_ITEMS = 'charge_items'
+RESIDENTS = 'residents'
+
+_MODELS = {CHARGE_ITEMS: ChargeItem, RESIDENTS: Resident}
+
+
+def resident_key(building, unit, room_no):
+    """住户三元组键（楼栋/单元为空按空字符串处理，与 get_resident_by_triplet 一致）"""
+    return (building or '', unit or '', room_no or '')
+
+
+class ReferenceCache:
+    """收费项目和住户的进程内缓存（线程安全）"""
+
+    def __init__(self, session_factory=SessionLocal, check_interval=0.5):
+        self.session_factory = session_factory
+        # 两次 data_version 检查的最小间隔（秒），连续查找时不必每次都访问数据库
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._rows = {}             # kind -> {id: 列值字典}
+        self._resident_keys = {}    # 三元组 -> 住户ID
+        self._engine = None
+        self._monitor = None        # 专用于读取 data_version 的 DBAPI 连接
+        self._data_version = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.external_changes = 0
+        event.listen(session_factory, 'before_commit', self._before_commit)
+        event.listen(session_factory, 'after_commit', self._after_commit)
+
+    # ------------------------------------------------------------------ 查找
+    def get_charge_item(self, item_id):
+        """按ID取收费项目，不存在返回 None"""
+        with self._lock:
+            rows = self._table(CHARGE_ITEMS)
+            return self._build(CHARGE_ITEMS, rows.get(item_id))
+
+    def get_resident(self, resident_id):
+        """按ID取住户，不存在返回 None"""
+        with self._lock:
+            rows = self._table(RESIDENTS)
+            return self._build(RESIDENTS, rows.get(resident_id))
+
+    def get_resident_by_triplet(self, building, unit, room_no):
+        """按 (楼栋, 单元, 房号) 取住户，不存在返回 None"""
+        with self._lock:
+            rows = self._table(RESIDENTS)
+            resident_id = self._resident_keys.get(resident_key(building, unit, room_no))
+            return self._build(RESIDENTS, rows.get(resident_id))
+
+    # ------------------------------------------------------------------ 写回与失效
+    def store(self, db, obj):
+        """本进程写入提交后写回一行（obj 为 ChargeItem 或 Resident，列值须已加载）"""
+        kind = CHARGE_ITEMS if isinstance(obj, ChargeItem) else RESIDENTS
+        values = _column_values(obj)
+        with self._lock:
+            if not self._same_database(db):
+                return
+            rows = self._rows.get(kind)
+            if rows is not None:
+                self._remove(kind, rows, values['id'])
+                rows[values['id']] = values
+                if kind == RESIDENTS:
+                    self._resident_keys[_key_of(values)] = values['id']
+
+    def discard(self, db, kind, ids):
+        """本进程删除提交后剔除对应行"""
+        with self._lock:
+            if not self._same_database(db):
+                return
+            rows = self._rows.get(kind)
+            if rows is not None:
+                for row_id in ids:
+                    self._remove(kind, rows, row_id)
+
+    def invalidate(self, kind=None):
+        """整体失效（kind 为 None 时两张表都失效），下次查找重新载入"""
+        with self._lock:
+            if kind is None:
+                self._rows.clear()
+                self._resident_keys.clear()
+            else:
+                self._rows.pop(kind, None)
+                if kind == RESIDENTS:
+                    self._resident_keys.clear()
+
+    def reset(self):
+        """清空缓存并关闭监视连接（替换数据库文件前调用）"""
+        with self._lock:
+            self.invalidate()
+            self._close_monitor()
+
+    def stats(self):
+        """命中/未命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'reloads': self.reloads,
+                'external_changes': self.external_changes,
+                'charge_items': len(self._rows.get(CHARGE_ITEMS) or ()),
+                'residents': len(self._rows.get(RESIDENTS) or ()),
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.reloads = self.external_changes = 0
+
+    # ------------------------------------------------------------------ 内部
+    def _table(self, kind):
+        self._check_external_changes()
+        rows = self._rows.get(kind)
+        if rows is not None:
+            self.hits += 1
+            return rows
+        self.misses += 1
+        return self._load(kind)
+
+    def _load(self, kind):
+        model = _MODELS[kind]
+        db = self.session_factory()
+        try:
+            rows = {obj.id: _column_values(obj) for obj in db.query(model)}
+        finally:
+            db.close()
+        self._rows[kind] = rows
+        if kind == RESIDENTS:
+            self._resident_keys = {}
+            # 与 get_resident_by_triplet 的 .first() 一致：重复的三元组取 ID 最小的一条
+            for row_id in sorted(rows, reverse=True):
+                self._resident_keys[_key_of(rows[row_id])] = row_id
+        self.reloads += 1
+        return rows
+
+    def _remove(self, kind, rows, row_id):
+        old = rows.pop(row_id, None)
+        if old is not None and kind == RESIDENTS:
+            key = _key_of(old)
+            if self._resident_keys.get(key) == row_id:
+                del self._resident_keys[key]
+
+    def _build(self, kind, values):
+        if values is None:
+            return None
+        obj = _MODELS[kind](**values)
+        make_transient_to_detached(obj)
+        return obj
+
+    def _check_external_changes(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        version = self._read_data_version()
+        if version != self._data_version:
+            if self._data_version is not None:
+                self.external_changes += 1
+            self._data_version = version
+            self.invalidate()
+
+    def _same_database(self, db):
+        # 写入走的是其他数据库（如测试传入的内存库会话）时与本缓存无关
+        return db.get_bind() is self.session_factory.kw.get('bind')
+
+    def _before_commit(self, session):
+        # 提交前先确认上次检查之后有没有其他进程写库，有则按外部变化失效
+        with self._lock:
+            if self._data_version is not None and self._same_database(session):
+                self._check_external_changes(force=True)
+
+    def _after_commit(self, session):
+        # 本进程刚提交的写入也会改变监视连接看到的 data_version；涉及缓存的行已由服务层写回，
+        # 把当前值作为新基线，避免随后整表重新载入。
+        # 只有恰好与本次提交同时发生的其他进程提交会被一并吸收，直到下一次变化才失效
+        with self._lock:
+            if self._data_version is not None and self._same_database(session):
+                self._rebaseline()
+
+    def _rebaseline(self):
+        self._data_version = self._read_data_version()
+        self._checked_at = time.monotonic()
+
+    def _read_data_version(self):
+        engine = self.session_factory.kw.get('bind')
+        if engine is not self._engine:
+            # SessionLocal 改绑到其他数据库（测试、基准脚本），旧数据全部作废
+            self._close_monitor()
+            self.invalidate()
+            self._engine = engine
+        if engine is None or engine.url.database in (None, '', ':memory:'):
+            return None
+        try:
+            if self._monitor is None:
+                self._monitor = engine.raw_connection()
+            cursor = self._monitor.cursor()
+            try:
+                cursor.execute('PRAGMA data_version')
+                return cursor.fetchone()[0]
+            finally:
+                cursor.close()
+        except Exception:
+            # 监视连接失效（文件被替换等）：重建连接，并视为已变化
+            self._close_monitor()
+            return object()
+
+    def _close_monitor(self):
+        if self._monitor is not None:
+            try:
+                self._monitor.close()
+            except Exception:
+                pass
+        self._monitor = None
+        self._data_version = None
+
+
+def _column_values(obj):
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+def _key_of(values):
+    return resident_key(values.get('building'), values.get('unit'), values.get('room_no'))
+
+
+# 全局缓存实例
+reference_cache = ReferenceCache()
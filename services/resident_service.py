@@ -4,10 +4,46 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from models.resident import Resident
-from models.database import SessionLocal
-from sqlalchemy import and_
+from models.database import SessionLocal, chunked
+from services.reference_cache import reference_cache, RESIDENTS
+from sqlalchemy import and_, or_
+from utils.logger import logger
+from utils.profiler import profile_service
+from services.write_executor import serialize_writes
+from services.pagination import keyset_page, DEFAULT_PAGE_SIZE
 
+# 住户分页的排序键：(房号, ID)，走房号索引
+RESIDENT_PAGE_KEYS = (('room_no', False), ('id', False))
 
+
+def _search_filter(keyword):
+    """住户搜索条件：'楼栋-单元-房号'、'单元-房号' 或按房号/姓名/电话模糊匹配"""
+    import re
+    parts = re.findall(r'\d+', keyword)
+    if len(parts) == 3:
+        b, u, rno = parts
+        return (
+            (Resident.building == str(b)) &
+            (Resident.unit == str(u)) &
+            (Resident.room_no.like(f"%{rno}%"))
+        )
+    if len(parts) == 2:
+        a, b = parts
+        return (
+            ((Resident.unit == str(a)) & (Resident.room_no.like(f"%{b}%"))) |
+            ((Resident.building == str(a)) & (Resident.room_no.like(f"%{b}%"))) |
+            (Resident.name.like(f"%{keyword}%"))
+        )
+    keyword_like = f"%{keyword}%"
+    return (
+        (Resident.room_no.like(keyword_like)) |
+        (Resident.name.like(keyword_like)) |
+        (Resident.phone.like(keyword_like))
+    )
+
+
+@serialize_writes
+@profile_service
 class ResidentService:
     """住户管理服务类"""
     
@@ -24,12 +60,47 @@ class ResidentService:
         finally:
             if db is not None:
                 db.close()
+
+    @staticmethod
+    def get_residents_page(after=None, limit: int = DEFAULT_PAGE_SIZE, active_only: bool = False,
+                           db: Session = None):
+        """分页获取住户，按 (房号, ID) 排序
+
+        Returns:
+            dict: {'items': [住户], 'cursor': 下一页游标，没有下一页时为 None}
+        """
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            query = db.query(Resident)
+            if active_only:
+                query = query.filter(Resident.status == 1)
+            return keyset_page(query, Resident, RESIDENT_PAGE_KEYS, after, limit)
+        finally:
+            if close_db:
+                db.close()
+
+    @staticmethod
+    def search_residents_page(keyword: str, after=None, limit: int = DEFAULT_PAGE_SIZE, db: Session = None):
+        """分页搜索住户（条件同 search_residents），按 (房号, ID) 排序"""
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            query = db.query(Resident).filter(_search_filter(keyword))
+            return keyset_page(query, Resident, RESIDENT_PAGE_KEYS, after, limit)
+        finally:
+            if close_db:
+                db.close()
     
     @staticmethod
     def get_resident_by_id(resident_id: int, db: Session = None):
-        """根据ID获取住户"""
+        """根据ID获取住户（未传入会话时走引用数据缓存）"""
         if db is None:
-            db = SessionLocal()
+            return reference_cache.get_resident(resident_id)
         try:
             return db.query(Resident).filter(Resident.id == resident_id).first()
         finally:
@@ -64,9 +135,9 @@ class ResidentService:
 
     @staticmethod
     def get_resident_by_triplet(building: str, unit: str, room_no: str, db: Session = None):
-        """根据 (building, unit, room_no) 三元组获取住户（全部匹配）"""
+        """根据 (building, unit, room_no) 三元组获取住户（全部匹配；未传入会话时走引用数据缓存）"""
         if db is None:
-            db = SessionLocal()
+            return reference_cache.get_resident_by_triplet(building, unit, room_no)
         try:
             return db.query(Resident).filter(
                 and_(
@@ -107,6 +178,7 @@ class ResidentService:
             db.commit()
             # refresh by re-querying to avoid session persistence issues
             resident = db.query(Resident).filter(Resident.id == resident.id).first()
+            reference_cache.store(db, resident)
             return resident
         except IntegrityError:
             db.rollback()
@@ -165,6 +237,7 @@ class ResidentService:
             db.commit()
             # re-query to avoid detached instance issues
             resident = db.query(Resident).filter(Resident.id == resident_id).first()
+            reference_cache.store(db, resident)
             return resident
         except IntegrityError:
             db.rollback()
@@ -178,30 +251,15 @@ class ResidentService:
     
     @staticmethod
     def delete_resident(resident_id: int, db: Session = None):
-        """删除住户"""
+        """删除住户（级联删除其账单、流水和抄表记录）"""
         if db is None:
             db = SessionLocal()
         try:
-            resident = db.query(Resident).filter(Resident.id == resident_id).first()
-            if not resident:
+            found, _ = ResidentService._delete_resident_rows(db, [resident_id])
+            if not found:
                 raise ValueError("住户不存在")
-
-            # 级联删除：先删除与该住户相关的所有 payment_transactions 与 payments，再删除住户本身
-            from models.payment import Payment
-            from models.payment_transaction import PaymentTransaction
-
-            payments = db.query(Payment).filter(Payment.resident_id == resident_id).all()
-            if payments:
-                payment_ids = [p.id for p in payments if p.id is not None]
-                if payment_ids:
-                    # 删除支付流水（transaction）记录
-                    db.query(PaymentTransaction).filter(PaymentTransaction.payment_id.in_(payment_ids)).delete(synchronize_session=False)
-                # 删除 payments
-                db.query(Payment).filter(Payment.resident_id == resident_id).delete(synchronize_session=False)
-
-            # 最后删除住户
-            db.delete(resident)
             db.commit()
+            reference_cache.discard(db, RESIDENTS, found)
             return True
         except Exception as e:
             db.rollback()
@@ -209,36 +267,136 @@ class ResidentService:
         finally:
             if db is not None:
                 db.close()
-    
+
+    @staticmethod
+    def delete_residents_batch(resident_ids: list, db: Session = None):
+        """批量删除住户及其账单、流水和抄表记录（单个事务）
+
+        Returns:
+            tuple: (删除数量, [(不存在的ID, 原因), ...])
+        """
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            found, not_found = ResidentService._delete_resident_rows(db, resident_ids)
+            db.commit()
+            reference_cache.discard(db, RESIDENTS, found)
+            logger.log_operation("DELETE_RESIDENTS_BATCH",
+                                 f"requested={len(found) + len(not_found)}, deleted={len(found)}, not_found={not_found}")
+            return len(found), [(rid, "住户不存在") for rid in not_found]
+        except Exception as e:
+            logger.log_error(e, f"DELETE_RESIDENTS_BATCH_FAILED: count={len(resident_ids)}")
+            db.rollback()
+            raise e
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def _delete_resident_rows(db: Session, resident_ids):
+        """按住户ID集合删除流水、账单、抄表记录和住户（不提交）
+
+        Returns:
+            tuple: (存在并已删除的ID列表, 不存在的ID列表)
+        """
+        from models.payment import Payment
+        from models.payment_transaction import PaymentTransaction
+        from models.meter_reading import MeterReading
+
+        ids = list(dict.fromkeys(int(rid) for rid in resident_ids))
+        found = set()
+        for chunk in chunked(ids):
+            found.update(rid for (rid,) in db.query(Resident.id).filter(Resident.id.in_(chunk)))
+        found_ids = [rid for rid in ids if rid in found]
+        not_found = [rid for rid in ids if rid not in found]
+
+        for chunk in chunked(found_ids):
+            payment_ids = db.query(Payment.id).filter(Payment.resident_id.in_(chunk))
+            db.query(PaymentTransaction).filter(
+                PaymentTransaction.payment_id.in_(payment_ids.scalar_subquery())).delete(synchronize_session=False)
+            db.query(MeterReading).filter(MeterReading.resident_id.in_(chunk)).delete(synchronize_session=False)
+            db.query(Payment).filter(Payment.resident_id.in_(chunk)).delete(synchronize_session=False)
+            db.query(Resident).filter(Resident.id.in_(chunk)).delete(synchronize_session=False)
+        return found_ids, not_found
+
+    @staticmethod
+    def count_related_records(resident_ids: list, db: Session = None):
+        """删除住户前统计将一并删除的账单数和流水数
+
+        Returns:
+            tuple: (账单数, 流水数)
+        """
+        from sqlalchemy import func
+        from models.payment import Payment
+        from models.payment_transaction import PaymentTransaction
+
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            payment_count = tx_count = 0
+            for chunk in chunked(int(rid) for rid in resident_ids):
+                payment_count += db.query(func.count(Payment.id)).filter(Payment.resident_id.in_(chunk)).scalar()
+                tx_count += db.query(func.count(PaymentTransaction.id)).join(
+                    Payment, Payment.id == PaymentTransaction.payment_id
+                ).filter(Payment.resident_id.in_(chunk)).scalar()
+            return payment_count, tx_count
+        finally:
+            if close_db and db is not None:
+                db.close()
+
+    @staticmethod
+    def suggest_residents(text: str, limit: int = 20, active_only: bool = True, db: Session = None):
+        """住户选择框的输入提示：按房号或姓名前缀查找，只取需要显示的列
+
+        输入 “楼栋-单元-房号” 形式（如 6-1-12）时按楼栋、单元精确、房号前缀匹配。
+        前缀条件写成范围比较，可以走房号/姓名索引。
+
+        Returns:
+            list: [(住户ID, '6-1-1204 - 张三'), ...]，最多 limit 条
+        """
+        text = (text or '').strip()
+        if not text:
+            return []
+        close_db = False
+        if db is None:
+            db = SessionLocal()
+            close_db = True
+        try:
+            def prefix(column, value):
+                return and_(column >= value, column < value + '\U0010ffff')
+
+            parts = [p.strip() for p in text.split('-')]
+            if len(parts) >= 3 and all(parts[:2]):
+                condition = and_(Resident.building == parts[0], Resident.unit == parts[1],
+                                 prefix(Resident.room_no, '-'.join(parts[2:])))
+            elif len(parts) == 2 and parts[0]:
+                condition = or_(and_(Resident.building == parts[0], prefix(Resident.room_no, parts[1])),
+                                and_(Resident.unit == parts[0], prefix(Resident.room_no, parts[1])))
+            else:
+                condition = or_(prefix(Resident.room_no, text), prefix(Resident.name, text))
+
+            query = db.query(Resident.id, Resident.building, Resident.unit, Resident.room_no, Resident.name) \
+                .filter(condition)
+            if active_only:
+                query = query.filter(Resident.status == 1)
+            rows = query.order_by(Resident.building, Resident.unit, Resident.room_no).limit(limit).all()
+            return [(rid, f"{Resident.format_room_no(building, unit, room_no)} - {name}")
+                    for rid, building, unit, room_no, name in rows]
+        finally:
+            if close_db and db is not None:
+                db.close()
+
     @staticmethod
     def search_residents(keyword: str, db: Session = None):
         """搜索住户（按房号或姓名）"""
         if db is None:
             db = SessionLocal()
         try:
-            import re
-            parts = re.findall(r'\d+', keyword)
-            if len(parts) == 3:
-                b, u, rno = parts
-                return db.query(Resident).filter(
-                    (Resident.building == str(b)) &
-                    (Resident.unit == str(u)) &
-                    (Resident.room_no.like(f"%{rno}%"))
-                ).order_by(Resident.room_no).all()
-            elif len(parts) == 2:
-                a, b = parts
-                return db.query(Resident).filter(
-                    ((Resident.unit == str(a)) & (Resident.room_no.like(f"%{b}%"))) |
-                    ((Resident.building == str(a)) & (Resident.room_no.like(f"%{b}%"))) |
-                    (Resident.name.like(f"%{keyword}%"))
-                ).order_by(Resident.room_no).all()
-            else:
-                keyword_like = f"%{keyword}%"
-                return db.query(Resident).filter(
-                    (Resident.room_no.like(keyword_like)) |
-                    (Resident.name.like(keyword_like)) |
-                    (Resident.phone.like(keyword_like))
-                ).order_by(Resident.room_no).all()
+            return db.query(Resident).filter(_search_filter(keyword)).order_by(Resident.room_no).all()
         finally:
             if db is not None:
                 db.close()
@@ -0,0 +1,288 @@
+"""
+写操作执行器
+
+界面线程、批量出账线程、打印和定时任务各自开会话写库，SQLite 同一时刻只允许一个写事务，
+并发时容易出现“database is locked”。这里把写操作统一交给一个专用写线程排队执行：
+
+- 服务类加上 @serialize_writes 后，写方法（非 get_/search_/suggest_/count_ 开头）在未传入 db 时
+  自动提交到写线程并等待结果，调用方式和返回值都不变；读方法仍在调用线程中并发执行；
+- 写线程中开始的第一个事务使用 BEGIN IMMEDIATE，一开始就拿到写锁，不会读到一半才发现写不了；
+- 遇到 SQLITE_BUSY（其他进程正在写）按退避间隔重试，连接本身也设置了 busy_timeout；
+- submit_unit() 提交的小写入（打印流水等）在队列中相邻时合并为一个事务提交，
+  每个写入在各自的保存点中执行，一个失败不影响同批的其他写入。
+
+submit() / submit_unit() 返回 concurrent.futures.Future；run() / run_unit() 提交后等待结果。
+"""
+import time
+import queue
+import inspect
+import threading
+import functools
+from concurrent.futures import Future
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from models.database import SessionLocal
+from services.api_protocol import is_read, LOCAL_METHODS
+from utils.logger import logger
+
+# 遇到 SQLITE_BUSY 时的重试次数和首次退避间隔（秒，每次翻倍）
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05
+
+_thread_state = threading.local()
+_hooked_engines = set()
+
+
+def is_busy_error(error):
+    """是否为数据库被其他连接锁住（SQLITE_BUSY / SQLITE_LOCKED）"""
+    if not isinstance(error, OperationalError):
+        return False
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'database is locked' in message or 'database is busy' in message or 'table is locked' in message
+
+
+def _install_begin_hook(engine):
+    """写线程中开始事务时改发 BEGIN IMMEDIATE（每个引擎只注册一次）"""
+    if id(engine) in _hooked_engines:
+        return
+    _hooked_engines.add(id(engine))
+
+    @event.listens_for(engine, 'begin')
+    def _begin(conn):
+        # 只有写任务的第一个事务立即加写锁，任务中另开的会话保持原来的延迟事务
+        if getattr(_thread_state, 'immediate', False):
+            _thread_state.immediate = False
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+class _Task:
+    __slots__ = ('func', 'args', 'kwargs', 'future', 'unit')
+
+    def __init__(self, func, args, kwargs, unit):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.unit = unit
+
+
+class WriteExecutor:
+    """单写线程执行器（线程安全，写线程在第一次提交时启动）"""
+
+    def __init__(self, session_factory=SessionLocal, batch_size=200, retries=BUSY_RETRIES, backoff=BUSY_BACKOFF):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self._queue = queue.Queue()
+        self._pending = None        # 合并小写入时多取出的一个非小写入任务
+        self._thread = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.units = 0
+        self.batches = 0
+        self.busy_retries = 0
+        self.max_batch = 0
+
+    # ------------------------------------------------------------------ 提交
+    def in_writer_thread(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, func, *args, **kwargs):
+        """提交一次完整的写操作（通常是自行提交事务的服务方法），返回 Future"""
+        return self._put(_Task(func, args, kwargs, unit=False))
+
+    def submit_unit(self, work):
+        """提交一个可合并的小写入：work(db) 只做增删改、不提交，返回值即 Future 的结果。
+
+        work 可能因重试被执行多次，不应有数据库以外的副作用；
+        会话以 expire_on_commit=False 打开，返回的模型对象提交后仍可读取列值。
+        """
+        return self._put(_Task(work, (), {}, unit=True))
+
+    def run(self, func, *args, **kwargs):
+        """执行写操作并等待结果（已在写线程中时直接执行）"""
+        if self.in_writer_thread():
+            return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    def run_unit(self, work):
+        """执行一个小写入并等待结果（已在写线程中时单独开事务执行）"""
+        if self.in_writer_thread():
+            ok, value = self._run_units([_Task(work, (), {}, unit=True)])[0]
+            if not ok:
+                raise value
+            return value
+        return self.submit_unit(work).result()
+
+    def shutdown(self, wait=True):
+        """处理完已提交的任务后停止写线程"""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(None)
+        if wait:
+            thread.join()
+
+    def stats(self):
+        batches = self.batches
+        return {
+            'calls': self.calls,
+            'units': self.units,
+            'batches': batches,
+            'avg_batch': round(self.units / batches, 1) if batches else 0.0,
+            'max_batch': self.max_batch,
+            'busy_retries': self.busy_retries,
+            'queued': self._queue.qsize(),
+        }
+
+    def reset_stats(self):
+        self.calls = self.units = self.batches = self.busy_retries = self.max_batch = 0
+
+    # ------------------------------------------------------------------ 写线程
+    def _put(self, task):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='DbWriter', daemon=True)
+                self._thread.start()
+            self._queue.put(task)
+        return task.future
+
+    def _next(self):
+        if self._pending is not None:
+            task, self._pending = self._pending, None
+            return task
+        return self._queue.get()
+
+    def _loop(self):
+        while True:
+            task = self._next()
+            if task is None:
+                return
+            if not task.unit:
+                self._run_call(task)
+                continue
+            # 把队列中紧跟着的小写入一起取出，合并为一个事务
+            batch = [task]
+            while len(batch) < self.batch_size:
+                try:
+                    follower = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if follower is None or not follower.unit:
+                    self._pending = follower
+                    break
+                batch.append(follower)
+            self._run_batch(batch)
+
+    def _run_call(self, task):
+        if not task.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self._with_retry(lambda: task.func(*task.args, **task.kwargs))
+        except BaseException as e:
+            task.future.set_exception(e)
+        else:
+            task.future.set_result(result)
+        self.calls += 1
+
+    def _run_batch(self, batch):
+        batch = [task for task in batch if task.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            outcomes = self._with_retry(lambda: self._run_units(batch))
+        except BaseException as e:
+            for task in batch:
+                task.future.set_exception(e)
+            return
+        for task, (ok, value) in zip(batch, outcomes):
+            if ok:
+                task.future.set_result(value)
+            else:
+                task.future.set_exception(value)
+        self.units += len(batch)
+        self.batches += 1
+        self.max_batch = max(self.max_batch, len(batch))
+
+    def _run_units(self, tasks):
+        """在一个事务中依次执行小写入，返回 [(成功, 结果或异常)]；遇到 SQLITE_BUSY 整批回滚并抛出"""
+        db = self.session_factory(expire_on_commit=False)
+        outcomes = []
+        try:
+            for task in tasks:
+                try:
+                    with db.begin_nested():
+                        outcomes.append((True, task.func(db)))
+                except Exception as e:
+                    if is_busy_error(e):
+                        raise
+                    outcomes.append((False, e))
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return outcomes
+
+    def _prepare(self):
+        _install_begin_hook(self.session_factory.kw['bind'])
+        _thread_state.immediate = True
+
+    def _with_retry(self, action):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            self._prepare()
+            try:
+                return action()
+            except Exception as e:
+                if not is_busy_error(e) or attempt == self.retries:
+                    raise
+                self.busy_retries += 1
+                logger.log('WARNING', 'DB_WRITE_BUSY', str(e)[:200], attempt=attempt + 1, delay=delay)
+                time.sleep(delay)
+                delay *= 2
+            finally:
+                _thread_state.immediate = False
+
+
+# 全局写执行器
+write_executor = WriteExecutor()
+
+
+def routes_own_writes(func):
+    """标记自行决定如何提交到写线程的方法，serialize_writes 不再包装"""
+    func.__routes_own_writes__ = True
+    return func
+
+
+def serialize_writes(cls):
+    """类装饰器：写方法在未传入 db 且不在写线程中时交给 write_executor 执行"""
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('_') or not isinstance(value, staticmethod):
+            continue
+        if is_read(attr) or (cls.__name__, attr) in LOCAL_METHODS:
+            continue
+        func = value.__func__
+        if getattr(func, '__routes_own_writes__', False):
+            continue
+        setattr(cls, attr, staticmethod(_routed(func)))
+    return cls
+
+
+def _routed(func):
+    params = list(inspect.signature(func).parameters)
+    db_index = params.index('db') if 'db' in params else None
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        has_db = kwargs.get('db') is not None or (
+            db_index is not None and len(args) > db_index and args[db_index] is not None)
+        if has_db or write_executor.in_writer_thread():
+            return func(*args, **kwargs)
+        return write_executor.submit(func, *args, **kwargs).result()
+    return wrapper
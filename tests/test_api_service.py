@@ -0,0 +1,106 @@
+import socket
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+
+from models.database import Base, SessionLocal
+from models.resident import Resident
+from services.api_server import ApiServer
+from services.api_client import ApiClient, RemoteError
+from utils.money import Money
+
+
+@pytest.fixture
+def api(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}", connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    old_bind = SessionLocal.kw['bind']
+    SessionLocal.configure(bind=engine)
+    server = ApiServer('127.0.0.1', 0, token='secret').start()
+    host, port = server.address
+    yield ApiClient(f'http://{host}:{port}', token='secret')
+    server.stop()
+    SessionLocal.configure(bind=old_bind)
+    engine.dispose()
+
+
+def test_remote_calls_round_trip(api):
+    assert api.ping()['ok']
+    resident = api.call('ResidentService', 'create_resident', building='1', unit='2', room_no='301', name='张三', area=88.5)
+    assert isinstance(resident, Resident) and resident.full_room_no == '1-2-301'
+    item = api.call('ChargeService', 'create_charge_item', name='物业费', price=2.5, charge_type='area')
+    api.call('PaymentService', 'create_payment', resident_id=resident.id, charge_item_id=item.id, period='2024-05',
+             billing_start_date=datetime(2024, 5, 1), billing_end_date=datetime(2024, 5, 31),
+             billing_months=1, amount=Money('221.25'))
+
+    payments = api.call('PaymentService', 'get_payments_by_period', '2024-05')
+    assert len(payments) == 1
+    assert payments[0].amount == Money('221.25') and isinstance(payments[0].amount, Money)
+    assert payments[0].resident.name == '张三' and payments[0].charge_item.name == '物业费'
+    assert payments[0].billing_start_date == datetime(2024, 5, 1)
+
+    receipt = api.call('PaymentService', 'collect_payments', resident.id, {payments[0].id: None}, operator='前台1')
+    assert receipt['total'] == 221 and receipt['items'][0]['settled']
+
+    with pytest.raises(ValueError):
+        api.call('ResidentService', 'create_resident', building='1', unit='2', room_no='301', name='李四')
+    with pytest.raises(RemoteError):
+        api.call('ResidentService', '_delete_resident_rows', [resident.id])
+    with pytest.raises(RemoteError):
+        ApiClient(api.url).ping()
+
+
+def test_lan_server_requires_token():
+    with pytest.raises(ValueError):
+        ApiServer('0.0.0.0', 0)
+    ApiServer('127.0.0.1', 0).start().stop()
+
+
+def _flaky_server():
+    """第一个请求正常应答并保持连接，之后的请求读完就断开、不应答"""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(5)
+    received = []
+
+    def handle(conn):
+        with conn:
+            while True:
+                data = conn.recv(65536)
+                if not data:
+                    return
+                received.append(data.split(b' ', 2)[1])
+                if len(received) > 1:
+                    return
+                conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: 12\r\n\r\n{"ok": true}')
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener, received
+
+
+def test_sent_writes_are_not_retried():
+    listener, received = _flaky_server()
+    client = ApiClient(f'http://127.0.0.1:{listener.getsockname()[1]}')
+    try:
+        assert client.ping()['ok']
+        with pytest.raises(ConnectionError):
+            client.call('PaymentService', 'collect_payments', 1, amount=100)
+        # 写请求发出后连接断开：只发一次
+        assert received.count(b'/api/call/PaymentService/collect_payments') == 1
+        with pytest.raises(ConnectionError):
+            client.call('PaymentService', 'get_payments_by_period', '2024-05')
+        # 读请求可以重发，但新连接上的失败不再重发
+        assert received.count(b'/api/call/PaymentService/get_payments_by_period') <= 2
+    finally:
+        listener.close()
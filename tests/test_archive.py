@@ -0,0 +1,184 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+
+from models.database import Base, SessionLocal, archive_db_path
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from models.payment_transaction import PaymentTransaction
+from services.archive_service import ArchiveService
+from services.payment_service import PaymentService
+from services.reference_cache import reference_cache
+from services.write_executor import write_executor
+
+
+@pytest.fixture
+def file_db(tmp_path):
+    path = str(tmp_path / 'property.db')
+    engine = create_engine(f'sqlite:///{path}', connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    old_bind = SessionLocal.kw['bind']
+    SessionLocal.configure(bind=engine)
+    reference_cache.reset()
+    yield path
+    write_executor.shutdown()
+    SessionLocal.configure(bind=old_bind)
+    reference_cache.reset()
+    engine.dispose()
+
+
+def _bill(db, rid, period, paid):
+    payment = Payment(resident_id=rid, charge_item_id=1, period=period,
+                      billing_start_date=datetime(2020, 1, 1), billing_end_date=datetime(2020, 1, 31),
+                      billing_months=1, paid_months=1 if paid else 0,
+                      amount=100, paid_amount=100 if paid else 0, paid=1 if paid else 0)
+    db.add(payment)
+    db.flush()
+    if paid:
+        db.add(PaymentTransaction(payment_id=payment.id, amount=100, operator='收银员'))
+
+
+def test_archive_closed_periods(file_db):
+    db = SessionLocal()
+    db.add(ChargeItem(name='物业费', price=1, charge_type='fixed'))
+    db.add_all([Resident(room_no='101', name='张三'), Resident(room_no='102', name='李四')])
+    db.flush()
+    for period, paid in (('2020-01', True), ('2020-02', True), ('2020-03', False), ('2024-05', False)):
+        for rid in (1, 2):
+            _bill(db, rid, period, paid if rid == 1 else True)
+    db.commit()
+    db.close()
+
+    result = ArchiveService.archive_closed_periods(3, now=datetime(2024, 6, 1))
+    assert result['cutoff'] == '2021-06'
+    assert result['periods'] == ['2020-01', '2020-02']
+    assert result['open_periods'] == ['2020-03']
+    assert (result['payments'], result['transactions']) == (4, 4)
+    assert os.path.exists(archive_db_path(file_db))
+
+    # 默认只查主库，勾选归档后与原来一致
+    assert sorted({p.period for p in PaymentService.get_all_payments()}) == ['2020-03', '2024-05']
+    everything = PaymentService.get_all_payments(include_archive=True)
+    assert len(everything) == 8
+    assert len({p.id for p in everything}) == 8
+    assert PaymentService.get_periods(include_archive=True) == ['2024-05', '2020-03', '2020-02', '2020-01']
+    archived = PaymentService.get_payments_by_period('2020-01', include_archive=True)
+    assert [p.resident.name for p in archived] == ['张三', '李四']
+    assert len(PaymentService.search_payments('张三', include_archive=True)) == 4
+
+    stats = PaymentService.get_statistics_by_period('2020-02', include_archive=True)
+    assert stats['total_count'] == 2 and stats['paid_count'] == 2
+    assert ArchiveService.get_archived_periods()[0]['payment_count'] == 2
+
+    # 结清后再次归档
+    db = SessionLocal()
+    db.query(Payment).filter(Payment.period == '2020-03').update({'paid': 1, 'paid_amount': 100})
+    db.commit()
+    db.close()
+    result = ArchiveService.archive_closed_periods(3, now=datetime(2024, 6, 1))
+    assert result['periods'] == ['2020-03']
+    status = ArchiveService.get_archive_status()
+    assert (status['periods'], status['payments']) == (3, 6)
+
+    result = ArchiveService.archive_closed_periods(1, now=datetime(2026, 6, 1))
+    assert result['periods'] == [] and result['open_periods'] == ['2024-05']
+    db = SessionLocal()
+    db.query(Payment).filter(Payment.period == '2024-05').update({'paid': 1, 'paid_amount': 100})
+    db.commit()
+    db.close()
+    result = ArchiveService.archive_closed_periods(1, now=datetime(2026, 6, 1))
+    assert result['periods'] == ['2024-05']
+
+
+def test_deleted_hot_ids_are_not_reused_after_archive(file_db):
+    db = SessionLocal()
+    db.add(ChargeItem(name='物业费', price=1, charge_type='fixed'))
+    db.add_all([Resident(room_no='101', name='张三'), Resident(room_no='102', name='李四')])
+    db.flush()
+    for rid in (1, 2):
+        _bill(db, rid, '2020-01', True)
+    for rid in (1, 2):
+        _bill(db, rid, '2024-05', True)
+    db.commit()
+    db.close()
+
+    result = ArchiveService.archive_closed_periods(3, now=datetime(2024, 6, 1))
+    assert result['periods'] == ['2020-01']
+    archive = sqlite3.connect(archive_db_path(file_db))
+    archived_payment, archived_tx = archive.execute(
+        "SELECT (SELECT MAX(id) FROM payments), (SELECT MAX(id) FROM payment_transactions)").fetchone()
+    archive.close()
+
+    # 删除主库最新的账单后再出账、收费，新 ID 仍排在归档库之后
+    db = SessionLocal()
+    db.query(PaymentTransaction).delete()
+    db.query(Payment).delete()
+    db.commit()
+    _bill(db, 1, '2024-06', True)
+    db.commit()
+    new_payment = db.query(Payment).one()
+    new_tx = db.query(PaymentTransaction).one()
+    assert new_payment.id > archived_payment
+    assert new_tx.id > archived_tx
+    db.close()
+
+    everything = PaymentService.get_all_payments(include_archive=True)
+    assert len(everything) == len({p.id for p in everything}) == 3
+
+
+def _seed_archivable(db_path):
+    db = SessionLocal()
+    db.add(ChargeItem(name='物业费', price=1, charge_type='fixed'))
+    db.add_all([Resident(room_no='101', name='张三'), Resident(room_no='102', name='李四')])
+    db.flush()
+    for period in ('2020-01', '2024-05'):
+        for rid in (1, 2):
+            _bill(db, rid, period, True)
+    db.commit()
+    db.close()
+
+
+def _restore(engine, entry):
+    engine.restore(entry)
+    # 测试夹具自建的引擎不在 get_engine 的连接池里，文件替换后需自行释放旧连接
+    SessionLocal.kw['bind'].dispose()
+
+
+def test_snapshot_restores_archive_with_database(file_db, tmp_path):
+    from utils.backup_engine import BackupEngine
+
+    _seed_archivable(file_db)
+    ArchiveService.archive_closed_periods(3, now=datetime(2024, 6, 1))
+    engine = BackupEngine(backup_dir=str(tmp_path / 'backup'), db_path=file_db, min_free_bytes=0)
+    entry = engine.snapshot()
+    assert entry.archive and os.path.exists(os.path.join(engine.backup_dir, entry.archive))
+
+    # 归档库丢失后从快照恢复，历史账单一并回来
+    os.remove(archive_db_path(file_db))
+    _restore(engine, entry)
+    everything = PaymentService.get_all_payments(include_archive=True)
+    assert sorted(p.period for p in everything) == ['2020-01', '2020-01', '2024-05', '2024-05']
+
+
+def test_restore_before_archive_does_not_duplicate(file_db, tmp_path):
+    from utils.backup_engine import BackupEngine
+
+    _seed_archivable(file_db)
+    engine = BackupEngine(backup_dir=str(tmp_path / 'backup'), db_path=file_db, min_free_bytes=0)
+    before = engine.snapshot()
+    assert before.archive is None
+    ArchiveService.archive_closed_periods(3, now=datetime(2024, 6, 1))
+
+    _restore(engine, before)
+    everything = PaymentService.get_all_payments(include_archive=True)
+    assert len(everything) == len({p.id for p in everything}) == 4
+    assert ArchiveService.get_archived_periods() == []
+
+    # 再次归档不会主键冲突
+    result = ArchiveService.archive_closed_periods(3, now=datetime(2024, 6, 1))
+    assert (result['periods'], result['payments']) == (['2020-01'], 2)
+    assert len(PaymentService.get_all_payments(include_archive=True)) == 4
@@ -0,0 +1,121 @@
+import sqlite3
+from datetime import datetime, timedelta
+from utils.backup_engine import BackupEngine, BackupEntry
+
+
+def _make_db(path, rows):
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+    conn.executemany("INSERT INTO t (v) VALUES (?)", [(f"row{i}" * 20,) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def _values(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("SELECT id, v FROM t ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_full_then_delta_snapshot_roundtrip(tmp_path):
+    db = tmp_path / 'property.db'
+    _make_db(db, 3000)
+    engine = BackupEngine(backup_dir=str(tmp_path / 'backup'), db_path=str(db), min_free_bytes=0)
+
+    full = engine.snapshot()
+    assert full.kind == 'full'
+    assert full.size < full.db_size
+
+    conn = sqlite3.connect(str(db))
+    conn.execute("UPDATE t SET v = 'changed' WHERE id = 5")
+    conn.execute("INSERT INTO t (v) VALUES ('new')")
+    conn.commit()
+    conn.close()
+    expected = _values(db)
+
+    delta = engine.snapshot()
+    assert delta.kind == 'delta'
+    assert delta.base == full.id
+    assert delta.size < full.size
+
+    listed = engine.list_backups()
+    assert [e.id for e in listed][:2] == [delta.id, full.id]
+
+    out = tmp_path / 'restored.db'
+    engine.materialize(delta, str(out))
+    assert _values(out) == expected
+
+
+def test_retention_keeps_daily_and_referenced_full(tmp_path):
+    engine = BackupEngine(backup_dir=str(tmp_path), db_path=str(tmp_path / 'x.db'),
+                          keep_daily=2, keep_weekly=0, keep_monthly=0)
+    now = datetime(2024, 3, 10, 12, 0, 0)
+
+    def entry(id, days_ago, kind='delta', base='f0'):
+        created = (now - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S')
+        return BackupEntry(id, kind, f'{id}.gz', created, base=base if kind == 'delta' else None,
+                           backup_dir=str(tmp_path))
+
+    entries = [entry('f0', 5, 'full'), entry('d1', 3), entry('d2', 1), entry('d3', 0),
+               entry('d4', 0)]
+    kept = {e.id for e in engine._apply_retention(entries)}
+    assert kept == {'d4', 'd2', 'f0'}
+
+    # 旧版 raw 备份与最近一次恢复前快照不参与清理
+    legacy = BackupEntry('property_backup_old', 'raw', 'property_backup_old.db', '2023-01-01 00:00:00',
+                         backup_dir=str(tmp_path))
+    entries = [legacy, entry('f0', 5, 'full'), entry('d1', 3), entry('d2', 1), entry('d3', 0), entry('d4', 0)]
+    entries[2].reason = 'pre-restore'
+    kept = {e.id for e in engine._apply_retention(entries)}
+    assert kept == {'property_backup_old', 'd1', 'd4', 'd2', 'f0'}
+
+
+def test_concurrent_engines_share_directory_lock(tmp_path):
+    import threading
+    import subprocess
+    import sys
+    import os
+
+    db = tmp_path / 'property.db'
+    _make_db(db, 500)
+    backup_dir = str(tmp_path / 'backup')
+    engines = [BackupEngine(backup_dir=backup_dir, db_path=str(db), min_free_bytes=0) for _ in range(4)]
+    errors = []
+    created = []
+
+    def run(engine):
+        try:
+            created.append(engine.snapshot())
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(e,)) for e in engines]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert len({e.id for e in created}) == 4
+    # 同一天的快照按保留策略只留最新一个（及其依赖的全量），索引与文件一致
+    entries = BackupEngine(backup_dir=backup_dir, db_path=str(db)).list_backups()
+    latest = max(created, key=lambda e: (e.created, e.id))
+    assert entries[0].id == latest.id
+    assert all(os.path.exists(e.path) for e in entries)
+
+    # 持有目录锁时，另一个进程拿不到 backup.lock
+    code = (
+        "import sys; sys.path.insert(0, sys.argv[1]);"
+        "from utils.backup_engine import _lock_file;"
+        "_lock_file(sys.argv[2], timeout=0.5)"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with engines[0]._lock:
+        held = subprocess.run([sys.executable, '-c', code, root, os.path.join(backup_dir, 'backup.lock')],
+                              capture_output=True)
+    assert held.returncode != 0
+    free = subprocess.run([sys.executable, '-c', code, root, os.path.join(backup_dir, 'backup.lock')],
+                          capture_output=True)
+    assert free.returncode == 0
@@ -0,0 +1,90 @@
+import sqlite3
+from utils.backup_manager import BackupManager
+
+
+def _make_db(path, rows):
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+    conn.executemany("INSERT INTO t (v) VALUES (?)", [(f"row{i}" * 20,) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def _count(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_backup_reports_progress_and_passes_integrity(tmp_path):
+    db = tmp_path / 'property.db'
+    _make_db(db, 2000)
+    steps = []
+    path = BackupManager.backup_database(backup_dir=str(tmp_path / 'backup'), db_path=str(db),
+                                         progress=lambda done, total: steps.append((done, total)))
+
+    assert _count(path) == 2000
+    assert BackupManager.check_integrity(path) == (True, 'ok')
+    assert steps and steps[-1][0] == steps[-1][1]
+    assert not list((tmp_path / 'backup').glob('*.tmp'))
+
+
+def test_restore_replaces_database_and_rejects_corrupt_backup(tmp_path):
+    db = tmp_path / 'property.db'
+    _make_db(db, 10)
+    backup = BackupManager.backup_database(backup_dir=str(tmp_path / 'backup'), db_path=str(db))
+
+    conn = sqlite3.connect(str(db))
+    conn.execute("DELETE FROM t")
+    conn.commit()
+    conn.close()
+
+    BackupManager.restore_database(backup, db_path=str(db), backup_dir=str(tmp_path / 'backup'))
+    assert _count(db) == 10
+
+    bad = tmp_path / 'backup' / 'property_backup_bad.db'
+    bad.write_bytes(b'not a database' * 100)
+    try:
+        BackupManager.restore_database(str(bad), db_path=str(db), backup_dir=str(tmp_path / 'backup'))
+        assert False, '损坏的备份不应被恢复'
+    except Exception as e:
+        assert '损坏' in str(e)
+    assert _count(db) == 10
+
+
+def test_restore_migrates_old_backup(tmp_path):
+    from migrate_db import latest_version
+    from models.charge_item import ChargeItem
+    from models.database import get_engine
+    from sqlalchemy.orm import sessionmaker
+
+    # 金额改为整数分之前的备份：user_version 为 5，价格按元保存
+    old = tmp_path / 'property_backup_20240101_000000.db'
+    conn = sqlite3.connect(str(old))
+    conn.executescript("""
+        CREATE TABLE charge_items (id INTEGER PRIMARY KEY, name VARCHAR(50), price NUMERIC(10,2),
+                                   charge_type VARCHAR(20), status INTEGER);
+        CREATE TABLE residents (id INTEGER PRIMARY KEY, room_no VARCHAR(20), name VARCHAR(50),
+                                phone VARCHAR(20), area FLOAT, status INTEGER);
+        CREATE TABLE payments (id INTEGER PRIMARY KEY, resident_id INTEGER, charge_item_id INTEGER,
+                               period VARCHAR(7), amount NUMERIC(10,2), paid INTEGER);
+        INSERT INTO charge_items (name, price, charge_type, status) VALUES ('垃圾费', 2.5, 'fixed', 1);
+    """)
+    conn.commit()
+    conn.close()
+
+    db = tmp_path / 'property.db'
+    _make_db(db, 1)
+    BackupManager.restore_database(str(old), db_path=str(db), keep_current=False)
+
+    conn = sqlite3.connect(str(db))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == latest_version()
+    conn.close()
+    session = sessionmaker(bind=get_engine(str(db)))()
+    try:
+        assert float(session.query(ChargeItem.price).scalar()) == 2.5
+    finally:
+        session.close()
+        get_engine(str(db)).dispose()
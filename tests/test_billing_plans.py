@@ -0,0 +1,56 @@
+import pytest
+
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from services.billing_plan_service import BillingPlanService, period_range
+from services.payment_service import PaymentService
+
+
+def test_run_period_is_idempotent(db_session):
+    db_session.add_all([Resident(building='1', unit='1', room_no=str(100 + i), name=f'住户{i}', area=50 + i,
+                                 property_type='residential', status=1) for i in range(5)])
+    db_session.add_all([
+        ChargeItem(name='物业费', price=1.5, unit='元/平方米/月', charge_type='area', status=1),
+        ChargeItem(name='垃圾费', price=10, unit='元/月', charge_type='fixed', status=1),
+    ])
+    db_session.commit()
+    for item in db_session.query(ChargeItem):
+        BillingPlanService.create_plan(item.id, billing_months=3, db=db_session)
+
+    first = BillingPlanService.run_period('2024-11', db=db_session)
+    assert (first['created'], first['skipped']) == (10, 0)
+    again = BillingPlanService.run_period('2024-11', db=db_session)
+    assert (again['created'], again['skipped']) == (0, 10)
+
+    payment = db_session.query(Payment).join(ChargeItem).filter(ChargeItem.name == '垃圾费').first()
+    assert (payment.billing_months, float(payment.amount)) == (3, 30)
+    assert payment.billing_end_date == period_range('2024-11', 3)[1]
+    assert payment.billing_end_date.strftime('%Y-%m-%d') == '2025-01-31'
+
+
+def test_create_payment_rejects_duplicate(db_session):
+    db_session.add_all([Resident(room_no='101', name='张三'), ChargeItem(name='垃圾费', price=10, charge_type='fixed')])
+    db_session.commit()
+
+    start, end = period_range('2024-11')
+    PaymentService.create_payment(1, 1, '2024-11', start, end, 1, 10, db=db_session)
+    with pytest.raises(ValueError, match='已有此收费项目的账单'):
+        PaymentService.create_payment(1, 1, '2024-11', start, end, 1, 10, db=db_session)
+
+
+
+def test_multi_month_plan_bills_once_per_cycle(db_session):
+    db_session.add_all([Resident(room_no='101', name='张三', status=1),
+                        ChargeItem(name='垃圾费', price=10, unit='元/月', charge_type='fixed', status=1)])
+    db_session.commit()
+    BillingPlanService.create_plan(1, billing_months=3, db=db_session)
+
+    results = {period: BillingPlanService.run_period(period, db=db_session)
+               for period in ('2025-01', '2025-02', '2025-03', '2025-04')}
+    assert [r['created'] for r in results.values()] == [1, 0, 0, 1]
+    assert results['2025-02']['not_due'][0]['next_period'] == '2025-04'
+
+    bills = db_session.query(Payment).order_by(Payment.period).all()
+    assert [(b.period, b.billing_start_date.strftime('%m-%d'), b.billing_end_date.strftime('%m-%d'))
+            for b in bills] == [('2025-01', '01-01', '03-31'), ('2025-04', '04-01', '06-30')]
@@ -0,0 +1,92 @@
+import io
+import json
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import cli
+import models.database as database
+import utils.backup_manager as backup_manager
+from models.database import SessionLocal, init_db, get_engine
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from services.billing_plan_service import BillingPlanService
+from services.reference_cache import reference_cache
+
+
+@pytest.fixture
+def estate(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'ESTATES_FILE', str(tmp_path / 'estates.json'))
+    monkeypatch.setattr(backup_manager, '_default_backup_dir', lambda: str(tmp_path / 'backup'))
+    old_estate, old_bind = database.current_estate(), SessionLocal.kw['bind']
+    path = str(tmp_path / 'east.db')
+    init_db(path)
+    db = sessionmaker(bind=get_engine(path))()
+    db.add(ChargeItem(name='物业费', price=100, charge_type='fixed'))
+    db.add_all([Resident(room_no='101', name='张三'), Resident(room_no='102', name='李四')])
+    db.add(Payment(resident_id=1, charge_item_id=1, period='2026-09', billing_start_date=datetime(2026, 9, 1),
+                   billing_end_date=datetime(2026, 9, 30), amount=100, paid_amount=0, paid=0))
+    db.commit()
+    db.close()
+    key = database.add_estate('东苑', path).key
+    reference_cache.reset()
+    yield key, tmp_path
+    database._current_estate = old_estate
+    SessionLocal.configure(bind=old_bind)
+    reference_cache.reset()
+
+
+def run(*argv):
+    out, err = io.StringIO(), io.StringIO()
+    code = cli.main(list(argv), stdout=out, stderr=err)
+    return code, out.getvalue(), err.getvalue()
+
+
+def test_billing_exports_and_exit_codes(estate):
+    key, tmp_path = estate
+    code, out, _ = run('--estate', key, '--json', 'billing', 'run', '--period', '2026-10')
+    assert code == cli.EXIT_ERROR and '出账计划' in json.loads(out)['error']
+
+    BillingPlanService.create_plan(1)
+    code, out, err = run('--estate', key, '--json', 'billing', 'run', '--period', '2026-10')
+    assert code == cli.EXIT_OK
+    assert json.loads(out)['created'] == 2 and '物业费' in err
+    # 重复执行不产生重复账单
+    code, out, _ = run('--estate', key, '--json', 'billing', 'run', '--period', '2026-10')
+    assert (json.loads(out)['created'], json.loads(out)['skipped']) == (0, 2)
+
+    target = str(tmp_path / 'unpaid.xlsx')
+    code, out, _ = run('--estate', key, '--json', '--quiet', 'export', 'unpaid', '--period', '2026-10',
+                       '--output', target)
+    assert code == cli.EXIT_OK and json.loads(out)['file'] == target
+
+    code, out, _ = run('--estate', key, '--json', 'backup', 'create')
+    assert code == cli.EXIT_OK and json.loads(out)['kind'] == 'full'
+
+    assert run('billing', 'run', '--period', '2026-13')[0] == cli.EXIT_USAGE
+    # 命令行指定的小区不改变界面记住的当前小区
+    assert database._read_estates_file().get('current') != key
+
+
+def test_migration_output_stays_off_stdout(estate):
+    key, tmp_path = estate
+    conn = sqlite3.connect(str(tmp_path / 'east.db'))
+    conn.execute("PRAGMA user_version = 11")
+    conn.close()
+    code, out, err = run('--estate', key, '--json', 'backup', 'list')
+    assert code == cli.EXIT_OK and isinstance(json.loads(out), (list, dict))
+    assert '数据库迁移' in err
+
+
+def test_cli_does_not_import_qt():
+    code = ("import sys, cli; cli.build_parser();"
+            "import services.billing_plan_service, utils.excel_exporter, utils.excel_importer,"
+            " utils.report_generator, utils.backup_engine, services.archive_service;"
+            "print(any(m.startswith('PyQt5') for m in sys.modules))")
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=cli.PROJECT_ROOT)
+    assert output.strip() == b'False'
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from models.payment_transaction import PaymentTransaction
+from services.billing_plan_service import period_range
+from services.closeout_service import CloseoutService, day_range
+
+
+def test_closeout_groups_transactions_and_reconciles(db_session):
+    db_session.add_all([Resident(room_no='101', name='张三'), Resident(room_no='102', name='李四'),
+                        ChargeItem(name='物业费', price=100, charge_type='fixed'),
+                        ChargeItem(name='停车费', price=50, charge_type='fixed')])
+    db_session.commit()
+    start, end = period_range('2026-10')
+    for resident_id, item_id, paid in ((1, 1, 100), (2, 1, 100), (1, 2, 80)):
+        db_session.add(Payment(resident_id=resident_id, charge_item_id=item_id, period='2026-10',
+                               billing_start_date=start, billing_end_date=end, amount=100, paid_amount=paid))
+    db_session.commit()
+    for payment_id, amount, when, operator in ((1, 100, datetime(2026, 10, 18, 9), '甲'),
+                                               (2, 60, datetime(2026, 10, 18, 10), '乙'),
+                                               (2, 40, datetime(2026, 10, 19, 9), '甲'),
+                                               (3, 50, datetime(2026, 10, 19, 10), None),
+                                               (1, 10, datetime(2026, 10, 20, 9), '甲')):
+        db_session.add(PaymentTransaction(payment_id=payment_id, amount=amount, paid_time=when, operator=operator))
+    db_session.commit()
+
+    closeout = CloseoutService.get_closeout('2026-10-18', '2026-10-19', db=db_session)
+    assert [(r['day'], r['operator'], r['item'], r['count'], float(r['amount'])) for r in closeout['rows']] == [
+        ('2026-10-18', '乙', '物业费', 1, 60), ('2026-10-18', '甲', '物业费', 1, 100),
+        ('2026-10-19', '未记录', '停车费', 1, 50), ('2026-10-19', '甲', '物业费', 1, 40)]
+    assert [(r['operator'], float(r['amount'])) for r in closeout['by_operator']] == [
+        ('乙', 60), ('未记录', 50), ('甲', 140)]
+    assert (closeout['total']['count'], float(closeout['total']['amount'])) == (4, 250)
+    assert CloseoutService.get_closeout('2026-10-19', operator='未记录', db=db_session)['total']['count'] == 1
+
+    # 明细按 (收款时间, ID) 分页
+    first = CloseoutService.get_closeout_details('2026-10-18', '2026-10-20', limit=3, db=db_session)
+    rest = CloseoutService.get_closeout_details('2026-10-18', '2026-10-20', limit=3, db=db_session,
+                                                after=(first[-1]['paid_time'], first[-1]['id']))
+    assert [r['id'] for r in first + rest] == [1, 2, 3, 4, 5] and rest[0]['item'] == '停车费'
+
+    # 账单 1 的流水合计 110 与已缴 100 不一致；账单 3 已缴 80 而流水只有 50
+    reconciliation = CloseoutService.get_reconciliation('2026-10-18', '2026-10-19', db=db_session)
+    assert reconciliation['checked'] == 3
+    assert [(m['payment_id'], float(m['difference'])) for m in reconciliation['mismatches']] == [(1, -10), (3, 30)]
+
+    with pytest.raises(ValueError):
+        day_range('2026-10-20', '2026-10-19')
+
+
+def test_mark_paid_transactions_use_local_time(db_session):
+    from services.payment_service import PaymentService
+
+    db_session.add_all([Resident(room_no='101', name='张三'), ChargeItem(name='物业费', price=100, charge_type='fixed')])
+    db_session.commit()
+    start, end = period_range('2026-10')
+    db_session.add(Payment(resident_id=1, charge_item_id=1, period='2026-10', billing_start_date=start,
+                           billing_end_date=end, billing_months=1, paid_months=0, amount=100, paid_amount=0))
+    db_session.commit()
+
+    before = datetime.now()
+    PaymentService.mark_paid(1, operator='甲', db=db_session)
+    tx = db_session.query(PaymentTransaction).one()
+    assert before <= tx.paid_time <= datetime.now()
+    today = CloseoutService.get_closeout(before.date(), db=db_session)
+    assert today['total']['count'] == 1 and today['by_operator'][0]['operator'] == '甲'
+
+
+def test_migration_converts_utc_transaction_times(tmp_path):
+    import sqlite3
+    import migrate_db
+
+    path = str(tmp_path / 'property.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE payment_transactions (id INTEGER PRIMARY KEY, payment_id INTEGER, paid_time DATETIME)")
+    conn.execute("INSERT INTO payment_transactions VALUES (1, 1, '2026-10-18 23:30:00')")
+    conn.execute("INSERT INTO payment_transactions VALUES (2, 1, '2026-10-19 07:30:00.123456')")
+    conn.execute("PRAGMA user_version = 11")
+    conn.commit()
+    conn.close()
+
+    assert migrate_db.migrate_database(path)
+    conn = sqlite3.connect(path)
+    rows = dict(conn.execute("SELECT id, paid_time FROM payment_transactions").fetchall())
+    local = conn.execute("SELECT datetime('2026-10-18 23:30:00', 'localtime')").fetchone()[0]
+    conn.close()
+    assert rows == {1: local, 2: '2026-10-19 07:30:00.123456'}
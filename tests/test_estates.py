@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import models.database as database
+from models.database import SessionLocal, init_db, get_engine
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from services.estate_report_service import EstateReportService
+
+
+@pytest.fixture
+def estates(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'ESTATES_FILE', str(tmp_path / 'estates.json'))
+    old_estate, old_bind = database.current_estate(), SessionLocal.kw['bind']
+    yield tmp_path
+    database._current_estate = old_estate
+    SessionLocal.configure(bind=old_bind)
+
+
+def _populate(path, amounts, paid):
+    init_db(path)
+    db = sessionmaker(bind=get_engine(path))()
+    db.add(ChargeItem(name='物业费', price=1, charge_type='fixed'))
+    for i, amount in enumerate(amounts):
+        db.add(Resident(room_no=str(101 + i), name=f'住户{i}'))
+        db.add(Payment(resident_id=i + 1, charge_item_id=1, period='2024-05',
+                       billing_start_date=datetime(2024, 5, 1), billing_end_date=datetime(2024, 5, 31),
+                       amount=amount, paid_amount=amount if i in paid else 0, paid=1 if i in paid else 0))
+    db.commit()
+    db.close()
+
+
+def test_consolidated_statistics_and_switch(estates):
+    a, b = str(estates / 'a.db'), str(estates / 'b.db')
+    _populate(a, [100, 50.5], paid={0})
+    _populate(b, [20], paid=set())
+    estate_a = database.add_estate('东苑', a)
+    estate_b = database.add_estate('西苑', b)
+
+    stats = EstateReportService.get_statistics_by_period('2024-05', [estate_a.key, estate_b.key])
+    assert [(r['name'], r['total_count'], str(r['total_amount']), str(r['paid_amount'])) for r in stats['estates']] == \
+        [('东苑', 2, '150.50', '100.00'), ('西苑', 1, '20.00', '0.00')]
+    assert str(stats['total']['unpaid_amount']) == '70.50'
+
+    items = EstateReportService.get_item_breakdown('2024-05', [estate_b.key])
+    assert [(r['name'], r['item'], r['count']) for r in items] == [('西苑', '物业费', 1)]
+
+    database.switch_estate(estate_b.key)
+    assert database.current_db_path() == b
+    db = SessionLocal()
+    try:
+        assert db.query(Payment).count() == 1
+    finally:
+        db.close()
+    with pytest.raises(ValueError):
+        database.remove_estate(estate_b.key)
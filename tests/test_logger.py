@@ -0,0 +1,38 @@
+import json
+from utils.logger import RuntimeLogger
+
+
+def test_log_records_are_jsonl(tmp_path):
+    log = RuntimeLogger(logs_dir=str(tmp_path))
+    log.log_operation("CREATE_PAYMENT_START", "resident_id=1")
+    try:
+        raise ValueError("缴费记录不存在")
+    except ValueError as e:
+        log.log_error(e, "DELETE_PAYMENT_FAILED")
+    log.close()
+
+    lines = (tmp_path / 'run_errors.log').read_text(encoding='utf-8').splitlines()
+    records = [json.loads(line) for line in lines]
+    assert records[0]['level'] == 'INFO'
+    assert records[0]['event'] == 'CREATE_PAYMENT_START'
+    assert records[1]['level'] == 'ERROR'
+    assert records[1]['message'] == '缴费记录不存在'
+    assert 'ValueError' in records[1]['stack']
+
+
+def test_size_rotation_and_tail(tmp_path):
+    log = RuntimeLogger(logs_dir=str(tmp_path), max_bytes=2000, backup_count=2)
+    for i in range(200):
+        log.log_operation("OP", f"item={i}")
+        if i % 20 == 0:
+            log.flush()
+    log.flush()
+
+    assert (tmp_path / 'run_errors.log.1').exists()
+    assert not (tmp_path / 'run_errors.log.3').exists()
+    assert (tmp_path / 'run_errors.log').stat().st_size <= 2000
+
+    tail = log.get_recent_errors(lines=3).split('\n')
+    assert len(tail) == 3
+    assert json.loads(tail[-1])['message'] == 'item=199'
+    log.close()
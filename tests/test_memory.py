@@ -0,0 +1,104 @@
+import tracemalloc
+
+from utils import memory
+from utils.memory import MemoryTracker
+
+
+class FakeTable:
+    def __init__(self):
+        self.rows = 0
+
+    def rowCount(self):
+        return self.rows
+
+    def columnCount(self):
+        return 4
+
+
+def test_measure_views_budget_and_dump(tmp_path, monkeypatch):
+    tracker = MemoryTracker()
+    table = FakeTable()
+    monkeypatch.setattr(memory, 'memory_tracker', tracker)
+
+    class Window:
+        payment_table = table
+
+        @memory.track_view('缴费记录', 'payment_table')
+        def load_payments(self):
+            table.rows = 1000
+            self.held = [bytearray(1024) for _ in range(table.rows)]
+            return 'ok'
+
+    window = Window()
+    # 未跟踪时只记录行数和单元格数
+    assert window.load_payments(True) == 'ok'
+    view = tracker.views()[0]
+    assert (view['loads'], view['rows'], view['cells']) == (1, 1000, 4000)
+    assert 'peak_kb' not in view
+
+    was_tracing = tracemalloc.is_tracing()
+    tracker.start()
+    try:
+        window.load_payments()
+        view = tracker.views()[0]
+        assert view['delta_kb'] >= 900
+        assert view['top'] and 'test_memory.py' in view['top'][0]['where']
+        monkeypatch.setitem(memory.VIEW_BUDGETS_MB, '缴费记录', 1.0)
+        window.load_payments()
+        assert tracker.views()[0]['over_budget'] is True
+
+        path = tracker.dump_top(str(tmp_path / 'memory.txt'))
+        text = open(path, encoding='utf-8').read()
+        assert '分配最多的' in text and '缴费记录：1000 行' in text
+    finally:
+        if not was_tracing:
+            tracker.stop()
+
+
+def test_peak_without_reset_peak(monkeypatch):
+    # Python 3.8 的 tracemalloc 没有 reset_peak，峰值和预算检查仍要可用
+    monkeypatch.delattr(tracemalloc, 'reset_peak', raising=False)
+    tracker = MemoryTracker()
+    table = FakeTable()
+    held = []
+
+    def load():
+        table.rows = 1000
+        held.extend(bytearray(1024) for _ in range(table.rows))
+
+    was_tracing = tracemalloc.is_tracing()
+    tracker.start()
+    try:
+        tracker.measure('缴费记录', load, table)
+        view = tracker.views()[0]
+        assert view['peak_kb'] >= 900 and view['delta_kb'] >= 900
+        assert view['peak_mb_per_10k'] is not None and view['over_budget'] is False
+    finally:
+        if not was_tracing:
+            tracker.stop()
+
+
+def test_paged_loads_accumulate_toward_budget(monkeypatch):
+    # 首屏只有 200 行，低于 BUDGET_MIN_ROWS；滚动追加的后续页要计入同一视图
+    tracker = MemoryTracker()
+    table = FakeTable()
+    held = []
+
+    def page():
+        table.rows += 200
+        held.extend(bytearray(1024) for _ in range(200))
+
+    monkeypatch.setitem(memory.VIEW_BUDGETS_MB, '缴费记录', 1.0)
+    was_tracing = tracemalloc.is_tracing()
+    tracker.start()
+    try:
+        tracker.measure('缴费记录', page, table)
+        assert tracker.views()[0]['over_budget'] is False
+        for _ in range(2):
+            tracker.measure_page(table, page)
+        view = tracker.views()[0]
+        assert (view['loads'], view['rows']) == (1, 600)
+        assert view['peak_kb'] >= 540 and view['over_budget'] is True
+    finally:
+        if not was_tracing:
+            tracker.stop()
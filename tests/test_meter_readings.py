@@ -0,0 +1,62 @@
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from models.meter_reading import MeterReading
+from services.meter_reading_service import MeterReadingService
+
+
+def _setup(db_session):
+    db_session.add_all([
+        Resident(building='1', unit='1', room_no='101', name='张三', area=80),
+        Resident(building='1', unit='1', room_no='102', name='李四', area=90),
+        ChargeItem(name='电费', price=0.6, unit='元/度', charge_type='fixed'),
+    ])
+    db_session.commit()
+    return db_session.query(ChargeItem).first().id
+
+
+def _write_csv(path, rows):
+    path.write_text('楼栋,单元,房号,表号,本期读数,上期读数\n' + '\n'.join(rows) + '\n', encoding='gbk')
+    return str(path)
+
+
+def test_import_fills_previous_and_billing_links_readings(db_session, tmp_path):
+    item_id = _setup(db_session)
+    first = _write_csv(tmp_path / 'm1.csv', ['1,1,101,A,100,0', '1,1,102,,50,0', '1,1,999,,1,0'])
+    success, fail, errors = MeterReadingService.import_readings(first, item_id, '2024-01', db=db_session)
+    assert (success, fail) == (2, 1) and '不存在' in errors[0]
+
+    second = _write_csv(tmp_path / 'm2.csv', ['1,1,101,A,123.45,', '1,1,102,,40,'])
+    MeterReadingService.import_readings(second, item_id, '2024-02', db=db_session)
+    readings = {r['room']: r for r in MeterReadingService.get_readings_by_period(item_id, '2024-02', db=db_session)}
+    assert readings['1-1-101']['previous_value'] == 100 and readings['1-1-101']['usage'] == 23.45
+
+    summary = MeterReadingService.run_billing(item_id, '2024-02', db=db_session)
+    assert summary['created'] == 1 and len(summary['skipped_negative']) == 1
+    payment = db_session.query(Payment).one()
+    assert float(payment.usage) == 23.45 and float(payment.amount) == 14  # 23.45 * 0.6 = 14.07 -> 14
+    linked = db_session.query(MeterReading).filter(MeterReading.payment_id == payment.id).count()
+    assert linked == 1
+
+    # 重复出账不会生成第二张账单；已出账的读数不能再修改
+    assert MeterReadingService.run_billing(item_id, '2024-02', db=db_session)['created'] == 0
+    _, fail, errors = MeterReadingService.import_readings(second, item_id, '2024-02', db=db_session)
+    assert fail == 1 and '已出账' in errors[0]
+
+
+def test_billing_skips_residents_with_incomplete_meters(db_session, tmp_path):
+    item_id = _setup(db_session)
+    first = _write_csv(tmp_path / 'm1.csv', ['1,1,101,A,100,0', '1,1,102,A,50,0'])
+    MeterReadingService.import_readings(first, item_id, '2024-01', db=db_session)
+    # 101 新增的 B 表没有上期读数：不能只按 A 表出账
+    second = _write_csv(tmp_path / 'm2.csv', ['1,1,101,A,110,', '1,1,101,B,30,', '1,1,102,A,60,'])
+    MeterReadingService.import_readings(second, item_id, '2024-02', db=db_session)
+
+    summary = MeterReadingService.run_billing(item_id, '2024-02', db=db_session)
+    assert summary['created'] == 1 and summary['skipped_no_previous'] == 1
+    assert summary['skipped_incomplete'] == [1]
+    payment = db_session.query(Payment).filter(Payment.period == '2024-02').one()
+    assert payment.resident_id == 2
+    unlinked = db_session.query(MeterReading).filter(MeterReading.period == '2024-02',
+                                                     MeterReading.payment_id.is_(None)).all()
+    assert sorted(r.meter_no for r in unlinked) == ['A', 'B'] and {r.resident_id for r in unlinked} == {1}
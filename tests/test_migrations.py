@@ -0,0 +1,121 @@
+import sqlite3
+import migrate_db
+from migrate_db import migrate_database, latest_version, _rebuild_table
+
+
+def _legacy_db(path):
+    conn = sqlite3.connect(str(path))
+    conn.executescript("""
+        CREATE TABLE charge_items (id INTEGER PRIMARY KEY, name VARCHAR(50), price NUMERIC(10,2),
+                                   charge_type VARCHAR(20), status INTEGER);
+        CREATE TABLE residents (id INTEGER PRIMARY KEY, room_no VARCHAR(20), name VARCHAR(50),
+                                phone VARCHAR(20), area FLOAT, status INTEGER);
+        CREATE TABLE payments (id INTEGER PRIMARY KEY, resident_id INTEGER, charge_item_id INTEGER,
+                               period VARCHAR(7), amount NUMERIC(10,2), paid INTEGER);
+        INSERT INTO payments (resident_id, charge_item_id, period, amount, paid) VALUES (1, 1, '2024-02', 100, 1);
+        INSERT INTO payments (resident_id, charge_item_id, period, amount, paid) VALUES (1, 1, '2024-02', 100, 0);
+    """)
+    conn.commit()
+    conn.close()
+
+
+def _columns(path, table):
+    conn = sqlite3.connect(str(path))
+    try:
+        return [r[1] for r in conn.execute(f"PRAGMA table_info('{table}')")]
+    finally:
+        conn.close()
+
+
+def test_legacy_database_is_upgraded_once(tmp_path):
+    db = tmp_path / 'property.db'
+    _legacy_db(db)
+
+    assert migrate_database(str(db))
+    conn = sqlite3.connect(str(db))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == latest_version()
+    row = conn.execute("SELECT billing_start_date, billing_end_date, billing_months, paid_amount FROM payments").fetchone()
+    # 升级前的重复账单保留，编号后满足唯一索引
+    assert [r[0] for r in conn.execute("SELECT dedup_seq FROM payments ORDER BY id")] == [0, 1]
+    conn.close()
+    assert row[0].startswith('2024-02-01') and row[1].startswith('2024-02-29')
+    assert row[2] == 1 and row[3] == 10000  # 金额按分保存
+    assert {'usage', 'paid_months'} <= set(_columns(db, 'payments'))
+    assert {'building', 'unit', 'identity'} <= set(_columns(db, 'residents'))
+
+    # 已是最新版本：不再执行任何步骤
+    assert migrate_database(str(db))
+
+
+def test_failed_step_rolls_back_everything(tmp_path, monkeypatch):
+    db = tmp_path / 'property.db'
+    _legacy_db(db)
+
+    def broken(cursor):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(migrate_db, 'MIGRATIONS', migrate_db.MIGRATIONS + [(999, 'broken', broken)])
+    assert not migrate_database(str(db))
+
+    conn = sqlite3.connect(str(db))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+    assert 'billing_start_date' not in _columns(db, 'payments')
+
+
+def test_rebuild_table_keeps_rows(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'x.db'))
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, a TEXT, dropped TEXT)")
+    cur.execute("INSERT INTO t (a, dropped) VALUES ('x', 'y')")
+    _rebuild_table(cur, 't', "CREATE TABLE {table} (id INTEGER PRIMARY KEY, a TEXT NOT NULL, b INTEGER DEFAULT 7)",
+                   indexes=["CREATE INDEX ix_t_a ON t (a)"])
+    assert cur.execute("SELECT id, a, b FROM t").fetchall() == [(1, 'x', 7)]
+    assert [r[1] for r in cur.execute("PRAGMA table_info('t')")] == ['id', 'a', 'b']
+    conn.close()
+
+
+def test_upgrade_stops_id_reuse_below_archive(tmp_path):
+    db = tmp_path / 'property.db'
+    _legacy_db(db)
+    archive = sqlite3.connect(str(tmp_path / 'property_archive.db'))
+    archive.execute("CREATE TABLE payments (id INTEGER PRIMARY KEY, period VARCHAR(20))")
+    archive.execute("INSERT INTO payments (id, period) VALUES (10, '2019-01')")
+    archive.commit()
+    archive.close()
+
+    assert migrate_database(str(db))
+    conn = sqlite3.connect(str(db))
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'payments'").fetchone()[0]
+    assert 'AUTOINCREMENT' in sql.upper()
+    indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'payments'")}
+    assert 'uq_payment_period' in indexes
+    # 主库最新的账单删掉后，新账单的 ID 仍排在归档库之后
+    conn.execute("DELETE FROM payments")
+    conn.execute("""
+        INSERT INTO payments (resident_id, charge_item_id, period, billing_start_date, billing_end_date,
+                              billing_months, amount)
+        VALUES (1, 1, '2024-03', '2024-03-01', '2024-03-31', 1, 100)
+    """)
+    assert conn.execute("SELECT MAX(id) FROM payments").fetchone()[0] == 11
+    conn.close()
+
+
+def test_archive_database_is_migrated(tmp_path):
+    archive = tmp_path / 'property_archive.db'
+    conn = sqlite3.connect(str(archive))
+    conn.execute("""
+        CREATE TABLE payments (id INTEGER NOT NULL, resident_id INTEGER NOT NULL, charge_item_id INTEGER NOT NULL,
+                               period VARCHAR(20) NOT NULL, amount INTEGER NOT NULL, PRIMARY KEY (id))
+    """)
+    conn.execute("INSERT INTO payments VALUES (5, 1, 1, '2019-01', 10000)")
+    conn.commit()
+    conn.close()
+
+    assert migrate_db.migrate_archive(str(archive))
+    conn = sqlite3.connect(str(archive))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == latest_version()
+    # 金额不会被再按“元改分”乘一次
+    assert conn.execute("SELECT id, amount FROM payments").fetchall() == [(5, 10000)]
+    conn.close()
+    assert 'created_at' in _columns(archive, 'payments')
@@ -0,0 +1,34 @@
+from datetime import datetime
+from decimal import Decimal
+
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from services.payment_service import PaymentService
+from utils.money import Money, to_fen, format_yuan
+
+
+def test_money_value_semantics():
+    assert Money(0.1) + Money(0.2) == Money('0.30')
+    assert isinstance(sum([Money('1.10')] * 3), Money) and sum([Money('1.10')] * 3) == Decimal('3.30')
+    assert (to_fen(12), to_fen(1.005), to_fen('¥1,234.5')) == (1200, 101, 123450)
+    assert Money.from_fen(-5).fen == -5 and f"{Money(3):.2f}" == '3.00' and float(Money('2.25')) == 2.25
+    assert (format_yuan(Money('12.50')), format_yuan(Money('-2.50')), format_yuan(None)) == ('¥13', '¥-3', '¥0')
+
+
+def test_amounts_stored_as_fen_and_summed_exactly(db_session):
+    db_session.add_all([Resident(room_no='101', name='张三'), ChargeItem(name='水费', price=0.1, charge_type='fixed')])
+    db_session.commit()
+    for i in range(10):
+        db_session.add(Payment(resident_id=1, charge_item_id=1, period='2024-01', dedup_seq=i,
+                               billing_start_date=datetime(2024, 1, 1), billing_end_date=datetime(2024, 1, 31),
+                               amount=0.1, paid=i % 2, paid_amount=0.1 if i % 2 else 0))
+    db_session.commit()
+
+    raw = db_session.connection().exec_driver_sql("SELECT amount FROM payments LIMIT 1").scalar()
+    assert raw == 10
+    stats = PaymentService.get_statistics_by_period('2024-01', db=db_session)
+    assert stats['total_amount'] == Money(1) and isinstance(stats['total_amount'], Money)
+    assert stats['unpaid_amount'] == Money('0.50')
+    [item] = PaymentService.get_period_breakdown('2024-01', by='item', db=db_session)
+    assert (item['key'], item['count'], item['paid']) == ('水费', 10, Money('0.50'))
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from services.billing_plan_service import period_range
+from services.payment_service import PaymentService
+from services.resident_service import ResidentService
+
+
+def collect(fetch):
+    items, cursor, pages = [], None, 0
+    while True:
+        page = fetch(cursor)
+        items += page['items']
+        pages += 1
+        cursor = page['cursor']
+        if cursor is None:
+            return items, pages
+
+
+def test_keyset_pages_match_full_lists(db_session):
+    db_session.add(ChargeItem(name='物业费', price=100, charge_type='fixed'))
+    db_session.add_all([Resident(room_no=f'{100 + i % 7}', building=str(i), name=f'住户{i}') for i in range(20)])
+    db_session.commit()
+    for i in range(30):
+        period = ('2026-08', '2026-09', '2026-10')[i % 3]
+        start, end = period_range(period)
+        # None 时由数据库 datetime('now') 写入（不带微秒）；创建时间相同的靠 ID 区分先后
+        created = None if i % 5 == 0 else datetime(2026, 10, 1 + i % 4)
+        db_session.add(Payment(resident_id=1 + i % 20, charge_item_id=1, period=period, billing_start_date=start,
+                               billing_end_date=end, amount=100, paid=i % 2, created_at=created))
+    db_session.commit()
+    # 早期版本升级上来的账单没有创建时间
+    db_session.execute(text("UPDATE payments SET created_at = NULL WHERE id % 7 = 0"))
+    db_session.commit()
+
+    def expected(query):
+        return [p.id for p in query.order_by(Payment.period.desc(), Payment.created_at.desc(), Payment.id.desc())]
+
+    items, pages = collect(lambda after: PaymentService.get_payments_page(after=after, limit=4, db=db_session))
+    assert [p.id for p in items] == expected(db_session.query(Payment)) and pages == 8
+    assert items[0].resident.name and items[0].charge_item.name == '物业费'
+
+    items, _ = collect(lambda after: PaymentService.get_payments_page('2026-09', after=after, limit=3, db=db_session))
+    assert [p.id for p in items] == [p.id for p in db_session.query(Payment).filter(Payment.period == '2026-09')
+                                     .order_by(Payment.paid, Payment.created_at.desc(), Payment.id.desc())]
+
+    items, _ = collect(lambda after: PaymentService.search_payments_page('住户1', after=after, limit=2, db=db_session))
+    assert [p.id for p in items] == expected(db_session.query(Payment).join(Payment.resident)
+                                             .filter(Resident.name.like('%住户1%')))
+
+    items, pages = collect(lambda after: ResidentService.get_residents_page(after, limit=6, db=db_session))
+    assert [r.id for r in items] == [r.id for r in db_session.query(Resident).order_by(Resident.room_no, Resident.id)]
+    assert pages == 4
+    items, _ = collect(lambda after: ResidentService.search_residents_page('102', after, limit=1, db=db_session))
+    assert [r.room_no for r in items] == ['102'] * 3
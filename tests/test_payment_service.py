@@ -0,0 +1,74 @@
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from models.payment_transaction import PaymentTransaction
+from services.billing_plan_service import period_range
+from services.payment_service import PaymentService
+from utils.money import Money
+
+
+def test_delete_payments_batch_is_set_based(db_session):
+    db_session.add_all([Resident(room_no='101', name='张三'), ChargeItem(name='垃圾费', price=10, charge_type='fixed')])
+    db_session.commit()
+    start, end = period_range('2024-11')
+    for period in ('2024-10', '2024-11'):
+        p = Payment(resident_id=1, charge_item_id=1, period=period, billing_start_date=start,
+                    billing_end_date=end, amount=10)
+        p.transactions.append(PaymentTransaction(amount=5))
+        db_session.add(p)
+    db_session.commit()
+
+    deleted, failed = PaymentService.delete_payments_batch([1, 1, 42], db=db_session)
+    assert deleted == 1 and failed == [(42, '缴费记录不存在')]
+    assert [p.period for p in db_session.query(Payment)] == ['2024-11']
+    assert db_session.query(PaymentTransaction).count() == 1
+
+
+def test_collect_payments_allocates_oldest_first(db_session):
+    db_session.add_all([Resident(room_no='101', name='张三'),
+                        ChargeItem(name='物业费', price=100, charge_type='fixed'),
+                        ChargeItem(name='停车费', price=50, charge_type='fixed')])
+    db_session.commit()
+    for item_id, period, months, amount in ((1, '2024-10', 3, 300), (2, '2024-09', 2, 100), (1, '2025-01', 1, 100)):
+        start, end = period_range(period, months)
+        db_session.add(Payment(resident_id=1, charge_item_id=item_id, period=period, billing_start_date=start,
+                               billing_end_date=end, billing_months=months, paid_months=0, amount=amount))
+    db_session.commit()
+
+    # 260 元：先缴清 2024-09 停车费 100，再缴 2024-10 物业费 1 个月 100，余 60 不足一个月
+    receipt = PaymentService.collect_payments(1, amount=260, operator='收银员', db=db_session)
+    assert [(i['period'], i['paid_months'], i['amount'], i['settled']) for i in receipt['items']] == [
+        ('2024-09', 2, 100, True), ('2024-10', 1, 100, False)]
+    assert (receipt['total'], receipt['change']) == (200, 60)
+    assert isinstance(receipt['change'], Money) and isinstance(db_session.get(Payment, 2).paid_amount, Money)
+    assert db_session.query(PaymentTransaction).count() == 2
+
+    receipt = PaymentService.collect_payments(1, {1: None, 3: None}, db=db_session)
+    assert receipt['total'] == 300
+    assert db_session.query(Payment).filter(Payment.paid == 0).count() == 0
+
+
+def test_bulk_payment_and_transaction_lookup(db_session):
+    from datetime import datetime
+    from services.payment_transaction_service import PaymentTransactionService
+
+    db_session.add_all([Resident(room_no='101', name='张三'), ChargeItem(name='物业费', price=100, charge_type='fixed')])
+    db_session.commit()
+    for period in ('2024-10', '2024-11'):
+        start, end = period_range(period)
+        db_session.add(Payment(resident_id=1, charge_item_id=1, period=period, billing_start_date=start,
+                               billing_end_date=end, amount=100))
+    db_session.commit()
+    for day, amount in ((3, 10), (1, 20), (2, 30)):
+        db_session.add(PaymentTransaction(payment_id=1, amount=amount, paid_time=datetime(2024, 10, day)))
+    db_session.commit()
+
+    payments = PaymentService.get_payments_by_ids([2, 42, 1, 2], db=db_session)
+    assert [p.id for p in payments] == [2, 1] and payments[0].resident.name == '张三'
+
+    txs = PaymentTransactionService.get_transactions_by_payments([1, 2], db=db_session)
+    assert [float(t.amount) for t in txs[1]] == [20, 30, 10] and txs[2] == []
+    txs = PaymentTransactionService.get_transactions_by_payments([1, 2], last=2, db=db_session)
+    assert [float(t.amount) for t in txs[1]] == [30, 10]
+    last = PaymentTransactionService.get_last_transactions([1, 2], db=db_session)
+    assert float(last[1].amount) == 10 and 2 not in last
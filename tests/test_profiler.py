@@ -0,0 +1,13 @@
+from utils.profiler import _percentile
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 11))
+    assert _percentile(values, 50) == 5
+    assert _percentile(values, 95) == 10
+    assert _percentile(values, 90) == 9
+    assert _percentile(values, 100) == 10
+    assert _percentile(values, 0) == 1
+    assert _percentile([1, 2], 50) == 1
+    assert _percentile([7], 95) == 7
+    assert _percentile([], 50) == 0.0
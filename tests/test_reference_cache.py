@@ -0,0 +1,68 @@
+import sqlite3
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.archived_period import ArchivedPeriod
+from services.reference_cache import ReferenceCache, RESIDENTS
+
+
+def test_reference_cache_write_through_and_external_changes(tmp_path):
+    db_path = str(tmp_path / 'cache.db')
+    engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    cache = ReferenceCache(session_factory=Session, check_interval=0)
+
+    db = Session()
+    db.add_all([Resident(building='1', unit='2', room_no='301', name='甲'),
+                ChargeItem(name='物业费', price=2.5, charge_type='area')])
+    db.commit()
+
+    assert cache.get_resident(1).name == '甲'
+    assert cache.get_resident_by_triplet('1', '2', '301').id == 1
+    assert cache.get_resident_by_triplet('1', '2', '999') is None
+    assert str(cache.get_charge_item(1).price) == '2.50'
+    reloads = cache.stats()['reloads']
+
+    # 本进程写入：写回缓存，不触发整表重新载入
+    resident = db.query(Resident).filter(Resident.id == 1).first()
+    resident.room_no = '302'
+    db.commit()
+    cache.store(db, resident)
+    assert cache.get_resident_by_triplet('1', '2', '301') is None
+    assert cache.get_resident_by_triplet('1', '2', '302').name == '甲'
+    cache.discard(db, RESIDENTS, [1])
+    assert cache.get_resident(1) is None
+    assert cache.stats()['reloads'] == reloads
+
+    # 本进程与两张表无关的提交（如收费）同样改变 data_version，但不算外部变化
+    other = Session()
+    other.add(ArchivedPeriod(period='2020-01', charge_item_id=1))
+    other.commit()
+    other.close()
+    assert cache.get_charge_item(1).name == '物业费'
+    assert cache.stats()['reloads'] == reloads
+    assert cache.stats()['external_changes'] == 0
+
+    # 返回的是副本，修改不影响缓存
+    cache.get_charge_item(1).name = '改名'
+    assert cache.get_charge_item(1).name == '物业费'
+
+    # 其他连接写库：data_version 变化，整体失效后重新载入
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE charge_items SET name = '卫生费' WHERE id = 1")
+    conn.commit()
+    conn.close()
+    assert cache.get_charge_item(1).name == '卫生费'
+    stats = cache.stats()
+    assert stats['external_changes'] == 1
+    assert stats['reloads'] > reloads
+    assert stats['hits'] > 0 and stats['misses'] > 0
+
+    db.close()
+    cache.reset()
+    engine.dispose()
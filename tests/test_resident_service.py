@@ -27,3 +27,38 @@ def test_duplicate_room_no(db_session):
     ResidentService.create_resident(room_no="103", name="王五", db=db_session)
     with pytest.raises(ValueError):
         ResidentService.create_resident(room_no="103", name="赵六", db=db_session)
+
+def test_delete_residents_batch_cascades(db_session):
+    from datetime import datetime
+    from models.charge_item import ChargeItem
+    from models.payment import Payment
+    from models.payment_transaction import PaymentTransaction
+
+    keep = ResidentService.create_resident(room_no="201", name="甲", db=db_session)
+    gone = ResidentService.create_resident(room_no="202", name="乙", db=db_session)
+    db_session.add(ChargeItem(name="物业费", price=10, charge_type="fixed"))
+    db_session.commit()
+    for rid in (keep.id, gone.id):
+        p = Payment(resident_id=rid, charge_item_id=1, period="2024-01", billing_start_date=datetime(2024, 1, 1),
+                    billing_end_date=datetime(2024, 1, 31), amount=10)
+        p.transactions.append(PaymentTransaction(amount=10))
+        db_session.add(p)
+    db_session.commit()
+
+    deleted, failed = ResidentService.delete_residents_batch([gone.id, 9999], db=db_session)
+    assert deleted == 1 and failed == [(9999, "住户不存在")]
+    assert [r.id for r in db_session.query(Resident)] == [keep.id]
+    assert db_session.query(Payment).count() == 1 and db_session.query(PaymentTransaction).count() == 1
+
+def test_suggest_residents_prefix(db_session):
+    ResidentService.create_resident(building="6", unit="1", room_no="1204", name="张三", db=db_session)
+    ResidentService.create_resident(building="6", unit="2", room_no="1201", name="张四", db=db_session)
+    ResidentService.create_resident(building="7", unit="1", room_no="1204", name="李五", db=db_session)
+
+    assert [label for _, label in ResidentService.suggest_residents("12", db=db_session)] == \
+        ["6-1-1204 - 张三", "6-2-1201 - 张四", "7-1-1204 - 李五"]
+    assert [label for _, label in ResidentService.suggest_residents("张", db=db_session)] == \
+        ["6-1-1204 - 张三", "6-2-1201 - 张四"]
+    assert [label for _, label in ResidentService.suggest_residents("6-1-12", db=db_session)] == ["6-1-1204 - 张三"]
+    assert ResidentService.suggest_residents("1204", limit=1, db=db_session)[0][1] == "6-1-1204 - 张三"
+    assert ResidentService.suggest_residents("三", db=db_session) == []
@@ -0,0 +1,39 @@
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base
+from models.payment import Payment
+from models.payment_transaction import PaymentTransaction
+from models.resident import Resident
+from scripts.synthetic_data import generate
+from services.payment_service import PaymentService
+
+
+def _build(households, years, seed=7):
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    summary = generate(engine, households, years, seed=seed)
+    return sessionmaker(bind=engine)(), summary
+
+
+def test_generate_is_deterministic_and_consistent():
+    db, summary = _build(60, 1)
+    assert summary['residents'] == 60 and (summary['first_period'], summary['last_period']) == ('2025-01', '2025-12')
+    assert db.query(Payment).count() == summary['payments']
+    assert db.query(PaymentTransaction).count() == summary['transactions']
+    # 每笔已缴金额都有对应流水，部分缴费的账单未标记为已缴
+    paid_total = db.query(func.sum(Payment.paid_amount)).scalar()
+    assert paid_total == db.query(func.sum(PaymentTransaction.amount)).scalar()
+    assert db.query(Payment).filter(Payment.paid_months > 0, Payment.paid_months < Payment.billing_months,
+                                    Payment.paid == 1).count() == 0
+    stats = PaymentService.get_statistics_by_period('2025-12', db=db)
+    assert stats['total_count'] > 60 and 0 < stats['paid_count'] < stats['total_count']
+
+    other, again = _build(60, 1)
+    assert again == summary
+    rows = lambda s: s.query(Resident.name, Resident.area).order_by(Resident.id).all()  # noqa: E731
+    assert rows(db) == rows(other)
+    assert [p.amount for p in db.query(Payment).order_by(Payment.id)] == \
+        [p.amount for p in other.query(Payment).order_by(Payment.id)]
+    db.close()
+    other.close()
@@ -0,0 +1,61 @@
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from services.charge_service import ChargeService
+from services.tariff import compile_tariff, billing_quantities, round_half_up
+
+UNITS = ['元/月', '元/日', '元/年', '元/小时', '元/时', '元/度', '元/平方米/月', '元/平米/日', '元/㎡/年', '', None]
+
+
+def _random_case(rng):
+    item = SimpleNamespace(
+        id=1,
+        charge_type=rng.choice(['fixed', 'area', 'manual']),
+        unit=rng.choice(UNITS),
+        price=round(rng.uniform(0, 50), rng.choice([0, 1, 2])),
+    )
+    start = end = None
+    if rng.random() < 0.6:
+        start = datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 400), hours=rng.randint(0, 23))
+        end = start + timedelta(days=rng.randint(0, 800), hours=rng.randint(0, 23))
+    kwargs = dict(
+        resident_area=round(rng.uniform(0, 300), 2),
+        months=rng.randint(1, 36),
+        manual_amount=round(rng.uniform(0, 5000), 2),
+        billing_start_date=start,
+        billing_end_date=end,
+        usage=round(rng.uniform(0, 999), rng.choice([0, 1, 2])) if rng.random() < 0.7 else None,
+    )
+    return item, kwargs
+
+
+def test_round_half_up_matches_decimal():
+    assert [round_half_up(v) for v in (0.5, 1.5, 2.5, -2.5, 2.4999999999999996, 1.005 * 1000)] == [1, 2, 3, -3, 2, 1005]
+
+
+def test_compiled_tariff_matches_calculate_amount():
+    rng = random.Random(20240601)
+    for _ in range(5000):
+        item, kwargs = _random_case(rng)
+        expected = ChargeService.calculate_amount(item, **kwargs)
+        assert compile_tariff(item).price_one(**kwargs) == expected, (item, kwargs)
+
+
+def test_price_batch_matches_per_resident_calculation():
+    rng = random.Random(7)
+    for _ in range(200):
+        item, kwargs = _random_case(rng)
+        n = rng.choice([1, 5, 100])
+        areas = [round(rng.uniform(0, 300), 2) for _ in range(n)]
+        usages = [round(rng.uniform(0, 999), 1) if rng.random() < 0.8 else None for _ in range(n)]
+        start, end, months = kwargs['billing_start_date'], kwargs['billing_end_date'], kwargs['months']
+        q = billing_quantities(start, end, months)
+
+        amounts = compile_tariff(item).price_batch(areas=areas, usages=usages, months=months,
+                                                   manual_amounts=kwargs['manual_amount'], count=n, **q)
+        expected = [ChargeService.calculate_amount(item, resident_area=a, months=months, usage=u,
+                                                   manual_amount=kwargs['manual_amount'],
+                                                   billing_start_date=start, billing_end_date=end)
+                    for a, u in zip(areas, usages)]
+        assert amounts == expected
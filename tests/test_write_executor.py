@@ -0,0 +1,150 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base, SessionLocal
+from models.resident import Resident
+from models.charge_item import ChargeItem
+from models.payment import Payment
+from models.print_log import PrintLog
+from services.payment_service import PaymentService
+from services.print_service import PrintService
+from services.reference_cache import reference_cache
+from services.write_executor import WriteExecutor, write_executor
+
+RESIDENTS = 40
+
+
+@pytest.fixture
+def file_db(tmp_path):
+    path = str(tmp_path / 'stress.db')
+    engine = create_engine(f'sqlite:///{path}', connect_args={'check_same_thread': False, 'timeout': 10})
+    Base.metadata.create_all(engine)
+    old_bind = SessionLocal.kw['bind']
+    SessionLocal.configure(bind=engine)
+    reference_cache.reset()
+    yield path, engine
+    write_executor.shutdown()
+    SessionLocal.configure(bind=old_bind)
+    reference_cache.reset()
+    engine.dispose()
+
+
+def test_concurrent_billing_collection_and_printing(file_db):
+    path, engine = file_db
+    db = SessionLocal()
+    db.add(ChargeItem(name='物业费', price=1, charge_type='fixed'))
+    db.add_all(Resident(room_no=str(101 + i), name=f'住户{i}') for i in range(RESIDENTS))
+    db.commit()
+    db.close()
+    PaymentService.create_payments_batch(1, '2024-04', datetime(2024, 4, 1), datetime(2024, 4, 30), 1,
+                                         [(rid, 100) for rid in range(1, RESIDENTS + 1)])
+
+    errors = []
+
+    def guarded(target):
+        def run():
+            try:
+                target()
+            except Exception as e:  # pragma: no cover - 失败时在断言中显示
+                errors.append(e)
+        return threading.Thread(target=run)
+
+    def billing(period):
+        rows = [(rid, 120) for rid in range(1, RESIDENTS + 1)]
+        for start in range(0, len(rows), 10):
+            PaymentService.create_payments_batch(1, period, datetime(2024, 5, 1), datetime(2024, 5, 31), 1,
+                                                 rows[start:start + 10])
+
+    def collecting(offset):
+        for rid in range(offset, RESIDENTS + 1, 4):
+            payment = [p for p in PaymentService.get_payments_by_resident(rid) if p.period == '2024-04'][0]
+            PaymentService.collect_payments(rid, {payment.id: None}, operator=f'收银{offset}')
+
+    def printing():
+        for _ in range(15):
+            PrintService.create_print_log(payment_id=1)
+
+    def other_process():
+        # 另一个程序直接写库，短暂持有写锁
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        for i in range(10):
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('UPDATE charge_items SET unit = ? WHERE id = 1', (f'元/月{i}',))
+            time.sleep(0.01)
+            conn.execute('COMMIT')
+        conn.close()
+
+    threads = [guarded(lambda p=p: billing(p)) for p in ('2024-05', '2024-06')]
+    threads += [guarded(lambda o=o: collecting(o)) for o in range(1, 5)]
+    threads += [guarded(printing) for _ in range(4)]
+    threads.append(guarded(other_process))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    db = SessionLocal()
+    try:
+        assert db.query(Payment).count() == RESIDENTS * 3
+        assert db.query(Payment).filter(Payment.period == '2024-04', Payment.paid == 1).count() == RESIDENTS
+        seqs = sorted(seq for (seq,) in db.query(PrintLog.seq))
+        assert seqs == list(range(1, 61))
+    finally:
+        db.close()
+
+
+def test_busy_retry_and_unit_batches(tmp_path):
+    path = str(tmp_path / 'busy.db')
+    # 连接等待锁的时间很短，靠执行器退避重试
+    engine = create_engine(f'sqlite:///{path}', connect_args={'check_same_thread': False, 'timeout': 0.01})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    executor = WriteExecutor(session_factory=Session, retries=6, backoff=0.02)
+
+    blocker = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    blocker.execute('BEGIN IMMEDIATE')
+    threading.Timer(0.2, lambda: blocker.execute('COMMIT')).start()
+
+    def add_resident(room_no):
+        db = Session()
+        try:
+            db.add(Resident(building='1', unit='1', room_no=room_no, name='张三'))
+            db.commit()
+        finally:
+            db.close()
+
+    executor.run(add_resident, '101')
+    assert executor.stats()['busy_retries'] >= 1
+
+    def unit(room_no):
+        def work(db):
+            resident = Resident(building='1', unit='1', room_no=room_no, name='李四')
+            db.add(resident)
+            db.flush()
+            return resident
+        return work
+
+    # 写线程忙时排队的小写入合并为一个事务，重复房号只让自己那一条失败
+    gate = threading.Event()
+    executor.submit(gate.wait)
+    futures = [executor.submit_unit(unit(room)) for room in ('201', '202', '101', '203')]
+    gate.set()
+    assert [f.exception() is None for f in futures] == [True, True, False, True]
+    assert futures[0].result().id and futures[0].result().room_no == '201'
+    assert executor.stats()['batches'] == 1
+    executor.shutdown()
+    blocker.close()
+
+    db = Session()
+    try:
+        assert db.query(func.count(Resident.id)).scalar() == 4
+    finally:
+        db.close()
+    engine.dispose()
@@ -3,11 +3,38 @@
 """
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QMessageBox, QTableWidget, QTableWidgetItem,
-                             QHeaderView, QFileDialog)
-from PyQt5.QtCore import Qt
+                             QHeaderView, QFileDialog, QProgressBar)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal as Signal
 import os
 
-from utils.backup_manager import BackupManager
+from utils.backup_engine import BackupEngine
+
+
+KIND_LABELS = {'full': '全量', 'delta': '增量', 'raw': '未压缩'}
+REASON_LABELS = {'manual': '手动', 'schedule': '定时', 'exit': '退出时', 'pre-restore': '恢复前', 'legacy': '旧版'}
+
+
+class BackupWorker(QThread):
+    """后台执行备份/恢复，按页报告进度"""
+    progress = Signal(int, int)  # 已复制页数, 总页数
+    finished = Signal(bool, str)  # 是否成功, 结果（备份文件或错误信息）
+
+    def __init__(self, engine, mode, entry=None):
+        super().__init__()
+        self.engine = engine
+        self.mode = mode
+        self.entry = entry
+
+    def run(self):
+        try:
+            if self.mode == 'restore':
+                self.engine.restore(self.entry, progress=self.progress.emit)
+                self.finished.emit(True, self.entry.file)
+            else:
+                entry = self.engine.snapshot(reason='manual', progress=self.progress.emit)
+                self.finished.emit(True, f"{entry.file}（{KIND_LABELS.get(entry.kind, entry.kind)}）")
+        except Exception as e:
+            self.finished.emit(False, str(e))
 
 
 class BackupDialog(QDialog):
@@ -15,6 +42,11 @@ class BackupDialog(QDialog):
     
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.engine = BackupEngine()
+        self.backups = []
+        self.worker = None
+        # 恢复成功后由主窗口重新加载数据
+        self.restored = False
         self.init_ui()
         self.load_backups()
     
@@ -38,13 +70,18 @@ class BackupDialog(QDialog):
         layout.addWidget(list_label)
         
         self.backup_table = QTableWidget()
-        self.backup_table.setColumnCount(3)
-        self.backup_table.setHorizontalHeaderLabels(['备份文件', '大小', '备份时间'])
+        self.backup_table.setColumnCount(5)
+        self.backup_table.setHorizontalHeaderLabels(['备份时间', '类型', '大小', '来源', '备份文件'])
         self.backup_table.horizontalHeader().setStretchLastSection(True)
         self.backup_table.setSelectionBehavior(QTableWidget.SelectRows)
         self.backup_table.setEditTriggers(QTableWidget.NoEditTriggers)
         layout.addWidget(self.backup_table)
         
+        # 进度条
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+        
         # 操作按钮
         btn_layout = QHBoxLayout()
         self.restore_btn = QPushButton('恢复选中备份')
@@ -67,27 +104,70 @@ class BackupDialog(QDialog):
     def load_backups(self):
         """加载备份列表"""
         try:
-            backups = BackupManager.get_backup_list()
-            self.backup_table.setRowCount(len(backups))
+            self.backups = self.engine.list_backups()
+            self.backup_table.setRowCount(len(self.backups))
             
-            for row, (file_path, file_size, mtime) in enumerate(backups):
-                filename = os.path.basename(file_path)
-                size_mb = file_size / (1024 * 1024)
+            for row, entry in enumerate(self.backups):
+                size_mb = entry.size / (1024 * 1024)
                 
-                self.backup_table.setItem(row, 0, QTableWidgetItem(filename))
-                self.backup_table.setItem(row, 1, QTableWidgetItem(f"{size_mb:.2f} MB"))
-                self.backup_table.setItem(row, 2, QTableWidgetItem(mtime))
+                self.backup_table.setItem(row, 0, QTableWidgetItem(entry.created))
+                self.backup_table.setItem(row, 1, QTableWidgetItem(KIND_LABELS.get(entry.kind, entry.kind)))
+                self.backup_table.setItem(row, 2, QTableWidgetItem(f"{size_mb:.2f} MB"))
+                self.backup_table.setItem(row, 3, QTableWidgetItem(REASON_LABELS.get(entry.reason, entry.reason)))
+                self.backup_table.setItem(row, 4, QTableWidgetItem(entry.file))
         except Exception as e:
             QMessageBox.critical(self, '错误', f'加载备份列表失败：{str(e)}')
     
+    def set_busy(self, busy):
+        """备份/恢复进行中时禁用按钮"""
+        for btn in (self.backup_btn, self.restore_btn, self.delete_btn, self.close_btn):
+            btn.setEnabled(not busy)
+        self.progress_bar.setVisible(busy)
+        if busy:
+            self.progress_bar.setRange(0, 0)
+    
+    def start_worker(self, mode, entry=None):
+        """启动后台备份/恢复线程"""
+        self.set_busy(True)
+        self.worker = BackupWorker(self.engine, mode, entry)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.finished.connect(self.on_backup_finished if mode == 'backup' else self.on_restore_finished)
+        self.worker.start()
+    
+    def on_progress(self, done, total):
+        """更新进度"""
+        if total > 0:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(done)
+    
     def create_backup(self):
         """创建备份"""
-        try:
-            backup_path = BackupManager.backup_database()
-            QMessageBox.information(self, '成功', f'备份已创建：\n{backup_path}')
+        self.start_worker('backup')
+    
+    def on_backup_finished(self, ok, result):
+        """备份完成"""
+        self.set_busy(False)
+        if ok:
+            QMessageBox.information(self, '成功', f'备份已创建并通过完整性检查：\n{result}\n\n已按保留策略清理过期备份。')
             self.load_backups()
-        except Exception as e:
-            QMessageBox.critical(self, '错误', f'创建备份失败：{str(e)}')
+        else:
+            QMessageBox.critical(self, '错误', f'创建备份失败：{result}')
+    
+    def on_restore_finished(self, ok, result):
+        """恢复完成"""
+        self.set_busy(False)
+        if ok:
+            self.restored = True
+            QMessageBox.information(self, '成功', '数据库已恢复，数据将重新加载。')
+            self.accept()
+        else:
+            QMessageBox.critical(self, '错误', f'恢复失败：{result}')
+    
+    def reject(self):
+        """备份/恢复进行中不允许关闭"""
+        if self.worker is not None and self.worker.isRunning():
+            return
+        super().reject()
     
     def restore_backup(self):
         """恢复备份"""
@@ -96,7 +176,8 @@ class BackupDialog(QDialog):
             QMessageBox.warning(self, '提示', '请选择要恢复的备份')
             return
         
-        filename = self.backup_table.item(selected_rows[0].row(), 0).text()
+        entry = self.backups[selected_rows[0].row()]
+        filename = f"{entry.created}（{KIND_LABELS.get(entry.kind, entry.kind)}）"
         
         reply = QMessageBox.question(
             self, 
@@ -107,13 +188,7 @@ class BackupDialog(QDialog):
         
         if reply == QMessageBox.Yes:
             try:
-                # 获取备份文件路径
-                backups = BackupManager.get_backup_list()
-                backup_path = backups[selected_rows[0].row()][0]
-                
-                BackupManager.restore_database(backup_path)
-                QMessageBox.information(self, '成功', '数据库已恢复！\n\n请重启程序使更改生效。')
-                self.accept()
+                self.start_worker('restore', entry)
             except Exception as e:
                 QMessageBox.critical(self, '错误', f'恢复失败：{str(e)}')
     
@@ -124,7 +199,8 @@ class BackupDialog(QDialog):
             QMessageBox.warning(self, '提示', '请选择要删除的备份')
             return
         
-        filename = self.backup_table.item(selected_rows[0].row(), 0).text()
+        entry = self.backups[selected_rows[0].row()]
+        filename = entry.file
         
         reply = QMessageBox.question(
             self, 
@@ -135,9 +211,7 @@ class BackupDialog(QDialog):
         
         if reply == QMessageBox.Yes:
             try:
-                backups = BackupManager.get_backup_list()
-                backup_path = backups[selected_rows[0].row()][0]
-                BackupManager.delete_backup(backup_path)
+                self.engine.delete(entry)
                 QMessageBox.information(self, '成功', '备份已删除')
                 self.load_backups()
             except Exception as e:
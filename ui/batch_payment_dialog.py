@@ -10,6 +10,10 @@ from datetime import datetime, timedelta
 from services.resident_service import ResidentService
 from services.charge_service import ChargeService
 from services.payment_service import PaymentService
+from services.tariff import compile_tariff
+
+# 每个写事务包含的账单数
+BATCH_SIZE = 200
 
 
 class BatchPaymentWorker(QThread):
@@ -38,47 +42,58 @@ class BatchPaymentWorker(QThread):
             self.finished.emit(0, 0, ['收费项目不存在'])
             return
         
-        for idx, resident_id in enumerate(self.resident_ids, 1):
+        # 一次取出所有住户，并用编译后的收费规则一次算出全部金额
+        residents_by_id = {r.id: r for r in ResidentService.get_all_residents()}
+        residents = [residents_by_id.get(rid) for rid in self.resident_ids]
+        if charge_item.charge_type == 'manual':
+            # 手动类型需要跳过或使用默认值
+            amounts = [0.0] * total
+        else:
+            tariff = compile_tariff(charge_item)
+            amounts = tariff.price_batch(
+                areas=[float(r.area) if r is not None and r.area else 0.0 for r in residents],
+                months=self.billing_months,
+                count=total
+            )
+        
+        rows = []
+        for resident_id, resident, amount in zip(self.resident_ids, residents, amounts):
+            if not resident:
+                fail_count += 1
+                errors.append(f"住户ID {resident_id} 不存在")
+                continue
+            rows.append((resident_id, amount))
+
+        # 每 BATCH_SIZE 户一个事务写入，进度按批更新
+        done = total - len(rows)
+        for start in range(0, len(rows), BATCH_SIZE):
+            chunk = rows[start:start + BATCH_SIZE]
             try:
-                resident = ResidentService.get_resident_by_id(resident_id)
-                if not resident:
-                    fail_count += 1
-                    errors.append(f"住户ID {resident_id} 不存在")
-                    continue
-                
-                # 计算金额
-                if charge_item.charge_type == 'manual':
-                    # 手动类型需要跳过或使用默认值
-                    amount = 0.0
-                else:
-                    amount = ChargeService.calculate_amount(
-                        charge_item,
-                        resident_area=float(resident.area) if resident.area else 0.0,
-                        months=self.billing_months
-                    )
-                
-                # 创建账单
-                PaymentService.create_payment(
-                    resident_id=resident_id,
+                results = PaymentService.create_payments_batch(
                     charge_item_id=self.charge_item_id,
                     period=self.period,
                     billing_start_date=self.billing_start_date,
                     billing_end_date=self.billing_end_date,
                     billing_months=self.billing_months,
-                    amount=amount
+                    amounts=chunk
                 )
-                success_count += 1
-                self.progress.emit(idx, total, f"{getattr(resident, 'full_room_no', resident.room_no)} - {resident.name}")
-                
-            except ValueError as e:
-                fail_count += 1
-                errors.append(f"{resident.room_no if 'resident' in locals() else resident_id}: {str(e)}")
-                self.progress.emit(idx, total, f"失败: {str(e)}")
             except Exception as e:
-                fail_count += 1
-                errors.append(f"{resident.room_no if 'resident' in locals() else resident_id}: {str(e)}")
-                self.progress.emit(idx, total, f"失败: {str(e)}")
-        
+                fail_count += len(chunk)
+                errors.extend(f"{residents_by_id[rid].room_no}: {str(e)}" for rid, _ in chunk)
+                done += len(chunk)
+                self.progress.emit(done, total, f"失败: {str(e)}")
+                continue
+            for resident_id, payment_id, error in results:
+                resident = residents_by_id[resident_id]
+                if error is None:
+                    success_count += 1
+                else:
+                    fail_count += 1
+                    errors.append(f"{resident.room_no}: {error}")
+            done += len(chunk)
+            last = residents_by_id[chunk[-1][0]]
+            self.progress.emit(done, total, f"{getattr(last, 'full_room_no', last.room_no)} - {last.name}")
+
         self.finished.emit(success_count, fail_count, errors)
 
 
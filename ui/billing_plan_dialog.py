@@ -0,0 +1,195 @@
+"""
+周期出账计划对话框
+"""
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QGroupBox,
+                             QPushButton, QMessageBox, QComboBox, QDateEdit, QLineEdit,
+                             QSpinBox, QTableWidget, QTableWidgetItem)
+from PyQt5.QtCore import QDate
+
+from services.charge_service import ChargeService
+from services.billing_plan_service import BillingPlanService
+from services.tariff import parse_unit_kind, KIND_USAGE
+
+
+class BillingPlanDialog(QDialog):
+    """维护出账计划，并可立即为某周期执行"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.generated = False
+        self.init_ui()
+        self.load_charge_items()
+        self.load_plans()
+
+    def init_ui(self):
+        """初始化UI"""
+        self.setWindowTitle('周期出账计划')
+        self.resize(760, 520)
+
+        layout = QVBoxLayout(self)
+
+        tip = QLabel('启用的计划在每个周期开始后自动出账；同一住户同一项目同一周期只会生成一张账单，重复执行会自动跳过。')
+        tip.setWordWrap(True)
+        layout.addWidget(tip)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels(['收费项目', '出账范围', '计费月数', '状态', '最近执行周期'])
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SingleSelection)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setColumnWidth(0, 200)
+        self.table.setColumnWidth(1, 160)
+        layout.addWidget(self.table)
+
+        plan_btn_layout = QHBoxLayout()
+        self.toggle_btn = QPushButton('启用/停用')
+        self.toggle_btn.clicked.connect(self.toggle_plan)
+        plan_btn_layout.addWidget(self.toggle_btn)
+        self.delete_btn = QPushButton('删除计划')
+        self.delete_btn.clicked.connect(self.delete_plan)
+        plan_btn_layout.addWidget(self.delete_btn)
+        plan_btn_layout.addStretch()
+        layout.addLayout(plan_btn_layout)
+
+        # 新增计划
+        add_group = QGroupBox('新增计划')
+        add_layout = QHBoxLayout(add_group)
+        add_layout.addWidget(QLabel('收费项目:'))
+        self.charge_combo = QComboBox()
+        self.charge_combo.setMinimumWidth(180)
+        add_layout.addWidget(self.charge_combo)
+        add_layout.addWidget(QLabel('房屋类型:'))
+        self.type_combo = QComboBox()
+        self.type_combo.addItem('全部', '')
+        self.type_combo.addItem('住宅', 'residential')
+        self.type_combo.addItem('商铺', 'commercial')
+        add_layout.addWidget(self.type_combo)
+        add_layout.addWidget(QLabel('楼栋:'))
+        self.building_input = QLineEdit()
+        self.building_input.setPlaceholderText('全部')
+        self.building_input.setMaximumWidth(60)
+        add_layout.addWidget(self.building_input)
+        add_layout.addWidget(QLabel('月数:'))
+        self.months_spin = QSpinBox()
+        self.months_spin.setRange(1, 36)
+        add_layout.addWidget(self.months_spin)
+        self.add_btn = QPushButton('添加')
+        self.add_btn.clicked.connect(self.add_plan)
+        add_layout.addWidget(self.add_btn)
+        layout.addWidget(add_group)
+
+        # 立即执行
+        run_layout = QHBoxLayout()
+        run_layout.addWidget(QLabel('周期:'))
+        self.period_date = QDateEdit()
+        self.period_date.setCalendarPopup(True)
+        self.period_date.setDate(QDate.currentDate())
+        self.period_date.setDisplayFormat('yyyy-MM')
+        run_layout.addWidget(self.period_date)
+        self.run_btn = QPushButton('立即出账')
+        self.run_btn.clicked.connect(self.run_now)
+        run_layout.addWidget(self.run_btn)
+        run_layout.addStretch()
+        close_btn = QPushButton('关闭')
+        close_btn.clicked.connect(self.accept)
+        run_layout.addWidget(close_btn)
+        layout.addLayout(run_layout)
+
+    def load_charge_items(self):
+        """只列出可以自动出账的收费项目（排除手动金额和按用量计费）"""
+        self.charge_combo.clear()
+        for item in ChargeService.get_all_charge_items(active_only=True):
+            if item.charge_type == 'manual' or parse_unit_kind(item.charge_type, item.unit) == KIND_USAGE:
+                continue
+            self.charge_combo.addItem(f"{item.name}（{item.price}{item.unit}）", item.id)
+        self.add_btn.setEnabled(self.charge_combo.count() > 0)
+
+    def load_plans(self):
+        """加载出账计划"""
+        try:
+            self.plans = BillingPlanService.get_all_plans()
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'加载出账计划失败：{str(e)}')
+            self.plans = []
+        self.table.setRowCount(len(self.plans))
+        for row, plan in enumerate(self.plans):
+            values = [
+                plan.charge_item.name if plan.charge_item else f'（已删除 {plan.charge_item_id}）',
+                plan.scope_text(),
+                str(plan.billing_months),
+                '启用' if plan.active else '停用',
+                plan.last_period or '',
+            ]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+
+    def selected_plan(self):
+        row = self.table.currentRow()
+        if row < 0 or row >= len(self.plans):
+            QMessageBox.warning(self, '提示', '请先选择一个计划')
+            return None
+        return self.plans[row]
+
+    def add_plan(self):
+        try:
+            BillingPlanService.create_plan(
+                self.charge_combo.currentData(),
+                property_type=self.type_combo.currentData(),
+                building=self.building_input.text(),
+                billing_months=self.months_spin.value(),
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, '提示', str(e))
+            return
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'添加计划失败：{str(e)}')
+            return
+        self.building_input.clear()
+        self.load_plans()
+
+    def toggle_plan(self):
+        plan = self.selected_plan()
+        if plan is None:
+            return
+        try:
+            BillingPlanService.set_plan_active(plan.id, not plan.active)
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'修改计划失败：{str(e)}')
+            return
+        self.load_plans()
+
+    def delete_plan(self):
+        plan = self.selected_plan()
+        if plan is None:
+            return
+        reply = QMessageBox.question(self, '确认', '确定删除该计划吗？已生成的账单不受影响。',
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        try:
+            BillingPlanService.delete_plan(plan.id)
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'删除计划失败：{str(e)}')
+            return
+        self.load_plans()
+
+    def run_now(self):
+        """立即按全部启用的计划为所选周期出账"""
+        date = self.period_date.date()
+        period = f"{date.year():04d}-{date.month():02d}"
+        try:
+            summary = BillingPlanService.run_period(period)
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'出账失败：{str(e)}')
+            return
+        if summary['created']:
+            self.generated = True
+        self.load_plans()
+        lines = [f"{period}：新建账单 {summary['created']} 张，已存在跳过 {summary['skipped']} 张"]
+        for p in summary['plans']:
+            lines.append(f"  {p['charge_item']}：新建 {p['created']}，跳过 {p['skipped']}")
+        for p in summary['not_due']:
+            lines.append(f"  {p['charge_item']}：上一账期未结束，下次出账 {p['next_period']}")
+        QMessageBox.information(self, '出账结果', '\n'.join(lines))
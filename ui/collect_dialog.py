@@ -0,0 +1,153 @@
+"""
+合并收款对话框
+"""
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                             QMessageBox, QSpinBox, QDoubleSpinBox, QCheckBox,
+                             QTableWidget, QTableWidgetItem)
+from PyQt5.QtCore import Qt
+
+from services.payment_service import PaymentService
+from services.resident_service import ResidentService
+
+
+class CollectDialog(QDialog):
+    """一次收取同一住户的多笔账单，可按实收金额先欠先缴自动分配"""
+
+    def __init__(self, parent=None, resident_id=None, payment_ids=None):
+        super().__init__(parent)
+        self.resident_id = resident_id
+        self.preselected = set(payment_ids or [])
+        self.payments = []
+        self.receipt = None
+        self.init_ui()
+        self.load_payments()
+
+    def init_ui(self):
+        """初始化UI"""
+        self.setWindowTitle('合并收款')
+        self.resize(720, 460)
+
+        layout = QVBoxLayout(self)
+        self.info_label = QLabel('')
+        layout.addWidget(self.info_label)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(6)
+        self.table.setHorizontalHeaderLabels(['收款', '收费项目', '周期', '计费期间', '剩余月数', '缴费月数'])
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setColumnWidth(0, 50)
+        self.table.setColumnWidth(1, 150)
+        self.table.setColumnWidth(3, 190)
+        layout.addWidget(self.table)
+
+        amount_layout = QHBoxLayout()
+        self.lump_sum_check = QCheckBox('按实收金额分配（先欠先缴）:')
+        self.lump_sum_check.toggled.connect(self.on_lump_sum_toggled)
+        amount_layout.addWidget(self.lump_sum_check)
+        self.amount_input = QDoubleSpinBox()
+        self.amount_input.setRange(0, 9999999)
+        self.amount_input.setDecimals(2)
+        self.amount_input.setPrefix('¥')
+        self.amount_input.setEnabled(False)
+        amount_layout.addWidget(self.amount_input)
+        amount_layout.addStretch()
+        self.total_label = QLabel('应收合计: ¥0.00')
+        self.total_label.setStyleSheet('font-size: 16px; font-weight: bold; color: #d32f2f;')
+        amount_layout.addWidget(self.total_label)
+        layout.addLayout(amount_layout)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        self.collect_btn = QPushButton('确认收款')
+        self.collect_btn.clicked.connect(self.collect)
+        cancel_btn = QPushButton('取消')
+        cancel_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(self.collect_btn)
+        btn_layout.addWidget(cancel_btn)
+        layout.addLayout(btn_layout)
+
+    def load_payments(self):
+        """加载该住户全部未缴清账单（按计费开始日期从早到晚）"""
+        try:
+            resident = ResidentService.get_resident_by_id(self.resident_id)
+            payments = [p for p in PaymentService.get_payments_by_resident(self.resident_id)
+                        if p.paid_months < p.billing_months]
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'加载账单失败：{str(e)}')
+            return
+        if resident is not None:
+            self.info_label.setText(f"住户: {resident.full_room_no} - {resident.name}    未缴清账单 {len(payments)} 笔")
+        payments.sort(key=lambda p: (p.billing_start_date, p.period, p.id))
+        self.payments = payments
+
+        self.table.setRowCount(len(payments))
+        for row, p in enumerate(payments):
+            check = QCheckBox()
+            check.setChecked(not self.preselected or p.id in self.preselected)
+            check.toggled.connect(self.update_total)
+            self.table.setCellWidget(row, 0, check)
+            self.table.setItem(row, 1, QTableWidgetItem(p.charge_item.name if p.charge_item else ''))
+            self.table.setItem(row, 2, QTableWidgetItem(p.period))
+            self.table.setItem(row, 3, QTableWidgetItem(
+                f"{p.billing_start_date.strftime('%Y-%m-%d')} 至 {p.billing_end_date.strftime('%Y-%m-%d')}"))
+            remaining = p.billing_months - p.paid_months
+            remaining_item = QTableWidgetItem(str(remaining))
+            remaining_item.setTextAlignment(Qt.AlignCenter)
+            self.table.setItem(row, 4, remaining_item)
+            months = QSpinBox()
+            months.setRange(1, remaining)
+            months.setValue(remaining)
+            months.valueChanged.connect(self.update_total)
+            self.table.setCellWidget(row, 5, months)
+        self.collect_btn.setEnabled(bool(payments))
+        self.update_total()
+
+    def selected_allocations(self):
+        allocations = {}
+        for row, p in enumerate(self.payments):
+            if self.table.cellWidget(row, 0).isChecked():
+                allocations[p.id] = self.table.cellWidget(row, 5).value()
+        return allocations
+
+    def update_total(self):
+        allocations = self.selected_allocations()
+        total = sum(PaymentService.installment_amount(p, allocations[p.id])
+                    for p in self.payments if p.id in allocations)
+        self.total_label.setText(f'应收合计: ¥{total:.2f}')
+        if not self.lump_sum_check.isChecked():
+            self.amount_input.setValue(total)
+
+    def on_lump_sum_toggled(self, checked):
+        self.amount_input.setEnabled(checked)
+        if not checked:
+            self.update_total()
+
+    def collect(self):
+        """确认收款"""
+        allocations = self.selected_allocations()
+        if not allocations:
+            QMessageBox.warning(self, '提示', '请至少选择一笔账单')
+            return
+        amount = self.amount_input.value() if self.lump_sum_check.isChecked() else None
+        try:
+            self.receipt = PaymentService.collect_payments(
+                self.resident_id, allocations, amount=amount, operator='管理员')
+        except ValueError as e:
+            QMessageBox.warning(self, '提示', str(e))
+            return
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'收款失败：{str(e)}')
+            return
+
+        lines = [f"{i['charge_item_name']} {i['period']}：{i['paid_months']} 月 ¥{i['amount']:.2f}"
+                 + ('' if i['settled'] else f"（剩余 {i['remaining_months']} 月）")
+                 for i in self.receipt['items']]
+        lines.append(f"合计：¥{self.receipt['total']:.2f}")
+        if self.receipt['change'] > 0:
+            lines.append(f"实收：¥{self.receipt['received']:.2f}  找零：¥{self.receipt['change']:.2f}")
+        QMessageBox.information(self, '收款成功', '\n'.join(lines))
+        self.accept()
+
+    def collected_payment_ids(self):
+        return [i['payment_id'] for i in self.receipt['items']] if self.receipt else []
@@ -0,0 +1,200 @@
+"""
+小区管理与多小区汇总对话框
+"""
+import os
+from datetime import datetime
+
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                             QMessageBox, QDateEdit, QFileDialog, QInputDialog,
+                             QTableWidget, QTableWidgetItem)
+from PyQt5.QtCore import Qt, QDate
+
+from models.database import load_estates, add_estate, rename_estate, remove_estate, current_estate
+
+
+class EstateDialog(QDialog):
+    """登记、改名、移除小区（每个小区一个数据库文件）"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.changed = False
+        self.estates = []
+        self.init_ui()
+        self.load_estates()
+
+    def init_ui(self):
+        """初始化UI"""
+        self.setWindowTitle('小区管理')
+        self.resize(680, 380)
+
+        layout = QVBoxLayout(self)
+        tip = QLabel('每个小区的数据保存在单独的数据库文件中；选择一个尚不存在的文件即新建小区，首次切换时建表。')
+        tip.setWordWrap(True)
+        layout.addWidget(tip)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(3)
+        self.table.setHorizontalHeaderLabels(['小区', '数据库文件', '状态'])
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SingleSelection)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setColumnWidth(0, 150)
+        self.table.setColumnWidth(1, 380)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        for text, slot in (('添加小区', self.add_estate), ('改名', self.rename_estate), ('移除', self.remove_estate)):
+            btn = QPushButton(text)
+            btn.clicked.connect(slot)
+            btn_layout.addWidget(btn)
+        btn_layout.addStretch()
+        close_btn = QPushButton('关闭')
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+    def load_estates(self):
+        self.estates = load_estates()
+        current = current_estate().key
+        self.table.setRowCount(len(self.estates))
+        for row, estate in enumerate(self.estates):
+            status = '当前' if estate.key == current else ('' if os.path.exists(estate.db_path) else '未建库')
+            for col, value in enumerate((estate.name, estate.db_path, status)):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+
+    def selected_estate(self):
+        row = self.table.currentRow()
+        if row < 0 or row >= len(self.estates):
+            QMessageBox.warning(self, '提示', '请先选择一个小区')
+            return None
+        return self.estates[row]
+
+    def add_estate(self):
+        name, ok = QInputDialog.getText(self, '添加小区', '小区名称：')
+        if not ok or not name.strip():
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, '选择或新建小区数据库文件', os.path.dirname(current_estate().db_path),
+            'SQLite 数据库 (*.db)', options=QFileDialog.DontConfirmOverwrite)
+        if not path:
+            return
+        try:
+            add_estate(name, path)
+        except ValueError as e:
+            QMessageBox.warning(self, '提示', str(e))
+            return
+        self.changed = True
+        self.load_estates()
+
+    def rename_estate(self):
+        estate = self.selected_estate()
+        if estate is None:
+            return
+        name, ok = QInputDialog.getText(self, '小区改名', '小区名称：', text=estate.name)
+        if not ok:
+            return
+        try:
+            rename_estate(estate.key, name)
+        except ValueError as e:
+            QMessageBox.warning(self, '提示', str(e))
+            return
+        self.changed = True
+        self.load_estates()
+
+    def remove_estate(self):
+        estate = self.selected_estate()
+        if estate is None:
+            return
+        reply = QMessageBox.question(self, '确认', f'确定移除小区“{estate.name}”吗？数据库文件不会被删除。',
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        try:
+            remove_estate(estate.key)
+        except ValueError as e:
+            QMessageBox.warning(self, '提示', str(e))
+            return
+        self.changed = True
+        self.load_estates()
+
+
+class EstateSummaryDialog(QDialog):
+    """各小区某周期账单汇总，可导出 Excel"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.init_ui()
+        self.load_summary()
+
+    def init_ui(self):
+        """初始化UI"""
+        self.setWindowTitle('多小区汇总')
+        self.resize(760, 420)
+
+        layout = QVBoxLayout(self)
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(QLabel('缴费周期:'))
+        self.period_date = QDateEdit()
+        self.period_date.setCalendarPopup(True)
+        self.period_date.setDate(QDate.currentDate())
+        self.period_date.setDisplayFormat('yyyy-MM')
+        self.period_date.dateChanged.connect(self.load_summary)
+        top_layout.addWidget(self.period_date)
+        top_layout.addStretch()
+        layout.addLayout(top_layout)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(7)
+        self.table.setHorizontalHeaderLabels(['小区', '账单数', '已缴费', '未缴费', '应收金额', '已收金额', '未收金额'])
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setColumnWidth(0, 160)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        export_btn = QPushButton('导出Excel')
+        export_btn.clicked.connect(self.export)
+        btn_layout.addWidget(export_btn)
+        close_btn = QPushButton('关闭')
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+    def period(self):
+        date = self.period_date.date()
+        return f"{date.year():04d}-{date.month():02d}"
+
+    def load_summary(self):
+        """一条跨库查询取出各小区统计"""
+        from services.estate_report_service import EstateReportService
+        try:
+            stats = EstateReportService.get_statistics_by_period(self.period())
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'汇总失败：{str(e)}')
+            return
+        rows = stats['estates'] + [stats['total']]
+        self.table.setRowCount(len(rows))
+        for row, r in enumerate(rows):
+            values = [r['name'], r['total_count'], r['paid_count'], r['unpaid_count'],
+                      f"{r['total_amount']:.2f}", f"{r['paid_amount']:.2f}", f"{r['unpaid_amount']:.2f}"]
+            for col, value in enumerate(values):
+                cell = QTableWidgetItem(str(value))
+                if col > 0:
+                    cell.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, col, cell)
+
+    def export(self):
+        period = self.period()
+        default_name = f"多小区汇总_{period}_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx"
+        path, _ = QFileDialog.getSaveFileName(self, '导出多小区汇总', default_name, 'Excel 文件 (*.xlsx)')
+        if not path:
+            return
+        from utils.excel_exporter import ExcelExporter
+        try:
+            ExcelExporter.export_estate_summary(period, path)
+        except Exception as e:
+            QMessageBox.critical(self, '错误', str(e))
+            return
+        QMessageBox.information(self, '成功', f'已导出到：{path}')
@@ -5,7 +5,7 @@ import os
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QMessageBox, QFileDialog, QComboBox)
 from PyQt5.QtCore import Qt
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from utils.excel_exporter import ExcelExporter
 from utils.report_generator import ReportGenerator
@@ -14,9 +14,10 @@ from utils.report_generator import ReportGenerator
 class ExportDialog(QDialog):
     """导出对话框"""
     
-    def __init__(self, parent=None, export_type='unpaid'):
+    def __init__(self, parent=None, export_type='unpaid', include_archive=False):
         super().__init__(parent)
         self.export_type = export_type  # 'unpaid', 'payments', 'report'
+        self.include_archive = include_archive  # 缴费记录是否包含归档库中的历史账单
         self.init_ui()
     
     def init_ui(self):
@@ -45,7 +46,7 @@ class ExportDialog(QDialog):
             gran_layout = QHBoxLayout()
             gran_layout.addWidget(QLabel('统计粒度:'))
             self.gran_combo = QComboBox()
-            self.gran_combo.addItems(['按月', '按日', '按年'])
+            self.gran_combo.addItems(['按月', '按日', '按年', '收银日结'])
             self.gran_combo.currentTextChanged.connect(self.on_gran_changed)
             gran_layout.addWidget(self.gran_combo)
             layout.addLayout(gran_layout)
@@ -94,6 +95,11 @@ class ExportDialog(QDialog):
             if hasattr(self, '_available_years'):
                 self.period_combo.clear()
                 self.period_combo.addItems(self._available_years)
+        elif text == '收银日结':
+            # 显示最近 31 天的日期
+            today = datetime.now()
+            self.period_combo.clear()
+            self.period_combo.addItems([(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(31)])
         else:
             # 恢复为月份列表
             if hasattr(self, '_available_periods'):
@@ -131,6 +137,8 @@ class ExportDialog(QDialog):
             if gran == '按日':
                 today_str = datetime.now().strftime('%Y-%m-%d')
                 default_filename = f'日度统计报表_{today_str}.xlsx'
+            elif gran == '收银日结':
+                default_filename = f'收银日结_{period}.xlsx'
             else:
                 default_filename = f'月度统计报表_{period}.xlsx'
             file_filter = 'Excel文件 (*.xlsx)'
@@ -152,7 +160,7 @@ class ExportDialog(QDialog):
                 ExcelExporter.export_unpaid_list(period, file_path)
                 QMessageBox.information(self, '成功', f'欠费清单已导出到：\n{file_path}')
             elif self.export_type == 'payments':
-                ExcelExporter.export_payments(period, file_path)
+                ExcelExporter.export_payments(period, file_path, include_archive=self.include_archive)
                 QMessageBox.information(self, '成功', f'缴费记录已导出到：\n{file_path}')
             else:
                 # 根据粒度选择生成不同报表
@@ -161,6 +169,15 @@ class ExportDialog(QDialog):
                     gran = self.gran_combo.currentText()
                 if gran == '按日':
                     ReportGenerator.generate_daily_report(period, file_path)
+                elif gran == '收银日结':
+                    # period 此时为日期
+                    result = ReportGenerator.generate_closeout_report(period, file_path)
+                    message = f"实收 {result['count']} 笔，合计 ¥{float(result['amount']):.2f}"
+                    if result['mismatches']:
+                        message += f"\n有 {result['mismatches']} 张账单的已缴金额与流水合计不一致，见“对账差异”工作表"
+                    QMessageBox.information(self, '成功', f'{message}\n收银日结已生成到：\n{file_path}')
+                    self.accept()
+                    return
                 elif gran == '按年':
                     # period holds year in this mode
                     ReportGenerator.generate_year_report(period, file_path)
@@ -4,9 +4,9 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QTabWidget, QTableWidget, QTableWidgetItem, QPushButton,
                              QLabel, QComboBox, QMessageBox, QLineEdit, QMenuBar, QMenu,
-                             QDialog, QFileDialog, QDoubleSpinBox)
+                             QDialog, QFileDialog, QDoubleSpinBox, QCheckBox)
 from PyQt5.QtWidgets import QInputDialog
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, pyqtSignal as Signal
 from PyQt5.QtGui import QFont, QPixmap
 import os
 import json
@@ -17,18 +17,10 @@ from decimal import Decimal, ROUND_HALF_UP
 from services.resident_service import ResidentService
 from services.charge_service import ChargeService
 from services.payment_service import PaymentService
-from models.database import DB_PATH, SessionLocal
-from models.payment import Payment
-from models.payment_transaction import PaymentTransaction
+from models.database import current_db_path
 from utils.logger import logger
-from ui.resident_dialog import ResidentDialog
-from ui.charge_dialog import ChargeDialog
-from ui.payment_dialog import PaymentDialog
-from ui.receipt_dialog import ReceiptDialog
-from ui.pay_dialog import PayDialog
-from ui.import_dialog import ImportDialog
-from ui.export_dialog import ExportDialog
-from ui.backup_dialog import BackupDialog
+from utils.startup import startup_timer
+from utils.memory import memory_tracker, track_view
 
 # Small helper QTableWidgetItem subclass to support custom sort keys
 class SortableItem(QTableWidgetItem):
@@ -49,18 +41,97 @@ class SortableItem(QTableWidgetItem):
                 return False
 
 
+def _room_sort_key(room):
+    """房号解析为整数元组作为排序 key，例如 "1-1-1001" -> (1,1,1001)"""
+    key = []
+    for part in str(room).split('-'):
+        try:
+            key.append(int(part))
+        except Exception:
+            key.append(part)
+    return tuple(key)
+
+
+class DatabaseReadyWorker(QThread):
+    """后台准备数据库（迁移/建表），完成后通知主窗口加载数据"""
+    finished = Signal(bool, str)  # 是否成功, 错误信息
+
+    def __init__(self, prepare):
+        super().__init__()
+        self.prepare = prepare
+
+    def run(self):
+        try:
+            with startup_timer.phase('db_ready'):
+                if self.prepare is not None:
+                    self.prepare()
+            self.finished.emit(True, '')
+        except Exception as e:
+            logger.log_error(e, 'DB_READY_FAILED')
+            self.finished.emit(False, str(e))
+
+
 class MainWindow(QMainWindow):
     """主窗口类"""
     
-    def __init__(self):
+    # 首次数据加载完成
+    data_loaded = Signal()
+    # 后台（如定时出账）生成了账单，可从任意线程发出
+    payments_generated = Signal()
+    
+    # 住户、缴费记录列表每次取的条数，滚动到底部附近时再取下一页
+    PAGE_SIZE = 200
+
+    def __init__(self, defer_load=False):
+        """
+        Args:
+            defer_load: 为 True 时只构建界面，由 start_deferred_load 在后台准备数据库后再加载数据，
+                        窗口可以先显示出来
+        """
         super().__init__()
+        self._db_worker = None
+        self._pagers = {}  # 表格 -> 分页状态
         self.init_ui()
-        self.load_data()
+        self.payments_generated.connect(self.on_payments_generated)
+        if not defer_load:
+            self.load_data()
         self.apply_stylesheet()
     
+    def start_deferred_load(self, prepare=None):
+        """后台执行 prepare（如 init_db），完成后在界面线程加载数据"""
+        self.set_data_ready(False)
+        self.statusBar().showMessage('正在准备数据库...')
+        self._db_worker = DatabaseReadyWorker(prepare)
+        self._db_worker.finished.connect(self.on_database_ready)
+        self._db_worker.start()
+    
+    def on_database_ready(self, ok, error):
+        """数据库准备完成，加载数据"""
+        if not ok:
+            QMessageBox.critical(self, '启动错误', f'数据库初始化失败：{error}')
+            self.close()
+            return
+        with startup_timer.phase('first_load'):
+            self.load_data()
+        self.set_data_ready(True)
+        self.statusBar().clearMessage()
+        startup_timer.finish()
+        self.data_loaded.emit()
+    
+    def on_payments_generated(self):
+        """后台生成账单后刷新周期和账单列表"""
+        self.load_periods()
+        self.load_payments()
+    
+    def set_data_ready(self, ready):
+        """数据库就绪前禁用菜单和操作区"""
+        self.menuBar().setEnabled(ready)
+        if self.centralWidget() is not None:
+            self.centralWidget().setEnabled(ready)
+    
     def init_ui(self):
         """初始化UI"""
-        self.setWindowTitle('四川盛涵物业缴费系统')
+        self.update_window_title()
         self.setGeometry(100, 100, 1200, 700)
         
         # 创建菜单栏
@@ -254,6 +325,8 @@ class MainWindow(QMainWindow):
         self.resident_table.setSortingEnabled(True)
         self.resident_table.setSelectionBehavior(QTableWidget.SelectRows)
         self.resident_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.resident_table.verticalScrollBar().valueChanged.connect(
+            lambda value: self.on_table_scrolled(self.resident_table))
         layout.addWidget(self.resident_table)
         
         self.tab_widget.addTab(tab, '住户管理')
@@ -323,6 +396,8 @@ class MainWindow(QMainWindow):
         self.add_payment_btn.clicked.connect(self.add_payment)
         self.edit_payment_btn.clicked.connect(self.edit_payment)
         self.mark_paid_btn.clicked.connect(self.mark_payment_paid)
+        self.collect_btn = QPushButton('合并收款')
+        self.collect_btn.clicked.connect(self.collect_payments)
         self.delete_payment_btn.clicked.connect(self.delete_payment)
         self.print_receipt_btn.clicked.connect(self.print_receipt)
         # 合并打印按钮
@@ -339,6 +414,7 @@ class MainWindow(QMainWindow):
         toolbar_layout.addWidget(self.edit_payment_btn)
         toolbar_layout.addWidget(self.batch_payment_btn)
         toolbar_layout.addWidget(self.mark_paid_btn)
+        toolbar_layout.addWidget(self.collect_btn)
         toolbar_layout.addWidget(self.delete_payment_btn)
         toolbar_layout.addWidget(self.print_receipt_btn)
         toolbar_layout.addWidget(self.export_payment_btn)
@@ -362,6 +438,10 @@ class MainWindow(QMainWindow):
         self.period_combo = QComboBox()
         self.period_combo.currentTextChanged.connect(self.load_payments)
         period_layout.addWidget(self.period_combo)
+        # 勾选后周期列表、账单列表和搜索包含已移入归档库的历史账单
+        self.include_archive_check = QCheckBox('含归档')
+        self.include_archive_check.toggled.connect(self.load_periods)
+        period_layout.addWidget(self.include_archive_check)
         period_layout.addStretch()
         period_layout.addWidget(QLabel('搜索:'))
         self.payment_search = QLineEdit()
@@ -378,6 +458,8 @@ class MainWindow(QMainWindow):
         self.payment_table.horizontalHeader().setStretchLastSection(True)
         self.payment_table.setSelectionBehavior(QTableWidget.SelectRows)
         self.payment_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.payment_table.verticalScrollBar().valueChanged.connect(
+            lambda value: self.on_table_scrolled(self.payment_table))
         layout.addWidget(self.payment_table)
         
         self.tab_widget.addTab(tab, '收费管理')
@@ -429,40 +511,54 @@ class MainWindow(QMainWindow):
         self.load_payments()
         self.load_unpaid()
     
+    # ------------------------------------------------------------------ 分页加载
+    def start_paging(self, table, fetch, fill):
+        """清空表格并按页加载：fetch(after) 返回 {'items', 'cursor'}，fill(items, start_row) 填充行"""
+        self._pagers[table] = {'fetch': fetch, 'fill': fill, 'cursor': None}
+        table.setRowCount(0)
+        self.fetch_next_page(table)
+
+    def fetch_next_page(self, table):
+        """取下一页追加到表格末尾，已全部加载时什么也不做"""
+        pager = self._pagers.get(table)
+        if pager is None:
+            return
+        page = pager['fetch'](pager['cursor'])
+        items = page['items']
+        # 追加期间关闭排序，避免新行插入时被重排导致填错行
+        sorting = table.isSortingEnabled()
+        table.setSortingEnabled(False)
+        try:
+            start = table.rowCount()
+            table.setRowCount(start + len(items))
+            pager['fill'](items, start)
+        finally:
+            table.setSortingEnabled(sorting)
+        pager['cursor'] = page['cursor']
+        if page['cursor'] is None:
+            # 已到最后一页
+            self._pagers.pop(table, None)
+
+    def on_table_scrolled(self, table):
+        """滚动到距底部不足一屏时加载下一页"""
+        if table not in self._pagers:
+            return
+        bar = table.verticalScrollBar()
+        if bar.value() >= bar.maximum() - bar.pageStep():
+            try:
+                # 后续页的内存计入该列表的加载统计，预算按已加载的全部行数计算
+                memory_tracker.measure_page(table, lambda: self.fetch_next_page(table))
+            except Exception as e:
+                self._pagers.pop(table, None)
+                QMessageBox.critical(self, '错误', f'加载下一页失败：{str(e)}')
+
+    @track_view('住户列表', 'resident_table')
     def load_residents(self):
-        """加载住户列表"""
+        """加载住户列表（分页）"""
         try:
-            residents = ResidentService.get_all_residents()
-            self.resident_table.setRowCount(len(residents))
-            
-            for row, resident in enumerate(residents):
-                # ID 列使用可排序的整数 key
-                try:
-                    id_key = int(resident.id)
-                except Exception:
-                    id_key = resident.id
-                self.resident_table.setItem(row, 0, SortableItem(str(resident.id), sort_key=id_key))
-                # 房号解析为整数元组作为排序 key，例如 "1-1-1001" -> (1,1,1001)
-                def _room_key(s):
-                    parts = str(s).split('-')
-                    key = []
-                    for p in parts:
-                        try:
-                            key.append(int(p))
-                        except Exception:
-                            key.append(p)
-                    return tuple(key)
-                room_display = getattr(resident, 'full_room_no', resident.room_no)
-                self.resident_table.setItem(row, 1, SortableItem(room_display, sort_key=_room_key(room_display)))
-                self.resident_table.setItem(row, 2, QTableWidgetItem(resident.name))
-                self.resident_table.setItem(row, 3, QTableWidgetItem(resident.phone or ''))
-                self.resident_table.setItem(row, 4, QTableWidgetItem(str(float(resident.area) if resident.area else 0.0)))
-                self.resident_table.setItem(row, 5, QTableWidgetItem(
-                    resident.move_in_date.strftime('%Y-%m-%d') if resident.move_in_date else ''))
-                # 身份列
-                identity_text = '房主' if getattr(resident, 'identity', 'owner') == 'owner' else '租户'
-                self.resident_table.setItem(row, 6, QTableWidgetItem(identity_text))
-                self.resident_table.setItem(row, 7, QTableWidgetItem('正常' if resident.status == 1 else '停用'))
+            self.start_paging(self.resident_table,
+                              lambda after: ResidentService.get_residents_page(after, self.PAGE_SIZE),
+                              self._fill_resident_rows)
         except Exception as e:
             QMessageBox.critical(self, '错误', f'加载住户列表失败：{str(e)}')
     
@@ -474,37 +570,36 @@ class MainWindow(QMainWindow):
             return
         
         try:
-            residents = ResidentService.search_residents(keyword)
-            self.resident_table.setRowCount(len(residents))
-            
-            for row, resident in enumerate(residents):
-                try:
-                    id_key = int(resident.id)
-                except Exception:
-                    id_key = resident.id
-                self.resident_table.setItem(row, 0, SortableItem(str(resident.id), sort_key=id_key))
-                def _room_key(s):
-                    parts = str(s).split('-')
-                    key = []
-                    for p in parts:
-                        try:
-                            key.append(int(p))
-                        except Exception:
-                            key.append(p)
-                    return tuple(key)
-                room_display = getattr(resident, 'full_room_no', resident.room_no)
-                self.resident_table.setItem(row, 1, SortableItem(room_display, sort_key=_room_key(room_display)))
-                self.resident_table.setItem(row, 2, QTableWidgetItem(resident.name))
-                self.resident_table.setItem(row, 3, QTableWidgetItem(resident.phone or ''))
-                self.resident_table.setItem(row, 4, QTableWidgetItem(str(float(resident.area) if resident.area else 0.0)))
-                self.resident_table.setItem(row, 5, QTableWidgetItem(
-                    resident.move_in_date.strftime('%Y-%m-%d') if resident.move_in_date else ''))
-                self.resident_table.setItem(row, 6, QTableWidgetItem('正常' if resident.status == 1 else '停用'))
+            self.start_paging(self.resident_table,
+                              lambda after: ResidentService.search_residents_page(keyword, after, self.PAGE_SIZE),
+                              self._fill_resident_rows)
         except Exception as e:
             QMessageBox.critical(self, '错误', f'搜索失败：{str(e)}')
+
+    def _fill_resident_rows(self, residents, start):
+        """从第 start 行起填充住户"""
+        for row, resident in enumerate(residents, start):
+            # ID 列使用可排序的整数 key
+            try:
+                id_key = int(resident.id)
+            except Exception:
+                id_key = resident.id
+            self.resident_table.setItem(row, 0, SortableItem(str(resident.id), sort_key=id_key))
+            room_display = getattr(resident, 'full_room_no', resident.room_no)
+            self.resident_table.setItem(row, 1, SortableItem(room_display, sort_key=_room_sort_key(room_display)))
+            self.resident_table.setItem(row, 2, QTableWidgetItem(resident.name))
+            self.resident_table.setItem(row, 3, QTableWidgetItem(resident.phone or ''))
+            self.resident_table.setItem(row, 4, QTableWidgetItem(str(float(resident.area) if resident.area else 0.0)))
+            self.resident_table.setItem(row, 5, QTableWidgetItem(
+                resident.move_in_date.strftime('%Y-%m-%d') if resident.move_in_date else ''))
+            # 身份列
+            identity_text = '房主' if getattr(resident, 'identity', 'owner') == 'owner' else '租户'
+            self.resident_table.setItem(row, 6, QTableWidgetItem(identity_text))
+            self.resident_table.setItem(row, 7, QTableWidgetItem('正常' if resident.status == 1 else '停用'))
     
     def add_resident(self):
         """新增住户"""
+        from ui.resident_dialog import ResidentDialog
         dialog = ResidentDialog(self)
         if dialog.exec_() == ResidentDialog.Accepted:
             self.load_residents()
@@ -517,6 +612,7 @@ class MainWindow(QMainWindow):
             return
         
         resident_id = int(self.resident_table.item(selected_rows[0].row(), 0).text())
+        from ui.resident_dialog import ResidentDialog
         dialog = ResidentDialog(self, resident_id=resident_id)
         if dialog.exec_() == ResidentDialog.Accepted:
             self.load_residents()
@@ -535,16 +631,7 @@ class MainWindow(QMainWindow):
             resident_ids.append(int(self.resident_table.item(r, 0).text()))
             room_nos.append(self.resident_table.item(r, 1).text())
         # 统计将被删除的相关缴费记录数与流水数，提示用户
-        db = SessionLocal()
-        try:
-            payments = db.query(Payment).filter(Payment.resident_id.in_(resident_ids)).all()
-            payment_ids = [p.id for p in payments if p.id is not None]
-            payment_count = len(payment_ids)
-            tx_count = 0
-            if payment_ids:
-                tx_count = db.query(PaymentTransaction).filter(PaymentTransaction.payment_id.in_(payment_ids)).count()
-        finally:
-            db.close()
+        payment_count, tx_count = ResidentService.count_related_records(resident_ids)
 
         # 使用自定义的可滚动确认对话框，避免大量项时按钮被遮挡
         from ui.confirm_delete_dialog import ConfirmDeleteDialog
@@ -552,35 +639,41 @@ class MainWindow(QMainWindow):
 
         # 在对话框外再弹一层强确认，显示将删除的记录统计和备份提示
         if dlg.exec_() == ConfirmDeleteDialog.Accepted:
-            msg = f"将删除 {len(resident_ids)} 个住户，及其关联的 {payment_count} 条缴费记录和 {tx_count} 条流水。\n\n操作前会自动备份数据库，确定继续吗？"
+            # 联网模式下数据库在服务端，由服务端定时备份，本机不复制数据库文件
+            from services.api_client import active_client
+            remote = active_client() is not None
+            backup_note = '数据库在服务端，由服务端定时备份' if remote else '操作前会自动备份数据库'
+            msg = f"将删除 {len(resident_ids)} 个住户，及其关联的 {payment_count} 条缴费记录和 {tx_count} 条流水。\n\n{backup_note}，确定继续吗？"
             reply = QMessageBox.question(self, '最终确认', msg, QMessageBox.Yes | QMessageBox.No)
             if reply != QMessageBox.Yes:
                 return
 
             # 备份数据库文件
-            try:
-                import shutil, os, datetime
-                os.makedirs('exports', exist_ok=True)
-                ts = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-                backup_path = os.path.join('exports', f'property_db_backup_{ts}.db')
-                shutil.copy2(DB_PATH, backup_path)
-            except Exception as e:
-                QMessageBox.warning(self, '警告', f'无法创建数据库备份：{e}\n继续删除可能无法恢复。')
-
-            failed = []
-            for rid in resident_ids:
+            backup_path = None
+            if not remote:
                 try:
-                    ResidentService.delete_resident(rid)
+                    import shutil, datetime
+                    os.makedirs('exports', exist_ok=True)
+                    ts = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+                    path = os.path.join('exports', f'property_db_backup_{ts}.db')
+                    shutil.copy2(current_db_path(), path)
+                    backup_path = path
                 except Exception as e:
-                    failed.append((rid, str(e)))
+                    QMessageBox.warning(self, '警告', f'无法创建数据库备份：{e}\n继续删除可能无法恢复。')
+
+            try:
+                _, failed = ResidentService.delete_residents_batch(resident_ids)
+            except Exception as e:
+                failed = [(rid, str(e)) for rid in resident_ids]
 
             if not failed:
-                QMessageBox.information(self, '成功', f'已删除选中住户（并删除其关联缴费与流水）。\n备份：{backup_path if os.path.exists(backup_path) else "未生成"}')
+                QMessageBox.information(self, '成功', f'已删除选中住户（并删除其关联缴费与流水）。\n备份：{backup_path or "未生成"}')
             else:
                 msgs = '\n'.join([f"{rid}: {err}" for rid, err in failed])
                 QMessageBox.warning(self, '部分失败', f'部分住户删除失败：\n{msgs}')
             self.load_residents()
     
+    @track_view('收费项目', 'charge_table')
     def load_charge_items(self):
         """加载收费项目列表"""
         try:
@@ -599,6 +692,7 @@ class MainWindow(QMainWindow):
     
     def add_charge_item(self):
         """新增收费项目"""
+        from ui.charge_dialog import ChargeDialog
         dialog = ChargeDialog(self)
         if dialog.exec_() == ChargeDialog.Accepted:
             self.load_charge_items()
@@ -611,6 +705,7 @@ class MainWindow(QMainWindow):
             return
         
         item_id = int(self.charge_table.item(selected_rows[0].row(), 0).text())
+        from ui.charge_dialog import ChargeDialog
         dialog = ChargeDialog(self, item_id=item_id)
         if dialog.exec_() == ChargeDialog.Accepted:
             self.load_charge_items()
@@ -638,12 +733,7 @@ class MainWindow(QMainWindow):
     def load_periods(self):
         """加载周期列表"""
         try:
-            payments = PaymentService.get_all_payments()
-            periods = set()
-            for payment in payments:
-                periods.add(payment.period)
-            
-            periods = sorted(list(periods), reverse=True)
+            periods = PaymentService.get_periods(include_archive=self.include_archive_check.isChecked())
             
             # 如果没有记录，添加当前月份
             current_period = datetime.now().strftime('%Y-%m')
@@ -658,46 +748,53 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, '错误', f'加载周期列表失败：{str(e)}')
     
+    @track_view('缴费记录', 'payment_table')
     def load_payments(self):
-        """加载缴费记录列表"""
+        """加载缴费记录列表（分页）"""
         try:
             period = self.period_combo.currentText()
             if not period:
                 return
             
-            payments = PaymentService.get_payments_by_period(period)
-            self.payment_table.setRowCount(len(payments))
-            
-            for row, payment in enumerate(payments):
-                self.payment_table.setItem(row, 0, QTableWidgetItem(str(payment.id)))
-                self.payment_table.setItem(row, 1, QTableWidgetItem(getattr(payment.resident, 'full_room_no', payment.resident.room_no)))
-                self.payment_table.setItem(row, 2, QTableWidgetItem(payment.resident.name))
-                self.payment_table.setItem(row, 3, QTableWidgetItem(payment.charge_item.name))
-                # 计费周期
-                billing_period = f"{payment.billing_start_date.strftime('%Y-%m-%d')} 至 {payment.billing_end_date.strftime('%Y-%m-%d')}" if payment.billing_start_date and payment.billing_end_date else payment.period
-                self.payment_table.setItem(row, 4, QTableWidgetItem(billing_period))
-                self.payment_table.setItem(row, 5, QTableWidgetItem(f"{payment.billing_months} 月"))
-                self.payment_table.setItem(row, 6, QTableWidgetItem(f"{payment.paid_months} 月"))
-                self.payment_table.setItem(row, 7, QTableWidgetItem(self._fmt_amount_int(payment.amount)))
-                # 已缴金额列
-                self.payment_table.setItem(row, 8, QTableWidgetItem(self._fmt_amount_int(payment.paid_amount)))
-                # 缴费状态
-                if payment.paid == 1:
-                    status_text = '已缴费'
-                elif payment.paid_months > 0:
-                    status_text = f'部分缴费({payment.paid_months}/{payment.billing_months})'
-                else:
-                    status_text = '未缴费'
-                self.payment_table.setItem(row, 9, QTableWidgetItem(status_text))
-                self.payment_table.setItem(row, 10, QTableWidgetItem(
-                    payment.paid_time.strftime('%Y-%m-%d %H:%M:%S') if payment.paid_time else ''))
+            include_archive = self.include_archive_check.isChecked()
+            self.start_paging(self.payment_table,
+                              lambda after: PaymentService.get_payments_page(
+                                  period, after=after, limit=self.PAGE_SIZE, include_archive=include_archive),
+                              self._fill_payment_rows)
         except Exception as e:
             QMessageBox.critical(self, '错误', f'加载缴费记录失败：{str(e)}')
+
+    def _fill_payment_rows(self, payments, start):
+        """从第 start 行起填充缴费记录"""
+        for row, payment in enumerate(payments, start):
+            self.payment_table.setItem(row, 0, QTableWidgetItem(str(payment.id)))
+            self.payment_table.setItem(row, 1, QTableWidgetItem(getattr(payment.resident, 'full_room_no', payment.resident.room_no)))
+            self.payment_table.setItem(row, 2, QTableWidgetItem(payment.resident.name))
+            self.payment_table.setItem(row, 3, QTableWidgetItem(payment.charge_item.name))
+            # 计费周期
+            billing_period = f"{payment.billing_start_date.strftime('%Y-%m-%d')} 至 {payment.billing_end_date.strftime('%Y-%m-%d')}" if payment.billing_start_date and payment.billing_end_date else payment.period
+            self.payment_table.setItem(row, 4, QTableWidgetItem(billing_period))
+            self.payment_table.setItem(row, 5, QTableWidgetItem(f"{payment.billing_months} 月"))
+            self.payment_table.setItem(row, 6, QTableWidgetItem(f"{payment.paid_months} 月"))
+            self.payment_table.setItem(row, 7, QTableWidgetItem(self._fmt_amount_int(payment.amount)))
+            # 已缴金额列
+            self.payment_table.setItem(row, 8, QTableWidgetItem(self._fmt_amount_int(payment.paid_amount)))
+            # 缴费状态
+            if payment.paid == 1:
+                status_text = '已缴费'
+            elif payment.paid_months > 0:
+                status_text = f'部分缴费({payment.paid_months}/{payment.billing_months})'
+            else:
+                status_text = '未缴费'
+            self.payment_table.setItem(row, 9, QTableWidgetItem(status_text))
+            self.payment_table.setItem(row, 10, QTableWidgetItem(
+                payment.paid_time.strftime('%Y-%m-%d %H:%M:%S') if payment.paid_time else ''))
     
     def add_payment(self):
         """生成账单"""
         logger.log_operation("UI_ADD_PAYMENT_START")
         try:
+            from ui.payment_dialog import PaymentDialog
             dialog = PaymentDialog(self)
             if dialog.exec_() == PaymentDialog.Accepted:
                 self.load_periods()
@@ -718,6 +815,7 @@ class MainWindow(QMainWindow):
                 return
 
             payment_id = int(self.payment_table.item(selected_rows[0].row(), 0).text())
+            from ui.payment_dialog import PaymentDialog
             dialog = PaymentDialog(self)
             # 加载账单到对话框以编辑
             dialog.load_payment(payment_id)
@@ -738,11 +836,36 @@ class MainWindow(QMainWindow):
         payment_id = int(self.payment_table.item(selected_rows[0].row(), 0).text())
         
         # 打开缴费对话框
+        from ui.pay_dialog import PayDialog
         dialog = PayDialog(self, payment_id=payment_id)
         if dialog.exec_() == PayDialog.Accepted:
             self.load_payments()
             self.load_unpaid()
     
+    def collect_payments(self):
+        """合并收款：一次收取同一住户的多笔账单，并可打印合并收据"""
+        selected_rows = self.payment_table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, '提示', '请选择要收款的账单（可多选，须为同一住户）')
+            return
+        payment_ids = [int(self.payment_table.item(idx.row(), 0).text()) for idx in selected_rows]
+        payments = PaymentService.get_payments_by_ids(payment_ids)
+        resident_ids = {p.resident_id for p in payments}
+        if len(resident_ids) != 1:
+            QMessageBox.warning(self, '提示', '合并收款只能选择同一住户的账单')
+            return
+
+        from ui.collect_dialog import CollectDialog
+        dialog = CollectDialog(self, resident_id=resident_ids.pop(), payment_ids=payment_ids)
+        if dialog.exec_() == CollectDialog.Accepted:
+            self.load_payments()
+            self.load_unpaid()
+            collected = dialog.collected_payment_ids()
+            reply = QMessageBox.question(self, '打印收据', '是否打印本次收款的合并收据？',
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+            if collected and reply == QMessageBox.Yes:
+                self.merge_print_receipts(collected)
+    
     def delete_payment(self):
         """删除账单"""
         logger.log_operation("UI_DELETE_PAYMENT_START")
@@ -802,39 +925,12 @@ class MainWindow(QMainWindow):
             return
         
         try:
-            payments = PaymentService.search_payments(keyword, period=period)
-            self.payment_table.setRowCount(len(payments))
-            
-            for row, payment in enumerate(payments):
-                # Match the same columns/format as load_payments to avoid misalignment
-                self.payment_table.setItem(row, 0, QTableWidgetItem(str(payment.id)))
-                self.payment_table.setItem(row, 1, QTableWidgetItem(getattr(payment.resident, 'full_room_no', payment.resident.room_no)))
-                self.payment_table.setItem(row, 2, QTableWidgetItem(payment.resident.name))
-                self.payment_table.setItem(row, 3, QTableWidgetItem(payment.charge_item.name))
-                # 计费周期显示：优先显示起止日期范围，否则显示 period 文本
-                billing_period = f"{payment.billing_start_date.strftime('%Y-%m-%d')} 至 {payment.billing_end_date.strftime('%Y-%m-%d')}" if payment.billing_start_date and payment.billing_end_date else payment.period
-                self.payment_table.setItem(row, 4, QTableWidgetItem(billing_period))
-                # 总月数 / 已缴月数 / 金额 / 已缴金额 / 状态 / 缴费时间
-                try:
-                    self.payment_table.setItem(row, 5, QTableWidgetItem(f"{payment.billing_months} 月"))
-                except Exception:
-                    self.payment_table.setItem(row, 5, QTableWidgetItem(''))
-                try:
-                    self.payment_table.setItem(row, 6, QTableWidgetItem(f"{payment.paid_months} 月"))
-                except Exception:
-                    self.payment_table.setItem(row, 6, QTableWidgetItem(''))
-                self.payment_table.setItem(row, 7, QTableWidgetItem(self._fmt_amount_int(payment.amount)))
-                self.payment_table.setItem(row, 8, QTableWidgetItem(self._fmt_amount_int(payment.paid_amount)))
-                # 缴费状态文本
-                if getattr(payment, 'paid', 0) == 1:
-                    status_text = '已缴费'
-                elif getattr(payment, 'paid_months', 0) > 0:
-                    status_text = f'部分缴费({payment.paid_months}/{payment.billing_months})'
-                else:
-                    status_text = '未缴费'
-                self.payment_table.setItem(row, 9, QTableWidgetItem(status_text))
-                self.payment_table.setItem(row, 10, QTableWidgetItem(
-                    payment.paid_time.strftime('%Y-%m-%d %H:%M:%S') if payment.paid_time else ''))
+            include_archive = self.include_archive_check.isChecked()
+            self.start_paging(self.payment_table,
+                              lambda after: PaymentService.search_payments_page(
+                                  keyword, period=period, after=after, limit=self.PAGE_SIZE,
+                                  include_archive=include_archive),
+                              self._fill_payment_rows)
         except Exception as e:
             QMessageBox.critical(self, '错误', f'搜索失败：{str(e)}')
     
@@ -847,27 +943,25 @@ class MainWindow(QMainWindow):
         
         payment_id = int(self.payment_table.item(selected_rows[0].row(), 0).text())
         
+        from ui.receipt_dialog import ReceiptDialog
         dialog = ReceiptDialog(self, payment_id=payment_id)
         dialog.exec_()
 
-    def merge_print_receipts(self):
-        """合并打印选中多笔账单到一张收据"""
-        selected_ranges = self.payment_table.selectionModel().selectedRows()
-        if not selected_ranges:
-            QMessageBox.warning(self, '提示', '请选择要合并打印的账单（可多选）')
-            return
+    def merge_print_receipts(self, payment_ids=None):
+        """合并打印多笔账单到一张收据（未指定 payment_ids 时取表格中选中的账单）"""
+        if not payment_ids:
+            selected_ranges = self.payment_table.selectionModel().selectedRows()
+            if not selected_ranges:
+                QMessageBox.warning(self, '提示', '请选择要合并打印的账单（可多选）')
+                return
 
-        payment_ids = []
-        for idx in selected_ranges:
-            r = idx.row()
-            payment_ids.append(int(self.payment_table.item(r, 0).text()))
+            payment_ids = []
+            for idx in selected_ranges:
+                r = idx.row()
+                payment_ids.append(int(self.payment_table.item(r, 0).text()))
         
-        # 收集 payment 对象
-        payments = []
-        for pid in payment_ids:
-            p = PaymentService.get_payment_by_id(pid)
-            if p:
-                payments.append(p)
+        # 收集 payment 对象（一次查询，按选中顺序）
+        payments = PaymentService.get_payments_by_ids(payment_ids)
 
         try:
             from utils.printer import ReceiptPrinter
@@ -1053,6 +1147,7 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, '错误', f'合并打印失败：{str(e)}')
     
+    @track_view('欠费查询', 'unpaid_table')
     def load_unpaid(self):
         """加载欠费列表"""
         try:
@@ -1123,10 +1218,14 @@ class MainWindow(QMainWindow):
     def create_menu_bar(self):
         """创建菜单栏"""
         menubar = self.menuBar()
+        # 联网模式下数据库在服务端，本机不做备份、不切换小区
+        from services.api_client import active_client
+        remote = active_client() is not None
         
         # 数据菜单
         data_menu = menubar.addMenu('数据')
-        data_menu.addAction('数据备份', self.show_backup_dialog)
+        if not remote:
+            data_menu.addAction('数据备份', self.show_backup_dialog)
         data_menu.addAction('住户批量导入', self.import_residents)
         data_menu.addSeparator()
         data_menu.addAction('导出缴费记录', self.export_payments)
@@ -1136,9 +1235,84 @@ class MainWindow(QMainWindow):
         # 工具菜单
         tools_menu = menubar.addMenu('工具')
         tools_menu.addAction('批量生成账单', self.batch_create_payments)
+        tools_menu.addAction('抄表与按量出账', self.show_meter_reading_dialog)
+        tools_menu.addAction('周期出账计划', self.show_billing_plan_dialog)
+        tools_menu.addAction('归档历史账单', self.archive_history)
+        tools_menu.addSeparator()
+        tools_menu.addAction('性能统计', self.show_performance_dialog)
+        tools_menu.addAction('导出内存诊断', self.dump_memory_report)
+
+        # 小区菜单（打开时按 estates.json 重建）
+        self.estate_menu = None
+        if not remote:
+            self.estate_menu = menubar.addMenu('小区')
+            self.estate_menu.aboutToShow.connect(self.build_estate_menu)
+            self.build_estate_menu()
+
+    def build_estate_menu(self):
+        """列出已登记的小区，勾选当前小区"""
+        from models.database import load_estates, current_estate
+        self.estate_menu.clear()
+        current = current_estate().key
+        for estate in load_estates():
+            action = self.estate_menu.addAction(estate.name)
+            action.setCheckable(True)
+            action.setChecked(estate.key == current)
+            action.triggered.connect(lambda checked, key=estate.key: self.switch_estate(key))
+        self.estate_menu.addSeparator()
+        self.estate_menu.addAction('小区管理', self.show_estate_dialog)
+        self.estate_menu.addAction('多小区汇总', self.show_estate_summary_dialog)
+
+    def update_window_title(self):
+        from models.database import load_estates, current_estate
+        from services.api_client import active_client
+        title = '四川盛涵物业缴费系统'
+        client = active_client()
+        if client is not None:
+            title += f'（联网：{client.url}）'
+        elif len(load_estates()) > 1:
+            title += f' - {current_estate().name}'
+        self.setWindowTitle(title)
+
+    def switch_estate(self, key):
+        """切换当前小区并重新加载数据（无需重启）"""
+        from models.database import switch_estate, current_estate
+        if key == current_estate().key:
+            return
+        from PyQt5.QtWidgets import QApplication
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            estate = switch_estate(key)
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            logger.log_error(e, f"SWITCH_ESTATE_FAILED: {key}")
+            QMessageBox.critical(self, '错误', f'切换小区失败：{str(e)}')
+            return
+        try:
+            self.load_data()
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.update_window_title()
+        logger.log_operation("SWITCH_ESTATE", f"key={estate.key}, name={estate.name}")
+        self.statusBar().showMessage(f'已切换到小区：{estate.name}', 5000)
+
+    def show_estate_dialog(self):
+        """显示小区管理对话框"""
+        from ui.estate_dialog import EstateDialog
+        dialog = EstateDialog(self)
+        dialog.exec_()
+        if dialog.changed:
+            self.update_window_title()
+
+    def show_estate_summary_dialog(self):
+        """显示多小区汇总对话框"""
+        from ui.estate_dialog import EstateSummaryDialog
+        dialog = EstateSummaryDialog(self)
+        dialog.exec_()
     
     def import_residents(self):
         """批量导入住户"""
+        from ui.import_dialog import ImportDialog
         dialog = ImportDialog(self)
         if dialog.exec_() == ImportDialog.Accepted:
             self.load_residents()
@@ -1150,6 +1324,7 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, '提示', '请先选择查询周期')
             return
         
+        from ui.export_dialog import ExportDialog
         dialog = ExportDialog(self, export_type='unpaid')
         dialog.set_periods([period])
         dialog.exec_()
@@ -1157,25 +1332,26 @@ class MainWindow(QMainWindow):
     def export_payments(self):
         """导出缴费记录"""
         # 获取所有周期
-        all_payments = PaymentService.get_all_payments()
-        periods = sorted(set(p.period for p in all_payments), reverse=True)
+        include_archive = self.include_archive_check.isChecked()
+        periods = PaymentService.get_periods(include_archive=include_archive)
         if not periods:
             QMessageBox.warning(self, '提示', '没有可用的周期数据')
             return
         
-        dialog = ExportDialog(self, export_type='payments')
+        from ui.export_dialog import ExportDialog
+        dialog = ExportDialog(self, export_type='payments', include_archive=include_archive)
         dialog.set_periods(periods)
         dialog.exec_()
     
     def generate_report(self):
         """生成统计报表"""
         # 获取所有周期
-        all_payments = PaymentService.get_all_payments()
-        periods = sorted(set(p.period for p in all_payments), reverse=True)
+        periods = PaymentService.get_periods()
         if not periods:
             QMessageBox.warning(self, '提示', '没有可用的周期数据')
             return
         
+        from ui.export_dialog import ExportDialog
         dialog = ExportDialog(self, export_type='report')
         dialog.set_periods(periods)
         dialog.exec_()
@@ -1196,9 +1372,75 @@ class MainWindow(QMainWindow):
     
     def show_backup_dialog(self):
         """显示备份对话框"""
+        from ui.backup_dialog import BackupDialog
         dialog = BackupDialog(self)
         dialog.exec_()
+        if dialog.restored:
+            self.load_data()
     
+    def show_performance_dialog(self):
+        """显示性能统计对话框"""
+        from ui.performance_dialog import PerformanceDialog
+        dialog = PerformanceDialog(self)
+        dialog.exec_()
+
+    def dump_memory_report(self):
+        """把分配最多的代码位置和各列表内存统计导出到日志目录"""
+        try:
+            path = memory_tracker.dump_top()
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'导出内存诊断失败：{str(e)}')
+            return
+        QMessageBox.information(self, '内存诊断', f'已导出到：\n{path}')
+
+    def archive_history(self):
+        """把多年前已结清的周期移入归档库"""
+        from services.archive_service import ArchiveService
+        try:
+            status = ArchiveService.get_archive_status()
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'读取归档信息失败：{str(e)}')
+            return
+        years, ok = QInputDialog.getInt(
+            self, '归档历史账单',
+            f"已归档 {status['periods']} 个周期、{status['payments']} 张账单。\n\n"
+            f"把多少年前、账单已全部缴清的周期移入归档库？\n"
+            f"归档后默认列表和搜索不再显示这些账单，勾选“含归档”可查看。",
+            3, 1, 50)
+        if not ok:
+            return
+        reply = QMessageBox.question(self, '确认', f'确定归档 {years} 年前已结清的周期吗？归档期间其他操作需等待。',
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        try:
+            result = ArchiveService.archive_closed_periods(years)
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'归档失败：{str(e)}')
+            return
+        lines = [f"归档周期 {len(result['periods'])} 个，账单 {result['payments']} 张，流水 {result['transactions']} 条。"]
+        if result['open_periods']:
+            lines.append(f"仍有欠费未归档的周期：{'、'.join(result['open_periods'])}")
+        QMessageBox.information(self, '归档完成', '\n'.join(lines))
+        self.load_periods()
+
+    def show_meter_reading_dialog(self):
+        """显示抄表与按量出账对话框"""
+        from ui.meter_reading_dialog import MeterReadingDialog
+        dialog = MeterReadingDialog(self)
+        dialog.exec_()
+        if dialog.billed:
+            self.load_periods()
+            self.load_payments()
+
+    def show_billing_plan_dialog(self):
+        """显示周期出账计划对话框"""
+        from ui.billing_plan_dialog import BillingPlanDialog
+        dialog = BillingPlanDialog(self)
+        dialog.exec_()
+        if dialog.generated:
+            self.on_payments_generated()
+
     def batch_create_payments(self):
         """批量生成账单"""
         from ui.batch_payment_dialog import BatchPaymentDialog
@@ -0,0 +1,216 @@
+"""
+抄表导入与按量出账对话框
+"""
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+                             QPushButton, QMessageBox, QComboBox, QDateEdit,
+                             QTableWidget, QTableWidgetItem, QFileDialog)
+from PyQt5.QtCore import Qt, QDate, QThread, pyqtSignal as Signal
+
+from services.charge_service import ChargeService
+from services.meter_reading_service import MeterReadingService
+from services.tariff import parse_unit_kind, KIND_USAGE
+
+
+class MeterImportWorker(QThread):
+    """抄表数据导入工作线程"""
+    finished = Signal(int, int, list)  # 成功数, 失败数, 错误列表
+    failed = Signal(str)
+
+    def __init__(self, file_path, charge_item_id, period):
+        super().__init__()
+        self.file_path = file_path
+        self.charge_item_id = charge_item_id
+        self.period = period
+
+    def run(self):
+        try:
+            success, fail, errors = MeterReadingService.import_readings(
+                self.file_path, self.charge_item_id, self.period)
+            self.finished.emit(success, fail, errors)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class MeterReadingDialog(QDialog):
+    """导入某周期的抄表数据，并按用量一次生成全部账单"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.worker = None
+        self.billed = False
+        self.init_ui()
+        self.load_charge_items()
+
+    def init_ui(self):
+        """初始化UI"""
+        self.setWindowTitle('抄表与按量出账')
+        self.resize(820, 560)
+
+        layout = QVBoxLayout(self)
+
+        form_layout = QHBoxLayout()
+        form_layout.addWidget(QLabel('收费项目:'))
+        self.charge_item_combo = QComboBox()
+        self.charge_item_combo.setMinimumWidth(200)
+        self.charge_item_combo.currentIndexChanged.connect(self.load_readings)
+        form_layout.addWidget(self.charge_item_combo)
+        form_layout.addWidget(QLabel('周期:'))
+        self.period_date = QDateEdit()
+        self.period_date.setCalendarPopup(True)
+        self.period_date.setDate(QDate.currentDate())
+        self.period_date.setDisplayFormat('yyyy-MM')
+        self.period_date.dateChanged.connect(self.load_readings)
+        form_layout.addWidget(self.period_date)
+        form_layout.addStretch()
+        layout.addLayout(form_layout)
+
+        btn_layout = QHBoxLayout()
+        self.template_btn = QPushButton('下载模板')
+        self.template_btn.clicked.connect(self.create_template)
+        btn_layout.addWidget(self.template_btn)
+        self.import_btn = QPushButton('导入抄表数据')
+        self.import_btn.clicked.connect(self.import_readings)
+        btn_layout.addWidget(self.import_btn)
+        self.billing_btn = QPushButton('生成账单')
+        self.billing_btn.clicked.connect(self.run_billing)
+        btn_layout.addWidget(self.billing_btn)
+        btn_layout.addStretch()
+        layout.addLayout(btn_layout)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(6)
+        self.table.setHorizontalHeaderLabels(['房号', '姓名', '表号', '上期读数', '本期读数', '用量'])
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.status_label = QLabel('')
+        layout.addWidget(self.status_label)
+
+        close_btn = QPushButton('关闭')
+        close_btn.clicked.connect(self.accept)
+        close_layout = QHBoxLayout()
+        close_layout.addStretch()
+        close_layout.addWidget(close_btn)
+        layout.addLayout(close_layout)
+
+    def load_charge_items(self):
+        """只列出按用量（度）计费的收费项目"""
+        self.charge_item_combo.blockSignals(True)
+        self.charge_item_combo.clear()
+        for item in ChargeService.get_all_charge_items(active_only=True):
+            if parse_unit_kind(item.charge_type, item.unit) == KIND_USAGE:
+                self.charge_item_combo.addItem(f"{item.name}（{item.price}{item.unit}）", item.id)
+        self.charge_item_combo.blockSignals(False)
+        has_items = self.charge_item_combo.count() > 0
+        self.import_btn.setEnabled(has_items)
+        self.billing_btn.setEnabled(has_items)
+        if not has_items:
+            self.status_label.setText('没有按用量（元/度）计费的收费项目，请先在收费项目中添加')
+        self.load_readings()
+
+    def current_period(self):
+        date = self.period_date.date()
+        return f"{date.year():04d}-{date.month():02d}"
+
+    def load_readings(self):
+        """加载当前收费项目、周期的抄表记录"""
+        charge_item_id = self.charge_item_combo.currentData()
+        self.table.setRowCount(0)
+        if charge_item_id is None:
+            return
+        try:
+            readings = MeterReadingService.get_readings_by_period(charge_item_id, self.current_period())
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'加载抄表记录失败：{str(e)}')
+            return
+
+        def fmt(value):
+            return '' if value is None else f"{value:.2f}"
+
+        self.table.setRowCount(len(readings))
+        billed = 0
+        for row, r in enumerate(readings):
+            values = [r['room'], r['resident_name'], r['meter_no'],
+                      fmt(r['previous_value']), fmt(r['current_value']), fmt(r['usage'])]
+            for col, value in enumerate(values):
+                cell = QTableWidgetItem(value)
+                if col >= 3:
+                    cell.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                if r['payment_id']:
+                    cell.setForeground(Qt.gray)
+                self.table.setItem(row, col, cell)
+            if r['payment_id']:
+                billed += 1
+        self.status_label.setText(f'共 {len(readings)} 条抄表记录，已出账 {billed} 条（灰色）')
+
+    def create_template(self):
+        """保存抄表导入模板"""
+        file_path, _ = QFileDialog.getSaveFileName(self, '保存模板', '抄表数据导入模板.xlsx', 'Excel文件 (*.xlsx)')
+        if not file_path:
+            return
+        try:
+            MeterReadingService.create_reading_template(file_path)
+            QMessageBox.information(self, '成功', f'模板已保存到：\n{file_path}')
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'保存模板失败：{str(e)}')
+
+    def import_readings(self):
+        """后台导入抄表文件"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, '选择抄表文件', '', 'Excel/CSV 文件 (*.xlsx *.xlsm *.csv)')
+        if not file_path:
+            return
+        self.import_btn.setEnabled(False)
+        self.billing_btn.setEnabled(False)
+        self.status_label.setText('正在导入抄表数据...')
+        self.worker = MeterImportWorker(file_path, self.charge_item_combo.currentData(), self.current_period())
+        self.worker.finished.connect(self.on_import_finished)
+        self.worker.failed.connect(self.on_import_failed)
+        self.worker.start()
+
+    def on_import_finished(self, success, fail, errors):
+        self.import_btn.setEnabled(True)
+        self.billing_btn.setEnabled(True)
+        self.load_readings()
+        message = f'导入完成：成功 {success} 条，失败 {fail} 条'
+        if errors:
+            message += '\n\n' + '\n'.join(errors[:20])
+            if len(errors) > 20:
+                message += f'\n... 还有 {len(errors) - 20} 条错误'
+            QMessageBox.warning(self, '导入结果', message)
+        else:
+            QMessageBox.information(self, '导入结果', message)
+
+    def on_import_failed(self, message):
+        self.import_btn.setEnabled(True)
+        self.billing_btn.setEnabled(True)
+        self.status_label.setText('')
+        QMessageBox.critical(self, '错误', f'导入抄表数据失败：{message}')
+
+    def run_billing(self):
+        """按本期抄表用量生成账单"""
+        period = self.current_period()
+        reply = QMessageBox.question(
+            self, '确认', f'确定按抄表用量生成 {period} 的账单吗？',
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        try:
+            summary = MeterReadingService.run_billing(self.charge_item_combo.currentData(), period)
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'生成账单失败：{str(e)}')
+            return
+        if summary['created']:
+            self.billed = True
+        self.load_readings()
+        lines = [f"生成账单 {summary['created']} 张，合计 ¥{summary['total_amount']:.2f}"]
+        if summary['skipped_no_previous']:
+            lines.append(f"缺少上期读数 {summary['skipped_no_previous']} 块表，"
+                         f"整户跳过 {len(summary['skipped_incomplete'])} 户")
+        if summary['skipped_existing']:
+            lines.append(f"本期已有账单跳过 {summary['skipped_existing']} 户")
+        if summary['skipped_negative']:
+            lines.append(f"读数倒退跳过 {len(summary['skipped_negative'])} 户")
+        QMessageBox.information(self, '出账结果', '\n'.join(lines))
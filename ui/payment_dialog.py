@@ -3,13 +3,14 @@
 """
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QMessageBox, QComboBox, QDoubleSpinBox,
-                             QDateTimeEdit, QDateEdit, QGroupBox, QSpinBox, QCompleter)
+                             QDateTimeEdit, QDateEdit, QGroupBox, QSpinBox)
 from PyQt5.QtCore import Qt, QDateTime, QDate
 from datetime import datetime, timedelta
 
 from services.resident_service import ResidentService
 from services.charge_service import ChargeService
 from services.payment_service import PaymentService
+from ui.resident_picker import ResidentPicker
 
 
 class PaymentDialog(QDialog):
@@ -19,7 +20,6 @@ class PaymentDialog(QDialog):
         super().__init__(parent)
         self.payment_id = None
         self.init_ui()
-        self.load_residents()
         self.load_charge_items()
         # 如果以编辑模式打开，外部可先设置 self.payment_id 再调用 load_payment()
     
@@ -33,21 +33,10 @@ class PaymentDialog(QDialog):
         # 住户选择
         resident_group = QGroupBox('选择住户')
         resident_layout = QVBoxLayout(resident_group)
-        self.resident_combo = QComboBox()
-        self.resident_combo.setEditable(True)
-        self.resident_combo.setInsertPolicy(QComboBox.NoInsert)
-        
-        # 启用模糊搜索（包含匹配）
-        completer = QCompleter(self.resident_combo.model())
-        completer.setFilterMode(Qt.MatchContains)
-        completer.setCaseSensitivity(Qt.CaseInsensitive)
-        completer.setCompletionMode(QCompleter.PopupCompletion)
-        self.resident_combo.setCompleter(completer)
-        
-        self.resident_combo.currentIndexChanged.connect(self.on_resident_changed)
-        # 某些样式下 editable combobox 会有背景色问题，这里显式设置一下样式（可选，视主题而定）
-        self.resident_combo.setStyleSheet("QComboBox { combobox-popup: 0; }")
-        resident_layout.addWidget(self.resident_combo)
+        # 不预先加载全部住户，输入房号或姓名时按前缀查询匹配的住户
+        self.resident_picker = ResidentPicker()
+        self.resident_picker.residentChanged.connect(self.on_resident_changed)
+        resident_layout.addWidget(self.resident_picker)
         layout.addWidget(resident_group)
         
         # 收费项目选择
@@ -149,16 +138,6 @@ class PaymentDialog(QDialog):
         btn_layout.addWidget(self.cancel_btn)
         layout.addLayout(btn_layout)
     
-    def load_residents(self):
-        """加载住户列表"""
-        try:
-            residents = ResidentService.get_all_residents(active_only=True)
-            self.resident_combo.clear()
-            for resident in residents:
-                self.resident_combo.addItem(f"{getattr(resident,'full_room_no', resident.room_no)} - {resident.name}", resident.id)
-        except Exception as e:
-            QMessageBox.critical(self, '错误', f'加载住户列表失败：{str(e)}')
-    
     def load_charge_items(self):
         """加载收费项目列表"""
         try:
@@ -177,9 +156,7 @@ class PaymentDialog(QDialog):
                 raise ValueError("账单不存在")
             self.payment_id = payment_id
             # 选择住户
-            idx = self.resident_combo.findData(payment.resident_id)
-            if idx >= 0:
-                self.resident_combo.setCurrentIndex(idx)
+            self.resident_picker.set_resident(payment.resident_id)
             # 选择收费项目
             cidx = self.charge_combo.findData(payment.charge_item_id)
             if cidx >= 0:
@@ -216,7 +193,7 @@ class PaymentDialog(QDialog):
     def on_resident_changed(self):
         """住户改变时的处理"""
         # 如果住户有入住日期，自动设置计费开始日期
-        resident_id = self.resident_combo.currentData()
+        resident_id = self.resident_picker.resident_id()
         if resident_id:
             resident = ResidentService.get_resident_by_id(resident_id)
             if resident and resident.move_in_date:
@@ -265,7 +242,7 @@ class PaymentDialog(QDialog):
     def calculate_amount(self):
         """计算金额"""
         try:
-            resident_id = self.resident_combo.currentData()
+            resident_id = self.resident_picker.resident_id()
             charge_item_id = self.charge_combo.currentData()
             
             if not resident_id or not charge_item_id:
@@ -324,7 +301,7 @@ class PaymentDialog(QDialog):
     
     def save_payment(self):
         """保存缴费记录（生成账单）"""
-        resident_id = self.resident_combo.currentData()
+        resident_id = self.resident_picker.resident_id()
         charge_item_id = self.charge_combo.currentData()
         
         if not resident_id:
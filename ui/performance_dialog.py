@@ -0,0 +1,200 @@
+"""
+性能统计对话框
+"""
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+                             QPushButton, QTableWidget, QTableWidgetItem, QTabWidget,
+                             QWidget, QDoubleSpinBox, QMessageBox)
+from PyQt5.QtCore import Qt
+
+from utils.profiler import profiler
+from utils.memory import memory_tracker, process_memory_mb
+from services.reference_cache import reference_cache
+from services.write_executor import write_executor
+
+
+class PerformanceDialog(QDialog):
+    """显示各服务操作的耗时分位数与慢查询"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.init_ui()
+        self.load_stats()
+
+    def init_ui(self):
+        """初始化UI"""
+        self.setWindowTitle('性能统计')
+        self.resize(900, 520)
+
+        layout = QVBoxLayout(self)
+
+        tip = QLabel('统计本次运行以来每个操作的耗时（毫秒）。P95 越大说明该操作越慢，可据此定位月末卡顿。')
+        tip.setWordWrap(True)
+        layout.addWidget(tip)
+
+        self.cache_label = QLabel('')
+        layout.addWidget(self.cache_label)
+
+        self.writer_label = QLabel('')
+        layout.addWidget(self.writer_label)
+
+        self.tabs = QTabWidget()
+        layout.addWidget(self.tabs)
+
+        # 操作统计
+        op_tab = QWidget()
+        op_layout = QVBoxLayout(op_tab)
+        self.op_table = QTableWidget()
+        self.op_table.setColumnCount(7)
+        self.op_table.setHorizontalHeaderLabels(['操作', '次数', 'P50', 'P95', '最大', '平均SQL数', '平均返回行数'])
+        self.op_table.horizontalHeader().setStretchLastSection(True)
+        self.op_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.op_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.op_table.setColumnWidth(0, 320)
+        op_layout.addWidget(self.op_table)
+        self.tabs.addTab(op_tab, '操作耗时')
+
+        # 慢查询
+        slow_tab = QWidget()
+        slow_layout = QVBoxLayout(slow_tab)
+        threshold_layout = QHBoxLayout()
+        threshold_layout.addWidget(QLabel('慢查询阈值:'))
+        self.threshold_input = QDoubleSpinBox()
+        self.threshold_input.setRange(1.0, 60000.0)
+        self.threshold_input.setDecimals(0)
+        self.threshold_input.setSuffix(' ms')
+        self.threshold_input.setValue(profiler.slow_query_ms)
+        self.threshold_input.valueChanged.connect(self.on_threshold_changed)
+        threshold_layout.addWidget(self.threshold_input)
+        threshold_layout.addStretch()
+        slow_layout.addLayout(threshold_layout)
+        self.slow_table = QTableWidget()
+        self.slow_table.setColumnCount(4)
+        self.slow_table.setHorizontalHeaderLabels(['时间', '操作', '耗时(ms)', 'SQL'])
+        self.slow_table.horizontalHeader().setStretchLastSection(True)
+        self.slow_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.slow_table.setColumnWidth(1, 240)
+        slow_layout.addWidget(self.slow_table)
+        self.tabs.addTab(slow_tab, '慢查询')
+
+        # 内存
+        mem_tab = QWidget()
+        mem_layout = QVBoxLayout(mem_tab)
+        mem_ctrl = QHBoxLayout()
+        self.memory_label = QLabel('')
+        mem_ctrl.addWidget(self.memory_label)
+        mem_ctrl.addStretch()
+        self.trace_btn = QPushButton('')
+        self.trace_btn.clicked.connect(self.toggle_tracing)
+        mem_ctrl.addWidget(self.trace_btn)
+        self.dump_btn = QPushButton('导出到日志目录')
+        self.dump_btn.clicked.connect(self.dump_memory)
+        mem_ctrl.addWidget(self.dump_btn)
+        mem_layout.addLayout(mem_ctrl)
+        self.mem_table = QTableWidget()
+        self.mem_table.setColumnCount(8)
+        self.mem_table.setHorizontalHeaderLabels(['列表', '加载次数', '行数', '单元格数', '增量(KB)',
+                                                  '峰值(KB)', '每万行峰值(MB)', '预算(MB)'])
+        self.mem_table.horizontalHeader().setStretchLastSection(True)
+        self.mem_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        mem_layout.addWidget(self.mem_table)
+        self.tabs.addTab(mem_tab, '内存')
+
+        # 按钮
+        btn_layout = QHBoxLayout()
+        self.refresh_btn = QPushButton('刷新')
+        self.reset_btn = QPushButton('清空统计')
+        self.close_btn = QPushButton('关闭')
+        self.refresh_btn.clicked.connect(self.load_stats)
+        self.reset_btn.clicked.connect(self.reset_stats)
+        self.close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(self.refresh_btn)
+        btn_layout.addWidget(self.reset_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.close_btn)
+        layout.addLayout(btn_layout)
+
+    def load_stats(self):
+        """加载统计数据"""
+        rows = profiler.summary()
+        self.op_table.setRowCount(len(rows))
+        for row, item in enumerate(rows):
+            values = [item['operation'], item['count'], item['p50_ms'], item['p95_ms'],
+                      item['max_ms'], item['avg_sql'], item['avg_rows']]
+            for col, value in enumerate(values):
+                cell = QTableWidgetItem(str(value))
+                if col > 0:
+                    cell.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.op_table.setItem(row, col, cell)
+
+        slow = profiler.slow_queries()
+        self.slow_table.setRowCount(len(slow))
+        for row, item in enumerate(slow):
+            self.slow_table.setItem(row, 0, QTableWidgetItem(item['time']))
+            self.slow_table.setItem(row, 1, QTableWidgetItem(item['operation']))
+            self.slow_table.setItem(row, 2, QTableWidgetItem(str(item['duration_ms'])))
+            self.slow_table.setItem(row, 3, QTableWidgetItem(item['statement']))
+
+        cache = reference_cache.stats()
+        self.cache_label.setText(
+            f"引用数据缓存：命中 {cache['hits']}，未命中 {cache['misses']}（命中率 {cache['hit_rate']:.1%}），"
+            f"整表载入 {cache['reloads']} 次，其他进程写库 {cache['external_changes']} 次；"
+            f"已缓存收费项目 {cache['charge_items']} 个、住户 {cache['residents']} 户")
+
+        writer = write_executor.stats()
+        self.writer_label.setText(
+            f"写线程：写操作 {writer['calls']} 次，合并小写入 {writer['units']} 条/{writer['batches']} 个事务"
+            f"（平均 {writer['avg_batch']}，最多 {writer['max_batch']}），"
+            f"遇锁重试 {writer['busy_retries']} 次，排队中 {writer['queued']}")
+
+        self.load_memory()
+
+    def load_memory(self):
+        """加载各列表的内存统计"""
+        tracing = memory_tracker.tracing
+        self.trace_btn.setText('停止跟踪' if tracing else '开始跟踪')
+        self.memory_label.setText(
+            f"进程内存 {process_memory_mb() or '-'} MB；"
+            + ('正在跟踪，列表每次加载都会记录内存增量和峰值' if tracing
+               else '未跟踪（开始后各列表重新加载时记录内存，跟踪会使加载变慢）'))
+        views = memory_tracker.views()
+        self.mem_table.setRowCount(len(views))
+        for row, view in enumerate(views):
+            values = [view['view'], view['loads'], view.get('rows', 0), view.get('cells', 0),
+                      view.get('delta_kb', '-'), view.get('peak_kb', '-'),
+                      view.get('peak_mb_per_10k', '-'), view.get('budget_mb_per_10k', '-')]
+            for col, value in enumerate(values):
+                cell = QTableWidgetItem(str(value if value is not None else '-'))
+                if col > 0:
+                    cell.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                if view.get('over_budget') and col == 6:
+                    cell.setForeground(Qt.red)
+                self.mem_table.setItem(row, col, cell)
+
+    def toggle_tracing(self):
+        """开始/停止 tracemalloc 跟踪"""
+        if memory_tracker.tracing:
+            memory_tracker.stop()
+        else:
+            memory_tracker.start()
+        self.load_memory()
+
+    def dump_memory(self):
+        """导出内存诊断到日志目录"""
+        try:
+            path = memory_tracker.dump_top()
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'导出内存诊断失败：{str(e)}')
+            return
+        QMessageBox.information(self, '内存诊断', f'已导出到：\n{path}')
+
+    def reset_stats(self):
+        """清空统计"""
+        profiler.reset()
+        memory_tracker.reset()
+        reference_cache.reset_stats()
+        write_executor.reset_stats()
+        self.load_stats()
+
+    def on_threshold_changed(self, value):
+        """调整慢查询阈值"""
+        profiler.slow_query_ms = float(value)
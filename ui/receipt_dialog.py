@@ -11,7 +11,6 @@ import json
 from pathlib import Path
 
 from services.payment_service import PaymentService
-from utils.printer import ReceiptPrinter
 from decimal import Decimal, ROUND_HALF_UP
 
 
@@ -192,7 +191,7 @@ class ReceiptDialog(QDialog):
             receipt_html = self.generate_receipt_html(payment)
             # 如果回退为 HTML，需要把 label 显示 HTML（转换为 QPixmap via QTextDocument）
             try:
-                from PyQt5.QtGui import QTextDocument
+                from PyQt5.QtGui import QTextDocument, QPainter
                 doc = QTextDocument()
                 doc.setHtml(receipt_html)
                 img = QPixmap(doc.size().toSize())
@@ -536,6 +535,7 @@ th {{ background:#f5f5f5; font-weight:600; }}
             comp_scale = float(getattr(self, 'company_scale_spin', None).value()) if getattr(self, 'company_scale_spin', None) else 1.0
             left_margin = float(getattr(self, 'left_margin_spin', None).value()) if getattr(self, 'left_margin_spin', None) else 4.0
             right_margin = float(getattr(self, 'right_margin_spin', None).value()) if getattr(self, 'right_margin_spin', None) else 8.0
+            from utils.printer import ReceiptPrinter
             printer = ReceiptPrinter(paper_size=paper_size, top_offset_mm=top_offset, company_font_scale_adj=comp_scale, safe_margin_left_mm=left_margin, safe_margin_right_mm=right_margin)
             if printer.print_receipt(self.payment_id):
                 QMessageBox.information(self, '成功', '打印成功')
@@ -573,6 +573,7 @@ th {{ background:#f5f5f5; font-weight:600; }}
             top_offset = float(getattr(self, 'top_offset_spin', None).value()) if getattr(self, 'top_offset_spin', None) else 0.0
             comp_scale = float(getattr(self, 'company_scale_spin', None).value()) if getattr(self, 'company_scale_spin', None) else 1.0
             safe_margin = float(getattr(self, 'safe_margin_spin', None).value()) if getattr(self, 'safe_margin_spin', None) else 8.0
+            from utils.printer import ReceiptPrinter
             printer = ReceiptPrinter(paper_size=paper_size, top_offset_mm=top_offset, company_font_scale_adj=comp_scale, safe_margin_mm=safe_margin)
             success = printer.print_receipt(self.payment_id, output_file=path)
             if success:
@@ -745,6 +746,7 @@ th {{ background:#f5f5f5; font-weight:600; }}
             paper_size = self.paper_size_combo.currentText()
             top_offset = float(getattr(self, 'top_offset_spin', None).value()) if getattr(self, 'top_offset_spin', None) else 0.0
             comp_scale = float(getattr(self, 'company_scale_spin', None).value()) if getattr(self, 'company_scale_spin', None) else 1.0
+            from utils.printer import ReceiptPrinter
             printer = ReceiptPrinter(paper_size=paper_size, top_offset_mm=top_offset, company_font_scale_adj=comp_scale)
             ok = printer.render_receipt_to_image(self.payment_id, path, dpi=300)
             if ok:
@@ -0,0 +1,89 @@
+"""
+住户选择框
+
+不预先加载住户：收银员输入房号或姓名后稍等片刻，按输入内容在数据库中做前缀查询，
+只取前若干条匹配结果放进补全列表。
+"""
+from PyQt5.QtWidgets import QLineEdit, QCompleter
+from PyQt5.QtGui import QStandardItemModel, QStandardItem
+from PyQt5.QtCore import Qt, QTimer, QModelIndex, pyqtSignal
+
+from services.resident_service import ResidentService
+
+
+class ResidentPicker(QLineEdit):
+    """输入即查的住户选择框，选中住户后发出 residentChanged(住户ID)，清除选择时发出 0"""
+
+    residentChanged = pyqtSignal(int)
+
+    def __init__(self, parent=None, limit=20, delay_ms=250, active_only=True):
+        super().__init__(parent)
+        self.limit = limit
+        self.active_only = active_only
+        self._resident_id = None
+        self.setPlaceholderText('输入房号（如 6-1-1204）或姓名查找住户')
+        self.setClearButtonEnabled(True)
+
+        self._model = QStandardItemModel(self)
+        self._completer = QCompleter(self._model, self)
+        # 结果已在数据库中过滤，补全框不再二次过滤
+        self._completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self._completer.setWidget(self)
+        self._completer.activated[QModelIndex].connect(self._on_activated)
+
+        # 输入停顿 delay_ms 后才查询，连续输入不会每个字符都查一次库
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.refresh_suggestions)
+        self.textEdited.connect(self._on_text_edited)
+
+    def resident_id(self):
+        """当前选中的住户ID，未选择返回 None"""
+        return self._resident_id
+
+    def set_resident(self, resident_id):
+        """按住户ID选中（编辑已有账单时使用）"""
+        resident = ResidentService.get_resident_by_id(resident_id) if resident_id else None
+        if resident is None:
+            self.clear_resident()
+            return
+        self.setText(f"{resident.full_room_no} - {resident.name}")
+        self._select(resident.id)
+
+    def clear_resident(self):
+        self.clear()
+        self._select(None)
+
+    def refresh_suggestions(self):
+        """按当前输入查询匹配的住户并弹出补全列表"""
+        text = self.text().strip()
+        self._model.clear()
+        if not text:
+            return
+        for resident_id, label in ResidentService.suggest_residents(
+                text, limit=self.limit, active_only=self.active_only):
+            item = QStandardItem(label)
+            item.setData(resident_id, Qt.UserRole)
+            self._model.appendRow(item)
+        if self._model.rowCount():
+            self._completer.complete()
+        elif self._completer.popup().isVisible():
+            self._completer.popup().hide()
+
+    def _on_text_edited(self, text):
+        # 手动改了文字就不再是之前选中的住户
+        if self._resident_id is not None:
+            self._select(None)
+        self._timer.start()
+
+    def _on_activated(self, index):
+        self._timer.stop()
+        self.setText(index.data())
+        self._select(index.data(Qt.UserRole))
+
+    def _select(self, resident_id):
+        if resident_id == self._resident_id:
+            return
+        self._resident_id = resident_id
+        self.residentChanged.emit(resident_id or 0)
@@ -0,0 +1,639 @@
+"""
+备份引擎：压缩、增量、定时备份与保留策略
+
+备份目录中的文件：
+    backup_index.json              备份索引（列表直接读索引，不逐个 stat 文件）
+    property_{ts}.full.gz          全量快照（gzip 压缩的数据库文件）
+    property_{ts}.pages.gz         全量快照的页哈希表，用于计算增量
+    property_{ts}.delta.gz         增量快照：相对最近一次全量快照发生变化的页
+    property_archive_{hash}.gz     归档库（property_archive.db）的压缩副本，按内容命名，
+                                   归档库没有变化的快照共用同一个文件
+    property_backup_{ts}.db        旧版未压缩备份（首次建立索引时登记为 raw）
+
+增量快照只依赖它的全量快照（差异备份），恢复时最多需要“全量 + 一个增量”。
+归档库与数据库在同一个读事务中复制，恢复时一起替换，归档后的历史账单不会只剩一份。
+全量快照超过 full_every_days 天或增量超过数据库一半大小时，自动改做全量。
+
+定时备份、备份对话框和命令行各自创建 BackupEngine，同一备份目录的写操作（快照、登记、删除、清理）
+在进程内共用一把按目录区分的锁，进程之间再用目录下的 backup.lock 文件锁串行，索引不会互相覆盖。
+"""
+import os
+import sys
+import time
+import gzip
+import json
+import shutil
+import struct
+import hashlib
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from utils.logger import logger
+
+
+INDEX_FILENAME = 'backup_index.json'
+INDEX_VERSION = 1
+DELTA_MAGIC = b'PMDELTA1'
+HASH_SIZE = 16
+LOCK_FILENAME = 'backup.lock'
+# 等待其他进程完成备份的最长时间（秒）
+LOCK_TIMEOUT_SECONDS = 600
+
+if sys.platform == 'win32':
+    import msvcrt
+
+    def _try_lock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _lock_file(path, timeout=None):
+    """对 path 加进程间排他锁，返回打开的文件；超时抛出异常"""
+    timeout = LOCK_TIMEOUT_SECONDS if timeout is None else timeout
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    f = open(path, 'a+b')
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _try_lock(f)
+            return f
+        except OSError:
+            if time.monotonic() >= deadline:
+                f.close()
+                raise Exception("另一个程序正在备份，请稍后再试")
+            time.sleep(0.2)
+
+
+class _DirectoryLock:
+    """备份目录锁：进程内为可重入锁，最外层持有时再加 backup.lock 文件锁"""
+
+    def __init__(self, backup_dir):
+        self.path = os.path.join(backup_dir, LOCK_FILENAME)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = _lock_file(self.path)
+            except Exception:
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                _unlock(self._file)
+            finally:
+                self._file.close()
+                self._file = None
+        self._lock.release()
+
+
+_dir_locks = {}
+_dir_locks_guard = threading.Lock()
+
+
+def directory_lock(backup_dir):
+    """同一备份目录在本进程内共用一把锁"""
+    key = os.path.normcase(os.path.abspath(backup_dir))
+    with _dir_locks_guard:
+        lock = _dir_locks.get(key)
+        if lock is None:
+            lock = _dir_locks[key] = _DirectoryLock(backup_dir)
+        return lock
+
+
+def _page_hash(page):
+    return hashlib.blake2b(page, digest_size=HASH_SIZE).digest()
+
+
+def _read_page_size(db_path):
+    """从 SQLite 文件头读取页大小（偏移 16，两字节大端；1 表示 65536）"""
+    with open(db_path, 'rb') as f:
+        header = f.read(100)
+    if len(header) < 18 or not header.startswith(b'SQLite format 3\x00'):
+        raise Exception("不是有效的 SQLite 数据库文件")
+    size = struct.unpack('>H', header[16:18])[0]
+    return 65536 if size == 1 else size
+
+
+def _iter_pages(path, page_size):
+    with open(path, 'rb') as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                break
+            yield page
+
+
+class BackupEntry:
+    """索引中的一条备份记录"""
+
+    __slots__ = ('id', 'kind', 'file', 'base', 'created', 'size', 'db_size', 'reason', 'archive', 'path')
+
+    def __init__(self, id, kind, file, created, size=0, db_size=0, base=None, reason='', archive=None,
+                 backup_dir=''):
+        self.id = id
+        self.kind = kind  # full / delta / raw
+        self.file = file
+        self.base = base
+        self.created = created
+        self.size = size
+        self.db_size = db_size
+        self.reason = reason
+        self.archive = archive  # 同时备份的归档库文件名，没有归档库时为 None
+        self.path = os.path.join(backup_dir, file)
+
+    @property
+    def created_at(self):
+        return datetime.strptime(self.created, '%Y-%m-%d %H:%M:%S')
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'kind': self.kind, 'file': self.file, 'base': self.base,
+            'created': self.created, 'size': self.size, 'db_size': self.db_size,
+            'reason': self.reason, 'archive': self.archive,
+        }
+
+    @classmethod
+    def from_dict(cls, data, backup_dir):
+        return cls(data['id'], data['kind'], data['file'], data['created'],
+                   size=data.get('size', 0), db_size=data.get('db_size', 0),
+                   base=data.get('base'), reason=data.get('reason', ''), archive=data.get('archive'),
+                   backup_dir=backup_dir)
+
+
+class BackupEngine:
+    """压缩/增量备份引擎"""
+
+    def __init__(self, backup_dir=None, db_path=None, keep_daily=7, keep_weekly=4, keep_monthly=12,
+                 full_every_days=7, min_free_bytes=50 * 1024 * 1024):
+        if db_path is None:
+            from models.database import current_db_path
+            db_path = current_db_path()
+        if backup_dir is None:
+            from utils.backup_manager import _default_backup_dir
+            backup_dir = _default_backup_dir()
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.index_path = os.path.join(self.backup_dir, INDEX_FILENAME)
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+        self.keep_monthly = keep_monthly
+        self.full_every_days = full_every_days
+        self.min_free_bytes = min_free_bytes
+        self._lock = directory_lock(self.backup_dir)
+
+    # ------------------------------------------------------------------ 索引
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return self._build_index_from_legacy()
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return [BackupEntry.from_dict(e, self.backup_dir) for e in data.get('entries', [])]
+        except (OSError, ValueError, KeyError) as e:
+            logger.log_error(e, 'BACKUP_INDEX_LOAD_FAILED', include_stack=False)
+            return self._build_index_from_legacy()
+
+    def _save_index(self, entries):
+        os.makedirs(self.backup_dir, exist_ok=True)
+        data = {'version': INDEX_VERSION, 'entries': [e.to_dict() for e in entries]}
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.index_path)
+
+    def _build_index_from_legacy(self):
+        """首次使用时把旧版 property_backup_*.db 登记到索引（只扫描一次）"""
+        entries = []
+        if os.path.isdir(self.backup_dir):
+            for filename in os.listdir(self.backup_dir):
+                if filename.startswith('property_backup_') and filename.endswith('.db'):
+                    path = os.path.join(self.backup_dir, filename)
+                    st = os.stat(path)
+                    created = datetime.fromtimestamp(st.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+                    entries.append(BackupEntry(filename[:-3], 'raw', filename, created,
+                                               size=st.st_size, db_size=st.st_size,
+                                               reason='legacy', backup_dir=self.backup_dir))
+            entries.sort(key=lambda e: e.created)
+            self._save_index(entries)
+        return entries
+
+    def list_backups(self):
+        """返回备份列表（新的在前），只读取索引文件"""
+        with self._lock:
+            entries = self._load_index()
+        return sorted(entries, key=lambda e: (e.created, e.id), reverse=True)
+
+    def register_file(self, path, reason=''):
+        """把一个未压缩的 .db 备份登记到索引（如恢复前的自动备份）"""
+        with self._lock:
+            entries = self._load_index()
+            filename = os.path.basename(path)
+            st = os.stat(path)
+            entry = BackupEntry(os.path.splitext(filename)[0], 'raw', filename,
+                                datetime.fromtimestamp(st.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                                size=st.st_size, db_size=st.st_size, reason=reason,
+                                backup_dir=self.backup_dir)
+            entries.append(entry)
+            self._save_index(entries)
+            return entry
+
+    # ------------------------------------------------------------------ 快照
+    def _check_free_space(self, needed):
+        os.makedirs(self.backup_dir, exist_ok=True)
+        free = shutil.disk_usage(self.backup_dir).free
+        if free < needed + self.min_free_bytes:
+            raise Exception(f"备份目录所在磁盘空间不足：剩余 {free // (1024 * 1024)} MB，"
+                            f"至少需要 {(needed + self.min_free_bytes) // (1024 * 1024)} MB")
+
+    def _latest_full(self, entries):
+        fulls = [e for e in entries if e.kind == 'full' and os.path.exists(e.path)]
+        return max(fulls, key=lambda e: (e.created, e.id)) if fulls else None
+
+    def _snapshot_files_exist(self, snap_id):
+        return any(os.path.exists(os.path.join(self.backup_dir, f'property_{snap_id}.{ext}'))
+                   for ext in ('full.gz', 'pages.gz', 'delta.gz'))
+
+    def _next_snapshot_id(self, entries, now):
+        """同一秒内的快照依次编号 {ts}_1、{ts}_2……；编号接着同一秒最大的编号往后排，
+        被保留策略清理掉的编号不会再用，索引之外残留的同名文件也不会被覆盖"""
+        stamp = now.strftime('%Y%m%d_%H%M%S')
+        seq = None
+        for e in entries:
+            if e.id == stamp:
+                seq = seq or 0
+            elif e.id.startswith(stamp + '_') and e.id[len(stamp) + 1:].isdigit():
+                seq = max(seq or 0, int(e.id[len(stamp) + 1:]))
+        snap_id = stamp if seq is None else f'{stamp}_{seq + 1}'
+        while self._snapshot_files_exist(snap_id):
+            seq = (seq or 0) + 1
+            snap_id = f'{stamp}_{seq}'
+        return snap_id
+
+    def snapshot(self, reason='manual', progress=None, force_full=False):
+        """创建一个快照并按保留策略清理旧备份
+
+        Args:
+            reason: 备份原因（manual/schedule/exit/pre-restore）
+            progress: 进度回调 progress(已复制页数, 总页数)
+            force_full: 强制做全量快照
+
+        Returns:
+            BackupEntry: 新建的备份记录
+        """
+        from utils.backup_manager import BackupManager
+        from models.database import archive_db_path
+
+        if not os.path.exists(self.db_path):
+            raise Exception("数据库文件不存在")
+
+        with self._lock:
+            archive_path = archive_db_path(self.db_path)
+            has_archive = os.path.exists(archive_path)
+            db_size = os.path.getsize(self.db_path) + (os.path.getsize(archive_path) if has_archive else 0)
+            # 快照临时文件 + 压缩包最坏情况约为数据库大小的两倍
+            self._check_free_space(db_size * 2)
+
+            entries = self._load_index()
+            now = datetime.now()
+            snap_id = self._next_snapshot_id(entries, now)
+
+            # 1. 用在线备份接口得到一致的快照，并做完整性检查
+            fd, snap_path = tempfile.mkstemp(prefix='snapshot_', suffix='.db', dir=self.backup_dir)
+            os.close(fd)
+            archive_snap = snap_path[:-3] + '_archive.db'
+            try:
+                if has_archive:
+                    BackupManager._copy_with_archive(self.db_path, snap_path, archive_path, archive_snap, progress)
+                    ok, message = BackupManager.check_integrity(archive_snap)
+                    if not ok:
+                        raise Exception(f"归档库快照完整性检查未通过：{message}")
+                else:
+                    BackupManager._copy_database(self.db_path, snap_path, progress)
+                ok, message = BackupManager.check_integrity(snap_path)
+                if not ok:
+                    raise Exception(f"快照完整性检查未通过：{message}")
+
+                page_size = _read_page_size(snap_path)
+                hashes = [_page_hash(p) for p in _iter_pages(snap_path, page_size)]
+                snap_size = os.path.getsize(snap_path)
+
+                base = None if force_full else self._latest_full(entries)
+                if base is not None and now - base.created_at > timedelta(days=self.full_every_days):
+                    base = None
+
+                entry = None
+                if base is not None:
+                    entry = self._write_delta(snap_id, snap_path, page_size, hashes, base, snap_size)
+                if entry is None:
+                    entry = self._write_full(snap_id, snap_path, hashes, snap_size)
+                if has_archive:
+                    entry.archive = self._write_archive(archive_snap)
+            finally:
+                for path in (snap_path, archive_snap):
+                    try:
+                        if os.path.exists(path):
+                            os.remove(path)
+                    except OSError:
+                        pass
+
+            entry.created = now.strftime('%Y-%m-%d %H:%M:%S')
+            entry.reason = reason
+            entries.append(entry)
+            entries = self._apply_retention(entries)
+            self._save_index(entries)
+            self._remove_unused_archives(entries)
+
+        logger.log('INFO', 'BACKUP_SNAPSHOT', entry.file, kind=entry.kind, size=entry.size,
+                   db_size=entry.db_size, reason=reason)
+        return entry
+
+    def _write_full(self, snap_id, snap_path, hashes, snap_size):
+        file = f'property_{snap_id}.full.gz'
+        path = os.path.join(self.backup_dir, file)
+        with open(snap_path, 'rb') as src, gzip.open(path + '.tmp', 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(path + '.tmp', path)
+        with gzip.open(os.path.join(self.backup_dir, f'property_{snap_id}.pages.gz'), 'wb') as f:
+            f.write(b''.join(hashes))
+        return BackupEntry(snap_id, 'full', file, '', size=os.path.getsize(path),
+                           db_size=snap_size, backup_dir=self.backup_dir)
+
+    def _write_delta(self, snap_id, snap_path, page_size, hashes, base, snap_size):
+        """写增量快照；变化页超过一半时返回 None，改做全量"""
+        base_hashes = self._load_page_hashes(base)
+        if base_hashes is None:
+            return None
+        changed = [i for i, h in enumerate(hashes)
+                   if i >= len(base_hashes) or base_hashes[i] != h]
+        if len(changed) * 2 > len(hashes):
+            return None
+
+        file = f'property_{snap_id}.delta.gz'
+        path = os.path.join(self.backup_dir, file)
+        header = json.dumps({'base': base.id, 'page_size': page_size, 'page_count': len(hashes),
+                             'changed': len(changed)}).encode('utf-8')
+        with open(snap_path, 'rb') as src, gzip.open(path + '.tmp', 'wb', compresslevel=6) as dst:
+            dst.write(DELTA_MAGIC)
+            dst.write(struct.pack('>I', len(header)))
+            dst.write(header)
+            for page_no in changed:
+                src.seek(page_no * page_size)
+                dst.write(struct.pack('>I', page_no))
+                dst.write(src.read(page_size).ljust(page_size, b'\x00'))
+        os.replace(path + '.tmp', path)
+        return BackupEntry(snap_id, 'delta', file, '', size=os.path.getsize(path),
+                           db_size=snap_size, base=base.id, backup_dir=self.backup_dir)
+
+    def _write_archive(self, archive_snap):
+        """压缩保存归档库快照，返回文件名；内容与已有的归档库副本相同时直接共用"""
+        digest = hashlib.blake2b(digest_size=HASH_SIZE)
+        with open(archive_snap, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        file = f'property_archive_{digest.hexdigest()}.gz'
+        path = os.path.join(self.backup_dir, file)
+        if not os.path.exists(path):
+            with open(archive_snap, 'rb') as src, gzip.open(path + '.tmp', 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(path + '.tmp', path)
+        return file
+
+    def _remove_unused_archives(self, entries):
+        """删除不再被任何备份引用的归档库副本"""
+        used = {e.archive for e in entries if e.archive}
+        for filename in os.listdir(self.backup_dir):
+            if filename.startswith('property_archive_') and filename.endswith('.gz') and filename not in used:
+                try:
+                    os.remove(os.path.join(self.backup_dir, filename))
+                except OSError as e:
+                    logger.log_error(e, 'BACKUP_DELETE_FAILED', include_stack=False)
+
+    def _load_page_hashes(self, full_entry):
+        path = os.path.join(self.backup_dir, f'property_{full_entry.id}.pages.gz')
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, 'rb') as f:
+            data = f.read()
+        return [data[i:i + HASH_SIZE] for i in range(0, len(data), HASH_SIZE)]
+
+    # ------------------------------------------------------------------ 恢复
+    def materialize(self, entry, out_path):
+        """把备份还原成一个普通的 .db 文件（不替换当前数据库）"""
+        if entry.kind == 'raw':
+            shutil.copyfile(entry.path, out_path)
+            return out_path
+        if entry.kind == 'full':
+            with gzip.open(entry.path, 'rb') as src, open(out_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            return out_path
+
+        entries = {e.id: e for e in self._load_index()}
+        base = entries.get(entry.base)
+        if base is None or not os.path.exists(base.path):
+            raise Exception(f"增量备份依赖的全量备份 {entry.base} 不存在")
+        self.materialize(base, out_path)
+        with gzip.open(entry.path, 'rb') as src, open(out_path, 'r+b') as dst:
+            if src.read(len(DELTA_MAGIC)) != DELTA_MAGIC:
+                raise Exception("增量备份文件格式错误")
+            header_len = struct.unpack('>I', src.read(4))[0]
+            header = json.loads(src.read(header_len).decode('utf-8'))
+            page_size = header['page_size']
+            for _ in range(header['changed']):
+                page_no = struct.unpack('>I', src.read(4))[0]
+                page = src.read(page_size)
+                dst.seek(page_no * page_size)
+                dst.write(page)
+            dst.truncate(header['page_count'] * page_size)
+        return out_path
+
+    def restore(self, entry, progress=None):
+        """恢复指定备份：先给当前数据库做一个快照，再还原并替换（备份中有归档库时一起替换）"""
+        from utils.backup_manager import BackupManager
+
+        fd, tmp_path = tempfile.mkstemp(prefix='restore_', suffix='.db', dir=self.backup_dir)
+        os.close(fd)
+        archive_tmp = None
+        try:
+            # 先还原出文件再做恢复前快照：快照的保留策略可能清理掉要恢复的这个备份
+            self.materialize(entry, tmp_path)
+            if entry.archive:
+                archive_tmp = tmp_path[:-3] + '_archive.db'
+                archive_file = os.path.join(self.backup_dir, entry.archive)
+                if not os.path.exists(archive_file):
+                    raise Exception(f"备份中的归档库文件 {entry.archive} 不存在")
+                with gzip.open(archive_file, 'rb') as src, open(archive_tmp, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+            try:
+                self.snapshot(reason='pre-restore')
+            except Exception as e:
+                logger.log_error(e, 'PRE_RESTORE_SNAPSHOT_FAILED', include_stack=False)
+            BackupManager.restore_database(tmp_path, progress=progress, db_path=self.db_path,
+                                           keep_current=False, archive_path=archive_tmp)
+        finally:
+            for path in (tmp_path, archive_tmp):
+                try:
+                    if path and os.path.exists(path):
+                        os.remove(path)
+                except OSError:
+                    pass
+        logger.log('INFO', 'BACKUP_RESTORED', entry.file, kind=entry.kind)
+
+    def delete(self, entry):
+        """删除备份；仍被增量备份依赖的全量备份不允许删除"""
+        with self._lock:
+            entries = self._load_index()
+            if entry.kind == 'full' and any(e.base == entry.id for e in entries):
+                raise Exception("该全量备份仍被增量备份依赖，请先删除对应的增量备份")
+            self._remove_files(entry)
+            entries = [e for e in entries if e.id != entry.id]
+            self._save_index(entries)
+            self._remove_unused_archives(entries)
+
+    def _remove_files(self, entry):
+        paths = [entry.path]
+        if entry.kind == 'full':
+            paths.append(os.path.join(self.backup_dir, f'property_{entry.id}.pages.gz'))
+        for path in paths:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.log_error(e, 'BACKUP_DELETE_FAILED', include_stack=False)
+
+    # ------------------------------------------------------------------ 保留策略
+    def _apply_retention(self, entries):
+        """按 日/周/月 保留最近的快照，被保留增量依赖的全量一并保留
+
+        只清理本引擎生成的全量/增量快照：登记进来的 raw 备份（旧版备份、手工导入）不动；
+        最近一次恢复前快照始终保留，恢复错了还能退回去。
+        """
+        keep = {e.id for e in entries if e.kind == 'raw'}
+        ordered = sorted((e for e in entries if e.kind != 'raw'),
+                         key=lambda e: (e.created, e.id), reverse=True)
+        if ordered:
+            keep.add(ordered[0].id)
+        pre_restore = next((e for e in ordered if e.reason == 'pre-restore'), None)
+        if pre_restore:
+            keep.add(pre_restore.id)
+        for count, bucket in ((self.keep_daily, lambda d: d.date()),
+                              (self.keep_weekly, lambda d: d.isocalendar()[:2]),
+                              (self.keep_monthly, lambda d: (d.year, d.month))):
+            seen = []
+            for e in ordered:
+                key = bucket(e.created_at)
+                if key in seen:
+                    continue
+                if len(seen) >= count:
+                    break
+                seen.append(key)
+                keep.add(e.id)
+        keep.update(e.base for e in ordered if e.id in keep and e.base)
+
+        kept = []
+        for e in entries:
+            if e.id in keep:
+                kept.append(e)
+            else:
+                self._remove_files(e)
+                logger.log('INFO', 'BACKUP_PRUNED', e.file, kind=e.kind, created=e.created)
+        return kept
+
+    def prune(self):
+        """手动执行一次保留策略"""
+        with self._lock:
+            entries = self._apply_retention(self._load_index())
+            self._save_index(entries)
+            self._remove_unused_archives(entries)
+            return entries
+
+    def last_snapshot_time(self):
+        entries = [e for e in self.list_backups() if e.kind != 'raw']
+        return entries[0].created_at if entries else None
+
+
+class BackupScheduler:
+    """定时备份：后台线程每隔 check_minutes 检查一次，距上次快照超过 interval_hours 就备份；
+    程序退出时若数据库在上次快照后有修改也备份一次"""
+
+    def __init__(self, engine=None, interval_hours=24, check_minutes=10):
+        self._engine = engine
+        self.interval = timedelta(hours=interval_hours)
+        self.check_seconds = check_minutes * 60
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def engine(self):
+        """未指定备份引擎时跟随当前小区（切换小区后备份切换后的数据库）"""
+        return self._engine or BackupEngine()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='BackupScheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        # 启动后稍等片刻，避免与程序启动抢占磁盘
+        if self._stop.wait(60):
+            return
+        while not self._stop.is_set():
+            self.run_if_due()
+            if self._stop.wait(self.check_seconds):
+                return
+
+    def run_if_due(self):
+        """到期则创建定时快照，返回新建的备份记录（未到期返回 None）"""
+        try:
+            engine = self.engine
+            last = engine.last_snapshot_time()
+            if last is not None and datetime.now() - last < self.interval:
+                return None
+            return engine.snapshot(reason='schedule')
+        except Exception as e:
+            logger.log_error(e, 'SCHEDULED_BACKUP_FAILED')
+            return None
+
+    def on_exit(self):
+        """程序退出时调用：数据库在上次快照之后有修改则备份"""
+        self.stop()
+        try:
+            engine = self.engine
+            if not os.path.exists(engine.db_path):
+                return None
+            last = engine.last_snapshot_time()
+            modified = datetime.fromtimestamp(os.path.getmtime(engine.db_path))
+            if last is not None and modified <= last:
+                return None
+            return engine.snapshot(reason='exit')
+        except Exception as e:
+            logger.log_error(e, 'EXIT_BACKUP_FAILED')
+            return None
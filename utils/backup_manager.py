@@ -1,102 +1,254 @@
 """
 数据备份管理工具
+
+备份使用 sqlite3 的在线备份接口（Connection.backup），按页分批复制，
+程序在写库时也能得到一致的快照；每个备份生成后都会做 PRAGMA integrity_check。
+恢复时先校验备份，再释放连接池、原子替换数据库文件并重新打开验证。
 """
 import os
-import shutil
+import sqlite3
 from datetime import datetime
-from models.database import DB_PATH
+from models.database import current_db_path, current_estate, get_engine, archive_db_path, DEFAULT_ESTATE
 from utils.path_utils import get_app_path
 
 
+# 每一步复制的页数（默认页大小 4KB，即每步约 1MB）
+BACKUP_PAGES_PER_STEP = 256
+
+
+def _default_backup_dir():
+    """当前小区的备份目录（默认小区为 backup，其他小区为 backup/<小区标识>）"""
+    base = os.path.join(get_app_path(), 'backup')
+    estate = current_estate()
+    return base if estate.key == DEFAULT_ESTATE else os.path.join(base, estate.key)
+
+
+def _remove_quietly(path):
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+
 class BackupManager:
     """数据备份管理类"""
-    
+
+    @staticmethod
+    def _copy_database(src_path, dst_path, progress=None, pages=BACKUP_PAGES_PER_STEP):
+        """用在线备份接口把 src_path 复制到 dst_path
+
+        Args:
+            progress: 进度回调 progress(已复制页数, 总页数)
+        """
+        def _on_step(status, remaining, total):
+            if progress is not None:
+                progress(total - remaining, total)
+
+        src = sqlite3.connect(src_path)
+        try:
+            dst = sqlite3.connect(dst_path)
+            try:
+                src.backup(dst, pages=pages, progress=_on_step)
+            finally:
+                dst.close()
+        finally:
+            src.close()
+
+    @staticmethod
+    def _copy_with_archive(src_path, dst_path, archive_path, archive_dst, progress=None,
+                           pages=BACKUP_PAGES_PER_STEP):
+        """在同一个读事务中复制数据库和归档库：归档在一个事务里同时改动两个库，分开复制可能得到不一致的两份"""
+        def _on_step(status, remaining, total):
+            if progress is not None:
+                progress(total - remaining, total)
+
+        src = sqlite3.connect(src_path, isolation_level=None)
+        try:
+            src.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+            src.execute("BEGIN")
+            # 读一次两个库，持有共享锁直到复制完成
+            src.execute("SELECT COUNT(*) FROM main.sqlite_master").fetchone()
+            src.execute("SELECT COUNT(*) FROM archive.sqlite_master").fetchone()
+            try:
+                for name, path in (('main', dst_path), ('archive', archive_dst)):
+                    dst = sqlite3.connect(path)
+                    try:
+                        src.backup(dst, pages=pages, progress=_on_step if name == 'main' else None, name=name)
+                    finally:
+                        dst.close()
+            finally:
+                src.execute("COMMIT")
+        finally:
+            src.close()
+
+    @staticmethod
+    def check_integrity(db_path):
+        """检查数据库文件完整性
+
+        Returns:
+            tuple: (是否完好, 检查结果文本)
+        """
+        if not os.path.exists(db_path):
+            return False, "文件不存在"
+        try:
+            conn = sqlite3.connect(db_path)
+            try:
+                rows = conn.execute("PRAGMA integrity_check").fetchall()
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError as e:
+            return False, str(e)
+        messages = [str(r[0]) for r in rows]
+        return messages == ['ok'], '\n'.join(messages)
+
     @staticmethod
-    def backup_database(backup_dir=None):
+    def backup_database(backup_dir=None, progress=None, db_path=None):
         """备份数据库
-        
+
         Args:
             backup_dir: 备份目录，如果为None则使用当前目录下的backup文件夹
-            
+            progress: 进度回调 progress(已复制页数, 总页数)，在调用线程中执行
+            db_path: 要备份的数据库文件，默认为当前数据库
+
         Returns:
             str: 备份文件路径
         """
-        if not os.path.exists(DB_PATH):
+        db_path = db_path or current_db_path()
+        if not os.path.exists(db_path):
             raise Exception("数据库文件不存在")
-        
+
         if backup_dir is None:
-            from utils.path_utils import get_app_path
-            backup_dir = os.path.join(get_app_path(), 'backup')
-        
+            backup_dir = _default_backup_dir()
+
         # 创建备份目录
         os.makedirs(backup_dir, exist_ok=True)
-        
+
         # 生成备份文件名
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_filename = f'property_backup_{timestamp}.db'
         backup_path = os.path.join(backup_dir, backup_filename)
-        
-        # 复制数据库文件
-        shutil.copy2(DB_PATH, backup_path)
-        
+        # 同一秒内多次备份时避免覆盖
+        seq = 1
+        while os.path.exists(backup_path):
+            backup_path = os.path.join(backup_dir, f'property_backup_{timestamp}_{seq}.db')
+            seq += 1
+
+        # 先写到临时文件，校验通过后再改名，避免留下不完整的备份
+        tmp_path = backup_path + '.tmp'
+        try:
+            BackupManager._copy_database(db_path, tmp_path, progress)
+            ok, message = BackupManager.check_integrity(tmp_path)
+            if not ok:
+                raise Exception(f"备份文件完整性检查未通过：{message}")
+            os.replace(tmp_path, backup_path)
+        except Exception:
+            _remove_quietly(tmp_path)
+            raise
+
         return backup_path
-    
+
     @staticmethod
-    def restore_database(backup_path):
+    def restore_database(backup_path, progress=None, db_path=None, backup_dir=None, keep_current=True,
+                         archive_path=None):
         """恢复数据库
-        
+
         Args:
             backup_path: 备份文件路径
+            progress: 进度回调 progress(已复制页数, 总页数)
+            db_path: 要恢复到的数据库文件，默认为当前数据库
+            backup_dir: 恢复前自动备份的存放目录
+            keep_current: 是否在恢复前备份当前数据库（调用方已自行备份时传 False）
+            archive_path: 与备份同一时刻的归档库副本，一起替换当前归档库；
+                          为 None 时保留当前归档库，并去掉其中与恢复后的数据库重复的账单
+
+        Returns:
+            str: 恢复前自动创建的当前数据库备份路径（创建失败时为 None）
         """
+        db_path = db_path or current_db_path()
         if not os.path.exists(backup_path):
             raise Exception("备份文件不存在")
-        
+
+        ok, message = BackupManager.check_integrity(backup_path)
+        if not ok:
+            raise Exception(f"备份文件已损坏，无法恢复：{message}")
+        if archive_path is not None:
+            ok, message = BackupManager.check_integrity(archive_path)
+            if not ok:
+                raise Exception(f"备份中的归档库已损坏，无法恢复：{message}")
+
         # 恢复前先备份当前数据库
+        current_backup = None
+        if keep_current and os.path.exists(db_path):
+            try:
+                current_backup = BackupManager.backup_database(backup_dir, db_path=db_path)
+            except Exception:
+                current_backup = None
+
+        # 在数据库所在目录准备替换文件（同一分区内 os.replace 才是原子的）
+        tmp_path = db_path + '.restore'
+        archive_db = archive_db_path(db_path)
+        archive_tmp = archive_db + '.restore'
         try:
-            current_backup = BackupManager.backup_database()
-        except:
-            pass
-        
-        # 恢复数据库
-        shutil.copy2(backup_path, DB_PATH)
-    
+            BackupManager._copy_database(backup_path, tmp_path, progress)
+            ok, message = BackupManager.check_integrity(tmp_path)
+            if not ok:
+                raise Exception(f"恢复文件完整性检查未通过：{message}")
+            if archive_path is not None:
+                BackupManager._copy_database(archive_path, archive_tmp)
+
+            # 关闭连接池中的所有连接（含引用数据缓存的监视连接，及附加了归档库的连接），再替换文件
+            from services.reference_cache import reference_cache
+            reference_cache.reset()
+            get_engine(db_path).dispose()
+            os.replace(tmp_path, db_path)
+            for suffix in ('-journal', '-wal', '-shm'):
+                _remove_quietly(db_path + suffix)
+            if archive_path is not None:
+                os.replace(archive_tmp, archive_db)
+                for suffix in ('-journal', '-wal', '-shm'):
+                    _remove_quietly(archive_db + suffix)
+        except Exception:
+            _remove_quietly(tmp_path)
+            _remove_quietly(archive_tmp)
+            raise
+
+        # 重新打开并验证
+        ok, message = BackupManager.check_integrity(db_path)
+        if not ok:
+            raise Exception(f"恢复后数据库校验失败：{message}")
+        # 旧版本的备份（金额仍按元保存等）先迁移到当前结构再使用，与切换小区时相同
+        from models.database import init_db
+        from services.reference_cache import reference_cache
+        init_db(db_path)
+        if archive_path is None and os.path.exists(archive_db):
+            # 备份中没有归档库（归档之前的备份、旧版备份）：恢复出的账单可能已在归档库中
+            from services.archive_service import reconcile_archive
+            reconcile_archive(db_path)
+        reference_cache.reset()
+        get_engine(db_path).dispose()
+        return current_backup
+
     @staticmethod
     def get_backup_list(backup_dir=None):
-        """获取备份文件列表
-        
+        """获取备份文件列表（读取备份索引，不逐个扫描文件）
+
         Args:
             backup_dir: 备份目录
-            
+
         Returns:
-            list: 备份文件信息列表 [(文件路径, 文件大小, 修改时间), ...]
+            list: 备份文件信息列表 [(文件路径, 文件大小, 备份时间), ...]，新的在前
         """
-        if backup_dir is None:
-            from utils.path_utils import get_app_path
-            backup_dir = os.path.join(get_app_path(), 'backup')
-        
-        if not os.path.exists(backup_dir):
-            return []
-        
-        backups = []
-        for filename in os.listdir(backup_dir):
-            if filename.startswith('property_backup_') and filename.endswith('.db'):
-                file_path = os.path.join(backup_dir, filename)
-                file_size = os.path.getsize(file_path)
-                mtime = os.path.getmtime(file_path)
-                mtime_str = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
-                backups.append((file_path, file_size, mtime_str))
-        
-        # 按时间倒序排序
-        backups.sort(key=lambda x: x[2], reverse=True)
-        return backups
-    
+        from utils.backup_engine import BackupEngine
+        entries = BackupEngine(backup_dir=backup_dir or _default_backup_dir()).list_backups()
+        return [(e.path, e.size, e.created) for e in entries]
+
     @staticmethod
     def delete_backup(backup_path):
         """删除备份文件
-        
+
         Args:
             backup_path: 备份文件路径
         """
         if os.path.exists(backup_path):
             os.remove(backup_path)
-
@@ -1,11 +1,10 @@
 """
 Excel导出工具
 """
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
 from datetime import datetime
 from services.payment_service import PaymentService
 from services.resident_service import ResidentService
+from utils.money import ZERO
 
 
 class ExcelExporter:
@@ -27,6 +26,9 @@ class ExcelExporter:
             unpaid_payments = PaymentService.get_unpaid_payments_by_period(period)
             
             # 创建Excel工作簿
+            # openpyxl 较重，首次导入/导出时再加载，加快程序启动
+            import openpyxl
+            from openpyxl.styles import Font, Alignment, PatternFill
             workbook = openpyxl.Workbook()
             sheet = workbook.active
             sheet.title = f"欠费清单_{period}"
@@ -47,9 +49,9 @@ class ExcelExporter:
                 cell.alignment = Alignment(horizontal='center', vertical='center')
             
             # 数据行
-            total_unpaid = 0.0
+            total_unpaid = ZERO
             for payment in unpaid_payments:
-                unpaid_amount = float(payment.amount) - (float(payment.paid_amount) if payment.paid_amount else 0.0)
+                unpaid_amount = payment.amount - (payment.paid_amount or ZERO)
                 total_unpaid += unpaid_amount
                 
                 row = [
@@ -60,8 +62,8 @@ class ExcelExporter:
                     f"{payment.billing_start_date.strftime('%Y-%m-%d')} 至 {payment.billing_end_date.strftime('%Y-%m-%d')}" if payment.billing_start_date and payment.billing_end_date else payment.period,
                     payment.billing_months,
                     payment.paid_months,
-                    float(payment.amount),
-                    float(payment.paid_amount) if payment.paid_amount else 0.0,
+                    payment.amount,
+                    payment.paid_amount or ZERO,
                     unpaid_amount,
                     payment.created_at.strftime('%Y-%m-%d %H:%M:%S') if payment.created_at else ''
                 ]
@@ -100,19 +102,22 @@ class ExcelExporter:
             raise Exception(f"导出失败：{str(e)}")
     
     @staticmethod
-    def export_payments(period=None, file_path=None):
+    def export_payments(period=None, file_path=None, include_archive=False):
         """导出缴费记录到Excel
         
         Args:
             period: 缴费周期（可选）
             file_path: 保存路径
+            include_archive: 是否包含归档库中的历史账单
         """
         try:
             if period:
-                payments = PaymentService.get_payments_by_period(period)
+                payments = PaymentService.get_payments_by_period(period, include_archive=include_archive)
             else:
-                payments = PaymentService.get_all_payments()
+                payments = PaymentService.get_all_payments(include_archive=include_archive)
             
+            import openpyxl
+            from openpyxl.styles import Font, Alignment, PatternFill
             workbook = openpyxl.Workbook()
             sheet = workbook.active
             sheet.title = f"缴费记录_{period or '全部'}"
@@ -150,8 +155,8 @@ class ExcelExporter:
                     billing_period,
                     payment.billing_months,
                     payment.paid_months,
-                    float(payment.amount),
-                    float(payment.paid_amount) if payment.paid_amount else 0.0,
+                    payment.amount,
+                    payment.paid_amount or ZERO,
                     status,
                     payment.paid_time.strftime('%Y-%m-%d %H:%M:%S') if payment.paid_time else ''
                 ]
@@ -168,3 +173,57 @@ class ExcelExporter:
         except Exception as e:
             raise Exception(f"导出失败：{str(e)}")
 
+    @staticmethod
+    def export_estate_summary(period, file_path, estate_keys=None):
+        """导出多小区汇总（各小区统计 + 按收费项目明细）到Excel
+
+        Args:
+            period: 缴费周期（格式：YYYY-MM）
+            file_path: 保存路径
+            estate_keys: 参与汇总的小区，默认全部
+        """
+        try:
+            from services.estate_report_service import EstateReportService
+            stats = EstateReportService.get_statistics_by_period(period, estate_keys)
+            breakdown = EstateReportService.get_item_breakdown(period, estate_keys)
+
+            import openpyxl
+            from openpyxl.styles import Font, Alignment, PatternFill
+            workbook = openpyxl.Workbook()
+            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+            header_font = Font(bold=True, color="FFFFFF", size=12)
+
+            def add_sheet(sheet, headers, rows, widths):
+                sheet.append(headers)
+                for col_idx in range(1, len(headers) + 1):
+                    cell = sheet.cell(row=1, column=col_idx)
+                    cell.fill = header_fill
+                    cell.font = header_font
+                    cell.alignment = Alignment(horizontal='center', vertical='center')
+                for row in rows:
+                    sheet.append(row)
+                for col_idx, width in enumerate(widths, start=1):
+                    sheet.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = width
+
+            summary = workbook.active
+            summary.title = f"多小区汇总_{period}"
+            add_sheet(summary,
+                      ['小区', '账单数', '已缴费', '未缴费', '应收金额', '已收金额', '未收金额'],
+                      [[r['name'], r['total_count'], r['paid_count'], r['unpaid_count'],
+                        r['total_amount'], r['paid_amount'], r['unpaid_amount']]
+                       for r in stats['estates'] + [stats['total']]],
+                      [20, 10, 10, 10, 14, 14, 14])
+            for col_idx in range(1, 8):
+                summary.cell(row=summary.max_row, column=col_idx).font = Font(bold=True, size=11)
+
+            add_sheet(workbook.create_sheet('按收费项目'),
+                      ['小区', '收费项目', '账单数', '已缴费', '应收金额', '已收金额'],
+                      [[r['name'], r['item'], r['count'], r['paid_count'], r['total'], r['paid_amount']]
+                       for r in breakdown],
+                      [20, 20, 10, 10, 14, 14])
+
+            workbook.save(file_path)
+            return True
+
+        except Exception as e:
+            raise Exception(f"导出失败：{str(e)}")
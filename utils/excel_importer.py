@@ -1,9 +1,7 @@
 """
 Excel导入工具
 """
-import openpyxl
 from datetime import datetime
-from PyQt5.QtWidgets import QMessageBox
 from services.resident_service import ResidentService
 
 
@@ -21,6 +19,8 @@ class ExcelImporter:
             tuple: (成功数量, 失败数量, 错误列表)
         """
         try:
+            # openpyxl 较重，首次导入/导出时再加载，加快程序启动
+            import openpyxl
             workbook = openpyxl.load_workbook(file_path)
             sheet = workbook.active
             
@@ -134,6 +134,7 @@ class ExcelImporter:
         Args:
             file_path: 保存路径
         """
+        import openpyxl
         workbook = openpyxl.Workbook()
         sheet = workbook.active
         
@@ -1,90 +1,261 @@
 """
 运行时错误日志工具
 用于记录程序运行时的异常和关键操作
+
+日志以 JSONL（每行一条 JSON 记录）格式写入 logs/run_errors.log：
+    {"ts": "2025-01-01 12:00:00.123", "level": "INFO", "event": "CREATE_PAYMENT_START", "message": "..."}
+调用方只负责把记录放入队列，由后台写线程批量写盘，避免在业务热路径上反复打开/关闭文件。
+日志文件按大小与日期两种方式轮转，保留最近 backup_count 个历史文件。
 """
 import os
-import traceback
+import io
 import sys
+import json
+import queue
+import atexit
+import threading
+import traceback
 from datetime import datetime
 from utils.path_utils import get_data_path
 
 
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+
+class _LogWriter(threading.Thread):
+    """后台写线程：从队列取出记录，批量追加到日志文件，并负责轮转"""
+
+    def __init__(self, path, max_bytes, backup_count):
+        super().__init__(name='RuntimeLoggerWriter', daemon=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.Queue()
+        self._file = None
+        self._opened_date = None
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            batch = [item]
+            # 尽量一次取空队列，合并为一次写入
+            try:
+                while len(batch) < 500:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            stop = False
+            lines = []
+            flush_events = []
+            for entry in batch:
+                if entry is None:
+                    stop = True
+                elif isinstance(entry, threading.Event):
+                    flush_events.append(entry)
+                else:
+                    lines.append(entry)
+
+            if lines:
+                self._write(lines)
+            for ev in flush_events:
+                ev.set()
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                self._close_file()
+                return
+
+    def _write(self, lines):
+        data = ''.join(lines)
+        try:
+            self._maybe_rotate(len(data.encode('utf-8')))
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+                self._opened_date = datetime.now().date()
+            self._file.write(data)
+            self._file.flush()
+        except Exception as write_error:
+            # 如果日志写入失败，尝试写到控制台
+            print(f"Failed to write to log file: {write_error}")
+            print(data)
+            self._close_file()
+
+    def _maybe_rotate(self, incoming):
+        """按日期（跨天）或大小（超过 max_bytes）轮转日志文件"""
+        try:
+            if not os.path.exists(self.path):
+                return
+            today = datetime.now().date()
+            file_date = self._opened_date
+            if file_date is None:
+                file_date = datetime.fromtimestamp(os.path.getmtime(self.path)).date()
+            size = os.path.getsize(self.path)
+            if file_date == today and (self.max_bytes <= 0 or size + incoming <= self.max_bytes):
+                return
+            if size == 0:
+                return
+        except OSError:
+            return
+
+        self._close_file()
+        try:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                dst = f"{self.path}.{i + 1}"
+                if os.path.exists(src):
+                    os.replace(src, dst)
+            if self.backup_count > 0:
+                os.replace(self.path, f"{self.path}.1")
+            else:
+                os.remove(self.path)
+        except OSError as rotate_error:
+            print(f"Failed to rotate log file: {rotate_error}")
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+        self._file = None
+        self._opened_date = None
+
+
 class RuntimeLogger:
-    """运行时日志记录器"""
+    """运行时日志记录器（异步、可轮转、结构化）"""
 
-    def __init__(self):
-        self.logs_dir = get_data_path('logs')
+    def __init__(self, logs_dir=None, max_bytes=5 * 1024 * 1024, backup_count=5):
+        self.logs_dir = logs_dir or get_data_path('logs')
         self.error_log_path = os.path.join(self.logs_dir, 'run_errors.log')
         self.exports_dir = get_data_path('exports')
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
 
         # 确保日志目录存在
         os.makedirs(self.logs_dir, exist_ok=True)
         os.makedirs(self.exports_dir, exist_ok=True)
 
-    def log_error(self, error, context="", include_stack=True):
-        """记录错误到日志文件"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        error_msg = f"[{timestamp}] ERROR in {context}: {str(error)}"
+        self._writer = None
+        self._lock = threading.Lock()
 
-        if include_stack:
-            error_msg += f"\nStack trace:\n{traceback.format_exc()}"
+    def _ensure_writer(self):
+        """首次写日志时才启动写线程（避免导入模块即创建线程）"""
+        writer = self._writer
+        if writer is not None and writer.is_alive():
+            return writer
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = _LogWriter(self.error_log_path, self.max_bytes, self.backup_count)
+                self._writer.start()
+            return self._writer
 
-        error_msg += "\n" + "="*50 + "\n"
+    def log(self, level, event, message="", **fields):
+        """写入一条结构化日志记录
 
+        Args:
+            level: 日志级别（DEBUG/INFO/WARNING/ERROR/CRITICAL）
+            event: 事件名，例如 CREATE_PAYMENT_START
+            message: 描述文本
+            **fields: 附加字段，原样写入 JSON（不可序列化的值会转为字符串）
+        """
+        level = str(level).upper()
+        if level not in LEVELS:
+            level = 'INFO'
+        record = {
+            'ts': datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            'level': level,
+            'event': event,
+        }
+        if message:
+            record['message'] = str(message)
+        if fields:
+            record.update(fields)
         try:
-            with open(self.error_log_path, 'a', encoding='utf-8') as f:
-                f.write(error_msg)
+            line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        except Exception:
+            line = json.dumps({'ts': record['ts'], 'level': level, 'event': event,
+                               'message': repr(message)}, ensure_ascii=False) + "\n"
+        try:
+            self._ensure_writer().queue.put(line)
         except Exception as log_error:
-            # 如果日志写入失败，尝试写到控制台
-            print(f"Failed to write to log file: {log_error}")
-            print(error_msg)
+            print(f"Failed to queue log record: {log_error}")
+            print(line)
+
+    def log_error(self, error, context="", include_stack=True):
+        """记录错误到日志文件"""
+        fields = {}
+        if include_stack:
+            stack = traceback.format_exc()
+            if stack and stack.strip() != 'NoneType: None':
+                fields['stack'] = stack
+        self.log('ERROR', context or 'ERROR', str(error), **fields)
 
     def log_operation(self, operation, details=""):
         """记录关键操作"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        log_msg = f"[{timestamp}] OPERATION: {operation}"
-        if details:
-            log_msg += f" - {details}"
-
-        try:
-            with open(self.error_log_path, 'a', encoding='utf-8') as f:
-                f.write(log_msg + "\n")
-        except Exception as log_error:
-            print(f"Failed to log operation: {log_error}")
+        self.log('INFO', operation, details)
 
     def log_startup_info(self):
         """记录启动信息"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        startup_info = f"""[{timestamp}] APP STARTUP
-Python version: {sys.version}
-Platform: {sys.platform}
-Frozen: {getattr(sys, 'frozen', False)}
-MEIPASS: {getattr(sys, '_MEIPASS', 'N/A')}
-Working dir: {os.getcwd()}
-Data path: {get_data_path('')}
-{'='*50}
-"""
-        try:
-            with open(self.error_log_path, 'a', encoding='utf-8') as f:
-                f.write(startup_info)
-        except Exception as log_error:
-            print(f"Failed to log startup: {log_error}")
+        self.log('INFO', 'APP_STARTUP', '',
+                 python=sys.version,
+                 platform=sys.platform,
+                 frozen=bool(getattr(sys, 'frozen', False)),
+                 meipass=getattr(sys, '_MEIPASS', 'N/A'),
+                 cwd=os.getcwd(),
+                 data_path=get_data_path(''))
+
+    def flush(self, timeout=5.0):
+        """等待队列中已提交的记录写入磁盘"""
+        writer = self._writer
+        if writer is None or not writer.is_alive():
+            return True
+        done = threading.Event()
+        writer.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """写完剩余记录并停止写线程（程序退出时自动调用）"""
+        writer = self._writer
+        if writer is None or not writer.is_alive():
+            return
+        writer.queue.put(None)
+        writer.join(timeout)
 
     def get_recent_errors(self, lines=50):
-        """获取最近的错误日志"""
+        """获取最近的错误日志（从文件末尾向前读取，不读全文件）"""
+        self.flush(timeout=1.0)
         try:
             if os.path.exists(self.error_log_path):
-                with open(self.error_log_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    lines_list = content.split('\n')
-                    return '\n'.join(lines_list[-lines:])
+                return '\n'.join(_tail_lines(self.error_log_path, lines))
         except Exception:
             pass
         return "No error logs found"
 
 
+def _tail_lines(path, count, block_size=8192):
+    """从文件末尾按块向前读取，返回最后 count 行"""
+    if count <= 0:
+        return []
+    with open(path, 'rb') as f:
+        f.seek(0, io.SEEK_END)
+        pos = f.tell()
+        data = b''
+        while pos > 0 and data.count(b'\n') <= count:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    text = data.decode('utf-8', errors='replace')
+    result = text.split('\n')
+    if result and result[-1] == '':
+        result.pop()
+    return result[-count:]
+
+
 # 全局日志器实例
 logger = RuntimeLogger()
+atexit.register(logger.close)
 
 
 def safe_execute(func, context="", *args, **kwargs):
@@ -109,7 +280,9 @@ def setup_global_exception_handler():
             return
 
         error_msg = ''.join(traceback.format_exception(exc_type, exc_value, exc_traceback))
-        logger.log_error(f"Uncaught exception: {error_msg}", "GLOBAL_EXCEPTION_HANDLER", include_stack=False)
+        logger.log('CRITICAL', 'GLOBAL_EXCEPTION_HANDLER', f"Uncaught exception: {exc_value}", stack=error_msg)
+        # 未捕获异常后进程可能立即退出，确保记录落盘
+        logger.flush(timeout=2.0)
 
         # 继续使用默认的异常处理器
         sys.__excepthook__(exc_type, exc_value, exc_traceback)
@@ -0,0 +1,268 @@
+"""
+内存诊断工具
+用 tracemalloc 记录主窗口各列表每次加载前后的内存变化，统计各表格持有的单元格对象数，
+并可把当前分配最多的代码位置导出到 logs 目录，用于排查收银电脑长时间运行后内存持续上涨。
+
+用法：
+    memory_tracker.start()                     # 开始跟踪（有额外开销，默认关闭）
+
+    @track_view('缴费记录', 'payment_table')    # 主窗口的 load_* 方法
+    def load_payments(self): ...
+
+    memory_tracker.dump_top()                  # 导出分配最多的位置到 logs/memory_*.txt
+
+未开始跟踪时 track_view 只记录表格行数和单元格数，不做快照。
+每个视图按“每 1 万行的峰值内存”与预算比较，超出的在统计中标出并写警告日志。
+"""
+import gc
+import os
+import sys
+import time
+import inspect
+import threading
+import functools
+import tracemalloc
+from datetime import datetime
+
+from utils.logger import logger
+
+# 各视图每加载 1 万行允许的峰值内存（MB），未列出的视图用 DEFAULT_BUDGET_MB
+VIEW_BUDGETS_MB = {
+    '住户列表': 40.0,
+    '缴费记录': 60.0,
+    '欠费查询': 60.0,
+    '收费项目': 20.0,
+}
+DEFAULT_BUDGET_MB = 60.0
+# 行数太少时按 1 万行折算误差很大，不参与预算检查
+BUDGET_MIN_ROWS = 500
+
+
+def peak_mb_per_10k(peak_bytes, rows):
+    """峰值内存折算为每 1 万行的 MB 数"""
+    if not rows:
+        return 0.0
+    return peak_bytes / 1024.0 / 1024.0 * 10000.0 / rows
+
+
+def process_memory_mb():
+    """当前进程占用的物理内存（MB），无法获取时返回 None"""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return round(counters.WorkingSetSize / 1024.0 / 1024.0, 1)
+            return None
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / 1024.0 / 1024.0, 1)
+    except Exception:
+        return None
+
+
+def orm_object_counts():
+    """内存中各 ORM 模型的实例数（遍历 gc 对象，较慢，仅在诊断时调用）"""
+    from models.database import Base
+
+    counts = {}
+    for obj in gc.get_objects():
+        if isinstance(obj, Base):
+            name = type(obj).__name__
+            counts[name] = counts.get(name, 0) + 1
+    return dict(sorted(counts.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def _snapshot():
+    """当前分配快照（去掉 tracemalloc 自身和导入机制的分配）"""
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ))
+
+
+class MemoryTracker:
+    """各视图加载时的内存统计"""
+
+    def __init__(self, frames=1, top_limit=10):
+        self.frames = frames
+        self.top_limit = top_limit
+        self._views = {}    # name -> dict
+        self._tables = {}   # name -> 表格控件
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ 开关
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        """开始 tracemalloc 跟踪（已在跟踪时不变）"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logger.log_operation("MEMORY_TRACE_START", f"frames={self.frames}")
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.log_operation("MEMORY_TRACE_STOP")
+
+    # ------------------------------------------------------------------ 记录
+    def measure(self, name, func, table=None, accumulate=False):
+        """执行 func 并记录内存变化；table 为加载结果所在的 QTableWidget
+
+        accumulate=True 表示分页表格追加的后续页：增量和峰值累加到该视图本次加载的统计上，
+        预算按累计峰值与表格已加载的总行数计算。
+        """
+        if table is not None:
+            self._tables[name] = table
+        if not tracemalloc.is_tracing():
+            result = func()
+            self._record(name, table, None, None, None, accumulate=accumulate)
+            return result
+        if hasattr(tracemalloc, 'reset_peak'):
+            before = _snapshot()
+            tracemalloc.reset_peak()
+        else:
+            # Python 3.8 没有 reset_peak：重新开始跟踪来清零峰值（与 service_benchmark 相同），
+            # 之前的分配记录随之清空，本次增量只统计加载期间新分配且仍存活的内存
+            frames = tracemalloc.get_traceback_limit()
+            tracemalloc.stop()
+            tracemalloc.start(frames)
+            before = _snapshot()
+        base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            current, peak = tracemalloc.get_traced_memory()
+            after = _snapshot()
+            diff = after.compare_to(before, 'lineno')
+            top = [{'where': str(stat.traceback[0]), 'size_diff_kb': round(stat.size_diff / 1024.0, 1),
+                    'count_diff': stat.count_diff} for stat in diff[:self.top_limit]]
+            delta = sum(stat.size_diff for stat in diff)
+            self._record(name, table, delta, peak - base, top, elapsed_ms, accumulate)
+
+    def measure_page(self, table, func):
+        """分页表格滚动加载下一页：计入该表格所属的视图，表格未被 track_view 记录过时直接执行"""
+        name = next((n for n, t in self._tables.items() if t is table), None)
+        if name is None:
+            return func()
+        return self.measure(name, func, table, accumulate=True)
+
+    def _record(self, name, table, delta, peak, top, elapsed_ms=None, accumulate=False):
+        rows = table.rowCount() if table is not None else 0
+        cells = rows * table.columnCount() if table is not None else 0
+        with self._lock:
+            view = self._views.setdefault(name, {'view': name, 'loads': 0})
+            if not accumulate or not view['loads']:
+                view['loads'] += 1
+            view['rows'] = rows
+            view['cells'] = cells
+            view['time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            if delta is None:
+                return
+            if accumulate and 'peak_kb' in view:
+                delta += view['delta_kb'] * 1024.0
+                peak += view['peak_kb'] * 1024.0
+                elapsed_ms += view['elapsed_ms']
+            view['delta_kb'] = round(delta / 1024.0, 1)
+            view['peak_kb'] = round(peak / 1024.0, 1)
+            view['elapsed_ms'] = round(elapsed_ms, 1)
+            view['top'] = top
+            budget = VIEW_BUDGETS_MB.get(name, DEFAULT_BUDGET_MB)
+            per_10k = peak_mb_per_10k(peak, rows)
+            view['peak_mb_per_10k'] = round(per_10k, 1)
+            view['budget_mb_per_10k'] = budget
+            view['over_budget'] = rows >= BUDGET_MIN_ROWS and per_10k > budget
+        if view['over_budget']:
+            logger.log('WARNING', 'MEMORY_OVER_BUDGET', name, rows=rows, peak_kb=view['peak_kb'],
+                       peak_mb_per_10k=view['peak_mb_per_10k'], budget_mb_per_10k=budget)
+
+    # ------------------------------------------------------------------ 汇总
+    def views(self):
+        """各视图最近一次加载的统计（按单元格数从多到少）"""
+        with self._lock:
+            rows = [dict(v) for v in self._views.values()]
+        for row in rows:
+            table = self._tables.get(row['view'])
+            if table is not None:
+                # 表格当前的行数（加载后可能被搜索/过滤改变）
+                row['rows'] = table.rowCount()
+                row['cells'] = table.rowCount() * table.columnCount()
+        rows.sort(key=lambda r: r.get('cells', 0), reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def dump_top(self, path=None, limit=30):
+        """把分配最多的代码位置、各视图统计和 ORM 对象数写入 logs 目录，返回文件路径。
+
+        未在跟踪时只能导出视图统计和对象数，并提示先开始跟踪。
+        """
+        if path is None:
+            path = os.path.join(logger.logs_dir, f"memory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+        lines = [f"内存诊断 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                 f"进程内存：{process_memory_mb()} MB", '']
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            lines.append(f"tracemalloc 当前 {current / 1024.0 / 1024.0:.1f} MB，峰值 {peak / 1024.0 / 1024.0:.1f} MB")
+            lines.append(f"分配最多的 {limit} 处：")
+            stats = _snapshot().statistics('lineno')
+            for stat in stats[:limit]:
+                lines.append(f"  {stat.size / 1024.0:10.1f} KB {stat.count:8d} 个  {stat.traceback[0]}")
+        else:
+            lines.append('未开始内存跟踪，没有分配位置统计（在“性能统计 - 内存”中开始跟踪后再导出）')
+        lines += ['', '各视图：']
+        for view in self.views():
+            lines.append(f"  {view['view']}：{view.get('rows', 0)} 行，{view.get('cells', 0)} 个单元格，"
+                         f"加载 {view['loads']} 次，最近增量 {view.get('delta_kb', '-')} KB，"
+                         f"峰值 {view.get('peak_kb', '-')} KB，每万行 {view.get('peak_mb_per_10k', '-')} MB"
+                         f"{'（超出预算）' if view.get('over_budget') else ''}")
+            for entry in view.get('top') or []:
+                lines.append(f"      {entry['size_diff_kb']:+10.1f} KB {entry['count_diff']:+8d} 个  {entry['where']}")
+        lines += ['', 'ORM 对象：']
+        for model, count in orm_object_counts().items():
+            lines.append(f"  {model}: {count}")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        logger.log_operation("MEMORY_DUMP", path)
+        return path
+
+
+# 全局内存统计实例
+memory_tracker = MemoryTracker()
+
+
+def track_view(name, table_attr=None):
+    """方法装饰器：记录主窗口某个列表加载时的内存变化，table_attr 为表格控件的属性名"""
+    def decorator(func):
+        params = list(inspect.signature(func).parameters.values())[1:]
+        varargs = any(p.kind == p.VAR_POSITIONAL for p in params)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            # 作为槽连接到 clicked(bool) 等信号时，丢掉方法本身不接收的信号参数
+            if not varargs:
+                args = args[:len(params)]
+            table = getattr(self, table_attr, None) if table_attr else None
+            return memory_tracker.measure(name, lambda: func(self, *args, **kwargs), table)
+        return wrapper
+    return decorator
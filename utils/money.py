@@ -0,0 +1,83 @@
+"""
+金额类型
+
+数据库中金额按整数“分”保存，SQL 的 SUM 直接在整数上计算，没有浮点误差；
+读出后是 Money（Decimal 的子类，固定两位小数），可以像以前的 Numeric 返回值一样
+float()、str()、格式化和与 Decimal 运算，Money 之间加减仍为 Money。
+
+    Money('12.5')           -> Money('12.50')
+    Money.from_fen(1250)    -> Money('12.50')
+    Money(0.1) + Money(0.2) -> Money('0.30')
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+_CENT = Decimal('0.01')
+
+
+class Money(Decimal):
+    """金额（元），不可变，精确到分"""
+
+    __slots__ = ()
+
+    def __new__(cls, value=0):
+        if type(value) is cls:
+            return value
+        if isinstance(value, float):
+            # 使用最短往返表示，0.1 按 0.1 而不是 0.1000000000000000055... 处理
+            value = repr(value)
+        elif isinstance(value, str):
+            value = value.strip().replace(',', '').lstrip('¥') or '0'
+        return Decimal.__new__(cls, Decimal(value).quantize(_CENT, rounding=ROUND_HALF_UP))
+
+    @classmethod
+    def from_fen(cls, fen):
+        """由整数分构造"""
+        return Decimal.__new__(cls, Decimal(int(fen)).scaleb(-2))
+
+    @property
+    def fen(self):
+        """整数分"""
+        return int(self.scaleb(2))
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def __add__(self, other):
+        if isinstance(other, (Decimal, int)) and not isinstance(other, bool):
+            return Money(Decimal.__add__(self, other))
+        return Decimal.__add__(self, other)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, (Decimal, int)) and not isinstance(other, bool):
+            return Money(Decimal.__sub__(self, other))
+        return Decimal.__sub__(self, other)
+
+    def __rsub__(self, other):
+        if isinstance(other, (Decimal, int)) and not isinstance(other, bool):
+            return Money(Decimal.__rsub__(self, other))
+        return Decimal.__rsub__(self, other)
+
+    def __neg__(self, context=None):
+        return Money.from_fen(-self.fen)
+
+    def __abs__(self, context=None):
+        return Money.from_fen(abs(self.fen))
+
+
+ZERO = Money.from_fen(0)
+
+
+def to_fen(value):
+    """把 元（int/float/Decimal/str/Money）换算为整数分，四舍五入"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value * 100
+    return Money(value).fen
+
+
+def format_yuan(value):
+    """报表显示用：四舍五入到整数元，如 Money('12.50') -> '¥13'"""
+    fen = to_fen(value or 0)
+    yuan = (abs(fen) + 50) // 100
+    return f"¥{-yuan if fen < 0 else yuan}"
@@ -1251,11 +1251,7 @@ class ReceiptPrinter:
         try:
             if not payment_ids:
                 return False
-            payments = []
-            for pid in payment_ids:
-                p = PaymentService.get_payment_by_id(pid)
-                if p:
-                    payments.append(p)
+            payments = PaymentService.get_payments_by_ids(payment_ids)
             if not payments:
                 return False
 
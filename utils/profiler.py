@@ -0,0 +1,221 @@
+"""
+性能统计工具
+记录每个服务方法的耗时、SQL 语句数与返回行数，并对慢查询写日志。
+
+用法：
+    @profile_service
+    class PaymentService: ...          # 为类中所有静态方法计时
+
+    with profiler.operation('月末结转'):  # 统计任意代码块
+        ...
+
+数据只保存在内存中（每个操作保留最近 max_samples 次），可通过 profiler.summary()
+或“工具 - 性能统计”对话框查看 p50/p95。
+"""
+import math
+import time
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from utils.logger import logger
+
+
+class _Frame:
+    """一次进行中的操作"""
+    __slots__ = ('name', 'sql_count', 'sql_ms', 'rows')
+
+    def __init__(self, name):
+        self.name = name
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.rows = 0
+
+
+def _count_rows(result):
+    """估算返回行数：列表/元组按长度，None 为 0，其它单个对象为 1"""
+    if result is None:
+        return 0
+    if isinstance(result, (list, tuple, set)):
+        return len(result)
+    return 1
+
+
+def _percentile(sorted_values, pct):
+    """最近秩法计算百分位数"""
+    if not sorted_values:
+        return 0.0
+    n = len(sorted_values)
+    k = max(0, min(n - 1, math.ceil(pct / 100.0 * n) - 1))
+    return sorted_values[k]
+
+
+class Profiler:
+    """服务层性能统计器"""
+
+    def __init__(self, max_samples=500, slow_query_ms=200.0, slow_operation_ms=1000.0):
+        self.max_samples = max_samples
+        self.slow_query_ms = slow_query_ms
+        self.slow_operation_ms = slow_operation_ms
+        self.enabled = True
+        self._samples = {}  # name -> deque[(wall_ms, sql_count, rows)]
+        self._slow_queries = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._engines = set()
+
+    # ------------------------------------------------------------------ SQL 钩子
+    def install(self, engine):
+        """在 SQLAlchemy 引擎上注册 before/after_cursor_execute 钩子"""
+        from sqlalchemy import event
+
+        if id(engine) in self._engines:
+            return
+        self._engines.add(id(engine))
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('_profiler_start', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get('_profiler_start')
+            if not starts:
+                return
+            elapsed_ms = (time.perf_counter() - starts.pop()) * 1000.0
+            self._on_sql(statement, parameters, elapsed_ms)
+
+    def _on_sql(self, statement, parameters, elapsed_ms):
+        for frame in self._stack():
+            frame.sql_count += 1
+            frame.sql_ms += elapsed_ms
+        if elapsed_ms >= self.slow_query_ms:
+            stack = self._stack()
+            op = stack[-1].name if stack else ''
+            sql = ' '.join(str(statement).split())[:1000]
+            entry = {
+                'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'operation': op,
+                'duration_ms': round(elapsed_ms, 1),
+                'statement': sql,
+            }
+            self._slow_queries.append(entry)
+            logger.log('WARNING', 'SLOW_QUERY', sql, duration_ms=entry['duration_ms'],
+                       operation=op, params=str(parameters)[:300])
+
+    # ---------------------------------------------------------------- 操作计时
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def operation(self, name):
+        """统计一个代码块的耗时与 SQL 数（可在块内设置 frame.rows 记录行数）"""
+        if not self.enabled:
+            yield None
+            return
+        frame = _Frame(name)
+        stack = self._stack()
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield frame
+        finally:
+            wall_ms = (time.perf_counter() - start) * 1000.0
+            stack.pop()
+            self._record(frame, wall_ms)
+
+    def _record(self, frame, wall_ms):
+        rows = frame.rows
+        with self._lock:
+            samples = self._samples.get(frame.name)
+            if samples is None:
+                samples = self._samples[frame.name] = deque(maxlen=self.max_samples)
+            samples.append((wall_ms, frame.sql_count, rows))
+        if wall_ms >= self.slow_operation_ms:
+            logger.log('WARNING', 'SLOW_OPERATION', frame.name, duration_ms=round(wall_ms, 1),
+                       sql_count=frame.sql_count, sql_ms=round(frame.sql_ms, 1), rows=rows)
+
+    def profiled(self, name=None):
+        """函数装饰器：统计每次调用的耗时、SQL 数和返回行数"""
+        def decorator(func):
+            op_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                frame = _Frame(op_name)
+                stack = self._stack()
+                stack.append(frame)
+                start = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                    frame.rows = _count_rows(result)
+                    return result
+                finally:
+                    wall_ms = (time.perf_counter() - start) * 1000.0
+                    stack.pop()
+                    self._record(frame, wall_ms)
+            wrapper.__profiled__ = True
+            return wrapper
+        return decorator
+
+    # ------------------------------------------------------------------ 汇总
+    def summary(self):
+        """返回各操作的统计列表，按 p95 从大到小排序"""
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+        rows = []
+        for name, samples in snapshot.items():
+            if not samples:
+                continue
+            walls = sorted(s[0] for s in samples)
+            count = len(samples)
+            rows.append({
+                'operation': name,
+                'count': count,
+                'p50_ms': round(_percentile(walls, 50), 2),
+                'p95_ms': round(_percentile(walls, 95), 2),
+                'max_ms': round(walls[-1], 2),
+                'avg_sql': round(sum(s[1] for s in samples) / count, 1),
+                'avg_rows': round(sum(s[2] for s in samples) / count, 1),
+            })
+        rows.sort(key=lambda r: r['p95_ms'], reverse=True)
+        return rows
+
+    def slow_queries(self):
+        """返回最近的慢查询记录（新的在前）"""
+        return list(reversed(self._slow_queries))
+
+    def reset(self):
+        """清空统计数据"""
+        with self._lock:
+            self._samples.clear()
+            self._slow_queries.clear()
+
+    def log_summary(self):
+        """把当前统计写入运行日志（程序退出时调用）"""
+        rows = self.summary()
+        if rows:
+            logger.log('INFO', 'PERF_SUMMARY', '', operations=rows[:50])
+
+
+# 全局性能统计器实例
+profiler = Profiler()
+
+
+def profile_service(cls):
+    """类装饰器：为服务类中的所有静态方法加上 profiler.profiled"""
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('__') or not isinstance(value, staticmethod):
+            continue
+        func = value.__func__
+        if getattr(func, '__profiled__', False):
+            continue
+        setattr(cls, attr, staticmethod(profiler.profiled(f"{cls.__name__}.{attr}")(func)))
+    return cls
@@ -1,13 +1,10 @@
 """
 报表生成工具
 """
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.chart import BarChart, PieChart, Reference
 from datetime import datetime
 from services.payment_service import PaymentService
 from services.charge_service import ChargeService
-from decimal import Decimal, ROUND_HALF_UP
+from utils.money import ZERO, format_yuan
 
 
 class ReportGenerator:
@@ -24,8 +21,11 @@ class ReportGenerator:
         try:
             # 获取统计数据
             stats = PaymentService.get_statistics_by_period(period)
-            payments = PaymentService.get_payments_by_period(period)
+            item_rows = PaymentService.get_period_breakdown(period, by='item')
             
+            # openpyxl 较重，首次导入/导出时再加载，加快程序启动
+            import openpyxl
+            from openpyxl.styles import Font, Alignment, PatternFill
             workbook = openpyxl.Workbook()
             sheet = workbook.active
             sheet.title = f"月度统计_{period}"
@@ -53,9 +53,9 @@ class ReportGenerator:
                 ['总账单数', stats['total_count']],
                 ['已缴费数', stats['paid_count']],
                 ['未缴费数', stats['unpaid_count']],
-                ['总金额', f"¥{int(Decimal(str(stats['total_amount'])).quantize(0, rounding=ROUND_HALF_UP))}"],
-                ['已缴费金额', f"¥{int(Decimal(str(stats['paid_amount'])).quantize(0, rounding=ROUND_HALF_UP))}"],
-                ['欠费金额', f"¥{int(Decimal(str(stats['unpaid_amount'])).quantize(0, rounding=ROUND_HALF_UP))}"],
+                ['总金额', format_yuan(stats['total_amount'])],
+                ['已缴费金额', format_yuan(stats['paid_amount'])],
+                ['欠费金额', format_yuan(stats['unpaid_amount'])],
                 ['缴费率', f"{(stats['paid_count']/stats['total_count']*100) if stats['total_count'] > 0 else 0:.1f}%"]
             ]
             
@@ -66,25 +66,6 @@ class ReportGenerator:
             
             sheet.append([])
             
-            # 按收费项目统计
-            charge_item_stats = {}
-            for payment in payments:
-                item_name = payment.charge_item.name
-                if item_name not in charge_item_stats:
-                    charge_item_stats[item_name] = {
-                        'total': 0.0,
-                        'paid': 0.0,
-                        'count': 0,
-                        'paid_count': 0
-                    }
-                charge_item_stats[item_name]['total'] += float(payment.amount)
-                charge_item_stats[item_name]['count'] += 1
-                if payment.paid == 1:
-                    charge_item_stats[item_name]['paid'] += float(payment.amount)
-                    charge_item_stats[item_name]['paid_count'] += 1
-                elif payment.paid_amount:
-                    charge_item_stats[item_name]['paid'] += float(payment.paid_amount)
-            
             # 收费项目明细表
             detail_row = sheet.max_row + 2
             sheet.cell(row=detail_row, column=1).value = "收费项目明细"
@@ -99,16 +80,16 @@ class ReportGenerator:
                 cell.font = header_font
                 cell.alignment = Alignment(horizontal='center', vertical='center')
             
-            for item_name, item_stats in charge_item_stats.items():
+            for item_stats in item_rows:
                 detail_row += 1
                 unpaid = item_stats['total'] - item_stats['paid']
                 row = [
-                    item_name,
+                    item_stats['key'],
                     item_stats['count'],
                     item_stats['paid_count'],
-                    f"¥{int(Decimal(str(item_stats['total'])).quantize(0, rounding=ROUND_HALF_UP))}",
-                    f"¥{int(Decimal(str(item_stats['paid'])).quantize(0, rounding=ROUND_HALF_UP))}",
-                    f"¥{int(Decimal(str(unpaid)).quantize(0, rounding=ROUND_HALF_UP))}"
+                    format_yuan(item_stats['total']),
+                    format_yuan(item_stats['paid']),
+                    format_yuan(unpaid)
                 ]
                 for col_idx, value in enumerate(row, start=1):
                     sheet.cell(row=detail_row, column=col_idx).value = value
@@ -135,43 +116,20 @@ class ReportGenerator:
     def generate_daily_report(period, file_path):
         """生成日度收费统计报表（按 day 聚合），period 格式 YYYY-MM"""
         try:
-            # 获取当月的缴费记录
-            payments = PaymentService.get_payments_by_period(period)
+            # 按天（计费开始日）和收费项目在 SQL 中汇总当月账单
+            day_rows = PaymentService.get_period_breakdown(period, by='day')
+            item_rows = PaymentService.get_period_breakdown(period, by='item')
 
             # 统计摘要（与月度相同的字段）
-            total_count = len(payments)
-            paid_count = sum(1 for p in payments if p.paid == 1)
+            total_count = sum(d['count'] for d in day_rows)
+            paid_count = sum(d['paid_count'] for d in day_rows)
             unpaid_count = total_count - paid_count
-            total_amount = sum(float(p.amount) for p in payments) if payments else 0.0
-            paid_amount = sum(float(p.paid_amount) for p in payments if p.paid_amount) if payments else 0.0
+            total_amount = sum((d['total'] for d in day_rows), ZERO)
+            paid_amount = sum((d['paid_amount'] for d in day_rows), ZERO)
             unpaid_amount = total_amount - paid_amount
 
-            # 按天聚合（使用 billing_start_date 的日作为分组）
-            day_stats = {}
-            # 以及按收费项目聚合（用于明细）
-            charge_item_stats = {}
-            for p in payments:
-                # day grouping
-                if p.billing_start_date:
-                    day = p.billing_start_date.day
-                else:
-                    day = 1
-                if day not in day_stats:
-                    day_stats[day] = {'total': 0.0, 'paid': 0.0, 'count': 0}
-                day_stats[day]['total'] += float(p.amount)
-                day_stats[day]['paid'] += float(p.paid_amount) if p.paid_amount else 0.0
-                day_stats[day]['count'] += 1
-
-                # charge item detail
-                item_name = p.charge_item.name if p.charge_item else '未知'
-                if item_name not in charge_item_stats:
-                    charge_item_stats[item_name] = {'total': 0.0, 'paid': 0.0, 'count': 0, 'paid_count': 0}
-                charge_item_stats[item_name]['total'] += float(p.amount)
-                charge_item_stats[item_name]['paid'] += float(p.paid_amount) if p.paid_amount else 0.0
-                charge_item_stats[item_name]['count'] += 1
-                if p.paid == 1:
-                    charge_item_stats[item_name]['paid_count'] += 1
-
+            import openpyxl
+            from openpyxl.styles import Font, Alignment, PatternFill
             workbook = openpyxl.Workbook()
             sheet = workbook.active
             sheet.title = f"日度统计_{period}"
@@ -194,9 +152,9 @@ class ReportGenerator:
                 ('总账单数', total_count),
                 ('已缴费数', paid_count),
                 ('未缴费数', unpaid_count),
-                ('总金额', f"¥{int(Decimal(str(total_amount)).quantize(0, rounding=ROUND_HALF_UP))}"),
-                ('已缴费金额', f"¥{int(Decimal(str(paid_amount)).quantize(0, rounding=ROUND_HALF_UP))}"),
-                ('欠费金额', f"¥{int(Decimal(str(unpaid_amount)).quantize(0, rounding=ROUND_HALF_UP))}"),
+                ('总金额', format_yuan(total_amount)),
+                ('已缴费金额', format_yuan(paid_amount)),
+                ('欠费金额', format_yuan(unpaid_amount)),
                 ('缴费率', f"{(paid_count/total_count*100) if total_count>0 else 0:.1f}%")
             ]
             for i, (label, value) in enumerate(summary_data, start=summary_row + 1):
@@ -206,29 +164,28 @@ class ReportGenerator:
             sheet.append([])
             # 日汇总表头
             sheet.append(['日期', '账单数', '日合计(¥)', '已缴(¥)', '欠费(¥)'])
-            for day in sorted(day_stats.keys()):
-                d = day_stats[day]
-                unpaid_day = d['total'] - d['paid']
+            for d in day_rows:
+                unpaid_day = d['total'] - d['paid_amount']
                 sheet.append([
-                    f"{period}-{day:02d}",
+                    f"{period}-{d['key']:02d}",
                     d['count'],
-                    f"¥{int(Decimal(str(d['total'])).quantize(0, rounding=ROUND_HALF_UP))}",
-                    f"¥{int(Decimal(str(d['paid'])).quantize(0, rounding=ROUND_HALF_UP))}",
-                    f"¥{int(Decimal(str(unpaid_day)).quantize(0, rounding=ROUND_HALF_UP))}"
+                    format_yuan(d['total']),
+                    format_yuan(d['paid_amount']),
+                    format_yuan(unpaid_day)
                 ])
 
             sheet.append([])
             # 收费项目明细（账单数/已缴费数/总金额/已缴金额/欠费金额）
             sheet.append(['收费项目', '账单数', '已缴费数', '总金额', '已缴金额', '欠费金额'])
-            for name, stats_item in charge_item_stats.items():
-                unpaid_item = stats_item['total'] - stats_item['paid']
+            for stats_item in item_rows:
+                unpaid_item = stats_item['total'] - stats_item['paid_amount']
                 sheet.append([
-                    name,
+                    stats_item['key'],
                     stats_item['count'],
                     stats_item['paid_count'],
-                    f"¥{int(Decimal(str(stats_item['total'])).quantize(0, rounding=ROUND_HALF_UP))}",
-                    f"¥{int(Decimal(str(stats_item['paid'])).quantize(0, rounding=ROUND_HALF_UP))}",
-                    f"¥{int(Decimal(str(unpaid_item)).quantize(0, rounding=ROUND_HALF_UP))}"
+                    format_yuan(stats_item['total']),
+                    format_yuan(stats_item['paid_amount']),
+                    format_yuan(unpaid_item)
                 ])
 
             # 列宽
@@ -255,6 +212,8 @@ class ReportGenerator:
             stats = PaymentService.get_statistics_by_year(int(year))
             # stats: {'year':year,'total_amount':..., 'by_item':[(name,amt)...]}
 
+            import openpyxl
+            from openpyxl.styles import Font, Alignment, PatternFill
             workbook = openpyxl.Workbook()
             sheet = workbook.active
             sheet.title = f"年度统计_{year}"
@@ -292,3 +251,91 @@ class ReportGenerator:
         except Exception as e:
             raise Exception(f"生成年度报表失败：{str(e)}")
 
+    @staticmethod
+    def generate_closeout_report(start_date, file_path, end_date=None, operator=None):
+        """生成收银日结报表（按实收流水统计），start_date/end_date 格式 YYYY-MM-DD
+
+        三个工作表：日结汇总（天 × 收银员 × 收费项目及小计）、收款明细、对账差异。
+        使用 openpyxl 的只写模式，明细逐页查询、逐行写入，流水再多内存也不随之增长。
+
+        Returns:
+            dict: {'count': 流水笔数, 'amount': 实收合计, 'mismatches': 对账不一致的账单数}
+        """
+        from services.closeout_service import CloseoutService, day_range
+        # 日期格式错误直接抛出 ValueError，便于命令行区分参数错误
+        day_range(start_date, end_date)
+        try:
+            closeout = CloseoutService.get_closeout(start_date, end_date, operator)
+            reconciliation = CloseoutService.get_reconciliation(start_date, end_date)
+
+            import openpyxl
+            from openpyxl.cell import WriteOnlyCell
+            from openpyxl.styles import Font
+            workbook = openpyxl.Workbook(write_only=True)
+            bold = Font(bold=True)
+
+            def add_sheet(title, widths):
+                sheet = workbook.create_sheet(title)
+                for col_idx, width in enumerate(widths, start=1):
+                    sheet.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = width
+                return sheet
+
+            def styled(sheet, values):
+                row = []
+                for value in values:
+                    cell = WriteOnlyCell(sheet, value=value)
+                    cell.font = bold
+                    row.append(cell)
+                return row
+
+            span = closeout['start'] if closeout['start'] == closeout['end'] \
+                else f"{closeout['start']} 至 {closeout['end']}"
+            sheet = add_sheet('日结汇总', [14, 14, 20, 10, 10, 14])
+            sheet.append(styled(sheet, [f"{span} 收银日结{'（' + operator + '）' if operator else ''}"]))
+            sheet.append([])
+            sheet.append(styled(sheet, ['日期', '收银员', '收费项目', '笔数', '账单数', '实收(¥)']))
+            for row in closeout['rows']:
+                sheet.append([row['day'], row['operator'], row['item'], row['count'], row['payment_count'],
+                              row['amount']])
+            sheet.append([])
+            sheet.append(styled(sheet, ['按收银员小计', '', '', '笔数', '', '实收(¥)']))
+            for row in closeout['by_operator']:
+                sheet.append(['', row['operator'], '', row['count'], '', row['amount']])
+            sheet.append([])
+            sheet.append(styled(sheet, ['按日期小计', '', '', '笔数', '', '实收(¥)']))
+            for row in closeout['by_day']:
+                sheet.append([row['day'], '', '', row['count'], '', row['amount']])
+            sheet.append([])
+            sheet.append(styled(sheet, ['合计', '', '', closeout['total']['count'], '',
+                                        closeout['total']['amount']]))
+            sheet.append([f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"])
+
+            sheet = add_sheet('收款明细', [20, 12, 10, 12, 20, 12, 12])
+            sheet.append(styled(sheet, ['收款时间', '收银员', '房号', '姓名', '收费项目', '缴费周期', '金额(¥)']))
+            after = None
+            while True:
+                page = CloseoutService.get_closeout_details(start_date, end_date, operator, after=after)
+                for row in page:
+                    sheet.append([row['paid_time'].strftime('%Y-%m-%d %H:%M:%S') if row['paid_time'] else '',
+                                  row['operator'], row['room_no'], row['name'], row['item'], row['period'],
+                                  row['amount']])
+                if not page:
+                    break
+                after = (page[-1]['paid_time'], page[-1]['id'])
+
+            sheet = add_sheet('对账差异', [10, 12, 12, 20, 12, 14, 14, 12])
+            sheet.append([f"核对 {reconciliation['checked']} 张账单（区间内有收款的全部账单），"
+                          f"已缴金额与流水合计不一致 {len(reconciliation['mismatches'])} 张"])
+            sheet.append(styled(sheet, ['账单ID', '房号', '姓名', '收费项目', '缴费周期', '已缴金额(¥)',
+                                        '流水合计(¥)', '差额(¥)']))
+            for row in reconciliation['mismatches']:
+                sheet.append([row['payment_id'], row['room_no'], row['name'], row['item'], row['period'],
+                              row['paid_amount'], row['transaction_total'],
+                              row['difference']])
+
+            workbook.save(file_path)
+            return {'count': closeout['total']['count'], 'amount': closeout['total']['amount'],
+                    'mismatches': len(reconciliation['mismatches'])}
+
+        except Exception as e:
+            raise Exception(f"生成日结报表失败：{str(e)}")
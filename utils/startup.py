@@ -0,0 +1,79 @@
+"""
+启动阶段计时
+记录从进程启动到首次加载数据完成的各阶段耗时，结束时写入一条 STARTUP_PHASES 日志。
+
+用法：
+    with startup_timer.phase('init_db'):
+        init_db()
+    ...
+    startup_timer.finish()
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+from utils.logger import logger
+
+
+class StartupTimer:
+    """启动阶段计时器（线程安全，后台线程中的阶段也可记录）"""
+
+    def __init__(self, t0=None):
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.phases = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def reset(self, t0=None):
+        """重新开始计时（t0 为进程启动时记下的 perf_counter）"""
+        with self._lock:
+            self.t0 = t0 if t0 is not None else time.perf_counter()
+            self.phases = []
+            self.finished = False
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.t0) * 1000.0
+
+    def record(self, name, start, end=None):
+        """记录一个阶段（start/end 为 perf_counter 值）"""
+        end = end if end is not None else time.perf_counter()
+        entry = {
+            'phase': name,
+            'start_ms': round((start - self.t0) * 1000.0, 1),
+            'duration_ms': round((end - start) * 1000.0, 1),
+            'thread': threading.current_thread().name,
+        }
+        with self._lock:
+            self.phases.append(entry)
+            late = self.finished
+        if late:
+            # 后台阶段在启动完成后才结束，单独记一条
+            logger.log('INFO', 'STARTUP_PHASE', name, **entry)
+
+    @contextmanager
+    def phase(self, name):
+        """统计一个代码块为一个启动阶段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def report(self):
+        with self._lock:
+            phases = sorted(self.phases, key=lambda p: p['start_ms'])
+        return {'total_ms': round(self.elapsed_ms(), 1), 'phases': phases}
+
+    def finish(self):
+        """启动完成：写入日志并返回各阶段耗时（只记录一次）"""
+        report = self.report()
+        with self._lock:
+            if self.finished:
+                return report
+            self.finished = True
+        logger.log('INFO', 'STARTUP_PHASES', '', **report)
+        return report
+
+
+# 全局启动计时器
+startup_timer = StartupTimer()